@@ -21,6 +21,7 @@
 from __future__ import print_function
 import itertools
 import math
+import multiprocessing
 
 # Third Party
 import numpy as np
@@ -34,6 +35,22 @@ from gdw import gdw
 # Package / Application
 from gdwcalc import __version__
 from gdwcalc import __released__
+from gdwcalc import compare
+from gdwcalc import engine
+from gdwcalc import exclusion
+from gdwcalc import history
+from gdwcalc import keepout
+from gdwcalc import landscape
+from gdwcalc import montecarlo
+from gdwcalc import mpw
+from gdwcalc import optimize
+from gdwcalc import probecard
+from gdwcalc import render
+from gdwcalc import reticle
+from gdwcalc import scheduler
+from gdwcalc import sensitivity
+from gdwcalc import stepping
+from gdwcalc import yield_models
 
 
 # TODO: Recode maxGDW to to include 'print' statements?
@@ -48,12 +65,32 @@ C\tToggle centerlines
 O\tToggle wafer outline
 G\tToggle die grid lines
 D\tToggle die centers
+CTRL+L\tGDW offset landscape
 CTRL+Q\tExit
 
 Click on wafer map to
 zoom (mouse wheel) and
 pan (middle-click + drag)"""
 
+# Display names for the View > Colour By menu.
+FIELD_LABELS = {"edge_distance": "Edge Distance (mm)",
+                "flat_distance": "Flat Distance (mm)",
+                "scribe_distance": "Scribe Distance (mm)",
+                "excl_area_fraction": "Area Inside Edge Exclusion",
+                }
+
+# The number of grid angles tried when searching for the best rotation.
+ROTATION_STEPS = 21
+
+# Fill colours for each product of an MPW layout, repeated as needed.
+MPW_COLORS = [(0, 160, 255),
+              (255, 160, 0),
+              (160, 255, 0),
+              (255, 0, 160),
+              (0, 255, 160),
+              (160, 0, 255),
+              ]
+
 
 # ---------------------------------------------------------------------------
 ### Application Classes
@@ -107,6 +144,28 @@ class MainFrame(wx.Frame):
 
     def _create_menu_items(self):
         """ Create each item for each menu """
+        self.mf_export = wx.MenuItem(self.mfile,
+                                     wx.ID_ANY,
+                                     "&Export Map Image...\tCtrl+E",
+                                     "Save the wafer map as a PNG or SVG",
+                                     )
+        self.mf_keepout = wx.MenuItem(self.mfile,
+                                      wx.ID_ANY,
+                                      "Load &Keep-Out Zones...",
+                                      "Load circular and polygonal keep-out"
+                                      " zones",
+                                      )
+        self.mf_profile = wx.MenuItem(self.mfile,
+                                      wx.ID_ANY,
+                                      "Load Edge Exclusion &Profile...",
+                                      "Load an edge exclusion width versus"
+                                      " angle table",
+                                      )
+        self.mf_table = wx.MenuItem(self.mfile,
+                                    wx.ID_ANY,
+                                    "Export Die &Table...",
+                                    "Save every die and its fields as CSV",
+                                    )
         self.mf_close = wx.MenuItem(self.mfile,
                                     wx.ID_ANY,
                                     "&Close\tCtrl+Q",
@@ -119,6 +178,53 @@ class MainFrame(wx.Frame):
                                    "Calculate Gross Die per Wafer",
                                    )
 
+        self.me_back = wx.MenuItem(self.medit,
+                                   wx.ID_ANY,
+                                   "&Previous Calculation\tCtrl+Z",
+                                   "Restore the previous calculation",
+                                   )
+        self.me_forward = wx.MenuItem(self.medit,
+                                      wx.ID_ANY,
+                                      "&Next Calculation\tCtrl+Y",
+                                      "Restore the next calculation",
+                                      )
+
+        self.me_aspect = wx.MenuItem(self.medit,
+                                     wx.ID_ANY,
+                                     "Optimize &Aspect Ratio...",
+                                     "Find the best die shape for a fixed area",
+                                     )
+        self.me_solve = wx.MenuItem(self.medit,
+                                    wx.ID_ANY,
+                                    "&Solve Die Size for GDW...",
+                                    "Find the largest die that meets a GDW",
+                                    )
+        self.me_shots = wx.MenuItem(self.medit,
+                                    wx.ID_ANY,
+                                    "Optimize S&hot Placement...",
+                                    "Place reticle shots for the fewest shots",
+                                    )
+        self.me_path = wx.MenuItem(self.medit,
+                                   wx.ID_ANY,
+                                   "Stepping &Path...",
+                                   "Choose the prober stepping order",
+                                   )
+        self.me_defects = wx.MenuItem(self.medit,
+                                      wx.ID_ANY,
+                                      "Simulate &Defects...",
+                                      "Monte Carlo defect simulation",
+                                      )
+        self.me_mpw = wx.MenuItem(self.medit,
+                                  wx.ID_ANY,
+                                  "&MPW Packing...",
+                                  "Pack several products onto one wafer",
+                                  )
+        self.me_compare = wx.MenuItem(self.medit,
+                                      wx.ID_ANY,
+                                      "C&ompare Setups...",
+                                      "Calculate several setups side by side",
+                                      )
+
         self.mv_zoomfit = wx.MenuItem(self.mview,
                                       wx.ID_ANY,
                                       "Zoom &Fit\tHome",
@@ -142,6 +248,20 @@ class MainFrame(wx.Frame):
                                         "Show or hide the die grid lines",
                                         wx.ITEM_CHECK,
                                         )
+        # View > Colour By submenu: None is the status map.
+        self.mv_colour = wx.Menu()
+        self.mv_colour_items = {}
+        colour_choices = [(None, "Die Status")]
+        colour_choices += [(name, FIELD_LABELS[name])
+                           for name in engine.FIELD_NAMES]
+        for name, label in colour_choices:
+            item = self.mv_colour.AppendRadioItem(wx.ID_ANY, label)
+            self.mv_colour_items[item.GetId()] = name
+        self.mv_landscape = wx.MenuItem(self.mview,
+                                        wx.ID_ANY,
+                                        "GDW &Landscape...\tCtrl+L",
+                                        "Show GDW versus fixed grid offset",
+                                        )
         self.mv_diecenters = wx.MenuItem(self.mview,
                                          wx.ID_ANY,
                                          "Die Centers\tD",
@@ -151,14 +271,33 @@ class MainFrame(wx.Frame):
 
     def _add_menu_items(self):
         """ Appends MenuItems to each menu """
+        self.mfile.Append(self.mf_keepout)
+        self.mfile.Append(self.mf_profile)
+        self.mfile.AppendSeparator()
+        self.mfile.Append(self.mf_export)
+        self.mfile.Append(self.mf_table)
+        self.mfile.AppendSeparator()
         self.mfile.Append(self.mf_close)
         self.medit.Append(self.me_calc)
+        self.medit.Append(self.me_back)
+        self.medit.Append(self.me_forward)
+        self.medit.AppendSeparator()
+        self.medit.Append(self.me_aspect)
+        self.medit.Append(self.me_solve)
+        self.medit.Append(self.me_shots)
+        self.medit.Append(self.me_path)
+        self.medit.Append(self.me_defects)
+        self.medit.Append(self.me_mpw)
+        self.medit.Append(self.me_compare)
         self.mview.Append(self.mv_zoomfit)
         self.mview.AppendSeparator()
         self.mview.Append(self.mv_crosshairs)
         self.mview.Append(self.mv_outline)
         self.mview.Append(self.mv_gridlines)
         self.mview.Append(self.mv_diecenters)
+        self.mview.AppendSubMenu(self.mv_colour, "Colour &By")
+        self.mview.AppendSeparator()
+        self.mview.Append(self.mv_landscape)
 
     def _add_menus(self):
         """ Appends each menu to the menu bar """
@@ -168,13 +307,30 @@ class MainFrame(wx.Frame):
 
     def _bind_events(self):
         """ Binds events to varoius MenuItems """
+        self.Bind(wx.EVT_MENU, self.on_export, self.mf_export)
+        self.Bind(wx.EVT_MENU, self.on_export_table, self.mf_table)
+        self.Bind(wx.EVT_MENU, self.on_load_keepouts, self.mf_keepout)
+        self.Bind(wx.EVT_MENU, self.on_load_profile, self.mf_profile)
         self.Bind(wx.EVT_MENU, self.on_quit, self.mf_close)
         self.Bind(wx.EVT_MENU, self.on_calc, self.me_calc)
+        self.Bind(wx.EVT_MENU, self.on_back, self.me_back)
+        self.Bind(wx.EVT_MENU, self.on_forward, self.me_forward)
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+        self.Bind(wx.EVT_MENU, self.on_aspect, self.me_aspect)
+        self.Bind(wx.EVT_MENU, self.on_solve, self.me_solve)
+        self.Bind(wx.EVT_MENU, self.on_shots, self.me_shots)
+        self.Bind(wx.EVT_MENU, self.on_path, self.me_path)
+        self.Bind(wx.EVT_MENU, self.on_defects, self.me_defects)
+        self.Bind(wx.EVT_MENU, self.on_mpw, self.me_mpw)
+        self.Bind(wx.EVT_MENU, self.on_compare, self.me_compare)
         self.Bind(wx.EVT_MENU, self.zoom_fit, self.mv_zoomfit)
         self.Bind(wx.EVT_MENU, self.toggle_crosshairs, self.mv_crosshairs)
         self.Bind(wx.EVT_MENU, self.toggle_outline, self.mv_outline)
         self.Bind(wx.EVT_MENU, self.toggle_gridlines, self.mv_gridlines)
         self.Bind(wx.EVT_MENU, self.toggle_diecenters, self.mv_diecenters)
+        self.Bind(wx.EVT_MENU, self.on_landscape, self.mv_landscape)
+        for item_id in self.mv_colour_items:
+            self.Bind(wx.EVT_MENU, self.on_colour_by, id=item_id)
 
     def on_quit(self, event):
         """ Actions for the quit event """
@@ -184,6 +340,83 @@ class MainFrame(wx.Frame):
         """ Action for Calc event """
         self.panel.on_calc_gdw(event)
 
+    def on_back(self, event):
+        """ Action for the Previous Calculation event """
+        self.panel.on_history_back(event)
+
+    def on_forward(self, event):
+        """ Action for the Next Calculation event """
+        self.panel.on_history_forward(event)
+
+    def on_close(self, event):
+        """ Remove the spilled history and stop the workers """
+        self.panel.history.close()
+        # Don't keep the window open until a running sweep task is done.
+        scheduler.shutdown_shared(wait=False)
+        event.Skip()
+
+    def on_aspect(self, event):
+        """ Open the aspect ratio optimizer """
+        self.panel.on_calc_gdw(event)
+        frame = AspectRatioFrame(self, self.panel)
+        frame.Show()
+
+    def on_solve(self, event):
+        """ Open the die size solver """
+        self.panel.on_calc_gdw(event)
+        frame = DieSizeSolverFrame(self, self.panel)
+        frame.Show()
+
+    def on_shots(self, event):
+        """ Open the shot placement optimizer """
+        self.panel.on_calc_gdw(event)
+        frame = ShotPlacementFrame(self, self.panel)
+        frame.Show()
+
+    def on_path(self, event):
+        """ Open the stepping path comparison """
+        self.panel.on_calc_gdw(event)
+        frame = SteppingPathFrame(self, self.panel)
+        frame.Show()
+
+    def on_defects(self, event):
+        """ Open the Monte Carlo defect simulation """
+        self.panel.on_calc_gdw(event)
+        frame = DefectSimulationFrame(self, self.panel)
+        frame.Show()
+
+    def on_mpw(self, event):
+        """ Open the multi-project wafer packing """
+        self.panel.on_calc_gdw(event)
+        frame = MpwPackingFrame(self, self.panel)
+        frame.Show()
+
+    def on_compare(self, event):
+        """ Open the side-by-side setup comparison """
+        frame = ComparisonFrame(self, self.panel)
+        frame.Show()
+
+    def on_export(self, event):
+        """ Action for the Export Map Image event """
+        self.panel.on_export_image(event)
+
+    def on_export_table(self, event):
+        """ Action for the Export Die Table event """
+        self.panel.on_export_table(event)
+
+    def on_load_keepouts(self, event):
+        """ Action for the Load Keep-Out Zones event """
+        self.panel.on_load_keepouts(event)
+
+    def on_load_profile(self, event):
+        """ Action for the Load Edge Exclusion Profile event """
+        self.panel.on_load_profile(event)
+
+    def on_colour_by(self, event):
+        """ Colour the map by status or by one of the die fields """
+        self.panel.colour_field = self.mv_colour_items[event.GetId()]
+        self.panel.on_calc_gdw(event)
+
     def zoom_fit(self, event):
         """ Call the WaferMapPanel.zoom_fill() method """
         print("Frame Event!")
@@ -209,6 +442,12 @@ class MainFrame(wx.Frame):
     def toggle_diecenters(self, event):
         self.panel.wafer_map.toggle_die_centers()
 
+    def on_landscape(self, event):
+        """ Open the GDW landscape for the current inputs """
+        self.panel.on_calc_gdw(event)
+        frame = LandscapeFrame(self, self.panel)
+        frame.Show()
+
 
 # ---------------------------------------------------------------------------
 ### SubPanels
@@ -703,6 +942,10 @@ class ResultPanel(wx.Panel):
                                                  "Die Lost to Scribe Exclusion:",
                                                  "0",
                                                  )
+        self.keepout_loss_result = StaticTextResult(self,
+                                                    "Die lost to keep-out:",
+                                                    "0",
+                                                    )
 
         self.shape_x_result = StaticTextResult(self,
                                                "Center X (Column) Offset:",
@@ -713,6 +956,27 @@ class ResultPanel(wx.Panel):
 
         self.center_x_result = StaticTextResult(self, "Center X Coord:", "0")
         self.center_y_result = StaticTextResult(self, "Center Y Coord:", "0")
+        self.rotation_result = StaticTextResult(self,
+                                                "Grid Rotation (deg):",
+                                                "0",
+                                                )
+
+        self.shots_result = StaticTextResult(self, "Shots:", "-")
+        self.partial_shots_result = StaticTextResult(self,
+                                                     "Partial Shots:",
+                                                     "-",
+                                                     )
+
+        self.touchdowns_result = StaticTextResult(self, "Touchdowns:", "-")
+        self.utilization_result = StaticTextResult(self,
+                                                   "Site Utilization:",
+                                                   "-",
+                                                   )
+
+        self.mpw_result = StaticTextResult(self,
+                                           "MPW Die (placed/required):",
+                                           "-",
+                                           )
 
         self.vbox = wx.BoxSizer(wx.VERTICAL)
         self.vbox.Add(self.gdw_result, 0, wx.EXPAND)
@@ -720,18 +984,36 @@ class ResultPanel(wx.Panel):
         self.vbox.Add(self.flat_loss_result, 0, wx.EXPAND)
         self.vbox.Add(self.fe_loss_result, 0, wx.EXPAND)
         self.vbox.Add(self.scribe_loss_result, 0, wx.EXPAND)
+        self.vbox.Add(self.keepout_loss_result, 0, wx.EXPAND)
         self.vbox.AddSpacer(10)
         self.vbox.Add(self.shape_x_result, 0, wx.EXPAND)
         self.vbox.Add(self.shape_y_result, 0, wx.EXPAND)
         self.vbox.AddSpacer(10)
         self.vbox.Add(self.center_x_result, 0, wx.EXPAND)
         self.vbox.Add(self.center_y_result, 0, wx.EXPAND)
+        self.vbox.Add(self.rotation_result, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.shots_result, 0, wx.EXPAND)
+        self.vbox.Add(self.partial_shots_result, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.touchdowns_result, 0, wx.EXPAND)
+        self.vbox.Add(self.utilization_result, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.mpw_result, 0, wx.EXPAND)
 
         self.SetSizer(self.vbox)
 
 
 class InputPanel(wx.Panel):
     """ Main input panel """
+    # The controls saved by ``state``, by type.
+    XY_CTRLS = ("size_input", "street_input", "fo_ctrl", "fdc_ctrl",
+                "reticle_ctrl", "probecard_ctrl")
+    TEXT_CTRLS = ("dia_input", "ee_input", "fe_input", "rotation_input",
+                  "rotation_search_ctrl", "scribe_loc_ctrl")
+    CHECKED_CTRLS = ("rotation_search_ctrl", "fo_ctrl", "fdc_ctrl",
+                     "scribe_loc_ctrl", "reticle_ctrl", "probecard_ctrl")
+
     def __init__(self, parent):
         wx.Panel.__init__(self, parent)
         self.parent = parent
@@ -740,9 +1022,19 @@ class InputPanel(wx.Panel):
 
     def _init_ui(self):
         self.size_input = LabeledXYCtrl(self, "Die Size (mm):", "5", "5")
+        self.street_input = LabeledXYCtrl(self, "Street Width (mm):", "0", "0")
         self.dia_input = LabeledTextCtrl(self, "Diameter (mm)", "150")
         self.ee_input = LabeledTextCtrl(self, "Edge Exclusion (mm)", "4.5")
         self.fe_input = LabeledTextCtrl(self, "Flat Exclusion (mm)", "4.5")
+        self.rotation_input = LabeledTextCtrl(self,
+                                              "Grid Rotation (deg)",
+                                              "0",
+                                              )
+        self.rotation_search_ctrl = CheckedTextCtrl(self,
+                                                    "Search Rotation?",
+                                                    "+/- (deg)",
+                                                    "1",
+                                                    )
         self.fo_ctrl = CheckedXYCtrl(self,
                                      "Force Fixed Offsets? (mm):",
                                      "0",
@@ -754,21 +1046,91 @@ class InputPanel(wx.Panel):
                                                "Y Coord (mm)",
                                                "70.2",
                                                )
+        self.reticle_ctrl = CheckedXYCtrl(self,
+                                          "Use Reticle? (die per shot):",
+                                          "4",
+                                          "3",
+                                          )
+        self.probecard_ctrl = CheckedXYCtrl(self,
+                                            "Use Probe Card? (sites):",
+                                            "2",
+                                            "2",
+                                            )
 
         self.vbox = wx.BoxSizer(wx.VERTICAL)
         self.vbox.Add(self.size_input, 0, wx.EXPAND)
+        self.vbox.Add(self.street_input, 0, wx.EXPAND)
         self.vbox.Add(self.dia_input, 0, wx.EXPAND)
         self.vbox.Add(self.ee_input, 0, wx.EXPAND)
         self.vbox.Add(self.fe_input, 0, wx.EXPAND)
+        self.vbox.Add(self.rotation_input, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.rotation_search_ctrl, 0, wx.EXPAND)
         self.vbox.AddSpacer(10)
         self.vbox.Add(self.fo_ctrl, 0, wx.EXPAND)
         self.vbox.AddSpacer(10)
         self.vbox.Add(self.fdc_ctrl, 0, wx.EXPAND)
         self.vbox.AddSpacer(10)
         self.vbox.Add(self.scribe_loc_ctrl, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.reticle_ctrl, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.probecard_ctrl, 0, wx.EXPAND)
 
         self.SetSizer(self.vbox)
 
+    def setup(self):
+        """
+        Return the die grid inputs as a ``compare.setup_die_map`` setup.
+
+        The reticle, probe card, rotation search and first die inputs don't
+        change the die map and are left out.
+        """
+        setup = {'die_xy': (float(self.size_input.x_value),
+                            float(self.size_input.y_value)),
+                 'street_xy': (float(self.street_input.x_value),
+                               float(self.street_input.y_value)),
+                 'dia': int(self.dia_input.value),
+                 'ee': float(self.ee_input.value),
+                 'fe': float(self.fe_input.value),
+                 'rotation': float(self.rotation_input.value),
+                 }
+        if self.scribe_loc_ctrl.checked:
+            setup['north_limit'] = float(self.scribe_loc_ctrl.value)
+        if self.fo_ctrl.checked:
+            setup['offset'] = (float(self.fo_ctrl.x_value),
+                               float(self.fo_ctrl.y_value))
+        return setup
+
+    def state(self):
+        """
+        Return every input as a JSON serializable dict of control name to
+        its text and, for checked controls, its checkbox.
+        """
+        state = {}
+        for name in self.XY_CTRLS:
+            ctrl = getattr(self, name)
+            state[name] = [ctrl.x_value, ctrl.y_value]
+        for name in self.TEXT_CTRLS:
+            state[name] = getattr(self, name).value
+        for name in self.CHECKED_CTRLS:
+            state[name + "_checked"] = bool(getattr(self, name).checked)
+        return state
+
+    def load_state(self, state):
+        """ Set the inputs from a ``state`` dict """
+        for name in self.XY_CTRLS:
+            ctrl = getattr(self, name)
+            ctrl.x_value, ctrl.y_value = state[name]
+        for name in self.TEXT_CTRLS:
+            getattr(self, name).value = state[name]
+        for name in self.CHECKED_CTRLS:
+            getattr(self, name).checked = state[name + "_checked"]
+
+    def load_setup(self, other):
+        """ Copy the values of another ``InputPanel`` """
+        self.load_state(other.state())
+
 
 # ---------------------------------------------------------------------------
 ### Main UI Panel
@@ -779,11 +1141,25 @@ class MainPanel(wx.Panel):
         wx.Panel.__init__(self, parent)
         self.parent = parent
 
-        probe_list, self.center_xy = gdw.maxGDW((5, 5), 150, 5, 5)
-        self.coord_list = [(i[0], i[1], i[4]) for i in probe_list]
+        self.die_map = engine.max_gdw((5, 5), 150, 5, 5)
+        self.center_xy = self.die_map.center_xy
+        self.coord_list = self.die_map.coord_list()
 
         self.wafer_info = wm_info.WaferInfo((5, 5), self.center_xy)
         self.die_xy = self.wafer_info.die_size
+        self.street_xy = (0, 0)
+        self.shot_phase = (0, 0)
+        self.requested_shot_offset = None
+        self.shot_map = None
+        self.touchdown_plan = None
+        self.path_strategy = "row"
+        self.colour_field = None
+        self.keepouts = []
+        self.ee_profile = None
+        self.rotation = 0
+        self.history = history.History()
+        self.grid_offset = (0, 0)
+        self.pitch_xy = self.die_map.pitch_xy
         self.dia = self.wafer_info.dia
 
         self.init_ui()
@@ -799,39 +1175,20 @@ class MainPanel(wx.Panel):
         self.gen_mask_button = wx.Button(self, label="Generate Mask File")
         self.Bind(wx.EVT_BUTTON, self.on_gen_mask, self.gen_mask_button)
 
-        # Actual Wafer Map
-        legend_values = [
-                         "flat",
-                         "excl",
-                         "probe",
-                         "flatExcl",
-                         "scribe",
-                         ]
-        legend_colors = [
-                         wx.Colour(191, 0, 0),
-                         wx.Colour(0, 191, 191),
-                         wx.Colour(95, 191, 0),
-                         wx.Colour(95, 0, 191),
-                         wx.Colour(152, 191, 0),
-                         ]
+        # Actual Wafer Map. Legend colors are shared with the headless
+        # renderer so that report images match the GUI.
+        legend_values = render.LEGEND_VALUES
+        legend_colors = [wx.Colour(*rgb) for rgb in render.LEGEND_COLORS]
         self.wafer_map = wm_core.WaferMapPanel(self,
                                                self.coord_list,
                                                self.wafer_info,
                                                data_type='discrete',
                                                plot_die_centers=False,
                                                show_die_gridlines=True,
-                                               discrete_legend_values=legend_values
+                                               discrete_legend_values=legend_values,
+                                               discrete_legend_colors=legend_colors,
                                                )
 
-        # Hack until I raise the legend colors up to WaferMapPanel constructor.
-#        self.wafer_map.legend = wm_legend.DiscreteLegend(self.wafer_map,
-#                                                         legend_values,
-#                                                         legend_colors,
-#                                                         )
-#
-#        self.wafer_map.toggle_legend()
-#        self.wafer_map.toggle_legend()
-
         # Radius Histograms
         radius_sqrd_data = list(
            (self.wafer_info.die_size[0] * (self.wafer_info.center_xy[0] - die[0]))**2
@@ -840,6 +1197,16 @@ class MainPanel(wx.Panel):
         radius_data = list(math.sqrt(item) for item in radius_sqrd_data)
         self.histograms = RadiusPlots(self, radius_data)
 
+        # GDW Sensitivity Curve
+        self.sensitivity = SensitivityPlot(self)
+        self.sensitivity.update(self.die_xy, self.dia,
+                                self.die_map.center_offset, 5, 5, None,
+                                self.street_xy)
+
+        # Net Die Yield Curves
+        self.yield_plot = YieldPlot(self)
+        self.yield_plot.update(self.die_map.gdw, self.die_xy)
+
         # Result Info
         self.results = ResultPanel(self)
 
@@ -866,7 +1233,11 @@ class MainPanel(wx.Panel):
         self.hbox.Add(self.vbox, 0, wx.EXPAND)
         self.hbox.AddSpacer(20)
         self.hbox.Add(self.wafer_map, 2, wx.EXPAND)
-        self.hbox.Add(self.histograms, 1, wx.EXPAND)
+        self.plots_vbox = wx.BoxSizer(wx.VERTICAL)
+        self.plots_vbox.Add(self.histograms, 2, wx.EXPAND)
+        self.plots_vbox.Add(self.sensitivity, 1, wx.EXPAND)
+        self.plots_vbox.Add(self.yield_plot, 1, wx.EXPAND)
+        self.hbox.Add(self.plots_vbox, 1, wx.EXPAND)
 
         self.SetSizer(self.hbox)
 
@@ -874,12 +1245,76 @@ class MainPanel(wx.Panel):
         """ Performs the GDW Calculation on button click """
         print("Button Pressed")
 
+        self.read_inputs()
+
+        # A loaded profile replaces the uniform edge exclusion for the map.
+        # The sweeps and plots still use the uniform value.
+        excl = self.ee if self.ee_profile is None else self.ee_profile
+
+        # This bypasses the shared scheduler: the dialogs that call it
+        # expect the new die map right away. A single map is fast; the
+        # rotation search runs ROTATION_STEPS of them, which can take about
+        # a second for small die on a 300 mm wafer.
+
+        # If using fixed offsets, call other function.
+        if self.fo_bool:
+            die_map = engine.classify(self.die_xy,
+                                      self.dia,
+                                      self.fo,
+                                      excl,
+                                      self.fe,
+                                      self.north_limit,
+                                      street_xy=self.street_xy,
+                                      fields=True,
+                                      keepouts=self.keepouts,
+                                      rotation=self.rotation,
+                                      )
+
+        else:
+            rotation = self.rotation
+            if self.input_panel.rotation_search_ctrl.checked:
+                span = float(self.input_panel.rotation_search_ctrl.value)
+                rotation = np.linspace(rotation - span, rotation + span,
+                                       ROTATION_STEPS)
+            die_map = engine.max_gdw(self.die_xy,
+                                     self.dia,
+                                     excl,
+                                     self.fe,
+                                     self.north_limit,
+                                     street_xy=self.street_xy,
+                                     fields=True,
+                                     keepouts=self.keepouts,
+                                     rotation=rotation,
+                                     )
+        params = self.calc_params()
+        # Only a map that was shown goes in the history, so that recalling
+        # an entry can't fail the way this calculation did.
+        self.show_die_map(die_map)
+        self.history.push(params, die_map)
+
+    def calc_params(self):
+        """
+        Return everything that a calculation depends on, for the history:
+        the input panel state plus the loaded keep-out zones and edge
+        exclusion profile.
+        """
+        params = self.input_panel.state()
+        params['keepouts'] = [zone.to_dict() for zone in self.keepouts]
+        params['ee_profile'] = (None if self.ee_profile is None
+                                else self.ee_profile.to_dict())
+        return params
+
+    def read_inputs(self):
+        """ Read the input panel into attributes """
         self.die_x = float(self.input_panel.size_input.x_value)
         self.die_y = float(self.input_panel.size_input.y_value)
         self.die_xy = (self.die_x, self.die_y)
+        self.street_xy = (float(self.input_panel.street_input.x_value),
+                          float(self.input_panel.street_input.y_value))
         self.dia = int(self.input_panel.dia_input.Value)
         self.ee = float(self.input_panel.ee_input.Value)
         self.fe = float(self.input_panel.fe_input.Value)
+        self.rotation = float(self.input_panel.rotation_input.value)
         self.fo_bool = bool(self.input_panel.fo_ctrl.checked)
         self.x_fo = float(self.input_panel.fo_ctrl.x_value)
         self.y_fo = float(self.input_panel.fo_ctrl.y_value)
@@ -890,24 +1325,19 @@ class MainPanel(wx.Panel):
         if not self.input_panel.scribe_loc_ctrl.checked:
             self.north_limit = None
 
-        # If using fixed offsets, call other function.
-        if self.fo_bool:
-            probe_list, self.center_xy = gdw.gdw(self.die_xy,
-                                                 self.dia,
-                                                 self.fo,
-                                                 self.ee,
-                                                 self.fe,
-                                                 self.north_limit
-                                                 )
+    def show_die_map(self, die_map):
+        """
+        Update the map, plots and results for a classified die map.
 
-        else:
-            probe_list, self.center_xy = gdw.maxGDW(self.die_xy,
-                                                    self.dia,
-                                                    self.ee,
-                                                    self.fe,
-                                                    self.north_limit
-                                                    )
-        self.coord_list = [(i[0], i[1], i[4]) for i in probe_list]
+        Used both for new calculations and for ones recalled from the
+        history, which are not classified again.
+        """
+        excl = self.ee if self.ee_profile is None else self.ee_profile
+        self.die_map = die_map
+        self.rotation = die_map.rotation
+        self.pitch_xy = die_map.pitch_xy
+        self.center_xy = die_map.center_xy
+        self.coord_list = die_map.coord_list()
 
         # If using a forced starting die (top-left), adjust coords
         if self.input_panel.fdc_ctrl.checked:
@@ -930,47 +1360,78 @@ class MainPanel(wx.Panel):
             self.center_xy = (self.center_xy[0] - delta_x,
                               self.center_xy[1] - delta_y)
 
-        # Calculate the Die Counts
-        # TODO: Update gdw.maxGDW to return these values instead
-        self.gdw = 0
-        self.flat_loss = 0
-        self.ee_loss = 0
-        self.fe_loss = 0
-        self.scribe_loss = 0
-
-        # TODO: This isn't pythonic at all, but I'm ~~in a rush~~ lazy
-        for rcd in self.coord_list:
-            if rcd[2] == 'probe':
-                self.gdw += 1
-            elif rcd[2] == 'flat':
-                self.flat_loss += 1
-            elif rcd[2] == 'excl':
-                self.ee_loss += 1
-            elif rcd[2] == 'flatExcl':
-                self.fe_loss += 1
-            elif rcd[2] == 'scribe':
-                self.scribe_loss += 1
-            else:
-                raise KeyError("Invalid dieStatus value")
+        # Plan probe card touchdowns on the final (possibly shifted) grid.
+        self.touchdown_plan = None
+        if self.input_panel.probecard_ctrl.checked:
+            sites = (int(self.input_panel.probecard_ctrl.x_value),
+                     int(self.input_panel.probecard_ctrl.y_value))
+            probe_xy = [c[:2] for c in self.coord_list if c[2] == "probe"]
+            self.touchdown_plan = probecard.plan_touchdowns(probe_xy, sites)
 
-        self.wafer_info = wm_info.WaferInfo(self.die_xy,
+        # Calculate the Die Counts
+        counts = die_map.counts()
+        self.gdw = int(counts[engine.PROBE])
+        self.flat_loss = int(counts[engine.FLAT])
+        self.ee_loss = int(counts[engine.EXCL])
+        self.fe_loss = int(counts[engine.FLAT_EXCL])
+        self.scribe_loss = int(counts[engine.SCRIBE])
+        self.keepout_loss = int(counts[engine.KEEPOUT])
+
+        # The map is drawn on the stepping grid, so it gets the pitch.
+        self.wafer_info = wm_info.WaferInfo(self.pitch_xy,
                                             self.center_xy,
                                             self.dia,
                                             self.ee,
                                             self.fe)
 
+        # Colour by status, or by a die field in continuous mode.
+        if self.colour_field is None:
+            map_data = self.coord_list
+            self.wafer_map.data_type = 'discrete'
+        else:
+            delta_x, delta_y = self.grid_offset
+            map_data = [(x - delta_x, y - delta_y, value) for x, y, value
+                        in die_map.field_list(self.colour_field)]
+            self.wafer_map.data_type = 'continuous'
+
         # All these things just so that I can update the map...
         self.wafer_map.canvas.InitAll()
         self.wafer_map._clear_canvas()
-        self.wafer_map.die_size = self.die_xy
-        self.wafer_map.xyd = self.coord_list
+        self.wafer_map.die_size = self.pitch_xy
+        self.wafer_map.xyd = map_data
         self.wafer_map.wafer_info = self.wafer_info
         self.wafer_map.grid_center = self.center_xy
-        self.wafer_map.xyd_dict = wm_core.xyd_to_dict(self.coord_list)
+        self.wafer_map.xyd_dict = wm_core.xyd_to_dict(map_data)
         self.wafer_map._create_legend()
         self.wafer_map.draw_die()
         self.wafer_map.die_centers = self.wafer_map.draw_die_center()
         self.wafer_map.draw_wafer_objects()
+        self.shot_map = None
+        # Shot maps are only laid out on unrotated grids.
+        if self.input_panel.reticle_ctrl.checked and not self.rotation:
+            reticle_xy = (int(self.input_panel.reticle_ctrl.x_value),
+                          int(self.input_panel.reticle_ctrl.y_value))
+            # Keep the shots on the same die as last time, unless a shot
+            # placement was just loaded.
+            if self.requested_shot_offset is not None:
+                self.shot_phase = reticle.shot_phase(
+                    die_map, reticle_xy, self.requested_shot_offset)
+                self.requested_shot_offset = None
+            self.shot_phase = (self.shot_phase[0] % reticle_xy[0],
+                               self.shot_phase[1] % reticle_xy[1])
+            shot_offset = reticle.shot_offset(die_map, reticle_xy,
+                                              self.shot_phase)
+            self.shot_map = reticle.shot_map(die_map.die_xy,
+                                             reticle_xy,
+                                             self.dia,
+                                             shot_offset,
+                                             excl,
+                                             self.fe,
+                                             self.north_limit,
+                                             die_map.street_xy,
+                                             self.keepouts,
+                                             )
+            self.draw_shot_overlay()
         self.wafer_map.zoom_fill()
 
         # Calcualte new radius data
@@ -980,12 +1441,22 @@ class MainPanel(wx.Panel):
            for die in self.coord_list)
         new_radius_data = list(math.sqrt(item) for item in radius_sqrd_data)
         self.histograms.update(new_radius_data)
+        self.sensitivity.update(die_map.die_xy,
+                                self.dia,
+                                die_map.center_offset,
+                                self.ee,
+                                self.fe,
+                                self.north_limit,
+                                die_map.street_xy,
+                                )
+        self.yield_plot.update(self.gdw, die_map.die_xy)
 
         self.results.gdw_result.value = self.gdw
         self.results.ee_loss_result.value = self.ee_loss
         self.results.flat_loss_result.value = self.flat_loss
         self.results.fe_loss_result.value = self.fe_loss
         self.results.scribe_loss_result.value = self.scribe_loss
+        self.results.keepout_loss_result.value = self.keepout_loss
 
         self.x_offset = self.center_xy[0] % 1
         if self.x_offset == 0:
@@ -1003,30 +1474,1196 @@ class MainPanel(wx.Panel):
 
         self.results.center_x_result.value = self.center_xy[0]
         self.results.center_y_result.value = self.center_xy[1]
+        self.results.rotation_result.value = "{:.3f}".format(self.rotation)
+
+        if self.shot_map is None:
+            self.results.shots_result.value = "-"
+            self.results.partial_shots_result.value = "-"
+        else:
+            self.results.shots_result.value = self.shot_map.n_shots
+            self.results.partial_shots_result.value = self.shot_map.n_partial
+
+        if self.touchdown_plan is None:
+            self.results.touchdowns_result.value = "-"
+            self.results.utilization_result.value = "-"
+        else:
+            plan = self.touchdown_plan
+            self.results.touchdowns_result.value = plan.n_touchdowns
+            self.results.utilization_result.value = "{:.1%}".format(
+                plan.utilization)
 
         # Update the screen
         self.Refresh()
         self.Update()
 
+    def on_history_back(self, event):
+        """ Restore the previous calculation """
+        self.recall(self.history.back())
+
+    def on_history_forward(self, event):
+        """ Restore the next calculation """
+        self.recall(self.history.forward())
+
+    def recall(self, entry):
+        """ Restore a ``history.HistoryEntry`` without recalculating """
+        if entry is None:
+            return
+        params = entry.params
+        self.input_panel.load_state(params)
+        self.keepouts = [keepout.zone_from_dict(zone)
+                         for zone in params['keepouts']]
+        self.ee_profile = None
+        if params['ee_profile'] is not None:
+            self.ee_profile = exclusion.ExclusionProfile.from_dict(
+                params['ee_profile'])
+        self.read_inputs()
+        self.show_die_map(entry.die_map)
+
+    def draw_shot_overlay(self):
+        """ Outline every shot that has a probe-able die on the map """
+        size = self.shot_map.shot_size
+        for x_ll, y_ll, _ in self.shot_map.shot_list():
+            self.wafer_map.canvas.AddRectangle((x_ll, y_ll),
+                                               size,
+                                               LineColor=wx.Colour(255, 255, 0),
+                                               LineWidth=2,
+                                               FillStyle="Transparent",
+                                               )
+
+    def draw_mpw(self, layout):
+        """ Draw an MPW layout on the wafer map, coloured by product """
+        self.wafer_map.canvas.InitAll()
+        self.wafer_map._clear_canvas()
+        self.wafer_map.draw_wafer_objects()
+        for x_ll, y_ll, width, height, product in layout.rect_list():
+            colour = MPW_COLORS[product % len(MPW_COLORS)]
+            self.wafer_map.canvas.AddRectangle((x_ll, y_ll),
+                                               (width, height),
+                                               LineColor=wx.Colour(0, 0, 0),
+                                               FillColor=wx.Colour(*colour),
+                                               FillStyle="Solid",
+                                               )
+        self.wafer_map.zoom_fill()
+
+        self.results.mpw_result.value = ", ".join(
+            "{} {}/{}".format(name, count, quantity)
+            for name, count, quantity in zip(layout.names,
+                                             layout.counts,
+                                             layout.quantity))
+
+    def load_fixed_offset(self, x_offset, y_offset):
+        """ Switch to the given fixed offsets (mm) and recalculate """
+        self.input_panel.fo_ctrl.checked = True
+        self.input_panel.fo_ctrl.x_value = "{:.4f}".format(x_offset)
+        self.input_panel.fo_ctrl.y_value = "{:.4f}".format(y_offset)
+        self.on_calc_gdw(None)
+
+    def load_candidate(self, die_x, die_y, x_offset, y_offset):
+        """ Load a die size and fixed offsets (mm) and recalculate """
+        self.input_panel.size_input.x_value = "{:.4f}".format(die_x)
+        self.input_panel.size_input.y_value = "{:.4f}".format(die_y)
+        self.load_fixed_offset(x_offset, y_offset)
+
+    def load_shot_placement(self, reticle_xy, x_offset, y_offset):
+        """ Load a reticle and mm shot offset and recalculate """
+        self.input_panel.reticle_ctrl.checked = True
+        self.input_panel.reticle_ctrl.x_value = str(reticle_xy[0])
+        self.input_panel.reticle_ctrl.y_value = str(reticle_xy[1])
+        self.requested_shot_offset = (x_offset, y_offset)
+        pitch_x, pitch_y = self.pitch_xy
+        self.load_fixed_offset(x_offset - (reticle_xy[0] - 1) / 2 * pitch_x,
+                               y_offset - (reticle_xy[1] - 1) / 2 * pitch_y)
+
     def on_gen_mask(self, event):
         """ Handle the gen_mask event """
         mask = "MDH00"
+        saved = "'{}'".format(mask)
         statusbar = self.parent.StatusBar
 
+        # Probe die (and touchdowns) are written in stepping order.
+        coord_list = stepping.order_coord_list(self.coord_list,
+                                               self.pitch_xy,
+                                               self.center_xy,
+                                               self.path_strategy)
         try:
-            gdw.gen_mask_file(self.coord_list, mask,
-                              self.die_xy, self.dia,
+            gdw.gen_mask_file(coord_list, mask,
+                              self.pitch_xy, self.dia,
                               self.input_panel.fdc_ctrl.checked)
+            if self.touchdown_plan is not None:
+                plan = self.touchdown_plan
+                xy = stepping.grid_to_mm(plan.touchdowns, self.pitch_xy,
+                                         self.center_xy)
+                order = stepping.plan_path(xy, self.path_strategy).order
+                plan = probecard.TouchdownPlan(plan.touchdowns[order],
+                                               plan.n_die[order],
+                                               plan.sites)
+                plan_file = mask + "_touchdowns.csv"
+                probecard.write_plan(plan_file, plan)
+                saved += " and '{}'".format(plan_file)
         except Exception as err:
             print(err)
             statusbar.SetStatusText("Error: {}".format(err))
             raise
-        statusbar.SetStatusText("Mask saved to '{}'".format(mask))
+        statusbar.SetStatusText("Mask saved to {}".format(saved))
+
+    def on_load_keepouts(self, event):
+        """ Load keep-out zones from a file and recalculate """
+        wildcard = "Keep-out zones (*.csv;*.txt)|*.csv;*.txt"
+        with wx.FileDialog(self,
+                           "Load Keep-Out Zones",
+                           wildcard=wildcard,
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST,
+                           ) as dialog:
+            if dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            fname = dialog.GetPath()
+
+        statusbar = self.parent.StatusBar
+        try:
+            self.keepouts = keepout.read_zones(fname)
+        except Exception as err:
+            print(err)
+            statusbar.SetStatusText("Error: {}".format(err))
+            raise
+        self.on_calc_gdw(event)
+        statusbar.SetStatusText("Loaded {} keep-out zones from '{}'".format(
+            len(self.keepouts), fname))
+
+    def on_load_profile(self, event):
+        """ Load an edge exclusion profile from a file and recalculate """
+        wildcard = "Exclusion profiles (*.csv;*.txt)|*.csv;*.txt"
+        with wx.FileDialog(self,
+                           "Load Edge Exclusion Profile",
+                           wildcard=wildcard,
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST,
+                           ) as dialog:
+            if dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            fname = dialog.GetPath()
+
+        statusbar = self.parent.StatusBar
+        try:
+            self.ee_profile = exclusion.read_profile(fname)
+        except Exception as err:
+            print(err)
+            statusbar.SetStatusText("Error: {}".format(err))
+            raise
+        self.on_calc_gdw(event)
+        statusbar.SetStatusText(
+            "Loaded edge exclusion profile ({} to {} mm) from '{}'".format(
+                self.ee_profile.min_width, self.ee_profile.max_width, fname))
+
+    def on_export_table(self, event):
+        """ Save every die, its status and its fields as CSV """
+        with wx.FileDialog(self,
+                           "Export Die Table",
+                           wildcard="CSV file (*.csv)|*.csv",
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT,
+                           ) as dialog:
+            if dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            fname = dialog.GetPath()
+
+        statusbar = self.parent.StatusBar
+        try:
+            self.die_map.write_csv(fname, self.grid_offset)
+        except Exception as err:
+            print(err)
+            statusbar.SetStatusText("Error: {}".format(err))
+            raise
+        statusbar.SetStatusText("Die table saved to '{}'".format(fname))
+
+    def on_export_image(self, event):
+        """ Save the current wafer map as a PNG or SVG image """
+        wildcard = "PNG image (*.png)|*.png|SVG image (*.svg)|*.svg"
+        with wx.FileDialog(self,
+                           "Export Map Image",
+                           wildcard=wildcard,
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT,
+                           ) as dialog:
+            if dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            fname = dialog.GetPath()
+
+        statusbar = self.parent.StatusBar
+        try:
+            if fname.lower().endswith(".svg"):
+                render.render_svg(fname, self.coord_list, self.pitch_xy,
+                                  self.center_xy, self.dia)
+            else:
+                render.render_png(fname, self.coord_list, self.pitch_xy,
+                                  self.center_xy, self.dia, size=1024)
+        except Exception as err:
+            print(err)
+            statusbar.SetStatusText("Error: {}".format(err))
+            raise
+        statusbar.SetStatusText("Map saved to '{}'".format(fname))
+
+
+# ---------------------------------------------------------------------------
+### Tool Frames
+# ---------------------------------------------------------------------------
+class LandscapeFrame(wx.Frame):
+    """
+    A Frame holding the GDW landscape heatmap.
+
+    Parameters:
+    -----------
+    parent : ``wx.Frame``
+        The parent frame.
+    main_panel : ``MainPanel``
+        The panel whose last calculation is used and which gets the
+        clicked offset.
+    """
+    def __init__(self, parent, main_panel):
+        wx.Frame.__init__(self,
+                          parent,
+                          title="GDW vs. Grid Offset",
+                          size=(560, 600),
+                          )
+        self.main_panel = main_panel
+        self.CreateStatusBar()
+        self.panel = LandscapePanel(self, main_panel)
+
+
+class AspectRatioFrame(wx.Frame):
+    """
+    Runs the aspect ratio optimizer for the main panel's wafer and lists
+    the best candidates. Clicking a candidate loads it into the main panel.
+
+    Layout:
+    -------
+    ::
+
+        +----------------------------+
+        |Die Area (mm^2)       [____]|
+        |Max Aspect Ratio      [____]|
+        |[         Optimize         ]|
+        |+--------------------------+|
+        || GDW | X | Y | X Ofs | ...||
+        |+--------------------------+|
+        +----------------------------+
+    """
+    COLUMNS = ["GDW", "Die X", "Die Y", "X Offset", "Y Offset"]
+
+    def __init__(self, parent, main_panel):
+        wx.Frame.__init__(self,
+                          parent,
+                          title="Optimize Aspect Ratio",
+                          size=(460, 420),
+                          )
+        self.main_panel = main_panel
+        self.candidates = []
+        self._init_ui()
+
+        self._bind_events()
+
+    def _init_ui(self):
+        """ """
+        self.panel = wx.Panel(self)
+        die_x, die_y = self.main_panel.die_xy
+        self.area_input = LabeledTextCtrl(self.panel,
+                                          "Die Area (mm^2)",
+                                          "{:g}".format(die_x * die_y),
+                                          )
+        self.aspect_input = LabeledTextCtrl(self.panel,
+                                            "Max Aspect Ratio",
+                                            "4",
+                                            )
+        self.run_button = wx.Button(self.panel, label="Optimize")
+        self.results = wx.ListCtrl(self.panel,
+                                   style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        for n, column in enumerate(self.COLUMNS):
+            self.results.InsertColumn(n, column)
+
+        self.vbox = wx.BoxSizer(wx.VERTICAL)
+        self.vbox.Add(self.area_input, 0, wx.EXPAND)
+        self.vbox.Add(self.aspect_input, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.run_button, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.results, 1, wx.EXPAND)
+        self.panel.SetSizer(self.vbox)
+
+    def _bind_events(self):
+        """ """
+        self.Bind(wx.EVT_BUTTON, self.on_run, self.run_button)
+        self.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_select, self.results)
+
+    def on_run(self, event):
+        """ Run the optimizer and list the results """
+        mp = self.main_panel
+        self.candidates = optimize.optimize_aspect_ratio(
+            float(self.area_input.value),
+            mp.dia,
+            mp.ee,
+            mp.fe,
+            mp.north_limit,
+            max_aspect=float(self.aspect_input.value),
+            top_n=20,
+            street_xy=mp.street_xy,
+            )
+
+        self.results.DeleteAllItems()
+        for n, cand in enumerate(self.candidates):
+            self.results.InsertItem(n, str(cand.gdw))
+            for col, val in enumerate(cand[1:], 1):
+                self.results.SetItem(n, col, "{:.4f}".format(val))
+
+    def on_select(self, event):
+        """ Load the selected candidate into the main panel """
+        cand = self.candidates[event.GetIndex()]
+        self.main_panel.load_candidate(cand.die_x, cand.die_y,
+                                       cand.x_offset, cand.y_offset)
+
+
+class DieSizeSolverFrame(wx.Frame):
+    """
+    Finds the largest die that still meets a target GDW on the main
+    panel's wafer, holding either the aspect ratio or die X fixed.
+
+    Layout:
+    -------
+    ::
+
+        +----------------------------+
+        |Target GDW            [____]|
+        |Aspect Ratio (X/Y)    [____]|
+        |[] Hold Die X Fixed?        |
+        |    Die X (mm)        [____]|
+        |[          Solve           ]|
+        |Die Size:        X.XX, Y.YY |
+        |GDW:                    NNN |
+        |[           Load           ]|
+        +----------------------------+
+    """
+    def __init__(self, parent, main_panel):
+        wx.Frame.__init__(self,
+                          parent,
+                          title="Solve Die Size for GDW",
+                          size=(320, 300),
+                          )
+        self.main_panel = main_panel
+        self.candidate = None
+        self._init_ui()
+
+        self._bind_events()
+
+    def _init_ui(self):
+        """ """
+        self.panel = wx.Panel(self)
+        die_x, die_y = self.main_panel.die_xy
+        self.target_input = LabeledTextCtrl(self.panel,
+                                            "Target GDW",
+                                            str(self.main_panel.gdw),
+                                            )
+        self.aspect_input = LabeledTextCtrl(self.panel,
+                                            "Aspect Ratio (X/Y)",
+                                            "{:g}".format(die_x / die_y),
+                                            )
+        self.die_x_ctrl = CheckedTextCtrl(self.panel,
+                                          "Hold Die X Fixed?",
+                                          "Die X (mm)",
+                                          "{:g}".format(die_x),
+                                          )
+        self.solve_button = wx.Button(self.panel, label="Solve")
+        self.size_result = StaticTextResult(self.panel, "Die Size:", "-")
+        self.gdw_result = StaticTextResult(self.panel, "GDW:", "-")
+        self.load_button = wx.Button(self.panel, label="Load")
+
+        self.vbox = wx.BoxSizer(wx.VERTICAL)
+        self.vbox.Add(self.target_input, 0, wx.EXPAND)
+        self.vbox.Add(self.aspect_input, 0, wx.EXPAND)
+        self.vbox.Add(self.die_x_ctrl, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.solve_button, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.size_result, 0, wx.EXPAND)
+        self.vbox.Add(self.gdw_result, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.load_button, 0, wx.EXPAND)
+        self.panel.SetSizer(self.vbox)
+
+    def _bind_events(self):
+        """ """
+        self.Bind(wx.EVT_BUTTON, self.on_solve, self.solve_button)
+        self.Bind(wx.EVT_BUTTON, self.on_load, self.load_button)
+
+    def on_solve(self, event):
+        """ Run the solver and show the result """
+        mp = self.main_panel
+        die_x = None
+        if self.die_x_ctrl.checked:
+            die_x = float(self.die_x_ctrl.value)
+        self.candidate = optimize.max_die_size(int(self.target_input.value),
+                                               mp.dia,
+                                               mp.ee,
+                                               mp.fe,
+                                               mp.north_limit,
+                                               aspect=float(self.aspect_input.value),
+                                               die_x=die_x,
+                                               street_xy=mp.street_xy,
+                                               )
+        if self.candidate is None:
+            self.size_result.value = "Not achievable"
+            self.gdw_result.value = "-"
+            return
+        self.size_result.value = "{:.4f}, {:.4f}".format(self.candidate.die_x,
+                                                         self.candidate.die_y)
+        self.gdw_result.value = self.candidate.gdw
+
+    def on_load(self, event):
+        """ Load the solved die size into the main panel """
+        if self.candidate is not None:
+            cand = self.candidate
+            self.main_panel.load_candidate(cand.die_x, cand.die_y,
+                                           cand.x_offset, cand.y_offset)
+
+
+class SteppingPathFrame(wx.Frame):
+    """
+    Compares the stepping path strategies over the main panel's probe die.
+    Clicking a strategy makes it the one used by Generate Mask File.
+
+    Layout:
+    -------
+    ::
+
+        +----------------------------+
+        |Stage Speed (mm/s)    [____]|
+        |Stage Accel (mm/s^2)  [____]|
+        |[         Compare          ]|
+        |+--------------------------+|
+        || Strategy | Dist | Time   ||
+        |+--------------------------+|
+        +----------------------------+
+    """
+    COLUMNS = ["Strategy", "Distance (mm)", "Index Time (s)"]
+
+    def __init__(self, parent, main_panel):
+        wx.Frame.__init__(self,
+                          parent,
+                          title="Stepping Path",
+                          size=(420, 300),
+                          )
+        self.main_panel = main_panel
+        self.paths = []
+        self._init_ui()
+
+        self._bind_events()
+
+    def _init_ui(self):
+        """ """
+        self.panel = wx.Panel(self)
+        self.speed_input = LabeledTextCtrl(self.panel,
+                                           "Stage Speed (mm/s)",
+                                           "100",
+                                           )
+        self.accel_input = LabeledTextCtrl(self.panel,
+                                           "Stage Accel (mm/s^2)",
+                                           "1000",
+                                           )
+        self.run_button = wx.Button(self.panel, label="Compare")
+        self.results = wx.ListCtrl(self.panel,
+                                   style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        for n, column in enumerate(self.COLUMNS):
+            self.results.InsertColumn(n, column)
+
+        self.vbox = wx.BoxSizer(wx.VERTICAL)
+        self.vbox.Add(self.speed_input, 0, wx.EXPAND)
+        self.vbox.Add(self.accel_input, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.run_button, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.results, 1, wx.EXPAND)
+        self.panel.SetSizer(self.vbox)
+
+    def _bind_events(self):
+        """ """
+        self.Bind(wx.EVT_BUTTON, self.on_run, self.run_button)
+        self.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_select, self.results)
+
+    def on_run(self, event):
+        """ Plan every strategy and list the results """
+        mp = self.main_panel
+        probe = [c[:2] for c in mp.coord_list if c[2] == "probe"]
+        xy = stepping.grid_to_mm(probe, mp.pitch_xy, mp.center_xy)
+        self.paths = stepping.compare_paths(xy,
+                                            float(self.speed_input.value),
+                                            float(self.accel_input.value),
+                                            )
+
+        self.results.DeleteAllItems()
+        for n, path in enumerate(self.paths):
+            name = stepping.STRATEGIES[path.strategy]
+            if path.strategy == mp.path_strategy:
+                name += " *"
+            self.results.InsertItem(n, name)
+            self.results.SetItem(n, 1, "{:.1f}".format(path.distance))
+            self.results.SetItem(n, 2, "{:.1f}".format(path.index_time))
+
+    def on_select(self, event):
+        """ Use the selected strategy for the mask file """
+        path = self.paths[event.GetIndex()]
+        self.main_panel.path_strategy = path.strategy
+        self.main_panel.parent.SetStatusText(
+            "Stepping path: {}".format(stepping.STRATEGIES[path.strategy]))
+
+
+class DefectSimulationFrame(wx.Frame):
+    """
+    Monte Carlo defect simulation over the main panel's die map, with a
+    higher defect density inside the edge exclusion ring.
+
+    Layout:
+    -------
+    ::
+
+        +----------------------------+
+        |D0 (defects/cm^2)     [____]|
+        |Edge D0 (defects/cm^2)[____]|
+        |Wafers                [____]|
+        |[         Simulate         ]|
+        |Mean good die: ...          |
+        |+--------------------------+|
+        ||   Per-Ring Yield Plot    ||
+        |+--------------------------+|
+        +----------------------------+
+    """
+    def __init__(self, parent, main_panel):
+        wx.Frame.__init__(self,
+                          parent,
+                          title="Defect Simulation",
+                          size=(480, 520),
+                          )
+        self.main_panel = main_panel
+        self._init_ui()
+
+        self._bind_events()
+
+    def _init_ui(self):
+        """ """
+        self.panel = wx.Panel(self)
+        self.d0_input = LabeledTextCtrl(self.panel,
+                                        "D0 (defects/cm^2)",
+                                        "0.1",
+                                        )
+        self.edge_d0_input = LabeledTextCtrl(self.panel,
+                                             "Edge D0 (defects/cm^2)",
+                                             "0.5",
+                                             )
+        self.wafers_input = LabeledTextCtrl(self.panel,
+                                            "Wafers",
+                                            "10000",
+                                            )
+        self.run_button = wx.Button(self.panel, label="Simulate")
+        self.summary = wx.StaticText(self.panel, label="")
+        self.canvas = wxplot.PlotCanvas(self.panel)
+        self.canvas.EnableGrid = True
+
+        self.vbox = wx.BoxSizer(wx.VERTICAL)
+        self.vbox.Add(self.d0_input, 0, wx.EXPAND)
+        self.vbox.Add(self.edge_d0_input, 0, wx.EXPAND)
+        self.vbox.Add(self.wafers_input, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.run_button, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.summary, 0, wx.EXPAND)
+        self.vbox.Add(self.canvas, 1, wx.EXPAND)
+        self.panel.SetSizer(self.vbox)
+
+    def _bind_events(self):
+        """ """
+        self.Bind(wx.EVT_BUTTON, self.on_run, self.run_button)
+
+    def on_run(self, event):
+        """
+        Queue the simulation in the worker pool. The results are shown by
+        ``show_result`` when the last batch is done, so the window stays
+        responsive while a sweep is ahead of it in the queue.
+        """
+        mp = self.main_panel
+        statusbar = mp.parent.StatusBar
+        try:
+            profile = montecarlo.edge_profile(mp.dia,
+                                              float(self.d0_input.value),
+                                              mp.ee,
+                                              float(self.edge_d0_input.value),
+                                              )
+            n_wafers = int(self.wafers_input.value)
+        except ValueError as err:
+            statusbar.SetStatusText("Error: {}".format(err))
+            return
+        die_map = mp.die_map
+        jobs = montecarlo.simulation_jobs(die_map, profile, n_wafers)
+        future = scheduler.shared_scheduler().map(montecarlo.simulate_batch,
+                                                  jobs)
+        self.run_button.Disable()
+        statusbar.SetStatusText("Simulating {} wafers...".format(n_wafers))
+        # The callback runs on a scheduler thread, so hand the result to
+        # the GUI thread.
+        future.add_done_callback(
+            lambda future: wx.CallAfter(self.show_result, die_map, future))
+
+    def show_result(self, die_map, future):
+        """ Show the summary and per-ring yield of a finished simulation """
+        # The window may have been closed while the simulation was running.
+        if not self:
+            return
+        self.run_button.Enable()
+        statusbar = self.main_panel.parent.StatusBar
+        try:
+            result = montecarlo.simulation_result(die_map, future.result())
+        except Exception as err:
+            statusbar.SetStatusText("Error: {}".format(err))
+            return
+        statusbar.SetStatusText("Simulation done")
+
+        text = ("Mean good die: {:.1f} of {} (95% CI {:.1f} to {:.1f})\n"
+                "95% of wafers: {:.0f} to {:.0f} good die")
+        self.summary.SetLabel(text.format(result.mean, result.gdw,
+                                          result.mean_ci[0],
+                                          result.mean_ci[1],
+                                          result.interval[0],
+                                          result.interval[1]))
+
+        centers = (result.ring_edges[:-1] + result.ring_edges[1:]) / 2
+        valid = ~np.isnan(result.ring_yield)
+        points = np.column_stack((centers, result.ring_yield))[valid]
+        objects = [wxplot.PolyLine(points, colour='blue', width=2),
+                   wxplot.PolyMarker(points, colour='blue', marker='circle')]
+        for x, low, high in zip(centers[valid],
+                                result.ring_ci[0][valid],
+                                result.ring_ci[1][valid]):
+            objects.append(wxplot.PolyLine([(x, low), (x, high)],
+                                           colour='red'))
+        plot = wxplot.PlotGraphics(objects,
+                                   title="Per-Ring Yield",
+                                   xLabel="Radius (mm)",
+                                   yLabel="Yield",
+                                   )
+        self.canvas.Draw(plot)
+        self.panel.Layout()
+
+
+class MpwPackingFrame(wx.Frame):
+    """
+    Packs several products onto the main panel's wafer and shows the
+    layout on the wafer map.
+
+    Layout:
+    -------
+    ::
+
+        +----------------------------+
+        |Products (name,x,y,qty):    |
+        |+--------------------------+|
+        ||                          ||
+        |+--------------------------+|
+        |Strategy          [shelf  v]|
+        |Candidates            [____]|
+        |[           Pack           ]|
+        |Product   Placed   Required |
+        |...                         |
+        +----------------------------+
+    """
+    COLUMNS = ["Product", "Placed", "Required"]
+
+    def __init__(self, parent, main_panel):
+        wx.Frame.__init__(self,
+                          parent,
+                          title="MPW Packing",
+                          size=(360, 480),
+                          )
+        self.main_panel = main_panel
+        self._init_ui()
+
+        self._bind_events()
+
+    def _init_ui(self):
+        """ """
+        self.panel = wx.Panel(self)
+        self.products_label = wx.StaticText(self.panel,
+                                            label="Products (name,x,y,qty):")
+        self.products_input = wx.TextCtrl(self.panel,
+                                          value="A,5,5,100\nB,10,8,20\n",
+                                          style=wx.TE_MULTILINE,
+                                          )
+        self.strategy_label = wx.StaticText(self.panel, label="Strategy")
+        self.strategy_choice = wx.Choice(self.panel,
+                                         choices=list(mpw.STRATEGIES))
+        self.strategy_choice.SetSelection(0)
+        self.candidates_input = LabeledTextCtrl(self.panel,
+                                                "Candidates",
+                                                str(mpw.N_CANDIDATES),
+                                                )
+        self.run_button = wx.Button(self.panel, label="Pack")
+        self.results = wx.ListCtrl(self.panel, style=wx.LC_REPORT)
+        for n, column in enumerate(self.COLUMNS):
+            self.results.InsertColumn(n, column)
+
+        self.strategy_hbox = wx.BoxSizer(wx.HORIZONTAL)
+        self.strategy_hbox.Add(self.strategy_label, 1, wx.EXPAND)
+        self.strategy_hbox.Add(self.strategy_choice, 0, wx.EXPAND)
+
+        self.vbox = wx.BoxSizer(wx.VERTICAL)
+        self.vbox.Add(self.products_label, 0, wx.EXPAND)
+        self.vbox.Add(self.products_input, 1, wx.EXPAND)
+        self.vbox.Add(self.strategy_hbox, 0, wx.EXPAND)
+        self.vbox.Add(self.candidates_input, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.run_button, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.results, 1, wx.EXPAND)
+        self.panel.SetSizer(self.vbox)
+
+    def _bind_events(self):
+        """ """
+        self.Bind(wx.EVT_BUTTON, self.on_run, self.run_button)
+
+    def on_run(self, event):
+        """ Pack the products and show the layout """
+        mp = self.main_panel
+        statusbar = mp.parent.StatusBar
+        try:
+            products = mpw.parse_products(
+                self.products_input.GetValue().splitlines())
+        except ValueError as err:
+            statusbar.SetStatusText("Error: {}".format(err))
+            return
+        if not products:
+            return
+
+        with wx.BusyCursor():
+            layout = mpw.pack(products,
+                              mp.dia,
+                              mp.ee,
+                              mp.fe,
+                              mp.north_limit,
+                              mp.street_xy,
+                              self.strategy_choice.GetStringSelection(),
+                              int(self.candidates_input.value),
+                              )
+
+        self.results.DeleteAllItems()
+        for n, (name, count, quantity) in enumerate(zip(layout.names,
+                                                        layout.counts,
+                                                        layout.quantity)):
+            self.results.InsertItem(n, name)
+            self.results.SetItem(n, 1, str(count))
+            self.results.SetItem(n, 2, str(quantity))
+        mp.draw_mpw(layout)
+        if not layout.complete:
+            statusbar.SetStatusText("Not every product reached its quantity")
+
+
+class ComparisonFrame(wx.Frame):
+    """
+    Calculates two to six setups side by side. Each column has its own
+    inputs and a small wafer map. Panning or zooming one map moves all of
+    them, and the table shows each setup's GDW and losses as a change from
+    the first setup.
+
+    Layout:
+    -------
+    ::
+
+        +------------------------------------------+
+        |[Add Setup] [Remove Setup] [   Compare   ]|
+        |+------------++------------++------------+|
+        ||  inputs    ||  inputs    ||  inputs    ||
+        ||  wafer map ||  wafer map ||  wafer map ||
+        |+------------++------------++------------+|
+        |Setup | GDW | Edge Excl | Flat | ...      |
+        +------------------------------------------+
+    """
+    COLUMNS = ["Setup", "GDW", "Edge Excl", "Flat", "Flat Excl", "Scribe",
+               "Keep-Out"]
+
+    def __init__(self, parent, main_panel):
+        wx.Frame.__init__(self,
+                          parent,
+                          title="Compare Setups",
+                          size=(1300, 800),
+                          )
+        self.main_panel = main_panel
+        self.inputs = []
+        self.maps = []
+        self.columns = []
+        self._init_ui()
+
+        self._bind_events()
+
+        # Start the workers while the setups are being edited.
+        wx.CallAfter(scheduler.shared_scheduler().warm)
+
+    def _init_ui(self):
+        """ """
+        self.panel = wx.Panel(self)
+        self.add_button = wx.Button(self.panel, label="Add Setup")
+        self.remove_button = wx.Button(self.panel, label="Remove Setup")
+        self.run_button = wx.Button(self.panel, label="Compare")
+        self.results = wx.ListCtrl(self.panel, style=wx.LC_REPORT)
+        for n, column in enumerate(self.COLUMNS):
+            self.results.InsertColumn(n, column)
+
+        self.button_hbox = wx.BoxSizer(wx.HORIZONTAL)
+        self.button_hbox.Add(self.add_button, 0, wx.EXPAND)
+        self.button_hbox.Add(self.remove_button, 0, wx.EXPAND)
+        self.button_hbox.AddSpacer(10)
+        self.button_hbox.Add(self.run_button, 1, wx.EXPAND)
+        self.columns_hbox = wx.BoxSizer(wx.HORIZONTAL)
+
+        self.vbox = wx.BoxSizer(wx.VERTICAL)
+        self.vbox.Add(self.button_hbox, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.columns_hbox, 3, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.results, 1, wx.EXPAND)
+        self.panel.SetSizer(self.vbox)
+
+        # Start by comparing the main panel's inputs against a copy.
+        self.add_column()
+        self.add_column()
+
+    def _bind_events(self):
+        """ """
+        self.Bind(wx.EVT_BUTTON, self.on_add, self.add_button)
+        self.Bind(wx.EVT_BUTTON, self.on_remove, self.remove_button)
+        self.Bind(wx.EVT_BUTTON, self.on_run, self.run_button)
+
+    def add_column(self):
+        """ Add a setup column, copying the main panel's inputs """
+        column = wx.BoxSizer(wx.VERTICAL)
+        inputs = InputPanel(self.panel)
+        inputs.load_setup(self.main_panel.input_panel)
+        die_map = self.main_panel.die_map
+        wafer_map = wm_core.WaferMapPanel(
+            self.panel,
+            die_map.coord_list(),
+            wm_info.WaferInfo(die_map.pitch_xy, die_map.center_xy,
+                              self.main_panel.dia),
+            data_type='discrete',
+            plot_die_centers=False,
+            show_die_gridlines=True,
+            discrete_legend_values=render.LEGEND_VALUES,
+            discrete_legend_colors=[wx.Colour(*rgb)
+                                    for rgb in render.LEGEND_COLORS],
+            )
+        canvas = wafer_map.canvas
+        for event_type in (wx.EVT_MOUSEWHEEL, wx.EVT_MOTION, wx.EVT_LEFT_UP,
+                           wx.EVT_MIDDLE_UP, wx.EVT_RIGHT_UP):
+            canvas.Bind(event_type,
+                        lambda event, canvas=canvas: self.on_view(event,
+                                                                  canvas))
+
+        column.Add(inputs, 0, wx.EXPAND)
+        column.Add(wafer_map, 1, wx.EXPAND)
+        self.columns_hbox.Add(column, 1, wx.EXPAND)
+        self.inputs.append(inputs)
+        self.maps.append(wafer_map)
+        self.columns.append(column)
+        self.panel.Layout()
+
+    def remove_column(self):
+        """ Remove the last setup column """
+        column = self.columns.pop()
+        self.inputs.pop()
+        self.maps.pop()
+        self.columns_hbox.Detach(column)
+        column.Clear(delete_windows=True)
+        self.panel.Layout()
+
+    def on_add(self, event):
+        """ Add a setup, up to ``compare.MAX_SETUPS`` """
+        if len(self.columns) < compare.MAX_SETUPS:
+            self.add_column()
+
+    def on_remove(self, event):
+        """ Remove the last setup, keeping at least two """
+        if len(self.columns) > 2:
+            self.remove_column()
+
+    def on_view(self, event, source):
+        """ Copy a map's pan and zoom to every other map """
+        event.Skip()
+        # Let the source canvas handle the event first.
+        wx.CallAfter(self.sync_views, source)
+
+    def sync_views(self, source):
+        """ Give every map the same scale and view center as ``source`` """
+        for wafer_map in self.maps:
+            canvas = wafer_map.canvas
+            if canvas is source:
+                continue
+            if (canvas.Scale == source.Scale
+                    and np.all(canvas.ViewPortCenter
+                               == source.ViewPortCenter)):
+                continue
+            canvas.Scale = source.Scale
+            canvas.ViewPortCenter = np.array(source.ViewPortCenter)
+            canvas.SetToNewScale()
+
+    def on_run(self, event):
+        """
+        Calculate every setup in the worker pool. The maps and table are
+        filled in by ``show_comparison`` when the last setup is done, so
+        the window stays responsive in the meantime.
+        """
+        mp = self.main_panel
+        statusbar = mp.parent.StatusBar
+        try:
+            setups = [inputs.setup() for inputs in self.inputs]
+        except ValueError as err:
+            statusbar.SetStatusText("Error: {}".format(err))
+            return
+        # Every setup shares the main panel's keep-outs and profile.
+        for n, setup in enumerate(setups):
+            setup['name'] = "Setup {}".format(n + 1)
+            setup['keepouts'] = mp.keepouts
+            if mp.ee_profile is not None:
+                setup['ee'] = mp.ee_profile
+
+        # Each setup is its own task, so they all run at once.
+        future = scheduler.shared_scheduler().map(
+            compare.setup_die_map, setups, priority=scheduler.INTERACTIVE)
+        self.run_button.Disable()
+        statusbar.SetStatusText("Comparing {} setups...".format(len(setups)))
+        # The callback runs on a scheduler thread, so hand the result to
+        # the GUI thread.
+        future.add_done_callback(
+            lambda future: wx.CallAfter(self.show_comparison, setups,
+                                        future))
+
+    def show_comparison(self, setups, future):
+        """ Draw the maps and table once every setup is calculated """
+        # The window may have been closed while the setups were running.
+        if not self:
+            return
+        self.run_button.Enable()
+        statusbar = self.main_panel.parent.StatusBar
+        try:
+            die_maps = future.result()
+        except Exception as err:
+            statusbar.SetStatusText("Error: {}".format(err))
+            return
+        statusbar.SetStatusText("Compared {} setups".format(len(setups)))
+        result = compare.comparison(setups, die_maps)
+
+        for wafer_map, die_map, setup in zip(self.maps, result.die_maps,
+                                             setups):
+            self.draw_map(wafer_map, die_map, setup)
+        # All maps start out with the first map's view.
+        wx.CallAfter(self.sync_views, self.maps[0].canvas)
+
+        self.results.DeleteAllItems()
+        for n, (name, row, delta) in enumerate(zip(result.names,
+                                                   result.table,
+                                                   result.deltas)):
+            self.results.InsertItem(n, name)
+            for col, (value, change) in enumerate(zip(row, delta), 1):
+                text = str(value)
+                if n > 0:
+                    text += " ({:+d})".format(change)
+                self.results.SetItem(n, col, text)
+
+    def draw_map(self, wafer_map, die_map, setup):
+        """ Replace the die on one of the small wafer maps """
+        coord_list = die_map.coord_list()
+        wafer_map.canvas.InitAll()
+        wafer_map._clear_canvas()
+        wafer_map.die_size = die_map.pitch_xy
+        wafer_map.xyd = coord_list
+        wafer_map.wafer_info = wm_info.WaferInfo(die_map.pitch_xy,
+                                                 die_map.center_xy,
+                                                 setup['dia'],
+                                                 exclusion.min_width(
+                                                     setup['ee']),
+                                                 setup['fe'],
+                                                 )
+        wafer_map.grid_center = die_map.center_xy
+        wafer_map.xyd_dict = wm_core.xyd_to_dict(coord_list)
+        wafer_map._create_legend()
+        wafer_map.draw_die()
+        wafer_map.die_centers = wafer_map.draw_die_center()
+        wafer_map.draw_wafer_objects()
+        wafer_map.zoom_fill()
+
+
+class ShotPlacementFrame(wx.Frame):
+    """
+    Finds the reticle grid placement with the fewest shots for the main
+    panel's wafer, allowing GDW to drop by up to a given number of die.
+
+    Layout:
+    -------
+    ::
+
+        +----------------------------+
+        |Reticle (die per shot)[_][_]|
+        |GDW Tolerance (die)   [____]|
+        |[] Drop Partial Shots?      |
+        |[         Optimize         ]|
+        |GDW:                    NNN |
+        |Shots:                  NNN |
+        |Partial Shots:          NNN |
+        |[           Load           ]|
+        +----------------------------+
+    """
+    def __init__(self, parent, main_panel):
+        wx.Frame.__init__(self,
+                          parent,
+                          title="Optimize Shot Placement",
+                          size=(320, 300),
+                          )
+        self.main_panel = main_panel
+        self.candidate = None
+        self._init_ui()
+
+        self._bind_events()
+
+    def _init_ui(self):
+        """ """
+        self.panel = wx.Panel(self)
+        reticle_ctrl = self.main_panel.input_panel.reticle_ctrl
+        self.reticle_input = LabeledXYCtrl(self.panel,
+                                           "Reticle (die per shot):",
+                                           reticle_ctrl.x_value,
+                                           reticle_ctrl.y_value,
+                                           )
+        self.tolerance_input = LabeledTextCtrl(self.panel,
+                                               "GDW Tolerance (die)",
+                                               "0",
+                                               )
+        self.drop_partial_cb = wx.CheckBox(self.panel,
+                                           label="Drop Partial Shots?")
+        self.run_button = wx.Button(self.panel, label="Optimize")
+        self.gdw_result = StaticTextResult(self.panel, "GDW:", "-")
+        self.shots_result = StaticTextResult(self.panel, "Shots:", "-")
+        self.partial_result = StaticTextResult(self.panel,
+                                               "Partial Shots:",
+                                               "-",
+                                               )
+        self.load_button = wx.Button(self.panel, label="Load")
+
+        self.vbox = wx.BoxSizer(wx.VERTICAL)
+        self.vbox.Add(self.reticle_input, 0, wx.EXPAND)
+        self.vbox.Add(self.tolerance_input, 0, wx.EXPAND)
+        self.vbox.Add(self.drop_partial_cb, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.run_button, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.gdw_result, 0, wx.EXPAND)
+        self.vbox.Add(self.shots_result, 0, wx.EXPAND)
+        self.vbox.Add(self.partial_result, 0, wx.EXPAND)
+        self.vbox.AddSpacer(10)
+        self.vbox.Add(self.load_button, 0, wx.EXPAND)
+        self.panel.SetSizer(self.vbox)
+
+    def _bind_events(self):
+        """ """
+        self.Bind(wx.EVT_BUTTON, self.on_run, self.run_button)
+        self.Bind(wx.EVT_BUTTON, self.on_load, self.load_button)
+
+    @property
+    def reticle_xy(self):
+        """ The reticle size from the inputs """
+        return (int(self.reticle_input.x_value),
+                int(self.reticle_input.y_value))
+
+    def on_run(self, event):
+        """ Run the optimizer and show the result """
+        mp = self.main_panel
+        self.candidate = optimize.optimize_shots(
+            mp.die_xy,
+            self.reticle_xy,
+            mp.dia,
+            mp.ee,
+            mp.fe,
+            mp.north_limit,
+            tolerance=int(self.tolerance_input.value),
+            drop_partial=self.drop_partial_cb.GetValue(),
+            street_xy=mp.street_xy,
+            )
+        self.gdw_result.value = self.candidate.gdw
+        self.shots_result.value = self.candidate.n_shots
+        self.partial_result.value = self.candidate.n_partial
+
+    def on_load(self, event):
+        """ Load the shot placement into the main panel """
+        if self.candidate is not None:
+            self.main_panel.load_shot_placement(self.reticle_xy,
+                                                self.candidate.x_offset,
+                                                self.candidate.y_offset)
 
 
 # ---------------------------------------------------------------------------
 ### Plotting Panels
 # ---------------------------------------------------------------------------
+class LandscapePanel(wx.Panel):
+    """
+    Heatmap of GDW over X offset (left to right) and Y offset (bottom to
+    top). Clicking a cell loads that offset into the fixed offset inputs
+    and recalculates.
+    """
+    def __init__(self, parent, main_panel):
+        wx.Panel.__init__(self, parent)
+        self.parent = parent
+        self.main_panel = main_panel
+
+        mp = main_panel
+        self.x_offsets, self.y_offsets, self.gdw = landscape.gdw_landscape(
+            mp.die_xy, mp.dia, mp.ee, mp.fe, mp.north_limit, shape=(96, 96),
+            street_xy=mp.street_xy)
+        self.cliff = landscape.cliff_depth(self.gdw)
+        rgb = landscape.to_rgb(self.gdw)
+        self.image = wx.Image(rgb.shape[1], rgb.shape[0], rgb.tobytes())
+
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self._bind_events()
+
+    def _bind_events(self):
+        """ """
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+        self.Bind(wx.EVT_SIZE, self.on_size)
+        self.Bind(wx.EVT_MOTION, self.on_mouse_move)
+        self.Bind(wx.EVT_LEFT_DOWN, self.on_left_down)
+
+    def on_size(self, event):
+        self.Refresh()
+        event.Skip()
+
+    def on_paint(self, event):
+        dc = wx.AutoBufferedPaintDC(self)
+        width, height = self.GetClientSize()
+        if width > 0 and height > 0:
+            scaled = self.image.Scale(width, height, wx.IMAGE_QUALITY_NORMAL)
+            dc.DrawBitmap(wx.Bitmap(scaled), 0, 0)
+
+    def _cell(self, pos):
+        """ Return the (iy, ix) landscape cell under a pixel position """
+        width, height = self.GetClientSize()
+        n_y, n_x = self.gdw.shape
+        ix = min(max(int(pos[0] * n_x / max(width, 1)), 0), n_x - 1)
+        iy = min(max(int(pos[1] * n_y / max(height, 1)), 0), n_y - 1)
+        return n_y - 1 - iy, ix
+
+    def on_mouse_move(self, event):
+        """ Show the offset and GDW under the cursor """
+        iy, ix = self._cell(event.GetPosition())
+        text = "Offset ({:.3f}, {:.3f}) :: GDW = {} :: Cliff = {}"
+        self.parent.SetStatusText(text.format(self.x_offsets[ix],
+                                              self.y_offsets[iy],
+                                              self.gdw[iy, ix],
+                                              self.cliff[iy, ix]))
+
+    def on_left_down(self, event):
+        """ Load the clicked offset into the main panel """
+        iy, ix = self._cell(event.GetPosition())
+        self.main_panel.load_fixed_offset(self.x_offsets[ix],
+                                          self.y_offsets[iy])
+
+
 class RadiusPlots(wx.Panel):
     """ A container for the two radius histograms """
     def __init__(self, parent, radius_data):
@@ -1076,6 +2713,176 @@ class RadiusPlots(wx.Panel):
         self.eq_area_plot.update(data, self.eq_area_binspec)
 
 
+class SensitivityPlot(wx.Panel):
+    """
+    GDW versus a single exclusion parameter, for the current die grid.
+
+    Layout:
+    -------
+    ::
+
+        +-------------------------+
+        |[Edge Exclusion      \/] |
+        |                         |
+        |      Plot Canvas        |
+        |                         |
+        +-------------------------+
+    """
+    CHOICES = ["Edge Exclusion (mm)",
+               "Flat Exclusion (mm)",
+               "Top-Side Scribe Y (mm)",
+               ]
+
+    def __init__(self, parent):
+        wx.Panel.__init__(self, parent)
+        self.parent = parent
+        self.params = None
+        self._init_ui()
+
+        self._bind_events()
+
+    def _init_ui(self):
+        """ """
+        self.choice = wx.Choice(self, choices=self.CHOICES)
+        self.choice.SetSelection(0)
+        self.canvas = wxplot.PlotCanvas(self)
+        self.canvas.EnableGrid = True
+
+        self.vbox = wx.BoxSizer(wx.VERTICAL)
+        self.vbox.Add(self.choice, 0, wx.EXPAND)
+        self.vbox.Add(self.canvas, 1, wx.EXPAND)
+        self.SetSizer(self.vbox)
+
+    def _bind_events(self):
+        """ """
+        self.Bind(wx.EVT_CHOICE, self.on_choice, self.choice)
+
+    def on_choice(self, event):
+        """ Redraw the curve for the newly selected parameter """
+        if self.params is not None:
+            self.update(*self.params)
+
+    def update(self, die_xy, dia, center_offset, ee, fe, north_limit,
+               street_xy=(0, 0)):
+        """ Recalculate and redraw the sensitivity curve """
+        self.params = (die_xy, dia, center_offset, ee, fe, north_limit,
+                       street_xy)
+        rad = dia / 2
+        selection = self.choice.GetSelection()
+        if selection == 0:
+            curve = sensitivity.edge_exclusion_curve(die_xy, dia,
+                                                     center_offset, fe,
+                                                     north_limit, street_xy)
+            current = ee
+            x_range = (0, max(2 * ee, 10))
+        elif selection == 1:
+            curve = sensitivity.flat_exclusion_curve(die_xy, dia,
+                                                     center_offset, ee,
+                                                     north_limit, street_xy)
+            current = fe
+            x_range = (0, max(2 * fe, 10))
+        else:
+            curve = sensitivity.north_limit_curve(die_xy, dia,
+                                                  center_offset, ee, fe,
+                                                  street_xy)
+            current = rad if north_limit is None else north_limit
+            x_range = (0, rad)
+
+        line = wxplot.PolyLine(curve.plot_points(*x_range),
+                               colour='blue',
+                               width=2,
+                               )
+        marker = wxplot.PolyMarker([(current, int(curve(current)))],
+                                   colour='red',
+                                   marker='circle',
+                                   )
+        plot = wxplot.PlotGraphics([line, marker],
+                                   title="GDW Sensitivity",
+                                   xLabel=self.CHOICES[selection],
+                                   yLabel="GDW",
+                                   )
+        self.canvas.Draw(plot, xAxis=x_range)
+
+
+class YieldPlot(wx.Panel):
+    """
+    Net die versus defect density D0 for every yield model.
+
+    Layout:
+    -------
+    ::
+
+        +-------------------------+
+        |[D0 = 0 to 1 /cm^2   \/] |
+        |                         |
+        |      Plot Canvas        |
+        |                         |
+        +-------------------------+
+    """
+    # (label, max D0 in defects/cm^2)
+    RANGES = [("D0 = 0 to 0.5 /cm^2", 0.5),
+              ("D0 = 0 to 1 /cm^2", 1.0),
+              ("D0 = 0 to 2 /cm^2", 2.0),
+              ("D0 = 0 to 5 /cm^2", 5.0),
+              ]
+    COLOURS = ['blue', 'red', 'green', 'purple']
+    N_POINTS = 2000
+
+    def __init__(self, parent):
+        wx.Panel.__init__(self, parent)
+        self.parent = parent
+        self.params = None
+        self._init_ui()
+
+        self._bind_events()
+
+    def _init_ui(self):
+        """ """
+        self.choice = wx.Choice(self, choices=[r[0] for r in self.RANGES])
+        self.choice.SetSelection(1)
+        self.canvas = wxplot.PlotCanvas(self)
+        self.canvas.EnableGrid = True
+        self.canvas.EnableLegend = True
+
+        self.vbox = wx.BoxSizer(wx.VERTICAL)
+        self.vbox.Add(self.choice, 0, wx.EXPAND)
+        self.vbox.Add(self.canvas, 1, wx.EXPAND)
+        self.SetSizer(self.vbox)
+
+    def _bind_events(self):
+        """ """
+        self.Bind(wx.EVT_CHOICE, self.on_choice, self.choice)
+
+    def on_choice(self, event):
+        """ Redraw the curves over the newly selected D0 range """
+        if self.params is not None:
+            self.update(*self.params)
+
+    def update(self, gdw, die_xy):
+        """ Recalculate and redraw the net die curves """
+        self.params = (gdw, die_xy)
+        max_d0 = self.RANGES[self.choice.GetSelection()][1]
+        d0 = np.linspace(0, max_d0, self.N_POINTS)
+        curves = yield_models.net_die_curves(gdw, die_xy[0] * die_xy[1], d0)
+
+        lines = []
+        for (name, (label, _)), curve, colour in zip(
+                yield_models.MODELS.items(), curves, self.COLOURS):
+            if name == "negative_binomial":
+                label += " (alpha={:g})".format(yield_models.DEFAULT_ALPHA)
+            lines.append(wxplot.PolyLine(np.column_stack((d0, curve)),
+                                         colour=colour,
+                                         width=2,
+                                         legend=label,
+                                         ))
+        plot = wxplot.PlotGraphics(lines,
+                                   title="Net Die per Wafer",
+                                   xLabel="D0 (defects/cm^2)",
+                                   yLabel="Net Die",
+                                   )
+        self.canvas.Draw(plot, xAxis=(0, max_d0), yAxis=(0, max(gdw, 1)))
+
+
 def pairwise(iterable):
     "s -> (s0,s1), (s1,s2), (s2, s3), ..."
     a, b = itertools.tee(iterable)
@@ -1173,4 +2980,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # Without this, the frozen Windows exe would start another copy of the
+    # GUI for every worker process.
+    multiprocessing.freeze_support()
     main()
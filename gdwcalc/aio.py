@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              aio.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             asyncio helpers for ``gdwcalc.service`` and
+                    ``gdwcalc.cluster``.
+
+                    CI still runs Python 3.5, which doesn't have
+                    ``asyncio.run``, ``asyncio.all_tasks`` or
+                    ``Server.serve_forever``. These use only the older API,
+                    which still works on current Pythons.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import asyncio
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def _all_tasks(loop):
+    """ ``asyncio.all_tasks``, which is ``Task.all_tasks`` before 3.7 """
+    if hasattr(asyncio, "all_tasks"):
+        return asyncio.all_tasks(loop)
+    return {task for task in asyncio.Task.all_tasks(loop) if not task.done()}
+
+
+def run(coro):
+    """
+    Run a coroutine on a new event loop and return its result, like
+    ``asyncio.run``. Tasks that are still running afterwards are
+    cancelled, and the loop is closed.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        try:
+            tasks = _all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                loop.run_until_complete(
+                    asyncio.gather(*tasks, return_exceptions=True))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+async def wait_forever():
+    """ Sleep until cancelled, in place of ``Server.serve_forever`` """
+    while True:
+        await asyncio.sleep(3600)
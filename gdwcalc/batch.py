@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              batch.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             Batch GDW calculations for a product catalog.
+
+                    Products use the same dicts as
+                    ``render.render_catalog``. Each product's GDW is
+                    calculated as a batch job in the shared scheduler,
+                    then the net die for every product and D0 is computed
+                    in one broadcast yield model expression.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import collections
+
+# Third Party
+import numpy as np
+
+# Package / Application
+from . import engine
+from . import scheduler
+from . import yield_models
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+# The result of ``sweep_catalog``. ``names``, ``gdw`` and ``die_area`` have
+# one entry per product; ``net_die`` has shape (n_products, len(d0)).
+CatalogSweep = collections.namedtuple("CatalogSweep",
+                                      ["names", "gdw", "die_area", "d0",
+                                       "net_die"])
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def product_gdw(product):
+    """
+    Return the GDW of a single catalog product. Runs in a worker process.
+
+    Uses the count-only engine unless the product has a fixed ``offset``
+    or fixed-point ``units``, which need the full die map.
+    """
+    die_xy = tuple(product['die_xy'])
+    dia = product['dia']
+    excl = product.get('ee', 4.5)
+    flat_excl = product.get('fe', 4.5)
+    north_limit = product.get('north_limit', None)
+    offset = product.get('offset', None)
+    units = product.get('units', None)
+    street_xy = tuple(product.get('street_xy', (0, 0)))
+
+    if units is not None:
+        if offset is None:
+            die_map = engine.max_gdw(die_xy, dia, excl, flat_excl,
+                                     north_limit, units=units,
+                                     street_xy=street_xy)
+        else:
+            die_map = engine.classify(die_xy, dia, tuple(offset), excl,
+                                      flat_excl, north_limit, units=units,
+                                      street_xy=street_xy)
+        return die_map.gdw
+    if offset is None:
+        return engine.count_max_gdw(die_xy, dia, excl, flat_excl,
+                                    north_limit, street_xy)[0]
+    return int(engine.count_gdw(die_xy, dia, tuple(offset), excl, flat_excl,
+                                north_limit, street_xy))
+
+
+def sweep_catalog(products, d0=(), model="poisson",
+                  alpha=yield_models.DEFAULT_ALPHA, max_workers=None):
+    """
+    Calculate the GDW and net die of every product in a catalog.
+
+    Parameters:
+    -----------
+    products : iterable of dict
+        See ``render.render_catalog``. Products may also have a
+        ``street_xy`` key, which defaults to (0, 0).
+    d0 : array-like of float, optional
+        The defect densities to evaluate, in defects/cm^2.
+    model : str, optional
+        One of the keys of ``yield_models.MODELS``.
+    alpha : float, optional
+        The negative binomial cluster parameter.
+    max_workers : int, optional
+        The number of worker processes. Defaults to the shared
+        ``scheduler``, at batch priority.
+
+    Returns:
+    --------
+    sweep : ``CatalogSweep``
+    """
+    products = list(products)
+    d0 = np.asarray(d0, dtype=float).ravel()
+    gdw = scheduler.batch_map(product_gdw, products, 8, max_workers)
+
+    gdw = np.array(gdw, dtype=int)
+    die_area = np.array([float(np.prod(product['die_xy']))
+                         for product in products])
+    net_die = yield_models.net_die(gdw[:, None], die_area[:, None],
+                                   d0[None, :], model, alpha)
+    return CatalogSweep([product['name'] for product in products],
+                        gdw, die_area, d0, net_die)
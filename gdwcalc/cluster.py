@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              cluster.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             Design-space sweeps spread over several machines.
+
+                    A coordinator splits a ``ParameterGrid`` into chunks of
+                    consecutive grid points. Workers on any host connect
+                    over TCP, pull a chunk, calculate it with
+                    ``batch.sweep_catalog`` on their own cores, and push
+                    the GDW back. Messages are newline-delimited JSON. The
+                    grid is sent once per worker; after that a chunk is
+                    only a range of flat grid indices.
+
+                    Each chunk handed out is a lease. A chunk goes back in
+                    the queue if its worker disconnects, and is handed to
+                    another worker if its lease runs out, so a lost or hung
+                    worker only costs the chunks it was holding. If two
+                    workers end up returning the same chunk, the first
+                    result is kept.
+
+                    On one machine (or for testing), start a coordinator
+                    and a few workers against localhost::
+
+                        python -m gdwcalc.cluster coordinator \\
+                            --die-x 0.5 30 0.01 --dia 150 200 300 \\
+                            --ee 3 4.5 --out sweep.npy
+                        python -m gdwcalc.cluster worker --host 127.0.0.1
+
+                    The coordinator only listens on localhost unless given
+                    ``--host``. Workers are not authenticated, so only
+                    listen on a network where every host that can reach
+                    the port is trusted.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import socket
+import time
+
+# Third Party
+import numpy as np
+
+# Package / Application
+from . import aio
+from . import batch
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+DEFAULT_PORT = 8043
+
+# Grid points per chunk.
+CHUNK_SIZE = 500
+
+# Seconds a worker may hold a chunk before it is handed to another worker.
+LEASE_TIMEOUT = 300.0
+
+# The longest a worker is told to wait before asking for work again.
+MAX_WAIT = 1.0
+
+# The longest message line, in bytes.
+LINE_LIMIT = 2**24
+
+# The order of the grid axes. ``die_y`` is left out for square die.
+AXES = ("die_x", "die_y", "dia", "ee", "fe")
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+class ParameterGrid(object):
+    """
+    Every combination of die size, wafer diameter and exclusions.
+
+    Parameters:
+    -----------
+    die_x : array-like of float
+        The die X sizes in mm.
+    die_y : array-like of float, optional
+        The die Y sizes in mm. ``None`` (the default) sweeps square die,
+        with Y equal to X.
+    dia : array-like of float, optional
+        The wafer diameters in mm.
+    ee, fe : array-like of float, optional
+        The edge and flat exclusions in mm.
+    north_limit : float, optional
+        The top-side scribe limit, the same for every point.
+    street_xy : tuple of floats, optional
+        The street width, the same for every point.
+    """
+    def __init__(self, die_x, die_y=None, dia=(150,), ee=(4.5,), fe=(4.5,),
+                 north_limit=None, street_xy=(0, 0)):
+        values = {'die_x': die_x, 'die_y': die_y, 'dia': dia, 'ee': ee,
+                  'fe': fe}
+        self.axes = collections.OrderedDict(
+            (name, np.asarray(values[name], dtype=float).ravel())
+            for name in AXES if values[name] is not None)
+        if any(len(axis) == 0 for axis in self.axes.values()):
+            raise ValueError("Every axis needs at least one value")
+        self.north_limit = north_limit
+        self.street_xy = tuple(street_xy)
+
+    @property
+    def shape(self):
+        return tuple(len(axis) for axis in self.axes.values())
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def square(self):
+        """ Whether the die Y size follows the X size """
+        return 'die_y' not in self.axes
+
+    def products(self, start, stop):
+        """
+        Return the ``batch.sweep_catalog`` products of the grid points
+        with flat (C order) indices ``start`` to ``stop``.
+        """
+        index = np.unravel_index(np.arange(start, stop), self.shape)
+        values = {name: axis[idx] for (name, axis), idx
+                  in zip(self.axes.items(), index)}
+        die_x = values['die_x'].tolist()
+        die_y = die_x if self.square else values['die_y'].tolist()
+        return [{'name': str(n),
+                 'die_xy': (x, y),
+                 'dia': dia,
+                 'ee': ee,
+                 'fe': fe,
+                 'north_limit': self.north_limit,
+                 'street_xy': self.street_xy,
+                 }
+                for n, x, y, dia, ee, fe in zip(range(start, stop), die_x,
+                                                die_y,
+                                                values['dia'].tolist(),
+                                                values['ee'].tolist(),
+                                                values['fe'].tolist())]
+
+    def to_dict(self):
+        """ Return the grid as a JSON serializable dict """
+        params = {name: axis.tolist() for name, axis in self.axes.items()}
+        params['north_limit'] = self.north_limit
+        params['street_xy'] = list(self.street_xy)
+        return params
+
+    @classmethod
+    def from_dict(cls, params):
+        """ The inverse of ``to_dict`` """
+        return cls(**params)
+
+
+class Coordinator(object):
+    """
+    Hands out the chunks of a grid to workers and collects the results.
+
+    Parameters:
+    -----------
+    grid : ``ParameterGrid``
+    host : str, optional
+        The interface to listen on. Use "0.0.0.0" to accept workers from
+        other hosts.
+    port : int, optional
+        The port to listen on. 0 picks a free port, which is then in
+        ``port`` once the coordinator has started.
+    chunk_size : int, optional
+        The number of grid points per chunk.
+    lease_timeout : float, optional
+        The seconds a worker may hold a chunk before it is reassigned.
+
+    Public Attributes:
+    ------------------
+    gdw : ``numpy.ndarray`` of int
+        The results, shape ``grid.shape``. -1 until calculated.
+    stats : ``collections.Counter``
+        ``assigned``, ``completed``, ``reassigned``, ``lost`` (chunks
+        returned by a disconnect) and ``duplicate`` counts.
+    """
+    def __init__(self, grid, host="127.0.0.1", port=DEFAULT_PORT,
+                 chunk_size=CHUNK_SIZE, lease_timeout=LEASE_TIMEOUT):
+        self.grid = grid
+        self.host = host
+        self.port = port
+        self.lease_timeout = lease_timeout
+        self.chunks = [(start, min(start + chunk_size, grid.size))
+                       for start in range(0, grid.size, chunk_size)]
+        self.gdw = np.full(grid.shape, -1, dtype=int)
+        self.stats = collections.Counter()
+        self._pending = collections.deque(range(len(self.chunks)))
+        self._leases = {}
+        self._done = set()
+        self._finished = None
+        self._server = None
+        self._handlers = set()
+        self._worker_ids = itertools.count()
+
+    @property
+    def n_done(self):
+        return len(self._done)
+
+    async def start(self):
+        """ Begin listening for workers """
+        self._finished = asyncio.Event()
+        if not self.chunks:
+            self._finished.set()
+        self._server = await asyncio.start_server(self._accept,
+                                                  self.host, self.port,
+                                                  limit=LINE_LIMIT)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def wait(self):
+        """ Wait until every chunk is done and return ``gdw`` """
+        await self._finished.wait()
+        return self.gdw
+
+    async def close(self, grace=2 * MAX_WAIT):
+        """
+        Stop listening. Connected workers get ``grace`` seconds to ask for
+        work again and be told that the sweep is done.
+        """
+        if self._server is None:
+            return
+        self._server.close()
+        if self._handlers:
+            _, running = await asyncio.wait(self._handlers, timeout=grace)
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    async def run(self):
+        """ Start, wait for every chunk, and stop. Returns ``gdw``. """
+        await self.start()
+        try:
+            return await self.wait()
+        finally:
+            await self.close()
+
+    def _assign(self, worker_id):
+        """ Return the next message for a worker that wants work """
+        now = time.monotonic()
+        while self._pending:
+            chunk = self._pending.popleft()
+            if chunk not in self._done:
+                self.stats['assigned'] += 1
+                return self._lease(chunk, worker_id, now)
+        if len(self._done) == len(self.chunks):
+            return {'type': "done"}
+
+        # Everything is out; take over the oldest expired lease.
+        expired = [(deadline, chunk) for chunk, (_, deadline)
+                   in self._leases.items() if deadline <= now]
+        if expired:
+            _, chunk = min(expired)
+            self.stats['reassigned'] += 1
+            return self._lease(chunk, worker_id, now)
+        next_deadline = min(deadline for _, deadline
+                            in self._leases.values())
+        return {'type': "wait",
+                'delay': min(MAX_WAIT, max(next_deadline - now, 0.01))}
+
+    def _lease(self, chunk, worker_id, now):
+        self._leases[chunk] = (worker_id, now + self.lease_timeout)
+        start, stop = self.chunks[chunk]
+        return {'type': "chunk", 'chunk': chunk, 'start': start,
+                'stop': stop}
+
+    def _store(self, message):
+        """ Save a chunk result """
+        chunk = message['chunk']
+        if (not isinstance(chunk, int) or isinstance(chunk, bool)
+                or not 0 <= chunk < len(self.chunks)):
+            raise ValueError("Unknown chunk {!r}".format(chunk))
+        if chunk in self._done:
+            self.stats['duplicate'] += 1
+            return
+        start, stop = self.chunks[chunk]
+        gdw = np.asarray(message['gdw'], dtype=int)
+        if gdw.shape != (stop - start,):
+            raise ValueError("Chunk {} has the wrong number of results"
+                             .format(chunk))
+        self.gdw.flat[start:stop] = gdw
+        self._done.add(chunk)
+        self._leases.pop(chunk, None)
+        self.stats['completed'] += 1
+        if len(self._done) == len(self.chunks):
+            self._finished.set()
+
+    def _release(self, worker_id):
+        """ Put a lost worker's chunks back at the front of the queue """
+        for chunk, (owner, _) in list(self._leases.items()):
+            if owner == worker_id:
+                del self._leases[chunk]
+                self._pending.appendleft(chunk)
+                self.stats['lost'] += 1
+
+    def _accept(self, reader, writer):
+        """ Start serving a new worker connection """
+        task = asyncio.ensure_future(self._handle_worker(reader, writer))
+        self._handlers.add(task)
+        task.add_done_callback(self._handlers.discard)
+
+    async def _handle_worker(self, reader, writer):
+        """
+        Serve one worker connection. A worker that sends anything invalid
+        is disconnected, and its chunks are released.
+        """
+        worker_id = next(self._worker_ids)
+        try:
+            await _send(writer, {'type': "grid",
+                                 'grid': self.grid.to_dict()})
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line.decode('utf-8'))
+                if not isinstance(message, dict):
+                    raise ValueError("Messages must be objects")
+                if message.get('type') == "result":
+                    self._store(message)
+                reply = self._assign(worker_id)
+                await _send(writer, reply)
+                if reply['type'] == "done":
+                    break
+        except (ConnectionError, ValueError, KeyError, TypeError):
+            pass
+        finally:
+            self._release(worker_id)
+            writer.close()
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+async def _send(writer, message):
+    """ Write one message line """
+    writer.write(json.dumps(message).encode('utf-8') + b"\n")
+    await writer.drain()
+
+
+def axis_range(start, stop, step):
+    """
+    Return ``start`` to ``stop``, both included, in steps of ``step``,
+    rounded to 1 nm so that 10 um steps stay exact.
+    """
+    n_steps = int(round((stop - start) / step))
+    return np.round(start + step * np.arange(n_steps + 1), 6)
+
+
+def sweep(grid, host="127.0.0.1", port=0, chunk_size=CHUNK_SIZE,
+          lease_timeout=LEASE_TIMEOUT):
+    """
+    Run a coordinator until workers have calculated the whole grid.
+
+    Returns:
+    --------
+    gdw : ``numpy.ndarray`` of int
+        Shape ``grid.shape``.
+    """
+    coordinator = Coordinator(grid, host, port, chunk_size, lease_timeout)
+    return aio.run(coordinator.run())
+
+
+def run_worker(host, port=DEFAULT_PORT, max_workers=None, retries=10,
+               retry_delay=1.0):
+    """
+    Pull chunks from a coordinator until the sweep is done.
+
+    Parameters:
+    -----------
+    host : str
+        The coordinator's host.
+    port : int, optional
+        The coordinator's port.
+    max_workers : int, optional
+        The number of local worker processes. Defaults to the shared
+        ``scheduler``.
+    retries : int, optional
+        How many times to retry the initial connection, for workers that
+        start before the coordinator.
+    retry_delay : float, optional
+        The seconds between connection attempts.
+
+    Returns:
+    --------
+    n_chunks : int
+        The number of chunks this worker calculated.
+    """
+    for attempt in itertools.count():
+        try:
+            sock = socket.create_connection((host, port))
+            break
+        except OSError:
+            if attempt >= retries:
+                raise
+            time.sleep(retry_delay)
+
+    n_chunks = 0
+    with sock, sock.makefile('rwb') as stream:
+        def receive():
+            line = stream.readline()
+            if not line:
+                raise ConnectionError("The coordinator closed the connection")
+            return json.loads(line.decode('utf-8'))
+
+        def send(message):
+            stream.write(json.dumps(message).encode('utf-8') + b"\n")
+            stream.flush()
+
+        grid = ParameterGrid.from_dict(receive()['grid'])
+        send({'type': "request"})
+        while True:
+            message = receive()
+            if message['type'] == "done":
+                return n_chunks
+            if message['type'] == "wait":
+                time.sleep(message['delay'])
+                send({'type': "request"})
+                continue
+            products = grid.products(message['start'], message['stop'])
+            result = batch.sweep_catalog(products, max_workers=max_workers)
+            send({'type': "result", 'chunk': message['chunk'],
+                  'gdw': result.gdw.tolist()})
+            n_chunks += 1
+
+
+def main(argv=None):
+    """ Run a coordinator or a worker from the command line """
+    parser = argparse.ArgumentParser(description="Multi-host GDW sweeps")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    coord = commands.add_parser("coordinator", help="Hand out a sweep")
+    coord.add_argument("--host", default="127.0.0.1",
+                       help="the interface to listen on; use 0.0.0.0 to"
+                            " accept workers from other (trusted) hosts")
+    coord.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coord.add_argument("--die-x", type=float, nargs=3, required=True,
+                       metavar=("START", "STOP", "STEP"))
+    coord.add_argument("--die-y", type=float, nargs=3, default=None,
+                       metavar=("START", "STOP", "STEP"),
+                       help="default: square die")
+    coord.add_argument("--dia", type=float, nargs="+", default=[150])
+    coord.add_argument("--ee", type=float, nargs="+", default=[4.5])
+    coord.add_argument("--fe", type=float, nargs="+", default=[4.5])
+    coord.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    coord.add_argument("--lease", type=float, default=LEASE_TIMEOUT)
+    coord.add_argument("--out", required=True,
+                       help="where to save the GDW array (.npy)")
+
+    work = commands.add_parser("worker", help="Calculate sweep chunks")
+    work.add_argument("--host", default="127.0.0.1")
+    work.add_argument("--port", type=int, default=DEFAULT_PORT)
+    work.add_argument("--workers", type=int, default=None,
+                      help="local processes (default: number of CPUs)")
+
+    args = parser.parse_args(argv)
+    if args.command == "worker":
+        n_chunks = run_worker(args.host, args.port, args.workers)
+        print("Calculated {} chunks".format(n_chunks))
+        return
+
+    die_y = None if args.die_y is None else axis_range(*args.die_y)
+    grid = ParameterGrid(axis_range(*args.die_x), die_y, args.dia, args.ee,
+                         args.fe)
+    print("Sweeping {} points with axes {} on port {}".format(
+        grid.size, list(grid.axes), args.port))
+    gdw = sweep(grid, args.host, args.port, args.chunk_size, args.lease)
+    np.save(args.out, gdw)
+    print("Saved {}".format(args.out))
+
+
+if __name__ == "__main__":
+    main()
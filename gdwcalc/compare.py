@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              compare.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             Side-by-side comparison of several wafer setups.
+
+                    Each setup is a dict with the same keys as a
+                    ``batch.sweep_catalog`` product. All setups are
+                    classified at once, one task each, on the shared
+                    ``scheduler`` at interactive priority, so the workers
+                    stay up between comparisons and a running sweep
+                    doesn't hold them up. The losses of every setup are
+                    tabulated along with their change from the first setup.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import collections
+
+# Third Party
+import numpy as np
+
+# Package / Application
+from . import engine
+from . import scheduler
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+# The comparison table columns and the status each one counts.
+COLUMNS = ("gdw", "excl", "flat", "flat_excl", "scribe", "keepout")
+COLUMN_STATUS = (engine.PROBE,
+                 engine.EXCL,
+                 engine.FLAT,
+                 engine.FLAT_EXCL,
+                 engine.SCRIBE,
+                 engine.KEEPOUT,
+                 )
+
+# The most setups that are compared at once.
+MAX_SETUPS = 6
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+# The result of ``compare_setups``. ``table`` has one row per setup
+# and one column per ``COLUMNS`` entry; ``deltas`` is ``table`` minus its
+# first row.
+Comparison = collections.namedtuple("Comparison",
+                                    ["names", "die_maps", "table", "deltas"])
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def setup_die_map(setup):
+    """
+    Return the die map of a single setup. Runs in a worker process.
+
+    Setups use the keys of ``batch.product_gdw``, and may also have
+    ``rotation`` in degrees and ``keepouts``. ``ee`` may be an
+    ``exclusion.ExclusionProfile``. The grid is the best of the four
+    odd/even shifts unless the setup has a fixed ``offset``.
+    """
+    die_xy = tuple(setup['die_xy'])
+    dia = setup['dia']
+    excl = setup.get('ee', 4.5)
+    flat_excl = setup.get('fe', 4.5)
+    north_limit = setup.get('north_limit', None)
+    offset = setup.get('offset', None)
+    units = setup.get('units', None)
+    street_xy = tuple(setup.get('street_xy', (0, 0)))
+    keepouts = setup.get('keepouts', ())
+    rotation = setup.get('rotation', 0)
+
+    if offset is None:
+        return engine.max_gdw(die_xy, dia, excl, flat_excl, north_limit,
+                              units=units, street_xy=street_xy,
+                              keepouts=keepouts, rotation=rotation)
+    return engine.classify(die_xy, dia, tuple(offset), excl, flat_excl,
+                           north_limit, units=units, street_xy=street_xy,
+                           keepouts=keepouts, rotation=rotation)
+
+
+def comparison(setups, die_maps):
+    """ Tabulate the losses of already classified setups """
+    table = np.array([die_map.counts()[list(COLUMN_STATUS)]
+                      for die_map in die_maps], dtype=int)
+    table = table.reshape(len(die_maps), len(COLUMNS))
+    names = [setup.get('name', "Setup {}".format(n + 1))
+             for n, setup in enumerate(setups)]
+    return Comparison(names, die_maps, table, table - table[:1])
+
+
+def compare_setups(setups, max_workers=None):
+    """
+    Classify several setups in parallel and compare them.
+
+    Parameters:
+    -----------
+    setups : iterable of dict
+        See ``setup_die_map``. Setups without a ``name`` are named
+        "Setup 1", "Setup 2", ...
+    max_workers : int, optional
+        The number of worker processes. Defaults to the shared
+        ``scheduler``.
+
+    Returns:
+    --------
+    comparison : ``Comparison``
+        The first setup is the baseline for ``deltas``.
+    """
+    setups = list(setups)
+    die_maps = scheduler.batch_map(setup_die_map, setups, 1, max_workers,
+                                   scheduler.INTERACTIVE)
+    return comparison(setups, die_maps)
@@ -0,0 +1,1099 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              engine.py
+@author:            Douglas Thor
+@created:           2019-10-15
+@descr:             Vectorized Gross Die per Wafer classification.
+
+                    A NumPy implementation of the die classification done by
+                    ``gdw.gdw`` and ``gdw.maxGDW``. Die are classified as a
+                    2D status grid rather than one die at a time.
+
+                    For centered (odd or even) grid offsets the radial part
+                    of the classification is symmetric about both axes, so
+                    only one quadrant is computed and then mirrored. The
+                    flat, flat exclusion and top-side scribe limits depend
+                    only on the row and are applied per row afterwards.
+
+                    Die are stepped at a pitch of die size + street width,
+                    and every exclusion test uses the die body only.
+
+                    Optional float32 fields (distances to each limit and
+                    the area fraction inside the edge exclusion) are
+                    computed for the whole grid with closed-form array math.
+
+                    ``classify``, ``max_gdw``, ``die_status``,
+                    ``die_fields``, ``count_gdw`` and ``count_max_gdw`` also
+                    take a ``geometry.Substrate`` (notched wafers, multiple
+                    flats, rectangular panels) in place of the diameter.
+                    Those are classified and counted from per-row chord
+                    tables. The other round-wafer functions here and in the
+                    rest of the package raise a ``TypeError`` for one.
+
+                    The edge exclusion may also be an
+                    ``exclusion.ExclusionProfile`` that varies with angle.
+                    Die are classified with its narrowest width, then only
+                    the die near the edge have their corners checked.
+
+                    The die grid may be rotated relative to the wafer. Then
+                    every die corner is rotated onto the wafer in one matrix
+                    multiply and classified against the substrate
+                    geometry. Grid indices and ``x_centers``/``y_centers``
+                    stay in the (rotated) grid frame.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import hashlib
+import math
+
+# Third Party
+import numpy as np
+
+# Package / Application
+from . import exclusion
+from . import geometry
+from . import keepout
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+# Defined by SEMI M1-0302
+FLAT_LENGTHS = geometry.FLAT_LENGTHS
+
+# Die status codes, as stored in ``DieMap.status``.
+OFF_WAFER = -1
+PROBE = 0
+EXCL = 1
+FLAT = 2
+FLAT_EXCL = 3
+SCRIBE = 4
+KEEPOUT = 5
+
+# Indexed by status code.
+STATUS_NAMES = ("probe", "excl", "flat", "flatExcl", "scribe", "keepout")
+
+# Optional per-die float32 fields, in ``DieMap.fields`` order.
+FIELD_NAMES = ("edge_distance",
+               "flat_distance",
+               "scribe_distance",
+               "excl_area_fraction",
+               )
+
+# Fixed-point units per mm, for ``classify(..., units=...)``.
+UNIT_SCALES = {"um": 1000, "nm": 1000000}
+
+# The four grid shifts searched by max_gdw, in the same order as gdw.maxGDW.
+CENTER_TYPES = (("odd", "odd"),
+                ("odd", "even"),
+                ("even", "odd"),
+                ("even", "even"))
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+class DieMap(object):
+    """
+    The result of a classification.
+
+    Parameters:
+    -----------
+    status : ``numpy.ndarray`` of int8
+        The die status codes, shape ``(n_rows, n_cols)``. Row 0 is the top
+        of the wafer. Die that fall off the wafer are ``OFF_WAFER``.
+    x_centers : ``numpy.ndarray``
+        The X coordinate (mm) of each column's die centers.
+    y_centers : ``numpy.ndarray``
+        The Y coordinate (mm) of each row's die centers, top row first.
+    die_xy : tuple of floats
+        The die body size in mm.
+    center_xy : tuple of floats
+        The grid coordinate of the wafer center.
+    center_offset : tuple, optional
+        The grid offset this map was classified with. See ``classify``.
+    street_xy : tuple of floats, optional
+        The street (scribe lane) width in mm between die.
+    fields : dict, optional
+        ``FIELD_NAMES`` mapped to float32 arrays the same shape as
+        ``status``. See ``die_fields``. ``None`` if not requested.
+    rotation : float, optional
+        The angle of the die grid in degrees, counterclockwise relative to
+        the wafer. ``x_centers`` and ``y_centers`` are in the grid frame.
+
+    Grid coordinates are ``(col, row)`` = ``(x, y)`` array indices, which is
+    what ``wafer_map`` and the mask file expect.
+    """
+    def __init__(self, status, x_centers, y_centers, die_xy, center_xy,
+                 center_offset=None, street_xy=(0, 0), fields=None,
+                 rotation=0):
+        self.status = status
+        self.x_centers = x_centers
+        self.y_centers = y_centers
+        self.die_xy = die_xy
+        self.center_xy = center_xy
+        self.center_offset = center_offset
+        self.street_xy = street_xy
+        self.fields = fields
+        self.rotation = rotation
+
+    @property
+    def pitch_xy(self):
+        """ The grid step in mm: die size plus street width """
+        return (self.die_xy[0] + self.street_xy[0],
+                self.die_xy[1] + self.street_xy[1])
+
+    def counts(self):
+        """ Return the number of die in each status, indexed by code. """
+        on_wafer = self.status[self.status != OFF_WAFER]
+        return np.bincount(on_wafer, minlength=len(STATUS_NAMES))
+
+    def fingerprint(self):
+        """
+        Return a hex digest of the status grid and wafer center.
+
+        Stable across machines for fixed-point classifications, so it can
+        be used as a cache key or to diff two runs.
+        """
+        digest = hashlib.sha1()
+        digest.update(np.array(self.status.shape, dtype=np.int64).tobytes())
+        digest.update(self.status.astype(np.int8).tobytes())
+        digest.update(repr(tuple(float(c) for c in self.center_xy)).encode())
+        if self.rotation:
+            digest.update(repr(float(self.rotation)).encode())
+        return digest.hexdigest()
+
+    @property
+    def gdw(self):
+        """ The number of probe-able die """
+        return int(np.count_nonzero(self.status == PROBE))
+
+    def wafer_centers(self):
+        """
+        Return the die centers in mm on the wafer, as two arrays the same
+        shape as ``status``. Only differs from the grid centers for a
+        rotated grid.
+        """
+        x, y = np.broadcast_arrays(self.x_centers[None, :],
+                                   self.y_centers[:, None])
+        if not self.rotation:
+            return x, y
+        wafer = np.dot(rotation_matrix(self.rotation),
+                       np.stack((x.ravel(), y.ravel())))
+        return wafer[0].reshape(x.shape), wafer[1].reshape(y.shape)
+
+    def probe_list(self):
+        """
+        Return the die in the same format as ``gdw.gdw``.
+
+        A list of (col, row, x_coord, y_coord, status) tuples, where the
+        coordinates are the lower-left corner of the die body in mm.
+        """
+        rows, cols = np.nonzero(self.status != OFF_WAFER)
+        x_ll = self.x_centers[cols] - self.die_xy[0] / 2
+        y_ll = self.y_centers[rows] - self.die_xy[1] / 2
+        names = [STATUS_NAMES[code] for code in self.status[rows, cols]]
+        return list(zip(cols.tolist(),
+                        rows.tolist(),
+                        x_ll.tolist(),
+                        y_ll.tolist(),
+                        names))
+
+    def coord_list(self):
+        """ Return the (x, y, status) list used by ``wafer_map``. """
+        return [(i[0], i[1], i[4]) for i in self.probe_list()]
+
+    def field_list(self, name):
+        """
+        Return a (x, y, value) list of one field for ``wafer_map``'s
+        continuous mode, in the same order as ``coord_list``.
+        """
+        if self.fields is None:
+            raise ValueError("This die map was classified without fields")
+        rows, cols = np.nonzero(self.status != OFF_WAFER)
+        values = self.fields[name][rows, cols].tolist()
+        return list(zip(cols.tolist(), rows.tolist(), values))
+
+    def write_csv(self, fname, grid_offset=(0, 0)):
+        """
+        Write every die on the wafer as CSV: the grid (col, row), the
+        lower-left corner of the die body in mm, the status, and any
+        fields.
+
+        ``grid_offset`` is subtracted from the grid coordinates, to match
+        a coord list that was shifted to a forced starting die.
+        """
+        names = list(FIELD_NAMES) if self.fields is not None else []
+        rows, cols = np.nonzero(self.status != OFF_WAFER)
+        values = [self.fields[name][rows, cols] for name in names]
+        with open(fname, 'w') as openf:
+            openf.write(",".join(["Col", "Row", "X", "Y", "Status"]
+                                 + names) + "\n")
+            for n, item in enumerate(self.probe_list()):
+                line = ["{}".format(item[0] - grid_offset[0]),
+                        "{}".format(item[1] - grid_offset[1]),
+                        "{:.6f}".format(item[2]), "{:.6f}".format(item[3]),
+                        item[4]]
+                line += ["{:.4f}".format(value[n]) for value in values]
+                openf.write(",".join(line) + "\n")
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def flat_location(dia):
+    """
+    Return the Y location of the wafer flat for a given diameter.
+
+    Wafers without a SEMI M1-0302 flat get the bottom of the wafer.
+    """
+    geometry.require_diameter(dia, "flat_location")
+    rad = dia / 2
+    if dia in FLAT_LENGTHS:
+        return -math.sqrt(rad**2 - (FLAT_LENGTHS[dia] / 2)**2)
+    return -rad
+
+
+def rotation_matrix(rotation):
+    """
+    Return the 2x2 matrix that takes grid coordinates onto the wafer for a
+    grid rotated ``rotation`` degrees counterclockwise.
+    """
+    theta = math.radians(rotation)
+    cos, sin = math.cos(theta), math.sin(theta)
+    return np.array([[cos, -sin], [sin, cos]])
+
+
+def _rotated_corners(x_centers, y_centers, half_x, half_y, rotation):
+    """
+    Return the wafer coordinates of the four corners of die at grid
+    centers, with the broadcast shape of the centers plus a leading axis
+    of 4.
+    """
+    x, y = np.broadcast_arrays(np.asarray(x_centers, dtype=float),
+                               np.asarray(y_centers, dtype=float))
+    shape = (4, ) + (1, ) * x.ndim
+    dx = np.array([-half_x, half_x, -half_x, half_x]).reshape(shape)
+    dy = np.array([-half_y, -half_y, half_y, half_y]).reshape(shape)
+    corners = np.stack(((x + dx).ravel(), (y + dy).ravel()))
+    wafer = np.dot(rotation_matrix(rotation), corners)
+    return (wafer[0].reshape((4, ) + x.shape),
+            wafer[1].reshape((4, ) + x.shape))
+
+
+def _offset_fraction(center_type, pitch):
+    """
+    Convert an "odd", "even" or mm offset to a fraction of the pitch.
+
+    A mm offset is the location of a die center relative to the wafer
+    center, so 0 is the same as "odd" and pitch/2 the same as "even".
+    """
+    if center_type == "odd":
+        return 0.0
+    elif center_type == "even":
+        return 0.5
+    return (float(center_type) % pitch) / pitch
+
+
+def grid_axis(rad, pitch, frac):
+    """
+    Return the die center coordinates along one axis, and the (fractional)
+    index of the wafer center along it.
+
+    The axis spans every die that could touch a wafer of radius ``rad``.
+    Centers are calculated as ``(k + frac) * pitch`` so that centered grids
+    (``frac`` of 0 or 0.5) are exactly mirror-symmetric about 0.
+    """
+    k_min = math.floor(-rad / pitch - frac)
+    k_max = math.ceil(rad / pitch - frac)
+    centers = (np.arange(k_min, k_max + 1) + frac) * pitch
+    return centers, -(k_min + frac)
+
+
+def _radial_status(x_centers, y_centers, half_x, half_y, rad, excl_rad):
+    """
+    Classify die by their farthest corner only: OFF_WAFER, EXCL or PROBE.
+
+    Uses squared distances so no sqrt is needed. Works the same for float
+    mm and for fixed-point integer inputs.
+    """
+    far_x = (np.abs(x_centers) + half_x)**2
+    far_y = (np.abs(y_centers) + half_y)**2
+    far_sq = far_y[:, None] + far_x[None, :]
+
+    status = np.where(far_sq > excl_rad**2, EXCL, PROBE).astype(np.int8)
+    status[far_sq > rad**2] = OFF_WAFER
+    return status
+
+
+def _mirror(half, centered):
+    """
+    Mirror the right half of an axis (last axis of ``half``) to the left.
+
+    If ``centered``, the first element sits on the axis and is not
+    duplicated.
+    """
+    left = half[..., ::-1]
+    if centered:
+        left = left[..., :-1]
+    return np.concatenate((left, half), axis=-1)
+
+
+def _symmetric_radial_status(x_centers, y_centers, half_x, half_y, rad,
+                             excl_rad, sym_x, sym_y):
+    """ Compute the radial status on the fundamental region and mirror. """
+    x_start = np.searchsorted(x_centers, 0) if sym_x else 0
+    y_start = np.searchsorted(-y_centers, 0) if sym_y else 0
+
+    status = _radial_status(x_centers[x_start:], y_centers[y_start:],
+                            half_x, half_y, rad, excl_rad)
+
+    if sym_x:
+        status = _mirror(status, x_centers[x_start] == 0)
+    if sym_y:
+        status = _mirror(status.T, y_centers[y_start] == 0).T
+    return status
+
+
+def _apply_row_limits(status, row_flat, row_flat_excl, row_scribe):
+    """
+    Apply the flat, flat exclusion and scribe limits, which only depend on
+    the row, on top of the radial status. Modifies ``status`` in place.
+    """
+    # Wafers without a flat and without a top-side limit never trigger
+    # them, so skip the work.
+    if row_flat.any() or row_flat_excl.any() or row_scribe.any():
+        on_wafer = status != OFF_WAFER
+        is_probe = status == PROBE
+        # Lowest priority first so that higher priorities overwrite.
+        status[row_scribe[:, None] & is_probe] = SCRIBE
+        status[row_flat_excl[:, None] & is_probe] = FLAT_EXCL
+        status[row_flat[:, None] & on_wafer] = FLAT
+
+
+def _classify_float(die_xy, dia, center_offset, excl, flat_excl,
+                    north_limit, symmetry, street_xy):
+    """ Classify using float mm. See ``classify``. """
+    die_x, die_y = die_xy
+    pitch_x = die_x + street_xy[0]
+    pitch_y = die_y + street_xy[1]
+    rad = dia / 2
+    frac_x = _offset_fraction(center_offset[0], pitch_x)
+    frac_y = _offset_fraction(center_offset[1], pitch_y)
+
+    x_centers, center_x = grid_axis(rad, pitch_x, frac_x)
+    y_centers, center_y = grid_axis(rad, pitch_y, frac_y)
+
+    # Rows count down from the top of the wafer.
+    y_centers = y_centers[::-1]
+    center_y = len(y_centers) - 1 - center_y
+
+    excl_rad = max(rad - exclusion.min_width(excl), 0)
+    sym_x = symmetry and frac_x in (0, 0.5)
+    sym_y = symmetry and frac_y in (0, 0.5)
+    if sym_x or sym_y:
+        status = _symmetric_radial_status(x_centers, y_centers,
+                                          die_x / 2, die_y / 2,
+                                          rad, excl_rad, sym_x, sym_y)
+    else:
+        status = _radial_status(x_centers, y_centers, die_x / 2, die_y / 2,
+                                rad, excl_rad)
+    if exclusion.is_profile(excl):
+        # Profiles are not symmetric, so this is on the full grid.
+        _circle_profile_status(status, x_centers[None, :],
+                               y_centers[:, None], die_x / 2, die_y / 2,
+                               rad, excl)
+
+    flat_y = flat_location(dia)
+    bottom = y_centers - die_y / 2
+    row_flat = bottom < flat_y
+    row_flat_excl = bottom < flat_y + flat_excl
+    if north_limit is None:
+        row_scribe = np.zeros_like(row_flat)
+    else:
+        row_scribe = y_centers + die_y / 2 > north_limit
+    _apply_row_limits(status, row_flat, row_flat_excl, row_scribe)
+
+    return DieMap(status, x_centers, y_centers, die_xy, (center_x, center_y),
+                  tuple(center_offset), tuple(street_xy))
+
+
+def _quantize(value, scale):
+    """ Round a mm value to an integer number of fixed-point units. """
+    return int(round(value * scale))
+
+
+def _fixed_axis(dia_q, pitch_q, offset2_q):
+    """
+    Fixed-point version of ``grid_axis``.
+
+    All values are integers at twice the unit resolution, so that die
+    half-sizes and "even" offsets stay exact. Returns the doubled centers
+    and the (fractional) index of the wafer center.
+    """
+    step = 2 * pitch_q
+    k_min = (-dia_q - offset2_q) // step
+    k_max = -((offset2_q - dia_q) // step)
+    centers = np.arange(k_min, k_max + 1, dtype=np.int64) * step + offset2_q
+    return centers, -(k_min + offset2_q / step)
+
+
+def _fixed_offset(center_type, pitch_q, scale):
+    """ Return the doubled fixed-point offset of a die center. """
+    if center_type == "odd":
+        return 0
+    elif center_type == "even":
+        return pitch_q
+    return 2 * (_quantize(float(center_type), scale) % pitch_q)
+
+
+def _classify_fixed(die_xy, dia, center_offset, excl, flat_excl,
+                    north_limit, symmetry, street_xy, scale):
+    """
+    Classify using int64 fixed-point units. See ``classify``.
+
+    Every input is rounded to the unit grid once, then all comparisons are
+    exact integer math on squared distances. Coordinates are kept at twice
+    the unit resolution: a die center is ``2 * x`` and its half-size is the
+    die size, the wafer radius is the diameter, and so on.
+    """
+    size_x = _quantize(die_xy[0], scale)
+    size_y = _quantize(die_xy[1], scale)
+    pitch_x = size_x + _quantize(street_xy[0], scale)
+    pitch_y = size_y + _quantize(street_xy[1], scale)
+    dia_q = _quantize(dia, scale)
+    excl_q = _quantize(excl, scale)
+    flat_excl_q = _quantize(flat_excl, scale)
+    if size_x <= 0 or size_y <= 0:
+        raise ValueError("Die size must be at least one fixed-point unit")
+
+    offset_x = _fixed_offset(center_offset[0], pitch_x, scale)
+    offset_y = _fixed_offset(center_offset[1], pitch_y, scale)
+
+    x2, center_x = _fixed_axis(dia_q, pitch_x, offset_x)
+    y2, center_y = _fixed_axis(dia_q, pitch_y, offset_y)
+
+    # Rows count down from the top of the wafer.
+    y2 = y2[::-1]
+    center_y = len(y2) - 1 - center_y
+
+    excl_rad2 = max(dia_q - 2 * excl_q, 0)
+    sym_x = symmetry and offset_x in (0, pitch_x)
+    sym_y = symmetry and offset_y in (0, pitch_y)
+    if sym_x or sym_y:
+        status = _symmetric_radial_status(x2, y2, size_x, size_y,
+                                          dia_q, excl_rad2, sym_x, sym_y)
+    else:
+        status = _radial_status(x2, y2, size_x, size_y, dia_q, excl_rad2)
+
+    # bottom < flat_y  <=>  bottom < 0 and bottom**2 > flat_y**2, which
+    # avoids the sqrt in the flat location.
+    if dia in FLAT_LENGTHS:
+        flat_sq = dia_q**2 - _quantize(FLAT_LENGTHS[dia], scale)**2
+    else:
+        flat_sq = dia_q**2
+    bottom = y2 - size_y
+    row_flat = (bottom < 0) & (bottom * bottom > flat_sq)
+    bottom = bottom - 2 * flat_excl_q
+    row_flat_excl = (bottom < 0) & (bottom * bottom > flat_sq)
+    if north_limit is None:
+        row_scribe = np.zeros_like(row_flat)
+    else:
+        row_scribe = y2 + size_y > 2 * _quantize(north_limit, scale)
+    _apply_row_limits(status, row_flat, row_flat_excl, row_scribe)
+
+    x_centers = x2 / (2 * scale)
+    y_centers = y2 / (2 * scale)
+    die_xy = (size_x / scale, size_y / scale)
+    street_xy = ((pitch_x - size_x) / scale, (pitch_y - size_y) / scale)
+    return DieMap(status, x_centers, y_centers, die_xy, (center_x, center_y),
+                  tuple(center_offset), street_xy)
+
+
+def die_fields(x_centers, y_centers, die_xy, dia, excl, north_limit=None,
+               rotation=0):
+    """
+    Return the per-die distance and area fields.
+
+    ``x_centers`` and ``y_centers`` are broadcast against each other, the
+    same as ``die_status``. Distances are in mm from the die body and are
+    negative once the die crosses the limit.
+
+    Returns:
+    --------
+    fields : dict of ``numpy.ndarray`` of float32
+        edge_distance : from the closest corner to the wafer edge. Notches
+            are only measured at the corners.
+        flat_distance : from the closest corner to any wafer flat (the
+            bottom of the wafer if it has no flat, inf for panels).
+        scribe_distance : from the top edge to the top-side scribe limit,
+            or inf if there is none.
+        excl_area_fraction : the fraction of the die area inside the edge
+            exclusion boundary. For an exclusion profile, the boundary
+            uses the width at the die center's angle. For a rotated grid
+            the area is taken in the grid frame, which is only exact for
+            round outlines.
+    """
+    substrate = geometry.as_substrate(dia)
+    x = np.asarray(x_centers, dtype=float)
+    y = np.asarray(y_centers, dtype=float)
+    x, y = np.broadcast_arrays(x, y)
+    half_x, half_y = die_xy[0] / 2, die_xy[1] / 2
+
+    if rotation:
+        corner_x, corner_y = _rotated_corners(x, y, half_x, half_y, rotation)
+        corners = list(zip(corner_x, corner_y))
+        top = corner_y.max(axis=0)
+    else:
+        corners = [(x + dx, y + dy) for dx in (-half_x, half_x)
+                   for dy in (-half_y, half_y)]
+        top = y + half_y
+    edge = np.min([substrate.outline_distance(*c) for c in corners], axis=0)
+    flat = np.min([substrate.flat_distance(*c) for c in corners], axis=0)
+    if north_limit is None:
+        scribe = np.full(x.shape, np.inf)
+    else:
+        scribe = north_limit - top
+
+    if exclusion.is_profile(excl):
+        # Angles on the wafer are the grid angles plus the rotation.
+        excl = excl.width_at(np.degrees(np.arctan2(y, x)) + rotation)
+    area = substrate.excl_area(x - half_x, x + half_x, y - half_y,
+                               y + half_y, excl)
+    fraction = np.clip(area / (die_xy[0] * die_xy[1]), 0, 1)
+
+    values = (edge, flat, scribe, fraction)
+    return {name: value.astype(np.float32)
+            for name, value in zip(FIELD_NAMES, values)}
+
+
+def _add_fields(die_map, dia, excl, north_limit):
+    """ Compute and attach ``die_fields`` to a die map. Returns it. """
+    die_map.fields = die_fields(die_map.x_centers[None, :],
+                                die_map.y_centers[:, None],
+                                die_map.die_xy, dia, excl, north_limit,
+                                die_map.rotation)
+    return die_map
+
+
+def _substrate_status(x_centers, y_centers, half_x, half_y, substrate,
+                      excl, flat_excl, north_limit):
+    """
+    Classify die on a ``geometry.Substrate`` from its chord tables.
+
+    ``x_centers`` and ``y_centers`` are broadcast together. The chords
+    only depend on ``y_centers``, so pass rows as a column to compute them
+    once per row.
+    """
+    y_centers = np.asarray(y_centers, dtype=float)
+    y_lo, y_hi = y_centers - half_y, y_centers + half_y
+    x_lo, x_hi = x_centers - half_x, x_centers + half_x
+
+    def within(table):
+        """ Die bodies inside a (lo, hi, gap_lo, gap_hi, ...) table """
+        lo, hi, gap_lo, gap_hi = table[:4]
+        return (x_lo >= lo) & (x_hi <= hi) & ~((x_hi >= gap_lo)
+                                                & (x_lo <= gap_hi))
+
+    def within_flats(table):
+        """ Die bodies inside the flats of a chord table """
+        return (x_lo >= table[4]) & (x_hi <= table[5])
+
+    edge = substrate.chord_table(y_lo, y_hi)
+    inner = substrate.chord_table(y_lo, y_hi, exclusion.min_width(excl))
+    flat_inner = substrate.chord_table(y_lo, y_hi, flat_excl)
+
+    on_wafer = within(edge)
+    status = np.where(within(inner), PROBE, EXCL).astype(np.int8)
+    if exclusion.is_profile(excl):
+        # Die inside the widest exclusion can't be affected by the profile.
+        widest = substrate.chord_table(y_lo, y_hi, excl.max_width)
+        near = (status == PROBE) & ~within(widest)
+        _apply_profile(status, x_centers, y_centers, half_x, half_y, excl,
+                       substrate.outline_distance, near)
+    is_probe = status == PROBE
+    if north_limit is not None:
+        status[is_probe & np.broadcast_to(y_hi > north_limit,
+                                          status.shape)] = SCRIBE
+    status[is_probe & ~within_flats(flat_inner)] = FLAT_EXCL
+    status[~within_flats(edge)] = FLAT
+    status[~on_wafer] = OFF_WAFER
+    return status
+
+
+def _classify_substrate(die_xy, substrate, center_offset, excl, flat_excl,
+                        north_limit, street_xy):
+    """ Classify on a ``geometry.Substrate``. See ``classify``. """
+    die_x, die_y = die_xy
+    pitch_x = die_x + street_xy[0]
+    pitch_y = die_y + street_xy[1]
+    extent_x, extent_y = substrate.extent
+    frac_x = _offset_fraction(center_offset[0], pitch_x)
+    frac_y = _offset_fraction(center_offset[1], pitch_y)
+
+    x_centers, center_x = grid_axis(extent_x, pitch_x, frac_x)
+    y_centers, center_y = grid_axis(extent_y, pitch_y, frac_y)
+
+    # Rows count down from the top of the wafer.
+    y_centers = y_centers[::-1]
+    center_y = len(y_centers) - 1 - center_y
+
+    status = _substrate_status(x_centers[None, :], y_centers[:, None],
+                               die_x / 2, die_y / 2, substrate, excl,
+                               flat_excl, north_limit)
+    return DieMap(status, x_centers, y_centers, die_xy, (center_x, center_y),
+                  tuple(center_offset), tuple(street_xy))
+
+
+def _holds_point(x_centers, y_centers, half_x, half_y, point, rotation):
+    """ Whether die bodies at grid centers hold a point on the wafer """
+    # Rotate the point into the grid instead of every die onto the wafer.
+    px, py = np.dot(rotation_matrix(rotation).T, point)
+    return ((np.abs(x_centers - px) <= half_x)
+            & (np.abs(y_centers - py) <= half_y))
+
+
+def _rotated_status(x_centers, y_centers, half_x, half_y, substrate, excl,
+                    flat_excl, north_limit, rotation):
+    """
+    Classify die of a rotated grid, at grid-frame centers, from their
+    corners on the wafer. Corners are exact for convex outlines and flats;
+    notches also check their tip.
+    """
+    x_centers, y_centers = np.broadcast_arrays(x_centers, y_centers)
+    corner_x, corner_y = _rotated_corners(x_centers, y_centers, half_x,
+                                          half_y, rotation)
+    outline = substrate.outline_distance(corner_x, corner_y)
+    flat = substrate.flat_distance(corner_x, corner_y).min(axis=0)
+
+    if exclusion.is_profile(excl):
+        inside = excl.die_inside(x_centers, y_centers, half_x, half_y,
+                                 substrate.outline_distance, rotation)
+        tip_inset = excl.min_width
+    else:
+        inside = outline.min(axis=0) >= excl
+        tip_inset = excl
+    on_wafer = outline.min(axis=0) >= 0
+    for point in substrate.notch_tips():
+        on_wafer &= ~_holds_point(x_centers, y_centers, half_x, half_y,
+                                  point, rotation)
+    for point in substrate.notch_tips(tip_inset):
+        inside &= ~_holds_point(x_centers, y_centers, half_x, half_y, point,
+                                rotation)
+
+    status = np.where(inside, PROBE, EXCL).astype(np.int8)
+    is_probe = status == PROBE
+    if north_limit is not None:
+        status[is_probe & (corner_y.max(axis=0) > north_limit)] = SCRIBE
+    status[is_probe & (flat < flat_excl)] = FLAT_EXCL
+    status[flat < 0] = FLAT
+    status[~on_wafer] = OFF_WAFER
+    return status
+
+
+def _classify_rotated(die_xy, dia, center_offset, excl, flat_excl,
+                      north_limit, street_xy, rotation):
+    """ Classify a rotated die grid. See ``classify``. """
+    substrate = geometry.as_substrate(dia)
+    die_x, die_y = die_xy
+    pitch_x = die_x + street_xy[0]
+    pitch_y = die_y + street_xy[1]
+    frac_x = _offset_fraction(center_offset[0], pitch_x)
+    frac_y = _offset_fraction(center_offset[1], pitch_y)
+
+    # The substrate's bounding box, seen from the grid.
+    theta = math.radians(rotation)
+    cos, sin = abs(math.cos(theta)), abs(math.sin(theta))
+    extent_x, extent_y = substrate.extent
+    x_centers, center_x = grid_axis(cos * extent_x + sin * extent_y,
+                                    pitch_x, frac_x)
+    y_centers, center_y = grid_axis(sin * extent_x + cos * extent_y,
+                                    pitch_y, frac_y)
+
+    # Rows count down from the top of the grid.
+    y_centers = y_centers[::-1]
+    center_y = len(y_centers) - 1 - center_y
+
+    status = _rotated_status(x_centers[None, :], y_centers[:, None],
+                             die_x / 2, die_y / 2, substrate, excl,
+                             flat_excl, north_limit, rotation)
+    return DieMap(status, x_centers, y_centers, die_xy, (center_x, center_y),
+                  tuple(center_offset), tuple(street_xy), rotation=rotation)
+
+
+def classify(die_xy, dia, center_offset, excl, flat_excl, north_limit=None,
+             symmetry=True, units=None, street_xy=(0, 0), fields=False,
+             keepouts=(), rotation=0):
+    """
+    Classify every die on the wafer.
+
+    Same priority as ``gdw.gdw``: off the wafer, then wafer flat, then edge
+    exclusion, then flat exclusion, then top-side scribe exclusion. Die
+    that would otherwise be probed but touch a keep-out zone are
+    ``KEEPOUT``.
+
+    Parameters:
+    -----------
+    die_xy : tuple of floats
+        The die body size in mm.
+    dia : int or float or ``geometry.Substrate``
+        The wafer diameter in mm, which gets the SEMI primary flat if there
+        is one, or any other substrate geometry.
+    center_offset : tuple
+        The X and Y grid offsets. Each is "odd" (a die is centered on the
+        wafer), "even" (a grid corner is on the wafer center) or the
+        location in mm of a die center relative to the wafer center.
+    excl : float or ``exclusion.ExclusionProfile``
+        The edge exclusion width in mm, or a width that varies with angle.
+        A die is inside a profile if each of its corners is.
+    flat_excl : float
+        The flat exclusion width in mm.
+    north_limit : float, optional
+        The Y coordinate (mm) of the top-side scribe exclusion. Die whose
+        top edge is above this are excluded. ``None`` disables it.
+    symmetry : bool, optional
+        If ``True`` (the default), only compute the fundamental region of
+        symmetric grids. ``False`` forces the full computation.
+    units : str, optional
+        ``None`` (the default) classifies in float mm. ``"um"`` or ``"nm"``
+        rounds every input to that resolution and classifies with exact
+        int64 math, so die on a boundary land the same way on every
+        machine and for every grid shift. Not supported with an exclusion
+        profile.
+    street_xy : tuple of floats, optional
+        The street (scribe lane) width in mm. Die are stepped at
+        ``die_xy + street_xy`` but only the die body is tested against the
+        exclusions. Defaults to no street.
+    fields : bool, optional
+        If ``True``, also compute ``DieMap.fields``. See ``die_fields``.
+    keepouts : iterable of ``keepout.CircleZone`` or ``keepout.PolygonZone``,
+               optional
+        Keep-out zones, in mm relative to the wafer center.
+    rotation : float, optional
+        The angle of the die grid in degrees, counterclockwise relative to
+        the wafer flat or notch. ``center_offset`` is then measured along
+        the grid axes. Not supported with ``units``.
+
+    Returns:
+    --------
+    die_map : ``DieMap``
+    """
+    if units is not None and exclusion.is_profile(excl):
+        raise ValueError("units are not supported with an exclusion profile")
+    if rotation:
+        if units is not None:
+            raise ValueError("units are not supported with a grid rotation")
+        die_map = _classify_rotated(die_xy, dia, center_offset, excl,
+                                    flat_excl, north_limit, street_xy,
+                                    rotation)
+    elif isinstance(dia, geometry.Substrate):
+        if units is not None:
+            raise ValueError("units are only supported for a wafer diameter")
+        die_map = _classify_substrate(die_xy, dia, center_offset, excl,
+                                      flat_excl, north_limit, street_xy)
+    elif units is None:
+        die_map = _classify_float(die_xy, dia, center_offset, excl,
+                                  flat_excl, north_limit, symmetry,
+                                  street_xy)
+    else:
+        try:
+            scale = UNIT_SCALES[units]
+        except KeyError:
+            raise ValueError("units must be one of {}".format(
+                sorted(UNIT_SCALES)))
+        die_map = _classify_fixed(die_xy, dia, center_offset, excl,
+                                  flat_excl, north_limit, symmetry,
+                                  street_xy, scale)
+    if keepouts:
+        if rotation:
+            # Zones are on the wafer, so rotate them onto the grid.
+            keepouts = [zone.rotated(-rotation) for zone in keepouts]
+        mask = keepout.grid_mask(die_map.x_centers, die_map.y_centers,
+                                 die_map.die_xy, keepouts)
+        die_map.status[mask & (die_map.status == PROBE)] = KEEPOUT
+    if fields:
+        _add_fields(die_map, dia, excl, north_limit)
+    return die_map
+
+
+def max_gdw(die_xy, dia, excl, flat_excl, north_limit=None, symmetry=True,
+            units=None, street_xy=(0, 0), fields=False, keepouts=(),
+            rotation=0):
+    """
+    Classify the wafer for each of the four odd/even grid shifts and return
+    the one with the most probe-able die.
+
+    Ties go to the first shift in ``CENTER_TYPES``, same as ``gdw.maxGDW``.
+    ``rotation`` may also be a sequence of grid angles (for example
+    ``numpy.linspace(-1, 1, 9)``), in which case every shift is tried at
+    every angle and ties go to the first angle. See ``classify`` for a
+    description of the other parameters.
+    """
+    best = None
+    for angle in np.atleast_1d(rotation).tolist():
+        for center_type in CENTER_TYPES:
+            die_map = classify(die_xy, dia, center_type, excl, flat_excl,
+                               north_limit, symmetry, units, street_xy,
+                               keepouts=keepouts, rotation=angle)
+            if best is None or die_map.gdw > best.gdw:
+                best = die_map
+    # Only the winner needs fields.
+    if fields:
+        _add_fields(best, dia, excl, north_limit)
+    return best
+
+
+def probe_half_widths(y_centers, die_xy, dia, excl, flat_excl,
+                      north_limit=None):
+    """
+    Return how far from x = 0 a die center may be and still be probe-able,
+    for die centered at each of ``y_centers``.
+
+    This is the per-row chord of the edge exclusion circle less half a die.
+    ``die_xy`` is the die body size; the street does not matter here.
+    Rows that are lost to the flat, flat exclusion or top-side scribe limit
+    get ``-inf``. ``y_centers`` may be any shape.
+
+    See ``classify`` for a description of the other parameters. Use
+    ``probe_intervals`` for a ``geometry.Substrate``.
+    """
+    geometry.require_diameter(dia, "probe_half_widths")
+    half_x = die_xy[0] / 2
+    half_y = die_xy[1] / 2
+    excl_rad = max(dia / 2 - excl, 0)
+    chord_sq = excl_rad**2 - (np.abs(y_centers) + half_y)**2
+    widths = np.sqrt(np.maximum(chord_sq, 0)) - half_x
+
+    flat_y = flat_location(dia)
+    bottom = y_centers - half_y
+    valid = ((chord_sq >= 0)
+             & (bottom >= flat_y)
+             & (bottom >= flat_y + flat_excl))
+    if north_limit is not None:
+        valid &= y_centers + half_y <= north_limit
+    return np.where(valid, widths, -np.inf)
+
+
+def die_status(x_centers, y_centers, die_xy, dia, excl, flat_excl,
+               north_limit=None, keepouts=(), rotation=0):
+    """
+    Classify die at arbitrary centers rather than on a full grid.
+
+    ``x_centers`` and ``y_centers`` (mm) are broadcast together, so this is
+    useful for classifying only a subset of a grid. The status codes and
+    priority are the same as ``classify``. For a rotated grid the centers
+    are in the grid frame.
+
+    See ``classify`` for a description of the other parameters.
+    """
+    half_x = die_xy[0] / 2
+    half_y = die_xy[1] / 2
+    if rotation:
+        status = _rotated_status(x_centers, y_centers, half_x, half_y,
+                                 geometry.as_substrate(dia), excl, flat_excl,
+                                 north_limit, rotation)
+        if keepouts:
+            keepouts = [zone.rotated(-rotation) for zone in keepouts]
+    elif isinstance(dia, geometry.Substrate):
+        x_centers, y_centers = np.broadcast_arrays(x_centers, y_centers)
+        status = _substrate_status(x_centers, y_centers, half_x, half_y, dia,
+                                   excl, flat_excl, north_limit)
+    else:
+        status = _circle_status(x_centers, y_centers, half_x, half_y, dia,
+                                excl, flat_excl, north_limit)
+    if keepouts:
+        mask = keepout.die_mask(x_centers, y_centers, die_xy, keepouts)
+        status[mask & (status == PROBE)] = KEEPOUT
+    return status
+
+
+def _circle_status(x_centers, y_centers, half_x, half_y, dia, excl,
+                   flat_excl, north_limit):
+    """ The round wafer part of ``die_status``. """
+    rad = dia / 2
+    excl_rad = max(rad - exclusion.min_width(excl), 0)
+    x_centers, y_centers = np.broadcast_arrays(x_centers, y_centers)
+    far_sq = (np.abs(x_centers) + half_x)**2 + (np.abs(y_centers) + half_y)**2
+
+    status = np.where(far_sq > excl_rad**2, EXCL, PROBE).astype(np.int8)
+    status[far_sq > rad**2] = OFF_WAFER
+    if exclusion.is_profile(excl):
+        _circle_profile_status(status, x_centers, y_centers, half_x, half_y,
+                               rad, excl)
+
+    flat_y = flat_location(dia)
+    bottom = y_centers - half_y
+    on_wafer = status != OFF_WAFER
+    is_probe = status == PROBE
+    if north_limit is not None:
+        status[is_probe & (y_centers + half_y > north_limit)] = SCRIBE
+    status[is_probe & (bottom < flat_y + flat_excl)] = FLAT_EXCL
+    status[on_wafer & (bottom < flat_y)] = FLAT
+    return status
+
+
+def _apply_profile(status, x_centers, y_centers, half_x, half_y, profile,
+                   distance, near):
+    """
+    Exclude the ``near`` die that reach inside an exclusion profile.
+    ``distance`` measures from the substrate edge. Modifies ``status`` in
+    place.
+    """
+    if not near.any():
+        return
+    x_centers, y_centers = np.broadcast_arrays(x_centers, y_centers)
+    inside = profile.die_inside(x_centers[near], y_centers[near],
+                                half_x, half_y, distance)
+    status[near] = np.where(inside, PROBE, EXCL)
+
+
+def _circle_profile_status(status, x_centers, y_centers, half_x, half_y, rad,
+                           profile):
+    """
+    Apply an exclusion profile to a round wafer status that was classified
+    with the profile's narrowest width.
+    """
+    far_sq = (np.abs(x_centers) + half_x)**2 + (np.abs(y_centers) + half_y)**2
+    widest_rad = max(rad - profile.max_width, 0)
+    near = (status == PROBE) & (far_sq > widest_rad**2)
+    _apply_profile(status, x_centers, y_centers, half_x, half_y, profile,
+                   lambda x, y: rad - np.hypot(x, y), near)
+
+
+def _offset_mm(center_type, pitch):
+    """
+    Convert an "odd", "even" or mm offset (scalar or array) to a mm offset
+    in ``[0, pitch)``.
+    """
+    if isinstance(center_type, str):
+        return _offset_fraction(center_type, 1) * pitch
+    return np.asarray(center_type, dtype=float) % pitch
+
+
+def probe_intervals(y_centers, die_xy, substrate, excl, flat_excl,
+                    north_limit=None):
+    """
+    The ``geometry.Substrate`` version of ``probe_half_widths``.
+
+    Returns:
+    --------
+    lo, hi : ``numpy.ndarray``
+        The range of probe-able die centers for each row. Empty rows have
+        ``lo > hi``.
+    gap_lo, gap_hi : ``numpy.ndarray``
+        Die centers in this closed range are not probe-able (a notch).
+    """
+    half_x = die_xy[0] / 2
+    half_y = die_xy[1] / 2
+    y_lo, y_hi = y_centers - half_y, y_centers + half_y
+    lo, hi, gap_lo, gap_hi, _, _ = substrate.chord_table(y_lo, y_hi, excl)
+    _, _, _, _, flat_lo, flat_hi = substrate.chord_table(y_lo, y_hi,
+                                                         flat_excl)
+    lo = np.maximum(lo, flat_lo) + half_x
+    hi = np.minimum(hi, flat_hi) - half_x
+    # Rows that cross the top-side scribe limit have no probe die.
+    if north_limit is not None:
+        hi = np.where(y_hi <= north_limit, hi, -np.inf)
+    return lo, hi, gap_lo - half_x, gap_hi + half_x
+
+
+def _count_in_range(lo, hi, offset, pitch):
+    """ Count ``k * pitch + offset`` in ``[lo, hi]``, or 0 if empty. """
+    with np.errstate(invalid='ignore'):
+        count = (np.floor((hi - offset) / pitch)
+                 - np.ceil((lo - offset) / pitch) + 1)
+    return np.where(np.isfinite(count) & (hi >= lo),
+                    np.maximum(count, 0), 0)
+
+
+def count_gdw(die_xy, dia, center_offset, excl, flat_excl, north_limit=None,
+              street_xy=(0, 0)):
+    """
+    Count probe-able die without building a die map.
+
+    Each row's probe-able die are counted directly from its chord, so the
+    cost is per row rather than per die. Die sizes, street widths and mm
+    offsets may be arrays, which are broadcast together so that many
+    candidate grids are counted in one call.
+
+    See ``classify`` for a description of the parameters. Exclusion
+    profiles need the full die map, so ``excl`` must be a single width.
+
+    Returns:
+    --------
+    gdw : int or ``numpy.ndarray`` of int
+        The GDW, with the broadcast shape of the die sizes and offsets.
+    """
+    if exclusion.is_profile(excl):
+        raise ValueError("count_gdw needs a uniform edge exclusion; use"
+                         " classify for an exclusion profile")
+    die_x, die_y, street_x, street_y = np.broadcast_arrays(
+        np.asarray(die_xy[0], dtype=float),
+        np.asarray(die_xy[1], dtype=float),
+        np.asarray(street_xy[0], dtype=float),
+        np.asarray(street_xy[1], dtype=float))
+    pitch_x = die_x + street_x
+    pitch_y = die_y + street_y
+    offset_x = _offset_mm(center_offset[0], pitch_x)
+    offset_y = _offset_mm(center_offset[1], pitch_y)
+    (die_x, die_y, pitch_x, pitch_y,
+     offset_x, offset_y) = np.broadcast_arrays(die_x, die_y, pitch_x, pitch_y,
+                                               offset_x, offset_y)
+
+    # Enough rows to cover the wafer for the smallest pitch, on a new axis.
+    substrate = dia if isinstance(dia, geometry.Substrate) else None
+    extent_y = substrate.extent[1] if substrate else dia / 2
+    n_half = int(math.ceil(extent_y / pitch_y.min())) + 1
+    k = np.arange(-n_half - 1, n_half + 1)
+    pitch_x = pitch_x[..., None]
+    y_centers = k * pitch_y[..., None] + offset_y[..., None]
+    if substrate is not None:
+        lo, hi, gap_lo, gap_hi = probe_intervals(
+            y_centers, (die_x[..., None], die_y[..., None]), substrate,
+            excl, flat_excl, north_limit)
+        offset_x = offset_x[..., None]
+        per_row = (_count_in_range(lo, hi, offset_x, pitch_x)
+                   - _count_in_range(np.maximum(lo, gap_lo),
+                                     np.minimum(hi, gap_hi),
+                                     offset_x, pitch_x))
+        gdw = per_row.sum(axis=-1).astype(int)
+        return gdw if gdw.ndim else int(gdw)
+
+    widths = probe_half_widths(y_centers, (die_x[..., None], die_y[..., None]),
+                               dia, excl, flat_excl, north_limit)
+
+    # Die centers at k * pitch + offset with |center| <= width.
+    valid = widths >= 0
+    widths = np.where(valid, widths, 0)
+    offset_x = offset_x[..., None]
+    per_row = (np.floor((widths - offset_x) / pitch_x)
+               + np.floor((widths + offset_x) / pitch_x) + 1)
+    gdw = np.where(valid, per_row, 0).sum(axis=-1).astype(int)
+    return gdw if gdw.ndim else int(gdw)
+
+
+def count_max_gdw(die_xy, dia, excl, flat_excl, north_limit=None,
+                  street_xy=(0, 0)):
+    """
+    Count-only version of ``max_gdw``.
+
+    Returns:
+    --------
+    gdw : int or ``numpy.ndarray`` of int
+        The best GDW of the four odd/even shifts.
+    shift : int or ``numpy.ndarray`` of int
+        The index into ``CENTER_TYPES`` of the best shift. Ties go to the
+        first, same as ``max_gdw``.
+    """
+    counts = np.stack([count_gdw(die_xy, dia, center_type, excl, flat_excl,
+                                 north_limit, street_xy)
+                       for center_type in CENTER_TYPES])
+    shift = np.argmax(counts, axis=0)
+    gdw = np.max(counts, axis=0)
+    if gdw.ndim:
+        return gdw, shift
+    return int(gdw), int(shift)
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              exclusion.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             Angle-dependent edge exclusion.
+
+                    Real edge exclusion is not uniform: it is wider at the
+                    notch or flat, under clamp ring fingers and at the laser
+                    ID. An ``ExclusionProfile`` gives the exclusion width as
+                    a periodic, piecewise-linear function of angle. Repeating
+                    an angle makes a step.
+
+                    The engine first classifies with the narrowest width,
+                    which is exact for every die that is still far enough
+                    from the edge to clear the widest width. Only the die
+                    in the band between the two are checked against the
+                    profile, so the cost stays close to that of a uniform
+                    exclusion. A die is checked at its corners and where
+                    each knot angle leaves the die, so a sector narrower
+                    than a die is not missed. That is exact for steps on a
+                    convex outline; a sloped segment is only checked at
+                    those points.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+
+# Third Party
+import numpy as np
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+class ExclusionProfile(object):
+    """
+    Edge exclusion width versus angle.
+
+    Parameters:
+    -----------
+    angles : array-like of float
+        The angles in degrees, counterclockwise from +X, the same as
+        ``geometry.Flat``. The SEMI flat or notch is at 270. Angles wrap
+        around, and an angle that is given twice is a step from the first
+        width to the second.
+    widths : array-like of float
+        The exclusion width in mm at each angle. Widths are interpolated
+        linearly between angles.
+    """
+    def __init__(self, angles, widths):
+        angles = np.mod(np.asarray(angles, dtype=float).ravel(), 360)
+        widths = np.asarray(widths, dtype=float).ravel()
+        if len(angles) == 0 or len(angles) != len(widths):
+            raise ValueError("angles and widths must be the same, non-zero,"
+                             " length")
+        if (widths < 0).any():
+            raise ValueError("widths must not be negative")
+        # A stable sort keeps the order of steps.
+        order = np.argsort(angles, kind='mergesort')
+        self.angles = angles[order]
+        self.widths = widths[order]
+        # Wrap one knot around each end so every angle has a neighbour on
+        # both sides.
+        self._knots = np.concatenate(([self.angles[-1] - 360], self.angles,
+                                      [self.angles[0] + 360]))
+        self._values = np.concatenate(([self.widths[-1]], self.widths,
+                                       [self.widths[0]]))
+        # Steps have zero span and are never interpolated across.
+        span = np.diff(self._knots)
+        self._slopes = np.diff(self._values) / np.where(span > 0, span, 1)
+        # The widest width at each knot angle, which is the side of a step
+        # that a die straddling the knot has to clear.
+        self._knot_angles = np.unique(self.angles)
+        self._knot_widths = np.array([self.widths[self.angles == angle].max()
+                                      for angle in self._knot_angles])
+
+    def __repr__(self):
+        return "ExclusionProfile({}, {})".format(self.angles.tolist(),
+                                                 self.widths.tolist())
+
+    def to_dict(self):
+        """ Return the profile as a JSON serializable dict """
+        return {'angles': self.angles.tolist(),
+                'widths': self.widths.tolist()}
+
+    @classmethod
+    def from_dict(cls, params):
+        """ The inverse of ``to_dict`` """
+        return cls(params['angles'], params['widths'])
+
+    @property
+    def min_width(self):
+        """ The narrowest exclusion width in mm """
+        return float(self.widths.min())
+
+    @property
+    def max_width(self):
+        """ The widest exclusion width in mm """
+        return float(self.widths.max())
+
+    def width_at(self, angle):
+        """ Return the exclusion width (mm) at angles in degrees """
+        angle = np.mod(np.asarray(angle, dtype=float), 360)
+        # side='right' skips past both knots of a step. The wrapped knots
+        # keep the interval in range, except for an angle that rounds to
+        # exactly 360.
+        lo = np.searchsorted(self._knots, angle, side='right') - 1
+        lo = np.minimum(lo, len(self._slopes) - 1)
+        return self._values[lo] + (angle - self._knots[lo]) * self._slopes[lo]
+
+    def width_xy(self, x, y):
+        """ Return the exclusion width (mm) in the direction of points """
+        return self.width_at(np.degrees(np.arctan2(y, x)))
+
+    def die_inside(self, x, y, half_x, half_y, distance, rotation=0):
+        """
+        Return whether die centered at (x, y) are at least the exclusion
+        width from the edge, checked at their four corners and where each
+        knot angle leaves the die.
+
+        Parameters:
+        -----------
+        x, y : array-like of float
+            The die centers in the grid frame.
+        half_x, half_y : float
+            Half the die body size.
+        distance : function
+            A function of wafer (x, y) giving the distance from the edge,
+            positive inside, such as ``Substrate.outline_distance``.
+        rotation : float, optional
+            The grid rotation in degrees counterclockwise, as for
+            ``engine.rotation_matrix``.
+        """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float),
+                                   np.asarray(y, dtype=float))
+        theta = np.radians(rotation)
+        cos, sin = np.cos(theta), np.sin(theta)
+        inside = np.ones(x.shape, dtype=bool)
+        for dx in (-half_x, half_x):
+            for dy in (-half_y, half_y):
+                corner_x = (x + dx) * cos - (y + dy) * sin
+                corner_y = (x + dx) * sin + (y + dy) * cos
+                inside &= (distance(corner_x, corner_y)
+                           >= self.width_xy(corner_x, corner_y))
+
+        for angle, width in zip(self._knot_angles, self._knot_widths):
+            # Where the ray from the center at ``angle`` leaves the die,
+            # found in the grid frame with the slab method.
+            ray = np.radians(angle)
+            ray_x, ray_y = np.cos(ray - theta), np.sin(ray - theta)
+            t_in = np.zeros(x.shape)
+            t_out = np.full(x.shape, np.inf)
+            for center, half, step in ((x, half_x, ray_x),
+                                       (y, half_y, ray_y)):
+                if abs(step) < 1e-12:
+                    t_out[np.abs(center) > half] = -np.inf
+                    continue
+                t_lo = (center - half) / step
+                t_hi = (center + half) / step
+                t_in = np.maximum(t_in, np.minimum(t_lo, t_hi))
+                t_out = np.minimum(t_out, np.maximum(t_lo, t_hi))
+            hit = t_out >= t_in
+            t_out = t_out[hit]
+            inside[hit] &= distance(t_out * np.cos(ray),
+                                    t_out * np.sin(ray)) >= width
+        return inside
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def step_profile(default, segments):
+    """
+    Return a piecewise-constant profile.
+
+    Parameters:
+    -----------
+    default : float
+        The exclusion width in mm outside every segment.
+    segments : iterable of (start, stop, width)
+        Angle ranges in degrees, counterclockwise from ``start`` to
+        ``stop``, that have a different width. Segments should not
+        overlap.
+
+    Returns:
+    --------
+    profile : ``ExclusionProfile``
+    """
+    angles = []
+    widths = []
+    for start, stop, width in segments:
+        angles += [start, start, stop, stop]
+        widths += [default, width, width, default]
+    if not angles:
+        angles, widths = [0], [default]
+    return ExclusionProfile(angles, widths)
+
+
+def is_profile(excl):
+    """ Return whether ``excl`` is an ``ExclusionProfile`` """
+    return isinstance(excl, ExclusionProfile)
+
+
+def min_width(excl):
+    """ The narrowest width of a profile, or a uniform width unchanged """
+    return excl.min_width if is_profile(excl) else excl
+
+
+def read_profile(fname):
+    """
+    Read an exclusion profile from a text file.
+
+    Each line is ``angle,width`` with the angle in degrees counterclockwise
+    from +X and the width in mm. Repeat an angle to make a step. Blank lines
+    and lines starting with ``#`` are ignored.
+    """
+    angles = []
+    widths = []
+    with open(fname) as openf:
+        for line_no, line in enumerate(openf, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            items = line.split(",")
+            try:
+                if len(items) != 2:
+                    raise ValueError("expected 'angle,width'")
+                angle, width = [float(item) for item in items]
+            except ValueError as err:
+                raise ValueError("Line {}: {}".format(line_no, err))
+            angles.append(angle)
+            widths.append(width)
+    return ExclusionProfile(angles, widths)
@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              geometry.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             Substrate geometry backends.
+
+                    A substrate describes its outline and flats with
+                    vectorized functions. The engine only needs per-row
+                    chords: for a band of rows, the X interval a die body
+                    must lie within to be inside the outline (less an
+                    inset, such as the edge exclusion) and inside every
+                    flat. A notch is a blocked X interval inside that chord.
+
+                    Chord tables are cached per substrate, so sweeps that
+                    reuse the same rows (offset landscapes, max_gdw) only
+                    compute them once.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import collections
+import math
+
+# Third Party
+import numpy as np
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+# Primary flat lengths (mm), defined by SEMI M1-0302
+FLAT_LENGTHS = {50: 15.88, 75: 22.22, 100: 32.5, 125: 42.5, 150: 57.5}
+
+# Secondary flat lengths (mm), defined by SEMI M1-0302
+SECONDARY_FLAT_LENGTHS = {50: 8.0, 75: 11.18, 100: 18.0, 125: 27.5,
+                          150: 37.5}
+
+# SEMI notch depth (mm) and included angle (degrees) for 200 and 300 mm.
+NOTCH_DEPTH = 1.0
+NOTCH_ANGLE = 90.0
+
+# The number of chord tables each substrate keeps.
+CHORD_CACHE_SIZE = 64
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def quarter_disk_area(x, y, rad):
+    """
+    Return the signed area of the disk of radius ``rad`` between the axes
+    and the point (``x``, ``y``).
+
+    The area is odd in both ``x`` and ``y``, so the area of any rectangle
+    inside the disk follows from its four corners.
+    """
+    sign = np.sign(x) * np.sign(y)
+    x = np.minimum(np.abs(x), rad)
+    y = np.minimum(np.abs(y), rad)
+    # Up to x_cross the disk is taller than y; after it, it's the arc.
+    x_cross = np.minimum(x, np.sqrt(rad**2 - y**2))
+
+    def arc_area(u):
+        """ Area under the arc from 0 to u """
+        return (u * np.sqrt(rad**2 - u**2)
+                + rad**2 * np.arcsin(u / rad)) / 2
+
+    return sign * (y * x_cross + arc_area(x) - arc_area(x_cross))
+
+
+def _ray_distance(x, y, x0, y0, dx, dy):
+    """
+    Return the distance from points to the ray from (x0, y0) along the unit
+    vector (dx, dy).
+    """
+    t = np.maximum((x - x0) * dx + (y - y0) * dy, 0)
+    return np.hypot(x - x0 - t * dx, y - y0 - t * dy)
+
+
+def _flat_normal(angle):
+    """
+    Return the (cos, sin) of a flat angle, rounded so that flats on an axis
+    are exactly on it.
+    """
+    return (round(math.cos(math.radians(angle)), 12),
+            round(math.sin(math.radians(angle)), 12))
+
+
+def as_substrate(dia):
+    """
+    Return ``dia`` if it is already a ``Substrate``, otherwise a
+    ``CircleFlat`` of that diameter with the SEMI primary flat (if any).
+    """
+    if isinstance(dia, Substrate):
+        return dia
+    return CircleFlat(dia)
+
+
+def require_diameter(dia, name):
+    """
+    Return ``dia``, or raise a ``TypeError`` if it is a ``Substrate``.
+
+    For functions that only handle round wafers; ``name`` is the function
+    named in the error.
+    """
+    if isinstance(dia, Substrate):
+        raise TypeError("{} takes a wafer diameter, not a {}"
+                        .format(name, type(dia).__name__))
+    return dia
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+# A flat: ``angle`` is the direction (degrees, counterclockwise from +X)
+# from the wafer center to the flat, and ``distance`` how far away it is.
+Flat = collections.namedtuple("Flat", ["angle", "distance"])
+
+
+class Substrate(object):
+    """
+    Base class for substrate geometries, centered on (0, 0).
+
+    Subclasses implement ``extent``, ``outline_chord``, ``inside_outline``
+    and ``outline_distance``, and may add ``flats``. Every function is
+    vectorized and broadcasts its arguments.
+
+    Status priority is the same as for a flatted wafer: a die that is not
+    inside the outline is off the substrate; one that crosses a flat is a
+    flat die, even though it is inside the outline.
+    """
+    flats = ()
+
+    def __init__(self):
+        self._chord_cache = collections.OrderedDict()
+
+    @property
+    def extent(self):
+        """ The (x, y) half-size of the bounding box in mm """
+        raise NotImplementedError
+
+    def outline_chord(self, y_lo, y_hi, inset=0):
+        """
+        Return the chord of the outline for a band of rows.
+
+        A rectangle spanning ``y_lo`` to ``y_hi`` is inside the outline
+        shrunk by ``inset`` if its X span is within ``[lo, hi]`` and does
+        not touch ``[gap_lo, gap_hi]``.
+
+        Returns:
+        --------
+        lo, hi, gap_lo, gap_hi : ``numpy.ndarray``
+            Empty bands have ``lo > hi``, and no gap is ``gap_lo > gap_hi``.
+        """
+        raise NotImplementedError
+
+    def inside_outline(self, x, y):
+        """ Return whether points are inside the outline """
+        raise NotImplementedError
+
+    def outline_distance(self, x, y):
+        """ Return the distance from points to the outline, +ve inside """
+        raise NotImplementedError
+
+    def flat_chord(self, y_lo, y_hi, inset=0):
+        """
+        Return the ``(lo, hi)`` X span a rectangle spanning ``y_lo`` to
+        ``y_hi`` must lie within to be at least ``inset`` from every flat.
+        """
+        y_lo, y_hi = np.broadcast_arrays(np.asarray(y_lo, dtype=float),
+                                         np.asarray(y_hi, dtype=float))
+        lo = np.full(y_lo.shape, -np.inf)
+        hi = np.full(y_lo.shape, np.inf)
+        for angle, distance in self.flats:
+            cos, sin = _flat_normal(angle)
+            # Inside the flat is x * cos + y * sin <= distance - inset, for
+            # the worst corner.
+            limit = distance - inset - np.maximum(y_lo * sin, y_hi * sin)
+            if cos > 0:
+                hi = np.minimum(hi, limit / cos)
+            elif cos < 0:
+                lo = np.maximum(lo, limit / cos)
+            else:
+                lo = np.where(limit >= 0, lo, np.inf)
+                hi = np.where(limit >= 0, hi, -np.inf)
+        return lo, hi
+
+    def flat_distance(self, x, y):
+        """
+        Return the distance from points to the nearest flat, positive
+        inside. ``inf`` if there are no flats.
+        """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float),
+                                   np.asarray(y, dtype=float))
+        dist = np.full(x.shape, np.inf)
+        for angle, distance in self.flats:
+            cos, sin = _flat_normal(angle)
+            dist = np.minimum(dist, distance - (x * cos + y * sin))
+        return dist
+
+    def inside(self, x, y):
+        """ Return whether points are on the substrate """
+        return self.inside_outline(x, y) & (self.flat_distance(x, y) >= 0)
+
+    def distance(self, x, y):
+        """ Return the distance from points to the boundary, +ve inside """
+        return np.minimum(self.outline_distance(x, y),
+                          self.flat_distance(x, y))
+
+    def excl_area(self, x_lo, x_hi, y_lo, y_hi, inset):
+        """
+        Return the area of rectangles that is inside the outline shrunk
+        by ``inset``. Ignores flats and notches.
+        """
+        raise NotImplementedError
+
+    def notch_tips(self, inset=0):
+        """
+        Return the (x, y) points of the outline, shrunk by ``inset``, that
+        point into the substrate. A rectangle with every corner inside the
+        outline is only inside it if it also holds none of these.
+        """
+        return ()
+
+    def chord_table(self, y_lo, y_hi, inset=0):
+        """
+        Return ``outline_chord`` and ``flat_chord`` for a band of rows as
+        ``(lo, hi, gap_lo, gap_hi, flat_lo, flat_hi)``, cached on the
+        rows and inset.
+        """
+        y_lo, y_hi = np.broadcast_arrays(np.asarray(y_lo, dtype=float),
+                                         np.asarray(y_hi, dtype=float))
+        key = (y_lo.shape, y_lo.tobytes(), y_hi.tobytes(), float(inset))
+        table = self._chord_cache.get(key)
+        if table is None:
+            table = (self.outline_chord(y_lo, y_hi, inset)
+                     + self.flat_chord(y_lo, y_hi, inset))
+            self._chord_cache[key] = table
+            if len(self._chord_cache) > CHORD_CACHE_SIZE:
+                self._chord_cache.popitem(last=False)
+        return table
+
+
+class Circle(Substrate):
+    """ A round wafer without flats or notches. """
+    def __init__(self, dia):
+        Substrate.__init__(self)
+        self.dia = dia
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, self.dia)
+
+    @property
+    def extent(self):
+        """ The (x, y) half-size of the bounding box in mm """
+        return self.dia / 2, self.dia / 2
+
+    def outline_chord(self, y_lo, y_hi, inset=0):
+        """ See ``Substrate.outline_chord``. """
+        rad = max(self.dia / 2 - inset, 0)
+        far_y = np.maximum(np.abs(y_lo), np.abs(y_hi))
+        chord_sq = rad**2 - far_y**2
+        half = np.where(chord_sq >= 0, np.sqrt(np.maximum(chord_sq, 0)),
+                        -np.inf)
+        no_gap = np.full(half.shape, np.inf)
+        return -half, half, no_gap, -no_gap
+
+    def inside_outline(self, x, y):
+        """ See ``Substrate.inside_outline``. """
+        return np.asarray(x)**2 + np.asarray(y)**2 <= (self.dia / 2)**2
+
+    def outline_distance(self, x, y):
+        """ See ``Substrate.outline_distance``. """
+        return self.dia / 2 - np.hypot(x, y)
+
+    def excl_area(self, x_lo, x_hi, y_lo, y_hi, inset):
+        """ See ``Substrate.excl_area``. """
+        # ``inset`` may vary per rectangle.
+        rad = self.dia / 2 - np.asarray(inset, dtype=float)
+        safe = np.where(rad > 0, rad, 1)
+        area = (quarter_disk_area(x_hi, y_hi, safe)
+                - quarter_disk_area(x_lo, y_hi, safe)
+                - quarter_disk_area(x_hi, y_lo, safe)
+                + quarter_disk_area(x_lo, y_lo, safe))
+        return np.where(rad > 0, area, 0)
+
+
+class CircleFlat(Circle):
+    """
+    A round wafer with one or more flats.
+
+    Parameters:
+    -----------
+    dia : float
+        The wafer diameter in mm.
+    flat_length : float, optional
+        The primary flat chord length in mm, at the bottom of the wafer.
+        Defaults to the SEMI length for ``dia``, or no flat. A wafer with
+        no flat is still limited at its bottom edge, as ``gdw.gdw`` does.
+    """
+    def __init__(self, dia, flat_length=None):
+        Circle.__init__(self, dia)
+        if flat_length is None:
+            flat_length = FLAT_LENGTHS.get(dia, 0)
+        self.flat_length = flat_length
+        self.flats = (self._flat(270, flat_length), )
+
+    def __repr__(self):
+        return "{}({}, {})".format(type(self).__name__, self.dia,
+                                   self.flat_length)
+
+    def _flat(self, angle, length):
+        """ Return the ``Flat`` with chord ``length`` at ``angle`` """
+        rad = self.dia / 2
+        return Flat(angle, math.sqrt(rad**2 - (length / 2)**2))
+
+
+class SecondaryFlat(CircleFlat):
+    """
+    A round wafer with a SEMI primary flat and a secondary flat.
+
+    Parameters:
+    -----------
+    dia : float
+        The wafer diameter in mm.
+    angle : float, optional
+        The angle of the secondary flat clockwise from the primary flat,
+        in degrees. SEMI uses 90 (p-type <100>), 180 (n-type <100>) and
+        45 (n-type <111>).
+    flat_length, secondary_length : float, optional
+        Default to the SEMI lengths for ``dia``.
+    """
+    def __init__(self, dia, angle=90, flat_length=None,
+                 secondary_length=None):
+        CircleFlat.__init__(self, dia, flat_length)
+        if secondary_length is None:
+            secondary_length = SECONDARY_FLAT_LENGTHS[dia]
+        self.angle = angle
+        self.secondary_length = secondary_length
+        self.flats += (self._flat((270 - angle) % 360, secondary_length), )
+
+    def __repr__(self):
+        return "{}({}, {})".format(type(self).__name__, self.dia,
+                                   self.angle)
+
+
+class CircleNotch(Circle):
+    """
+    A round wafer with a V notch at the bottom, as used on 200 and 300 mm
+    wafers.
+
+    Die that touch the notch are off the wafer, and die within the edge
+    exclusion of it are excluded. The notch grown by the edge exclusion is
+    taken as a V with the same angle, which slightly over-excludes near
+    the tip.
+
+    Parameters:
+    -----------
+    dia : float
+        The wafer diameter in mm.
+    depth : float, optional
+        How far the notch tip is from the wafer edge in mm.
+    angle : float, optional
+        The included angle of the notch in degrees.
+    """
+    def __init__(self, dia, depth=NOTCH_DEPTH, angle=NOTCH_ANGLE):
+        Circle.__init__(self, dia)
+        self.depth = depth
+        self.angle = angle
+        half = math.radians(angle / 2)
+        self._tip_y = -dia / 2 + depth
+        # The notch is y <= tip - |x| * slope.
+        self._slope = 1 / math.tan(half)
+        self._sin_half = math.sin(half)
+        self._cos_half = math.cos(half)
+
+    def __repr__(self):
+        return "{}({}, {}, {})".format(type(self).__name__, self.dia,
+                                       self.depth, self.angle)
+
+    def outline_chord(self, y_lo, y_hi, inset=0):
+        """ See ``Substrate.outline_chord``. """
+        lo, hi, _, _ = Circle.outline_chord(self, y_lo, y_hi, inset)
+        # Die with min |x| <= gap overlap the grown notch.
+        tip = self._tip_y + inset / self._sin_half
+        gap = (tip - np.asarray(y_lo, dtype=float)) / self._slope
+        gap_lo = np.where(gap >= 0, -gap, np.inf)
+        gap_hi = np.where(gap >= 0, gap, -np.inf)
+        return lo, hi, gap_lo, gap_hi
+
+    def notch_tips(self, inset=0):
+        """ See ``Substrate.notch_tips``. """
+        return ((0.0, self._tip_y + inset / self._sin_half), )
+
+    def inside_outline(self, x, y):
+        """ See ``Substrate.inside_outline``. """
+        in_notch = np.asarray(y) < self._tip_y - np.abs(x) * self._slope
+        return Circle.inside_outline(self, x, y) & ~in_notch
+
+    def outline_distance(self, x, y):
+        """ See ``Substrate.outline_distance``. """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float),
+                                   np.asarray(y, dtype=float))
+        # Distance to the two sides of the notch, measured from the tip.
+        notch = np.minimum(
+            _ray_distance(x, y, 0, self._tip_y,
+                          self._sin_half, -self._cos_half),
+            _ray_distance(x, y, 0, self._tip_y,
+                          -self._sin_half, -self._cos_half))
+        in_notch = y < self._tip_y - np.abs(x) * self._slope
+        notch = np.where(in_notch, -notch, notch)
+        return np.minimum(Circle.outline_distance(self, x, y), notch)
+
+
+class Panel(Substrate):
+    """
+    A rectangular panel, such as a fan-out panel, centered on (0, 0).
+
+    Parameters:
+    -----------
+    width, height : float
+        The panel size in mm.
+    """
+    def __init__(self, width, height):
+        Substrate.__init__(self)
+        self.width = width
+        self.height = height
+
+    def __repr__(self):
+        return "{}({}, {})".format(type(self).__name__, self.width,
+                                   self.height)
+
+    @property
+    def extent(self):
+        """ The (x, y) half-size of the bounding box in mm """
+        return self.width / 2, self.height / 2
+
+    def outline_chord(self, y_lo, y_hi, inset=0):
+        """ See ``Substrate.outline_chord``. """
+        half_x = self.width / 2 - inset
+        half_y = self.height / 2 - inset
+        y_lo, y_hi = np.broadcast_arrays(np.asarray(y_lo, dtype=float),
+                                         np.asarray(y_hi, dtype=float))
+        valid = (y_lo >= -half_y) & (y_hi <= half_y) & (half_x >= 0)
+        half = np.where(valid, half_x, -np.inf)
+        no_gap = np.full(half.shape, np.inf)
+        return -half, half, no_gap, -no_gap
+
+    def inside_outline(self, x, y):
+        """ See ``Substrate.inside_outline``. """
+        return ((np.abs(x) <= self.width / 2)
+                & (np.abs(y) <= self.height / 2))
+
+    def outline_distance(self, x, y):
+        """ See ``Substrate.outline_distance``. """
+        dx = np.abs(x) - self.width / 2
+        dy = np.abs(y) - self.height / 2
+        outside = np.hypot(np.maximum(dx, 0), np.maximum(dy, 0))
+        return np.where((dx <= 0) & (dy <= 0), -np.maximum(dx, dy), -outside)
+
+    def excl_area(self, x_lo, x_hi, y_lo, y_hi, inset):
+        """ See ``Substrate.excl_area``. """
+        half_x = self.width / 2 - inset
+        half_y = self.height / 2 - inset
+        span_x = np.minimum(x_hi, half_x) - np.maximum(x_lo, -half_x)
+        span_y = np.minimum(y_hi, half_y) - np.maximum(y_lo, -half_y)
+        return np.maximum(span_x, 0) * np.maximum(span_y, 0)
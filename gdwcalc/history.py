@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              history.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             Session history of completed calculations.
+
+                    Every calculation is kept with the inputs that made it,
+                    so stepping back and forward (or undoing a bad edit)
+                    restores the die map without classifying again. Recent
+                    entries are kept in memory up to a byte budget; the
+                    least recently used ones are spilled to compressed
+                    ``.npz`` files in a temporary directory and loaded back
+                    when they are recalled.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import collections
+import itertools
+import json
+import os
+import shutil
+import tempfile
+
+# Third Party
+import numpy as np
+
+# Package / Application
+from . import engine
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+# The default in-memory budget for die maps.
+MAX_BYTES = 64 * 1024**2
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+class HistoryEntry(object):
+    """
+    One completed calculation.
+
+    Parameters:
+    -----------
+    params : dict
+        The inputs that produced the die map. Must be JSON serializable.
+    die_map : ``engine.DieMap``
+    """
+    def __init__(self, params, die_map):
+        self.params = params
+        self.die_map = die_map
+
+    @property
+    def counts(self):
+        """ The number of die in each status, indexed by code """
+        return self.die_map.counts()
+
+    @property
+    def center_xy(self):
+        """ The grid coordinate of the wafer center """
+        return self.die_map.center_xy
+
+    @property
+    def nbytes(self):
+        """ The memory used by the die map arrays """
+        die_map = self.die_map
+        nbytes = (die_map.status.nbytes + die_map.x_centers.nbytes
+                  + die_map.y_centers.nbytes)
+        if die_map.fields is not None:
+            nbytes += sum(field.nbytes for field in die_map.fields.values())
+        return nbytes
+
+    def save(self, fname):
+        """ Write the entry to a compressed ``.npz`` file """
+        die_map = self.die_map
+        center_offset = die_map.center_offset
+        if center_offset is not None:
+            # "odd" and "even" stay strings.
+            center_offset = [item if isinstance(item, str) else float(item)
+                             for item in center_offset]
+        meta = {'params': self.params,
+                'die_xy': [float(item) for item in die_map.die_xy],
+                'center_xy': [float(item) for item in die_map.center_xy],
+                'center_offset': center_offset,
+                'street_xy': [float(item) for item in die_map.street_xy],
+                'rotation': float(die_map.rotation),
+                'fields': die_map.fields is not None,
+                }
+        arrays = {'status': die_map.status.astype(np.int8),
+                  'x_centers': die_map.x_centers,
+                  'y_centers': die_map.y_centers,
+                  }
+        if die_map.fields is not None:
+            for name, field in die_map.fields.items():
+                arrays["field_" + name] = field
+        with open(fname, 'wb') as openf:
+            np.savez_compressed(openf, meta=np.array(json.dumps(meta)),
+                                **arrays)
+
+    @classmethod
+    def load(cls, fname):
+        """ Read an entry written by ``save`` """
+        with np.load(fname) as data:
+            meta = json.loads(str(data['meta']))
+            fields = None
+            if meta['fields']:
+                fields = {name: data["field_" + name]
+                          for name in engine.FIELD_NAMES}
+            center_offset = meta['center_offset']
+            die_map = engine.DieMap(
+                data['status'],
+                data['x_centers'],
+                data['y_centers'],
+                tuple(meta['die_xy']),
+                tuple(meta['center_xy']),
+                None if center_offset is None else tuple(center_offset),
+                tuple(meta['street_xy']),
+                fields,
+                meta['rotation'],
+                )
+        return cls(meta['params'], die_map)
+
+
+class History(object):
+    """
+    A back/forward list of calculations with an LRU memory budget.
+
+    Like an undo stack, adding an entry after stepping back drops the
+    entries that were ahead of it.
+
+    Parameters:
+    -----------
+    max_bytes : int, optional
+        The most die map memory to keep. The most recently used entry is
+        always kept in memory, even if it is larger.
+    spill_dir : str, optional
+        Where to write evicted entries. Defaults to a new temporary
+        directory, which ``close`` removes.
+    """
+    def __init__(self, max_bytes=MAX_BYTES, spill_dir=None):
+        self.max_bytes = max_bytes
+        self._own_dir = spill_dir is None
+        if spill_dir is None:
+            spill_dir = tempfile.mkdtemp(prefix="gdwcalc_history_")
+        self.spill_dir = spill_dir
+        self._keys = []
+        self._index = -1
+        self._memory = collections.OrderedDict()
+        self._spilled = set()
+        self._next_key = itertools.count()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def index(self):
+        """ The position of the current entry, -1 if there are none """
+        return self._index
+
+    @property
+    def nbytes(self):
+        """ The memory used by the in-memory entries """
+        return sum(entry.nbytes for entry in self._memory.values())
+
+    @property
+    def can_back(self):
+        return self._index > 0
+
+    @property
+    def can_forward(self):
+        return self._index < len(self._keys) - 1
+
+    @property
+    def current(self):
+        """ The current ``HistoryEntry``, or ``None`` """
+        if self._index < 0:
+            return None
+        return self._get(self._keys[self._index])
+
+    def _path(self, key):
+        return os.path.join(self.spill_dir, "{}.npz".format(key))
+
+    def _get(self, key):
+        """ Return an entry, loading it from disk if it was spilled """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        entry = HistoryEntry.load(self._path(key))
+        self._memory[key] = entry
+        self._evict()
+        return entry
+
+    def _evict(self):
+        """ Spill least recently used entries until under budget """
+        nbytes = self.nbytes
+        while nbytes > self.max_bytes and len(self._memory) > 1:
+            key, entry = self._memory.popitem(last=False)
+            # Entries never change, so one copy on disk is enough.
+            if key not in self._spilled:
+                entry.save(self._path(key))
+                self._spilled.add(key)
+            nbytes -= entry.nbytes
+
+    def _drop(self, key):
+        self._memory.pop(key, None)
+        if key in self._spilled:
+            os.remove(self._path(key))
+            self._spilled.discard(key)
+
+    def push(self, params, die_map):
+        """
+        Add a calculation after the current entry and make it current.
+
+        A calculation with the same parameters and die map as the current
+        entry is not added again.
+
+        Returns:
+        --------
+        entry : ``HistoryEntry``
+        """
+        current = self.current
+        if (current is not None and current.params == params
+                and current.die_map.fingerprint() == die_map.fingerprint()):
+            return current
+
+        for key in self._keys[self._index + 1:]:
+            self._drop(key)
+        del self._keys[self._index + 1:]
+
+        key = next(self._next_key)
+        entry = HistoryEntry(params, die_map)
+        self._keys.append(key)
+        self._index = len(self._keys) - 1
+        self._memory[key] = entry
+        self._evict()
+        return entry
+
+    def back(self):
+        """ Step back and return the entry, or ``None`` at the start """
+        if not self.can_back:
+            return None
+        self._index -= 1
+        return self.current
+
+    def forward(self):
+        """ Step forward and return the entry, or ``None`` at the end """
+        if not self.can_forward:
+            return None
+        self._index += 1
+        return self.current
+
+    def close(self):
+        """ Forget every entry and remove the spilled files """
+        for key in self._keys:
+            self._drop(key)
+        self._keys = []
+        self._index = -1
+        if self._own_dir and os.path.isdir(self.spill_dir):
+            shutil.rmtree(self.spill_dir)
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              keepout.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             Keep-out zones for alignment marks, PCM structures and
+                    scribe IDs.
+
+                    Zones are circles or (possibly concave) polygons in mm
+                    relative to the wafer center. Each zone's bounding box
+                    is first turned into a block of grid rows and columns
+                    with ``searchsorted``, then only the die in that block
+                    are tested exactly: circles by the distance to the
+                    closest point of the die, and polygons by clipping every
+                    edge against every die and a point-in-polygon test for
+                    die that lie entirely inside.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+
+# Third Party
+import numpy as np
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+class CircleZone(object):
+    """
+    A circular keep-out zone.
+
+    Parameters:
+    -----------
+    x, y : float
+        The center in mm relative to the wafer center.
+    radius : float
+        The radius in mm.
+    """
+    def __init__(self, x, y, radius):
+        self.x = float(x)
+        self.y = float(y)
+        self.radius = float(radius)
+
+    def __repr__(self):
+        return "CircleZone({}, {}, {})".format(self.x, self.y, self.radius)
+
+    def to_dict(self):
+        """ Return the zone as a JSON serializable dict """
+        return {'kind': "circle", 'x': self.x, 'y': self.y,
+                'radius': self.radius}
+
+    @property
+    def bbox(self):
+        """ The (x_min, y_min, x_max, y_max) bounding box in mm """
+        return (self.x - self.radius, self.y - self.radius,
+                self.x + self.radius, self.y + self.radius)
+
+    def rotated(self, angle):
+        """ Return the zone rotated ``angle`` degrees about the origin """
+        x, y = _rotate([[self.x, self.y]], angle)[0]
+        return CircleZone(x, y, self.radius)
+
+    def hits(self, x, y, half_x, half_y):
+        """ Return whether die centered at (x, y) touch the zone """
+        dx = np.maximum(np.abs(x - self.x) - half_x, 0)
+        dy = np.maximum(np.abs(y - self.y) - half_y, 0)
+        return dx**2 + dy**2 <= self.radius**2
+
+
+class PolygonZone(object):
+    """
+    A polygonal keep-out zone.
+
+    Parameters:
+    -----------
+    vertices : array-like of float
+        The (x, y) vertices in mm relative to the wafer center, shape
+        ``(n, 2)``. The polygon is closed automatically and may be concave
+        but should not self-intersect.
+    """
+    def __init__(self, vertices):
+        self.vertices = np.asarray(vertices, dtype=float).reshape(-1, 2)
+        if len(self.vertices) < 3:
+            raise ValueError("A polygon needs at least 3 vertices")
+
+    def __repr__(self):
+        return "PolygonZone({})".format(self.vertices.tolist())
+
+    def to_dict(self):
+        """ Return the zone as a JSON serializable dict """
+        return {'kind': "polygon", 'vertices': self.vertices.tolist()}
+
+    @property
+    def bbox(self):
+        """ The (x_min, y_min, x_max, y_max) bounding box in mm """
+        x_min, y_min = self.vertices.min(axis=0)
+        x_max, y_max = self.vertices.max(axis=0)
+        return x_min, y_min, x_max, y_max
+
+    def rotated(self, angle):
+        """ Return the zone rotated ``angle`` degrees about the origin """
+        return PolygonZone(_rotate(self.vertices, angle))
+
+    def contains(self, x, y):
+        """ Even-odd point in polygon test, broadcast over edges """
+        x0, y0 = self.vertices.T
+        x1, y1 = np.roll(self.vertices, -1, axis=0).T
+        x = np.asarray(x, dtype=float)[..., None]
+        y = np.asarray(y, dtype=float)[..., None]
+        straddles = (y0 > y) != (y1 > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+        crossings = np.count_nonzero(straddles & (x < x_cross), axis=-1)
+        return crossings % 2 == 1
+
+    def hits(self, x, y, half_x, half_y):
+        """ Return whether die centered at (x, y) touch the zone """
+        x = np.asarray(x, dtype=float)[..., None]
+        y = np.asarray(y, dtype=float)[..., None]
+        x0, y0 = self.vertices.T
+        x1, y1 = np.roll(self.vertices, -1, axis=0).T
+        dx, dy = x1 - x0, y1 - y0
+
+        # Clip each edge, p0 + t * d for t in [0, 1], to each die.
+        def slab(start, delta, lo, hi):
+            """ The t range of one axis, empty if parallel and outside """
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t_a = (lo - start) / delta
+                t_b = (hi - start) / delta
+            parallel = delta == 0
+            inside = (start >= lo) & (start <= hi)
+            t_lo = np.where(parallel, np.where(inside, -np.inf, np.inf),
+                            np.minimum(t_a, t_b))
+            t_hi = np.where(parallel, np.where(inside, np.inf, -np.inf),
+                            np.maximum(t_a, t_b))
+            return t_lo, t_hi
+
+        tx_lo, tx_hi = slab(x0, dx, x - half_x, x + half_x)
+        ty_lo, ty_hi = slab(y0, dy, y - half_y, y + half_y)
+        t_lo = np.maximum(np.maximum(tx_lo, ty_lo), 0)
+        t_hi = np.minimum(np.minimum(tx_hi, ty_hi), 1)
+        edge_hit = (t_lo <= t_hi).any(axis=-1)
+
+        # Die entirely inside the polygon don't touch any edge.
+        return edge_hit | self.contains(x[..., 0], y[..., 0])
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def _rotate(points, angle):
+    """ Rotate (n, 2) points ``angle`` degrees counterclockwise """
+    theta = np.radians(angle)
+    cos, sin = np.cos(theta), np.sin(theta)
+    return np.dot(np.asarray(points, dtype=float),
+                  np.array([[cos, sin], [-sin, cos]]))
+
+
+def _axis_range(centers, half, lo, hi, descending=False):
+    """
+    Return the slice of sorted ``centers`` whose die (half-width ``half``)
+    overlap ``[lo, hi]``.
+    """
+    if descending:
+        centers = -centers
+        lo, hi = -hi, -lo
+    start = np.searchsorted(centers, lo - half, side='left')
+    stop = np.searchsorted(centers, hi + half, side='right')
+    return slice(start, stop)
+
+
+def grid_mask(x_centers, y_centers, die_xy, zones):
+    """
+    Return which die on a grid touch any keep-out zone.
+
+    Parameters:
+    -----------
+    x_centers : ``numpy.ndarray``
+        The die center X coordinates of each column, ascending.
+    y_centers : ``numpy.ndarray``
+        The die center Y coordinates of each row, descending (top row
+        first), as in ``engine.DieMap``.
+    die_xy : tuple of floats
+        The die body size in mm.
+    zones : iterable of ``CircleZone`` or ``PolygonZone``
+
+    Returns:
+    --------
+    mask : ``numpy.ndarray`` of bool
+        Shape ``(len(y_centers), len(x_centers))``.
+    """
+    half_x, half_y = die_xy[0] / 2, die_xy[1] / 2
+    mask = np.zeros((len(y_centers), len(x_centers)), dtype=bool)
+    for zone in zones:
+        x_min, y_min, x_max, y_max = zone.bbox
+        cols = _axis_range(x_centers, half_x, x_min, x_max)
+        rows = _axis_range(y_centers, half_y, y_min, y_max, descending=True)
+        if cols.start >= cols.stop or rows.start >= rows.stop:
+            continue
+        block = zone.hits(x_centers[None, cols], y_centers[rows, None],
+                          half_x, half_y)
+        mask[rows, cols] |= block
+    return mask
+
+
+def die_mask(x_centers, y_centers, die_xy, zones):
+    """
+    Return which die touch any keep-out zone, for die at arbitrary
+    centers. ``x_centers`` and ``y_centers`` are broadcast together.
+    """
+    half_x, half_y = die_xy[0] / 2, die_xy[1] / 2
+    x, y = np.broadcast_arrays(np.asarray(x_centers, dtype=float),
+                               np.asarray(y_centers, dtype=float))
+    mask = np.zeros(x.shape, dtype=bool)
+    for zone in zones:
+        x_min, y_min, x_max, y_max = zone.bbox
+        near = ((x + half_x >= x_min) & (x - half_x <= x_max)
+                & (y + half_y >= y_min) & (y - half_y <= y_max))
+        if near.any():
+            mask[near] |= zone.hits(x[near], y[near], half_x, half_y)
+    return mask
+
+
+def zone_from_dict(params):
+    """ The inverse of ``CircleZone.to_dict`` and ``PolygonZone.to_dict`` """
+    if params['kind'] == "circle":
+        return CircleZone(params['x'], params['y'], params['radius'])
+    if params['kind'] == "polygon":
+        return PolygonZone(params['vertices'])
+    raise ValueError("Unknown zone kind {!r}".format(params['kind']))
+
+
+def read_zones(fname):
+    """
+    Read keep-out zones from a text file.
+
+    Each line is either ``circle,x,y,radius`` or
+    ``polygon,x1,y1,x2,y2,...`` in mm. Blank lines and lines starting with
+    ``#`` are ignored.
+    """
+    zones = []
+    with open(fname) as openf:
+        for line_no, line in enumerate(openf, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            items = [item.strip() for item in line.split(",")]
+            kind, values = items[0], items[1:]
+            try:
+                values = [float(value) for value in values]
+                if kind.lower() == "circle" and len(values) == 3:
+                    zones.append(CircleZone(*values))
+                elif kind.lower() == "polygon" and len(values) % 2 == 0:
+                    zones.append(PolygonZone(values))
+                else:
+                    raise ValueError("unknown zone")
+            except ValueError as err:
+                raise ValueError("Line {}: {}".format(line_no, err))
+    return zones
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              landscape.py
+@author:            Douglas Thor
+@created:           2019-10-16
+@descr:             GDW over the continuous grid offset domain.
+
+                    maxGDW only looks at the four odd/even shifts. This
+                    calculates GDW for every (x_offset, y_offset) in
+                    [0, pitch_x) x [0, pitch_y) so you can see which offsets
+                    are robust and which sit on a cliff.
+
+                    Within a row, the number of probe-able die only changes
+                    at two X offsets, so each row contributes two events
+                    that are binned and cumulatively summed rather than
+                    classifying the wafer at every offset.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import math
+
+# Third Party
+import numpy as np
+
+# Package / Application
+from gdwcalc import engine
+from gdwcalc import geometry
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+# Same as the wafer_map continuous defaults.
+LOW_COLOR = (128, 0, 255)
+HIGH_COLOR = (0, 255, 128)
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def gdw_landscape(die_xy, dia, excl, flat_excl, north_limit=None,
+                  shape=(64, 64), street_xy=(0, 0)):
+    """
+    Calculate GDW on a regular grid of die offsets.
+
+    Offsets have the same meaning as a fixed mm offset in
+    ``engine.classify``: the location of a die center relative to the
+    wafer center.
+
+    Parameters:
+    -----------
+    die_xy : tuple of floats
+        The die body size in mm.
+    dia : int or float
+        The wafer diameter in mm.
+    excl, flat_excl : float
+        The edge and flat exclusion widths in mm.
+    north_limit : float, optional
+        The top-side scribe exclusion Y coordinate in mm.
+    shape : tuple of ints, optional
+        The number of (y, x) offsets to calculate.
+    street_xy : tuple of floats, optional
+        The street width in mm. Offsets span the die pitch.
+
+    Returns:
+    --------
+    x_offsets : ``numpy.ndarray``
+        The X offsets, shape ``(n_x, )``.
+    y_offsets : ``numpy.ndarray``
+        The Y offsets, shape ``(n_y, )``.
+    gdw : ``numpy.ndarray`` of int
+        The GDW, shape ``(n_y, n_x)``.
+    """
+    pitch_x = die_xy[0] + street_xy[0]
+    pitch_y = die_xy[1] + street_xy[1]
+    n_y, n_x = shape
+    rad = geometry.require_diameter(dia, "gdw_landscape") / 2
+    x_offsets = np.arange(n_x) * (pitch_x / n_x)
+    y_offsets = np.arange(n_y) * (pitch_y / n_y)
+
+    # Every candidate row, for every Y offset: shape (n_y, n_rows).
+    k = np.arange(math.floor(-rad / pitch_y) - 1,
+                  math.ceil(rad / pitch_y) + 1)
+    y_centers = k[None, :] * pitch_y + y_offsets[:, None]
+    widths = engine.probe_half_widths(y_centers, die_xy, dia, excl,
+                                      flat_excl, north_limit)
+
+    # A row with half-width w = n * pitch_x + r holds 2n + 1 die at an X
+    # offset of 0. It loses one once the offset passes r and gains one
+    # once it reaches pitch_x - r.
+    row_iy, row_k = np.nonzero(widths >= 0)
+    widths = widths[row_iy, row_k]
+    n_half = np.floor(widths / pitch_x)
+    remainder = widths - n_half * pitch_x
+
+    base = np.bincount(row_iy, weights=2 * n_half + 1, minlength=n_y)
+    lose = np.searchsorted(x_offsets, remainder, side='right')
+    gain = np.searchsorted(x_offsets, pitch_x - remainder, side='left')
+
+    n_bins = n_x + 1
+    events = (np.bincount(row_iy * n_bins + gain, minlength=n_y * n_bins)
+              - np.bincount(row_iy * n_bins + lose, minlength=n_y * n_bins))
+    events = events.reshape(n_y, n_bins)[:, :n_x]
+
+    gdw = base[:, None] + np.cumsum(events, axis=1)
+    return x_offsets, y_offsets, gdw.astype(int)
+
+
+def cliff_depth(gdw):
+    """
+    Return how many die each offset loses to its worst neighbor.
+
+    The offset domain is periodic, so neighbors wrap around. Zero means the
+    offset is robust to small shifts.
+    """
+    worst = gdw.copy()
+    for shift_y in (-1, 0, 1):
+        for shift_x in (-1, 0, 1):
+            rolled = np.roll(np.roll(gdw, shift_y, axis=0), shift_x, axis=1)
+            worst = np.minimum(worst, rolled)
+    return gdw - worst
+
+
+def to_rgb(gdw, low_color=LOW_COLOR, high_color=HIGH_COLOR):
+    """
+    Map a GDW landscape to an RGB image, row 0 (y offset 0) at the bottom.
+
+    Returns a ``(n_y, n_x, 3)`` array of ``uint8``.
+    """
+    low = gdw.min()
+    span = max(gdw.max() - low, 1)
+    frac = ((gdw - low) / span)[::-1, :, None]
+    low_color = np.array(low_color, dtype=float)
+    high_color = np.array(high_color, dtype=float)
+    rgb = low_color + frac * (high_color - low_color)
+    return np.round(rgb).astype(np.uint8)
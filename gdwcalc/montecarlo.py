@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              montecarlo.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             Monte Carlo spatial defect simulation.
+
+                    Analytic yield models assume defects are spread evenly
+                    over the wafer. This scatters defects with a radial
+                    density profile (for example, more defects inside the
+                    edge exclusion ring), bins them into die by floor
+                    division on the die grid, and counts the probe die that
+                    are left without a defect. Batches of wafers are
+                    simulated at once and queued as batch jobs in the
+                    shared scheduler. ``simulate`` waits for them; the GUI
+                    queues ``simulation_jobs`` itself and calls
+                    ``simulation_result`` when they are done.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import collections
+
+# Third Party
+import numpy as np
+
+# Package / Application
+from . import engine
+from . import geometry
+from . import scheduler
+from . import yield_models
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+# Die center radius bins (mm). Matches the linear RadiusPlots histogram.
+RING_EDGES = np.arange(0, 81, 5)
+
+# Wafers per worker task.
+BATCH_SIZE = 1000
+
+# Two-sided 95% normal quantile.
+Z_95 = 1.959964
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+class RadialProfile(object):
+    """
+    A piecewise-constant radial defect density.
+
+    Parameters:
+    -----------
+    radii : array-like of float
+        The ring edges in mm, starting at 0 and ending at the wafer
+        radius.
+    density : array-like of float
+        The defect density of each ring in defects/cm^2. One shorter than
+        ``radii``.
+    """
+    def __init__(self, radii, density):
+        self.radii = np.asarray(radii, dtype=float)
+        self.density = np.asarray(density, dtype=float)
+        if len(self.radii) != len(self.density) + 1:
+            raise ValueError("radii must be one longer than density")
+
+    @property
+    def ring_areas(self):
+        """ The area of each ring in mm^2 """
+        return np.pi * np.diff(self.radii**2)
+
+    @property
+    def expected_defects(self):
+        """ The mean number of defects per wafer in each ring """
+        return self.density * self.ring_areas / yield_models.MM2_PER_CM2
+
+    def sample(self, rng, n_wafers):
+        """
+        Scatter defects over ``n_wafers`` wafers.
+
+        Returns:
+        --------
+        wafer : ``numpy.ndarray`` of int
+            The wafer index of each defect.
+        x, y : ``numpy.ndarray`` of float
+            The defect locations in mm relative to the wafer center.
+        """
+        counts = rng.poisson(self.expected_defects, (n_wafers,
+                                                     len(self.density)))
+        ring = np.repeat(np.tile(np.arange(len(self.density)), n_wafers),
+                         counts.ravel())
+        wafer = np.repeat(np.arange(n_wafers), counts.sum(axis=1))
+        # Uniform by area within each ring.
+        r_sq_lo = self.radii[ring]**2
+        r_sq_hi = self.radii[ring + 1]**2
+        radius = np.sqrt(r_sq_lo + rng.random_sample(len(ring))
+                         * (r_sq_hi - r_sq_lo))
+        angle = rng.random_sample(len(ring)) * 2 * np.pi
+        return wafer, radius * np.cos(angle), radius * np.sin(angle)
+
+
+# The result of ``simulate``. ``good_die`` has one entry per wafer. Rings
+# are ``ring_edges`` bins of die center radius; ``ring_yield`` and its
+# interval are the mean per-wafer yield of the probe die in each ring, NaN
+# for rings without any.
+MonteCarloResult = collections.namedtuple("MonteCarloResult",
+                                          ["good_die",
+                                           "gdw",
+                                           "mean",
+                                           "mean_ci",
+                                           "interval",
+                                           "ring_edges",
+                                           "ring_yield",
+                                           "ring_ci",
+                                           ])
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def edge_profile(dia, d0, excl, edge_d0):
+    """
+    Return a profile with density ``d0`` in the center and ``edge_d0``
+    inside the edge exclusion ring ``excl`` mm wide.
+    """
+    rad = geometry.require_diameter(dia, "edge_profile") / 2
+    return RadialProfile([0, rad - excl, rad], [d0, edge_d0])
+
+
+def _all_edges(ring_edges):
+    """
+    Add an extra ring outside ``ring_edges`` (and one inside, if they
+    don't start at 0), so that every die can be killed and counted.
+    """
+    all_edges = np.append(ring_edges, np.inf)
+    if all_edges[0] > 0:
+        all_edges = np.insert(all_edges, 0, 0)
+    return all_edges
+
+
+def _die_grid(die_map, ring_edges):
+    """
+    Return the arrays a worker needs to bin defects into probe die.
+
+    ``ring`` is the ring index of every cell, or -1 if the cell is not a
+    probe die or is outside ``ring_edges``.
+    """
+    pitch_x, pitch_y = die_map.pitch_xy
+    x_left = die_map.x_centers[0] - pitch_x / 2
+    y_top = die_map.y_centers[0] + pitch_y / 2
+    radius = np.hypot(die_map.x_centers[None, :], die_map.y_centers[:, None])
+    ring = np.digitize(radius, ring_edges) - 1
+    outside = (ring < 0) | (ring >= len(ring_edges) - 1)
+    ring[outside | (die_map.status != engine.PROBE)] = -1
+    return (ring.ravel(), len(ring_edges) - 1, die_map.status.shape,
+            (x_left, y_top), die_map.pitch_xy, die_map.die_xy,
+            die_map.rotation)
+
+
+def simulate_batch(job):
+    """
+    Simulate one batch of wafers. Runs in a worker process.
+
+    ``job`` is one of the (grid, profile, n_wafers, seed) tuples from
+    ``simulation_jobs``, where ``grid`` comes from ``_die_grid``. Returns
+    the number of good die per ring for every wafer, shape
+    ``(n_wafers, n_rings)``.
+    """
+    grid, profile, n_wafers, seed = job
+    (ring, n_rings, shape, (x_left, y_top), (pitch_x, pitch_y), die_xy,
+     rotation) = grid
+    n_rows, n_cols = shape
+    rng = np.random.RandomState(seed)
+
+    wafer, x, y = profile.sample(rng, n_wafers)
+    if rotation:
+        # Defects are on the wafer; bin them on the rotated grid.
+        x, y = np.dot(engine.rotation_matrix(-rotation), np.stack((x, y)))
+    col_f = (x - x_left) / pitch_x
+    row_f = (y_top - y) / pitch_y
+    col = np.floor(col_f).astype(int)
+    row = np.floor(row_f).astype(int)
+    # Defects in the street don't land on a die body.
+    on_body = ((np.abs(col_f - col - 0.5) * pitch_x <= die_xy[0] / 2)
+               & (np.abs(row_f - row - 0.5) * pitch_y <= die_xy[1] / 2)
+               & (col >= 0) & (col < n_cols) & (row >= 0) & (row < n_rows))
+    cell = row[on_body] * n_cols + col[on_body]
+    wafer = wafer[on_body]
+    keep = ring[cell] >= 0
+    cell, wafer = cell[keep], wafer[keep]
+
+    # A die is killed by one or more defects.
+    killed = np.unique(wafer * (n_rows * n_cols) + cell)
+    killed_ring = ring[killed % (n_rows * n_cols)]
+    killed_wafer = killed // (n_rows * n_cols)
+    n_killed = np.bincount(killed_wafer * n_rings + killed_ring,
+                           minlength=n_wafers * n_rings)
+
+    probe = np.bincount(ring[ring >= 0], minlength=n_rings)
+    return probe[None, :] - n_killed.reshape(n_wafers, n_rings)
+
+
+def simulation_jobs(die_map, profile, n_wafers=10000, seed=None,
+                    ring_edges=RING_EDGES, batch_size=BATCH_SIZE):
+    """
+    Split a simulation into batches for ``simulate_batch``. The parameters
+    are the same as for ``simulate``.
+
+    Returns:
+    --------
+    jobs : list of tuple
+        One job per batch of at most ``batch_size`` wafers.
+    """
+    ring_edges = np.asarray(ring_edges, dtype=float)
+    grid = _die_grid(die_map, _all_edges(ring_edges))
+    seeds = np.random.RandomState(seed).randint(0, 2**31 - 1,
+                                                -(-n_wafers // batch_size))
+    return [(grid, profile, min(batch_size, n_wafers - start), batch_seed)
+            for start, batch_seed in zip(range(0, n_wafers, batch_size),
+                                         seeds)]
+
+
+def simulation_result(die_map, batches, ring_edges=RING_EDGES):
+    """
+    Combine the ``simulate_batch`` results of ``simulation_jobs``.
+
+    Parameters:
+    -----------
+    die_map : ``engine.DieMap``
+        The die map that the jobs were made from.
+    batches : list of ``numpy.ndarray``
+        The result of each job, in order.
+    ring_edges : array-like of float, optional
+        The ring edges that the jobs were made with.
+
+    Returns:
+    --------
+    result : ``MonteCarloResult``
+    """
+    ring_edges = np.asarray(ring_edges, dtype=float)
+    grid = _die_grid(die_map, _all_edges(ring_edges))
+    good = np.concatenate(batches)
+    n_wafers = len(good)
+
+    probe = np.bincount(grid[0][grid[0] >= 0], minlength=grid[1])
+    good_die = good.sum(axis=1)
+    mean = good_die.mean()
+    sem = good_die.std(ddof=1) / np.sqrt(n_wafers) if n_wafers > 1 else 0.0
+
+    # Drop the rings that were only added to catch every die.
+    first = 1 if ring_edges[0] > 0 else 0
+    n_rings = len(ring_edges) - 1
+    good = good[:, first:first + n_rings]
+    probe = probe[first:first + n_rings]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        wafer_yield = good / probe
+    ring_yield = wafer_yield.mean(axis=0)
+    if n_wafers > 1:
+        ring_sem = wafer_yield.std(axis=0, ddof=1) / np.sqrt(n_wafers)
+    else:
+        ring_sem = np.zeros(n_rings)
+
+    return MonteCarloResult(good_die,
+                            die_map.gdw,
+                            mean,
+                            (mean - Z_95 * sem, mean + Z_95 * sem),
+                            tuple(np.percentile(good_die, [2.5, 97.5])),
+                            ring_edges,
+                            ring_yield,
+                            np.stack((ring_yield - Z_95 * ring_sem,
+                                      ring_yield + Z_95 * ring_sem)),
+                            )
+
+
+def simulate(die_map, profile, n_wafers=10000, seed=None,
+             ring_edges=RING_EDGES, batch_size=BATCH_SIZE, max_workers=None):
+    """
+    Simulate random defects over many copies of a die map.
+
+    Parameters:
+    -----------
+    die_map : ``engine.DieMap``
+        Only ``PROBE`` die can be killed.
+    profile : ``RadialProfile``
+        The defect density.
+    n_wafers : int, optional
+        The number of wafers to simulate.
+    seed : int, optional
+        Makes the result repeatable, independent of ``max_workers``.
+    ring_edges : array-like of float, optional
+        The die center radius bins for the per-ring yield. Die outside
+        the bins are still counted in ``good_die``.
+    batch_size : int, optional
+        The number of wafers per worker task.
+    max_workers : int, optional
+        The number of worker processes. Defaults to the shared
+        ``scheduler``, at batch priority.
+
+    Returns:
+    --------
+    result : ``MonteCarloResult``
+        ``mean_ci`` is the 95% confidence interval of the mean good die and
+        ``interval`` the central 95% of the simulated wafers.
+    """
+    jobs = simulation_jobs(die_map, profile, n_wafers, seed, ring_edges,
+                           batch_size)
+    batches = scheduler.batch_map(simulate_batch, jobs,
+                                  max_workers=max_workers)
+    return simulation_result(die_map, batches, ring_edges)
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              mpw.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             Multi-project wafer (MPW) packing.
+
+                    Shuttle runs put several products, each with its own die
+                    size and required quantity, on one wafer. Die are packed
+                    in horizontal shelves from the top of the wafer down.
+                    Each shelf holds a single product and is as tall as that
+                    product's pitch, and its die are centered in the part of
+                    the shelf's chord that is inside the exclusions.
+
+                    A candidate packing is just the product of each shelf
+                    and the height of the first one. Candidates are
+                    generated and scored as 2D arrays, so thousands are
+                    scored in one pass of closed-form chord math.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import math
+
+# Third Party
+import numpy as np
+
+# Package / Application
+from . import geometry
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+# The candidate generators accepted by ``candidate_packings``.
+STRATEGIES = ("shelf", "row")
+
+# The number of candidates scored by ``pack`` if none is given.
+N_CANDIDATES = 2000
+
+# How much the candidate generators jitter each product's share.
+JITTER = 0.3
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+class MpwLayout(object):
+    """
+    A packed multi-project wafer. The result of ``layout`` and ``pack``.
+
+    Parameters:
+    -----------
+    names : list of str
+        The product names.
+    die_xy : ``numpy.ndarray`` of float
+        The die body size of each product in mm, shape ``(n_products, 2)``.
+    quantity : ``numpy.ndarray`` of int
+        The required quantity of each product.
+    product : ``numpy.ndarray`` of int
+        The product index of every placed die.
+    x_centers, y_centers : ``numpy.ndarray`` of float
+        The center of every placed die in mm relative to the wafer center.
+    shelves : ``numpy.ndarray`` of int
+        The product index of each shelf, top first. -1 for unused shelves.
+    """
+    def __init__(self, names, die_xy, quantity, product, x_centers,
+                 y_centers, shelves):
+        self.names = names
+        self.die_xy = die_xy
+        self.quantity = quantity
+        self.product = product
+        self.x_centers = x_centers
+        self.y_centers = y_centers
+        self.shelves = shelves
+
+    @property
+    def counts(self):
+        """ The number of die placed for each product """
+        return np.bincount(self.product, minlength=len(self.names))
+
+    @property
+    def shortfall(self):
+        """ How many die each product is short of its quantity """
+        return np.maximum(self.quantity - self.counts, 0)
+
+    @property
+    def complete(self):
+        """ Whether every product has its required quantity """
+        return not self.shortfall.any()
+
+    def rect_list(self):
+        """
+        Return every placed die.
+
+        A list of (x_ll, y_ll, width, height, product) tuples, where the
+        coordinates are the lower-left corner of the die body in mm.
+        """
+        size = self.die_xy[self.product]
+        x_ll = self.x_centers - size[:, 0] / 2
+        y_ll = self.y_centers - size[:, 1] / 2
+        return list(zip(x_ll.tolist(),
+                        y_ll.tolist(),
+                        size[:, 0].tolist(),
+                        size[:, 1].tolist(),
+                        self.product.tolist()))
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def parse_products(lines):
+    """
+    Parse MPW products from ``name,die_x,die_y,quantity`` lines.
+
+    Blank lines and lines starting with ``#`` are ignored.
+
+    Returns:
+    --------
+    products : list of dict
+        With ``name``, ``die_xy`` and ``quantity`` keys.
+    """
+    products = []
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        items = [item.strip() for item in line.split(",")]
+        try:
+            if len(items) != 4:
+                raise ValueError("expected 'name,die_x,die_y,quantity'")
+            die_xy = (float(items[1]), float(items[2]))
+            quantity = int(items[3])
+            if min(die_xy) <= 0 or quantity < 0:
+                raise ValueError("die sizes must be positive")
+        except ValueError as err:
+            raise ValueError("Line {}: {}".format(line_no, err))
+        products.append({'name': items[0],
+                         'die_xy': die_xy,
+                         'quantity': quantity})
+    return products
+
+
+def _product_arrays(products):
+    """ Return the names, die sizes and quantities of a product list """
+    names = [product['name'] for product in products]
+    die_xy = np.array([product['die_xy'] for product in products],
+                      dtype=float).reshape(-1, 2)
+    quantity = np.array([product['quantity'] for product in products],
+                        dtype=int)
+    return names, die_xy, quantity
+
+
+def _n_shelves(substrate, die_xy, street_xy):
+    """ Enough shelves of the shortest product to span the substrate """
+    min_pitch = die_xy[:, 1].min() + street_xy[1]
+    return int(math.ceil(2 * substrate.extent[1] / min_pitch)) + 1
+
+
+def _top(substrate, excl, north_limit):
+    """ The highest Y (mm) that a die body can reach """
+    top = substrate.extent[1] - excl
+    if north_limit is not None:
+        top = min(top, north_limit)
+    return top
+
+
+def _shelf_rows(shelves, start, die_xy, street_xy):
+    """
+    Return the die body ``(y_lo, y_hi)`` of every shelf.
+
+    Shelves with a product of -1 are zero height.
+    """
+    pitch_y = np.where(shelves >= 0, die_xy[shelves, 1] + street_xy[1], 0)
+    y_hi = (np.asarray(start)[..., None] - street_xy[1] / 2
+            - (np.cumsum(pitch_y, axis=-1) - pitch_y))
+    return y_hi - (pitch_y - street_xy[1]), y_hi
+
+
+def _spans(y_lo, y_hi, half_x, substrate, excl, flat_excl, north_limit):
+    """
+    Return the usable die center X ranges of each shelf as
+    ``(lo, hi, gap_lo, gap_hi)``, the same as ``engine.probe_intervals``
+    but without the chord cache, which would just fill up with one-off
+    candidate arrays.
+    """
+    lo, hi, gap_lo, gap_hi = substrate.outline_chord(y_lo, y_hi, excl)
+    flat_lo, flat_hi = substrate.flat_chord(y_lo, y_hi, flat_excl)
+    lo = np.maximum(lo, flat_lo) + half_x
+    hi = np.minimum(hi, flat_hi) - half_x
+    if north_limit is not None:
+        hi = np.where(y_hi <= north_limit, hi, -np.inf)
+    return lo, hi, gap_lo - half_x, gap_hi + half_x
+
+
+def _fit(lo, hi, pitch):
+    """ The number of die at ``pitch`` whose centers fit in ``[lo, hi]`` """
+    with np.errstate(invalid='ignore'):
+        count = np.floor((hi - lo) / pitch) + 1
+    return np.where(np.isfinite(count) & (hi >= lo), count, 0).astype(int)
+
+
+def _split(lo, hi, gap_lo, gap_hi):
+    """
+    Split center ranges around a notch gap. Returns the left and right
+    ranges; the right one is empty if there is no gap in the way.
+    """
+    has_gap = (gap_lo <= gap_hi) & (gap_lo <= hi) & (gap_hi >= lo)
+    left_hi = np.where(has_gap, np.minimum(hi, np.nextafter(gap_lo, -np.inf)),
+                       hi)
+    right_lo = np.where(has_gap, np.maximum(lo, np.nextafter(gap_hi, np.inf)),
+                        np.inf)
+    return (lo, left_hi), (right_lo, hi)
+
+
+def _shelf_counts(shelves, start, die_xy, street_xy, substrate, excl,
+                  flat_excl, north_limit):
+    """ Return the number of die in every shelf of every candidate """
+    y_lo, y_hi = _shelf_rows(shelves, start, die_xy, street_xy)
+    used = shelves >= 0
+    safe = np.where(used, shelves, 0)
+    pitch_x = die_xy[safe, 0] + street_xy[0]
+    spans = _spans(y_lo, y_hi, die_xy[safe, 0] / 2, substrate, excl,
+                   flat_excl, north_limit)
+    (left_lo, left_hi), (right_lo, right_hi) = _split(*spans)
+    counts = (_fit(left_lo, left_hi, pitch_x)
+              + _fit(right_lo, right_hi, pitch_x))
+    return np.where(used, counts, 0)
+
+
+def score_packings(products, shelves, start, dia, excl, flat_excl,
+                   north_limit=None, street_xy=(0, 0)):
+    """
+    Count the die of each product for many candidate packings at once.
+
+    Parameters:
+    -----------
+    products : list of dict
+        See ``parse_products``.
+    shelves : array-like of int
+        The product index of each shelf, top first, shape
+        ``(n_candidates, n_shelves)``. -1 leaves a shelf empty.
+    start : array-like of float
+        The Y coordinate (mm) of the top of each candidate's first shelf,
+        including half a street.
+    dia : int or float or ``geometry.Substrate``
+    excl, flat_excl, north_limit, street_xy :
+        See ``engine.classify``.
+
+    Returns:
+    --------
+    counts : ``numpy.ndarray`` of int
+        Shape ``(n_candidates, n_products)``.
+    """
+    _, die_xy, _ = _product_arrays(products)
+    shelves = np.atleast_2d(np.asarray(shelves, dtype=int))
+    substrate = geometry.as_substrate(dia)
+    per_shelf = _shelf_counts(shelves, start, die_xy, street_xy, substrate,
+                              excl, flat_excl, north_limit)
+    return np.stack([np.where(shelves == index, per_shelf, 0).sum(axis=-1)
+                     for index in range(len(die_xy))], axis=-1)
+
+
+def candidate_packings(products, dia, excl, flat_excl, north_limit=None,
+                       street_xy=(0, 0), strategy="shelf",
+                       n_candidates=N_CANDIDATES, rng=None):
+    """
+    Generate random candidate packings.
+
+    Each product's share of the wafer height is proportional to the area
+    its quantity needs, jittered per candidate.
+
+    Parameters:
+    -----------
+    strategy : str, optional
+        "shelf" gives each product one contiguous band of shelves, in a
+        random order. "row" draws every shelf's product independently, which
+        interleaves the products.
+    rng : ``numpy.random.RandomState``, optional
+
+    See ``score_packings`` for the other parameters.
+
+    Returns:
+    --------
+    shelves : ``numpy.ndarray`` of int
+        Shape ``(n_candidates, n_shelves)``.
+    start : ``numpy.ndarray`` of float
+        Shape ``(n_candidates,)``.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError("strategy must be one of {}".format(STRATEGIES))
+    if rng is None:
+        rng = np.random.RandomState()
+    _, die_xy, quantity = _product_arrays(products)
+    substrate = geometry.as_substrate(dia)
+    n_products = len(die_xy)
+    n_shelves = _n_shelves(substrate, die_xy, street_xy)
+    pitch_y = die_xy[:, 1] + street_xy[1]
+    area = (die_xy[:, 0] + street_xy[0]) * pitch_y * np.maximum(quantity, 1)
+
+    share = area * rng.uniform(1 - JITTER, 1 + JITTER,
+                               (n_candidates, n_products))
+    share /= share.sum(axis=1, keepdims=True)
+
+    if strategy == "shelf":
+        # Bands of shelves in a random product order.
+        height = 2 * _top(substrate, excl, north_limit)
+        n_band = np.maximum(np.round(share * height / pitch_y), 1)
+        order = np.argsort(rng.random_sample((n_candidates, n_products)),
+                           axis=1)
+        ends = np.cumsum(np.take_along_axis(n_band, order, axis=1), axis=1)
+        band = (np.arange(n_shelves)[None, :, None]
+                >= ends[:, None, :]).sum(axis=-1)
+        # The last band carries on to the bottom of the wafer.
+        band = np.minimum(band, n_products - 1)
+        shelves = np.take_along_axis(order, band, axis=1)
+    else:
+        # Shelves are drawn by the share of the height each product needs.
+        weight = share / pitch_y
+        cum = np.cumsum(weight / weight.sum(axis=1, keepdims=True), axis=1)
+        draw = rng.random_sample((n_candidates, n_shelves))
+        shelves = (draw[..., None] >= cum[:, None, :]).sum(axis=-1)
+        shelves = np.minimum(shelves, n_products - 1)
+
+    top = _top(substrate, excl, north_limit) + street_xy[1] / 2
+    start = top - rng.random_sample(n_candidates) * pitch_y.max()
+    return shelves, start
+
+
+def _rank(counts, quantity, die_xy):
+    """
+    Return the index of the best packing: the highest worst-case fraction
+    of the required quantity, then the most required die area, then the
+    most die area overall.
+    """
+    area = die_xy[:, 0] * die_xy[:, 1]
+    needed = np.minimum(counts, quantity)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fraction = np.where(quantity > 0, needed / quantity, 1)
+    worst = fraction.min(axis=1)
+    required = (needed * area).sum(axis=1)
+    total = (counts * area).sum(axis=1)
+    return int(np.lexsort((total, required, worst))[-1])
+
+
+def layout(products, shelves, start, dia, excl, flat_excl, north_limit=None,
+           street_xy=(0, 0)):
+    """
+    Place the die of a single candidate packing.
+
+    See ``score_packings`` for the parameters; ``shelves`` is 1D here.
+
+    Returns:
+    --------
+    layout : ``MpwLayout``
+    """
+    names, die_xy, quantity = _product_arrays(products)
+    substrate = geometry.as_substrate(dia)
+    shelves = np.asarray(shelves, dtype=int)
+    y_lo, y_hi = _shelf_rows(shelves, start, die_xy, street_xy)
+    used = shelves >= 0
+    safe = np.where(used, shelves, 0)
+    pitch_x = die_xy[safe, 0] + street_xy[0]
+    spans = _spans(y_lo, y_hi, die_xy[safe, 0] / 2, substrate, excl,
+                   flat_excl, north_limit)
+
+    product, x_centers, y_centers = [], [], []
+    for lo, hi in _split(*spans):
+        n_die = np.where(used, _fit(lo, hi, pitch_x), 0)
+        # Center the die in each range.
+        with np.errstate(invalid='ignore'):
+            first = np.where(n_die > 0,
+                             (lo + hi) / 2 - (n_die - 1) / 2 * pitch_x, 0)
+        shelf = np.repeat(np.arange(len(shelves)), n_die)
+        index = np.arange(len(shelf)) - np.repeat(np.cumsum(n_die) - n_die,
+                                                  n_die)
+        product.append(shelves[shelf])
+        x_centers.append(first[shelf] + index * pitch_x[shelf])
+        y_centers.append(((y_lo + y_hi) / 2)[shelf])
+
+    return MpwLayout(names, die_xy, quantity, np.concatenate(product),
+                     np.concatenate(x_centers), np.concatenate(y_centers),
+                     shelves)
+
+
+def pack(products, dia, excl, flat_excl, north_limit=None, street_xy=(0, 0),
+         strategy="shelf", n_candidates=N_CANDIDATES, seed=None):
+    """
+    Find a good multi-project wafer packing.
+
+    Parameters:
+    -----------
+    products : list of dict
+        See ``parse_products``.
+    dia : int or float or ``geometry.Substrate``
+    excl, flat_excl, north_limit, street_xy :
+        See ``engine.classify``.
+    strategy : str, optional
+        See ``candidate_packings``.
+    n_candidates : int, optional
+        The number of random candidates to score.
+    seed : int, optional
+        Makes the result repeatable.
+
+    Returns:
+    --------
+    layout : ``MpwLayout``
+        The candidate that comes closest to every required quantity. Ties
+        go to the one with the most die area.
+    """
+    rng = np.random.RandomState(seed)
+    shelves, start = candidate_packings(products, dia, excl, flat_excl,
+                                        north_limit, street_xy, strategy,
+                                        n_candidates, rng)
+    counts = score_packings(products, shelves, start, dia, excl, flat_excl,
+                            north_limit, street_xy)
+    _, die_xy, quantity = _product_arrays(products)
+    best = _rank(counts, quantity, die_xy)
+    return layout(products, shelves[best], start[best], dia, excl, flat_excl,
+                  north_limit, street_xy)
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              optimize.py
+@author:            Douglas Thor
+@created:           2019-10-17
+@descr:             Die geometry optimizers built on the count-only engine.
+
+                    Candidate die sizes and offsets are counted in bulk with
+                    ``engine.count_gdw``, so thousands of candidates are
+                    evaluated at once rather than one ``maxGDW`` call each.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import collections
+
+# Third Party
+import numpy as np
+
+# Package / Application
+from gdwcalc import engine
+from gdwcalc import geometry
+from gdwcalc import reticle
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+# Upper limit on the number of (candidate, offset, row) elements counted in
+# one broadcast call, to bound memory use.
+CHUNK_ELEMENTS = 2**21
+
+# max_die_size searches die sizes down to its upper bound divided by this.
+MIN_SIZE_DIVISOR = 16
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+# A single optimizer result. Offsets are in mm, the same as the fixed
+# offset inputs.
+Candidate = collections.namedtuple("Candidate",
+                                   ["gdw", "die_x", "die_y",
+                                    "x_offset", "y_offset"])
+
+# A shot placement result. Offsets are the mm location of a shot center,
+# the same as ``reticle.shot_map``.
+ShotCandidate = collections.namedtuple("ShotCandidate",
+                                       ["gdw", "n_shots", "n_partial",
+                                        "x_offset", "y_offset"])
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def _offset_fractions(n_offsets):
+    """
+    Return the (x, y) offset fractions of the die pitch to search.
+
+    Always includes the four odd/even shifts that maxGDW searches.
+    """
+    fracs = np.union1d(np.arange(n_offsets) / n_offsets, [0, 0.5])
+    frac_x, frac_y = np.meshgrid(fracs, fracs)
+    return frac_x.ravel(), frac_y.ravel()
+
+
+def best_offsets(die_x, die_y, dia, excl, flat_excl, north_limit=None,
+                 n_offsets=2, street_xy=(0, 0)):
+    """
+    Find the best grid offset for each of many die sizes.
+
+    Parameters:
+    -----------
+    die_x, die_y : array-like
+        The candidate die body sizes in mm, shape ``(n, )``.
+    dia, excl, flat_excl, north_limit :
+        See ``engine.classify``.
+    n_offsets : int, optional
+        Search this many evenly spaced offsets per axis, in addition to the
+        odd and even shifts. The default of 2 is just the odd/even shifts.
+    street_xy : tuple, optional
+        The street widths in mm. Each may be a float or an array of shape
+        ``(n, )``, so street width can be swept the same way as die size.
+
+    Returns:
+    --------
+    gdw, x_offset, y_offset : ``numpy.ndarray``
+        The best GDW for each die size and the mm offsets that give it.
+    """
+    geometry.require_diameter(dia, "best_offsets")
+    die_x = np.asarray(die_x, dtype=float)
+    die_y = np.asarray(die_y, dtype=float)
+    street_x = np.broadcast_to(np.asarray(street_xy[0], dtype=float),
+                               die_x.shape)
+    street_y = np.broadcast_to(np.asarray(street_xy[1], dtype=float),
+                               die_y.shape)
+    frac_x, frac_y = _offset_fractions(n_offsets)
+
+    # Shape (n_die, n_offsets)
+    offset_x = frac_x[None, :] * (die_x + street_x)[:, None]
+    offset_y = frac_y[None, :] * (die_y + street_y)[:, None]
+
+    n_rows = dia / (die_y + street_y).min() + 4
+    chunk = max(1, int(CHUNK_ELEMENTS // (len(frac_x) * n_rows)))
+    gdw = np.empty(offset_x.shape, dtype=int)
+    for start in range(0, len(die_x), chunk):
+        part = slice(start, start + chunk)
+        gdw[part] = engine.count_gdw((die_x[part, None], die_y[part, None]),
+                                     dia,
+                                     (offset_x[part], offset_y[part]),
+                                     excl, flat_excl, north_limit,
+                                     (street_x[part, None],
+                                      street_y[part, None]))
+
+    best = np.argmax(gdw, axis=1)
+    rows = np.arange(len(die_x))
+    return gdw[rows, best], offset_x[rows, best], offset_y[rows, best]
+
+
+def optimize_aspect_ratio(area, dia, excl, flat_excl, north_limit=None,
+                          max_aspect=4.0, n_aspect=1000, n_offsets=2,
+                          top_n=10, street_xy=(0, 0)):
+    """
+    Find the die aspect ratios and orientations that maximize GDW for a
+    fixed die area.
+
+    Aspect ratios (long side / short side) are log-spaced from 1 to
+    ``max_aspect`` and each is tried with the long side along X and along
+    Y, since the flat and top-side scribe limit make the two differ.
+
+    Parameters:
+    -----------
+    area : float
+        The die body area in mm^2, not including the street.
+    dia, excl, flat_excl, north_limit :
+        See ``engine.classify``.
+    max_aspect : float, optional
+        The largest aspect ratio to try.
+    n_aspect : int, optional
+        The number of aspect ratios to try.
+    n_offsets : int, optional
+        See ``best_offsets``.
+    top_n : int, optional
+        The number of candidates to return.
+    street_xy : tuple of floats, optional
+        The street width in mm. It stays with its axis when a die is turned
+        to portrait.
+
+    Returns:
+    --------
+    candidates : list of ``Candidate``
+        The best candidates, highest GDW first. Ties go to the squarer die.
+    """
+    aspect = np.logspace(0, np.log10(max_aspect), n_aspect)
+    long_side = np.sqrt(area * aspect)
+    short_side = np.sqrt(area / aspect)
+
+    # Landscape then portrait.
+    die_x = np.concatenate((long_side, short_side))
+    die_y = np.concatenate((short_side, long_side))
+    squareness = np.concatenate((aspect, aspect))
+
+    gdw, x_offset, y_offset = best_offsets(die_x, die_y, dia, excl,
+                                           flat_excl, north_limit, n_offsets,
+                                           street_xy)
+
+    order = np.lexsort((squareness, -gdw))[:top_n]
+    return [Candidate(int(gdw[i]), float(die_x[i]), float(die_y[i]),
+                      float(x_offset[i]), float(y_offset[i]))
+            for i in order]
+
+
+def max_die_size(target, dia, excl, flat_excl, north_limit=None, aspect=1.0,
+                 die_x=None, n_offsets=2, n_samples=1024, tol=1e-4,
+                 street_xy=(0, 0)):
+    """
+    Find the largest die that still achieves a target GDW.
+
+    GDW is a non-monotone step function of die size, so a plain bisection
+    can stop at the wrong step. Instead, the feasible range is sampled
+    densely with the count-only engine, the largest passing sample and the
+    failing sample after it bracket the answer, and that bracket is
+    re-sampled until it is narrower than ``tol``.
+
+    Parameters:
+    -----------
+    target : int
+        The required GDW.
+    dia, excl, flat_excl, north_limit :
+        See ``engine.classify``.
+    aspect : float, optional
+        The die_x / die_y ratio to hold fixed. Ignored if ``die_x`` is set.
+    die_x : float, optional
+        Hold die_x fixed (mm) and only grow die_y.
+    n_offsets : int, optional
+        See ``best_offsets``.
+    n_samples : int, optional
+        The number of sizes counted per pass.
+    tol : float, optional
+        Stop once the bracket on die_y is narrower than this (mm).
+    street_xy : tuple of floats, optional
+        The street width in mm. The die sizes solved for are the die body.
+
+    Returns:
+    --------
+    candidate : ``Candidate`` or None
+        The largest passing die and its best offsets, or ``None`` if even
+        the smallest sampled die (``MIN_SIZE_DIVISOR`` times smaller than
+        the area bound) misses the target.
+    """
+    # No die can be larger than the usable area divided by the target. The
+    # first pass starts well below that rather than at zero, since tiny die
+    # have an enormous number of rows to count.
+    geometry.require_diameter(dia, "max_die_size")
+    usable = np.pi * max(dia / 2 - excl, 0)**2
+    if die_x is None:
+        upper = np.sqrt(usable / (target * aspect))
+    else:
+        upper = min(usable / (target * die_x), dia)
+    if upper <= 0:
+        return None
+
+    def _evaluate(die_y):
+        sizes_x = aspect * die_y if die_x is None else np.full_like(die_y,
+                                                                     die_x)
+        result = best_offsets(sizes_x, die_y, dia, excl, flat_excl,
+                              north_limit, n_offsets, street_xy)
+        return (sizes_x, die_y) + result
+
+    low, high = upper / MIN_SIZE_DIVISOR, upper
+    die_y = np.linspace(low, high, n_samples)
+    best = None
+    while True:
+        sizes_x, die_y, gdw, x_offset, y_offset = _evaluate(die_y)
+        passing = np.nonzero(gdw >= target)[0]
+        if len(passing) == 0:
+            break
+        i = passing[-1]
+        best = Candidate(int(gdw[i]), float(sizes_x[i]), float(die_y[i]),
+                         float(x_offset[i]), float(y_offset[i]))
+        if i == len(die_y) - 1:
+            break
+        low, high = die_y[i], die_y[i + 1]
+        if high - low <= tol:
+            break
+        die_y = np.linspace(low, high, n_samples + 1)[1:]
+    return best
+
+
+def _block_starts(n_die, n_block, phase):
+    """
+    Return the ``np.add.reduceat`` indices that group an axis of ``n_die``
+    die into shots of ``n_block``, with a shot starting at ``phase``.
+    """
+    return np.union1d([0], np.arange(phase, n_die, n_block))
+
+
+def optimize_shots(die_xy, reticle_xy, dia, excl, flat_excl,
+                   north_limit=None, tolerance=0, drop_partial=False,
+                   n_offsets=8, street_xy=(0, 0)):
+    """
+    Find the reticle grid placement that needs the fewest shots while
+    keeping GDW within ``tolerance`` die of the best GDW found. With
+    ``drop_partial``, both are counted from full shots only.
+
+    Each die grid offset is classified once. Every shot placement on that
+    grid is then just a different grouping of its columns and rows, so the
+    per-shot die counts come from block sums of the probe map rather than
+    re-classifying.
+
+    Parameters:
+    -----------
+    die_xy : tuple of floats
+        The die body size in mm.
+    reticle_xy : tuple of ints
+        The number of die per shot in X and Y.
+    dia, excl, flat_excl, north_limit, street_xy :
+        See ``engine.classify``.
+    tolerance : int, optional
+        How many die below the best GDW a placement may be.
+    drop_partial : bool, optional
+        If ``True``, partial shots are not exposed, so only die in full
+        shots count towards GDW, and the tolerance is measured from the
+        best full-shot GDW of any placement.
+    n_offsets : int, optional
+        See ``best_offsets``.
+
+    Returns:
+    --------
+    candidate : ``ShotCandidate``
+        The best placement.
+    """
+    n_x, n_y = reticle_xy
+    die_per_shot = n_x * n_y
+    pitch_x = die_xy[0] + street_xy[0]
+    pitch_y = die_xy[1] + street_xy[1]
+    frac_x, frac_y = _offset_fractions(n_offsets)
+
+    placements = []
+    for offset in zip(frac_x * pitch_x, frac_y * pitch_y):
+        die_map = engine.classify(die_xy, dia, offset, excl, flat_excl,
+                                  north_limit, street_xy=street_xy)
+
+        # Bottom row first, to match the shot phase.
+        probe = (die_map.status[::-1] == engine.PROBE).astype(np.int32)
+        n_rows, n_cols = probe.shape
+        for phase_x in range(n_x):
+            by_col = np.add.reduceat(probe,
+                                     _block_starts(n_cols, n_x, phase_x),
+                                     axis=1)
+            for phase_y in range(n_y):
+                counts = np.add.reduceat(by_col,
+                                         _block_starts(n_rows, n_y, phase_y),
+                                         axis=0)
+                n_full = int(np.count_nonzero(counts == die_per_shot))
+                if drop_partial:
+                    gdw, n_shots = n_full * die_per_shot, n_full
+                else:
+                    gdw, n_shots = die_map.gdw, int(np.count_nonzero(counts))
+                placements.append((n_shots, -gdw, n_shots - n_full,
+                                   die_map, (phase_x, phase_y)))
+
+    best_gdw = max(-p[1] for p in placements)
+    feasible = [p for p in placements if -p[1] >= best_gdw - tolerance]
+    n_shots, gdw, n_partial, die_map, phase = min(feasible,
+                                                  key=lambda p: p[:3])
+    x_offset, y_offset = reticle.shot_offset(die_map, reticle_xy, phase)
+    return ShotCandidate(-gdw, n_shots, n_partial, x_offset, y_offset)
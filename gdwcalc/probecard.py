@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              probecard.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             Multi-site probe card touchdown planning.
+
+                    An N-site probe card tests a fixed pattern of die per
+                    touchdown, so sort time is driven by the number of
+                    touchdowns. Rectangular patterns are planned by
+                    splitting the map into bands of rows (or columns) and
+                    covering each band from one end, for every band phase.
+                    Any pattern can also be planned greedily from the
+                    coverage of every position over the whole grid, which
+                    is only updated near each new touchdown. The plan with
+                    the fewest touchdowns wins.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+
+# Third Party
+import numpy as np
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+class TouchdownPlan(object):
+    """
+    The result of ``plan_touchdowns``.
+
+    Parameters:
+    -----------
+    touchdowns : ``numpy.ndarray`` of int
+        The grid (col, row) of the pattern's top-left site for each
+        touchdown, shape ``(n, 2)``, in stepping order.
+    n_die : ``numpy.ndarray`` of int
+        The number of die tested by each touchdown.
+    sites : ``numpy.ndarray`` of bool
+        The site pattern, shape ``(rows, cols)``.
+    """
+    def __init__(self, touchdowns, n_die, sites):
+        self.touchdowns = touchdowns
+        self.n_die = n_die
+        self.sites = sites
+
+    @property
+    def n_touchdowns(self):
+        """ The number of touchdowns """
+        return len(self.touchdowns)
+
+    @property
+    def n_sites(self):
+        """ The number of sites on the probe card """
+        return int(np.count_nonzero(self.sites))
+
+    @property
+    def utilization(self):
+        """ The fraction of sites that land on a die to test """
+        if self.n_touchdowns == 0:
+            return 0.0
+        return float(self.n_die.sum()) / (self.n_touchdowns * self.n_sites)
+
+    def site_coords(self, step):
+        """ Return the grid (col, row) of every site for one touchdown """
+        rows, cols = np.nonzero(self.sites)
+        col, row = self.touchdowns[step]
+        return np.column_stack((cols + col, rows + row))
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def site_pattern(n_x, n_y):
+    """ Return a rectangular ``n_x`` by ``n_y`` site pattern. """
+    return np.ones((n_y, n_x), dtype=bool)
+
+
+def _coverage(untested, sites, row_slice, col_slice):
+    """
+    Return the number of untested die each position in the window covers.
+
+    Position ``(i, j)`` puts the top-left of the pattern on
+    ``untested[i, j]``.
+    """
+    rows = range(row_slice.start, row_slice.stop)
+    cols = range(col_slice.start, col_slice.stop)
+    total = np.zeros((len(rows), len(cols)), dtype=np.int32)
+    for site_row, site_col in zip(*np.nonzero(sites)):
+        total += untested[row_slice.start + site_row:
+                          row_slice.stop + site_row,
+                          col_slice.start + site_col:
+                          col_slice.stop + site_col]
+    return total
+
+
+def _serpentine(touchdowns):
+    """
+    Return the order that steps along each row of touchdowns, alternating
+    direction every row.
+    """
+    cols, rows = touchdowns[:, 0], touchdowns[:, 1]
+    _, band = np.unique(rows, return_inverse=True)
+    direction = np.where(band % 2, -1, 1)
+    return np.lexsort((cols * direction, rows))
+
+
+def _greedy_plan(probe_xy, sites):
+    """
+    Cover the first untested die in scan order with whichever touchdown
+    covers the most untested die, until none are left. Works for any site
+    pattern.
+    """
+    # Pad by the pattern size so that touchdowns can hang off the map.
+    pad_y, pad_x = sites.shape[0] - 1, sites.shape[1] - 1
+    low = probe_xy.min(axis=0) - (pad_x, pad_y)
+    n_cols, n_rows = probe_xy.max(axis=0) - low + 1
+    untested = np.zeros((n_rows + pad_y, n_cols + pad_x), dtype=np.int32)
+    untested[probe_xy[:, 1] - low[1], probe_xy[:, 0] - low[0]] = 1
+
+    coverage = _coverage(untested, sites, slice(0, n_rows), slice(0, n_cols))
+    site_rows, site_cols = np.nonzero(sites)
+    flat = untested.ravel()
+    first = 0
+    remaining = len(probe_xy)
+    touchdowns = []
+    n_die = []
+    while remaining:
+        first += int(np.argmax(flat[first:]))
+        die_i, die_j = divmod(first, untested.shape[1])
+        cand_i = die_i - site_rows
+        cand_j = die_j - site_cols
+        valid = ((cand_i >= 0) & (cand_i < n_rows)
+                 & (cand_j >= 0) & (cand_j < n_cols))
+        cand_i, cand_j = cand_i[valid], cand_j[valid]
+        best = np.argmax(coverage[cand_i, cand_j])
+        i, j = cand_i[best], cand_j[best]
+        covered = int(coverage[i, j])
+        touchdowns.append((j, i))
+        n_die.append(covered)
+        remaining -= covered
+        untested[i:i + sites.shape[0], j:j + sites.shape[1]][sites] = 0
+
+        # Only positions that overlap this touchdown have changed.
+        rows = slice(max(i - pad_y, 0), min(i + pad_y + 1, n_rows))
+        cols = slice(max(j - pad_x, 0), min(j + pad_x + 1, n_cols))
+        coverage[rows, cols] = _coverage(untested, sites, rows, cols)
+
+    return np.array(touchdowns, dtype=int) + low, np.array(n_die, dtype=int)
+
+
+def _band_plan(probe_xy, n_x, n_y, phase):
+    """
+    Split the rows into bands of ``n_y`` starting ``phase`` rows above the
+    top die, then cover each band from left to right. For a rectangular
+    pattern this is the fewest touchdowns for that set of bands.
+    """
+    cols, rows = probe_xy[:, 0], probe_xy[:, 1]
+    top = rows.min() - phase
+    band = (rows - top) // n_y
+    order = np.lexsort((cols, band))
+    cols, band = cols[order], band[order]
+    bounds = np.flatnonzero(np.diff(band)) + 1
+
+    touchdowns = []
+    n_die = []
+    band_rows = top + band[np.concatenate(([0], bounds))] * n_y
+    for band_cols, band_row in zip(np.split(cols, bounds), band_rows):
+        k = 0
+        while k < len(band_cols):
+            left = band_cols[k]
+            after = np.searchsorted(band_cols, left + n_x)
+            touchdowns.append((left, band_row))
+            n_die.append(after - k)
+            k = after
+    return np.array(touchdowns, dtype=int), np.array(n_die, dtype=int)
+
+
+def plan_touchdowns(probe_xy, sites=(2, 2)):
+    """
+    Find a small set of touchdowns that tests every probe die.
+
+    Parameters:
+    -----------
+    probe_xy : array-like of int
+        The grid (col, row) of every die to test, shape ``(n, 2)``.
+    sites : tuple of ints or array-like of bool, optional
+        Either ``(n_x, n_y)`` for a rectangular pattern or a 2D boolean
+        array of sites, row 0 at the top.
+
+    Returns:
+    --------
+    plan : ``TouchdownPlan``
+        Touchdowns are in row serpentine order.
+    """
+    if isinstance(sites, tuple):
+        sites = site_pattern(*sites)
+    sites = np.asarray(sites, dtype=bool)
+    probe_xy = np.asarray(probe_xy, dtype=int).reshape(-1, 2)
+    if len(probe_xy) == 0:
+        return TouchdownPlan(np.empty((0, 2), dtype=int),
+                             np.empty(0, dtype=int), sites)
+
+    plans = [_greedy_plan(probe_xy, sites)]
+    if sites.all():
+        n_y, n_x = sites.shape
+        for phase in range(n_y):
+            plans.append(_band_plan(probe_xy, n_x, n_y, phase))
+        # Column bands, by swapping X and Y.
+        for phase in range(n_x):
+            touchdowns, n_die = _band_plan(probe_xy[:, ::-1], n_y, n_x,
+                                           phase)
+            plans.append((touchdowns[:, ::-1], n_die))
+
+    touchdowns, n_die = min(plans, key=lambda plan: len(plan[0]))
+    order = _serpentine(touchdowns)
+    return TouchdownPlan(touchdowns[order], n_die[order], sites)
+
+
+def write_plan(fname, plan):
+    """
+    Write a touchdown plan as CSV.
+
+    Each line is the step number, the grid (col, row) of the top-left site
+    and the number of die tested.
+    """
+    header = "# {}x{} sites, {} touchdowns, {:.1%} site utilization\n"
+    with open(fname, 'w') as openf:
+        openf.write(header.format(plan.sites.shape[1],
+                                  plan.sites.shape[0],
+                                  plan.n_touchdowns,
+                                  plan.utilization))
+        openf.write("Step,Col,Row,Die\n")
+        for step, ((col, row), n_die) in enumerate(zip(plan.touchdowns,
+                                                      plan.n_die), 1):
+            openf.write("{},{},{},{}\n".format(step, col, row, n_die))
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              render.py
+@author:            Douglas Thor
+@created:           2019-10-14
+@descr:             Headless (wx-free) rendering of wafer maps.
+
+                    Turns a die map - the same ``(x, y, status)`` coord list
+                    that MainPanel hands to ``wm_core.WaferMapPanel`` - into
+                    a PNG (via a NumPy raster) or an SVG (via a streaming
+                    writer). Meant for report pipelines that need a picture
+                    of the wafer map without starting a GUI.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import math
+import os
+import struct
+import zlib
+
+# Third Party
+import numpy as np
+
+# Package / Application
+from gdwcalc import compare
+from gdwcalc import engine
+from gdwcalc import geometry
+from gdwcalc import scheduler
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+# Die statuses, in legend order, and their colors. MainPanel builds its
+# wx.Colour legend from these so that the GUI and the reports always match.
+LEGEND_VALUES = [
+                 "flat",
+                 "excl",
+                 "probe",
+                 "flatExcl",
+                 "scribe",
+                 "keepout",
+                 ]
+LEGEND_COLORS = [
+                 (191, 0, 0),
+                 (0, 191, 191),
+                 (95, 191, 0),
+                 (95, 0, 191),
+                 (152, 191, 0),
+                 (191, 95, 0),
+                 ]
+
+# Same as the wafer_map defaults.
+BACKGROUND_COLOR = (0, 0, 0)
+GRIDLINE_COLOR = (64, 64, 64)
+WAFER_EDGE_COLOR = (255, 0, 0)
+
+# How far past the wafer edge the image extends, as a fraction of the radius.
+MARGIN = 1.05
+
+
+# ---------------------------------------------------------------------------
+### Rasterizing
+# ---------------------------------------------------------------------------
+def _status_lut(coord_list):
+    """
+    Build a 2D lookup table of legend index + 1 (0 = no die) by grid coord.
+
+    Returns the table and the (col, row) grid coord of its [0, 0] element.
+    """
+    if len(coord_list) == 0:
+        return np.zeros((1, 1), dtype=np.uint8), (0, 0)
+
+    codes = {status: n + 1 for n, status in enumerate(LEGEND_VALUES)}
+    cols = np.array([die[0] for die in coord_list], dtype=np.int64)
+    rows = np.array([die[1] for die in coord_list], dtype=np.int64)
+    vals = np.array([codes[die[2]] for die in coord_list], dtype=np.uint8)
+
+    min_col = cols.min()
+    min_row = rows.min()
+    lut = np.zeros((rows.max() - min_row + 1, cols.max() - min_col + 1),
+                   dtype=np.uint8)
+    lut[rows - min_row, cols - min_col] = vals
+    return lut, (min_col, min_row)
+
+
+def rasterize(coord_list, die_xy, center_xy, dia, size=256, gridlines=True,
+              outline=True):
+    """
+    Rasterize a die map to an RGB image.
+
+    Each pixel is mapped back to a grid coordinate with the same math as
+    ``wm_utils.coord_to_grid``, so the whole image is a single fancy-index
+    into a small status lookup table rather than one rectangle per die.
+
+    Parameters:
+    -----------
+    coord_list : list of (x, y, status) tuples
+        The die map. ``status`` must be one of ``LEGEND_VALUES``.
+    die_xy : tuple of floats
+        The grid pitch in mm: the die size plus any street.
+    center_xy : tuple of floats
+        The grid coordinates of the wafer center.
+    dia : int or float
+        The wafer diameter in mm.
+    size : int, optional
+        The width and height of the image in pixels.
+    gridlines : bool, optional
+        If ``True``, draw the die edges.
+    outline : bool, optional
+        If ``True``, draw the wafer edge and flat.
+
+    Returns:
+    --------
+    img : ``numpy.ndarray``
+        A ``(size, size, 3)`` array of ``uint8``.
+    """
+    die_x, die_y = die_xy
+    rad = geometry.require_diameter(dia, "rasterize") / 2
+    extent = rad * MARGIN
+    scale = 2 * extent / size
+
+    # World coordinates of each pixel center. Image row 0 is the top.
+    world = -extent + (np.arange(size) + 0.5) * scale
+    pix_x = world
+    pix_y = world[::-1]
+
+    # Grid coordinates of each pixel column and row.
+    grid_x = np.floor(center_xy[0] + pix_x / die_x + 0.5).astype(np.int64)
+    grid_y = np.floor(center_xy[1] - pix_y / die_y + 0.5).astype(np.int64)
+
+    lut, (min_col, min_row) = _status_lut(coord_list)
+    lut_x = grid_x - min_col
+    lut_y = grid_y - min_row
+    valid_x = (lut_x >= 0) & (lut_x < lut.shape[1])
+    valid_y = (lut_y >= 0) & (lut_y < lut.shape[0])
+
+    codes = lut[np.clip(lut_y, 0, lut.shape[0] - 1)[:, None],
+                np.clip(lut_x, 0, lut.shape[1] - 1)[None, :]]
+    codes[~(valid_y[:, None] & valid_x[None, :])] = 0
+
+    palette = np.array([BACKGROUND_COLOR] + LEGEND_COLORS, dtype=np.uint8)
+    img = palette[codes]
+
+    if gridlines:
+        # A die edge lies between two pixels whose grid coords differ.
+        edge_x = np.zeros(size, dtype=bool)
+        edge_x[1:] = grid_x[1:] != grid_x[:-1]
+        edge_y = np.zeros(size, dtype=bool)
+        edge_y[1:] = grid_y[1:] != grid_y[:-1]
+        edges = (edge_y[:, None] | edge_x[None, :]) & (codes > 0)
+        img[edges] = GRIDLINE_COLOR
+
+    if outline:
+        dist = np.hypot(pix_x[None, :], pix_y[:, None])
+        flat_y = engine.flat_location(dia)
+        on_edge = (np.abs(dist - rad) <= scale) & (pix_y[:, None] >= flat_y)
+        on_flat = ((np.abs(pix_y - flat_y) <= scale / 2)[:, None]
+                   & (dist <= rad))
+        img[on_edge | on_flat] = WAFER_EDGE_COLOR
+
+    return img
+
+
+# ---------------------------------------------------------------------------
+### Writers
+# ---------------------------------------------------------------------------
+def _png_chunk(tag, data):
+    """ Pack a single PNG chunk. """
+    chunk = tag + data
+    return (struct.pack(">I", len(data))
+            + chunk
+            + struct.pack(">I", zlib.crc32(chunk) & 0xffffffff))
+
+
+def write_png(fname, img):
+    """
+    Write an RGB ``uint8`` image array to a PNG file.
+
+    Uses only ``zlib`` so that no imaging library is needed.
+
+    Parameters:
+    -----------
+    fname : str or file-like object
+        The path or binary file object to write to.
+    img : ``numpy.ndarray``
+        A ``(height, width, 3)`` array of ``uint8``.
+    """
+    height, width, _ = img.shape
+
+    # Every scanline is prefixed with filter type 0 (None).
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = img.reshape(height, width * 3)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    data = (b"\x89PNG\r\n\x1a\n"
+            + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+            + _png_chunk(b"IEND", b""))
+
+    if hasattr(fname, "write"):
+        fname.write(data)
+    else:
+        with open(fname, 'wb') as openf:
+            openf.write(data)
+
+
+def render_png(fname, coord_list, die_xy, center_xy, dia, size=256,
+               gridlines=True, outline=True):
+    """
+    Render a die map to a PNG file.
+
+    See ``rasterize`` for a description of the parameters.
+    """
+    img = rasterize(coord_list, die_xy, center_xy, dia, size,
+                    gridlines, outline)
+    write_png(fname, img)
+
+
+def _hex(color):
+    """ Convert an RGB tuple to an SVG hex color string. """
+    return "#{:02x}{:02x}{:02x}".format(*color)
+
+
+def write_svg(openf, coord_list, die_xy, center_xy, dia, gridlines=True,
+              outline=True):
+    """
+    Write a die map as SVG to an open text file.
+
+    Elements are written one die at a time, so memory use does not grow with
+    the size of the map. Units are mm and the wafer center is the origin.
+
+    Parameters:
+    -----------
+    openf : file-like object
+        The open text file to write to.
+    coord_list : list of (x, y, status) tuples
+        The die map. ``status`` must be one of ``LEGEND_VALUES``.
+    die_xy : tuple of floats
+        The grid pitch in mm: the die size plus any street.
+    center_xy : tuple of floats
+        The grid coordinates of the wafer center.
+    dia : int or float
+        The wafer diameter in mm.
+    gridlines : bool, optional
+        If ``True``, stroke the die edges.
+    outline : bool, optional
+        If ``True``, draw the wafer edge and flat.
+    """
+    die_x, die_y = die_xy
+    rad = geometry.require_diameter(dia, "write_svg") / 2
+    extent = rad * MARGIN
+
+    openf.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    openf.write('<svg xmlns="http://www.w3.org/2000/svg" '
+                'viewBox="{0:g} {0:g} {1:g} {1:g}" '
+                'width="{1:g}mm" height="{1:g}mm">\n'.format(-extent,
+                                                              2 * extent))
+    openf.write('<style>\n')
+    stroke = _hex(GRIDLINE_COLOR) if gridlines else "none"
+    for status, color in zip(LEGEND_VALUES, LEGEND_COLORS):
+        openf.write('.{} {{fill:{};stroke:{};stroke-width:0.1}}\n'.format(
+            status, _hex(color), stroke))
+    openf.write('</style>\n')
+    openf.write('<rect x="{0:g}" y="{0:g}" width="{1:g}" height="{1:g}" '
+                'fill="{2}"/>\n'.format(-extent, 2 * extent,
+                                        _hex(BACKGROUND_COLOR)))
+
+    # SVG +y is down, same as grid rows, so no flip is needed.
+    rect = '<rect class="{}" x="{:.4f}" y="{:.4f}" width="{:g}" height="{:g}"/>\n'
+    for col, row, status in coord_list:
+        openf.write(rect.format(status,
+                                die_x * (col - center_xy[0] - 0.5),
+                                die_y * (row - center_xy[1] - 0.5),
+                                die_x,
+                                die_y,
+                                ))
+
+    if outline:
+        flat_y = engine.flat_location(dia)
+        edge = _hex(WAFER_EDGE_COLOR)
+        if flat_y > -rad:
+            flat_x = math.sqrt(rad**2 - flat_y**2)
+            openf.write('<path d="M {0:.4f} {1:.4f} A {2:g} {2:g} 0 1 1 '
+                        '{3:.4f} {1:.4f} Z" fill="none" stroke="{4}" '
+                        'stroke-width="0.5"/>\n'.format(-flat_x, -flat_y,
+                                                        rad, flat_x, edge))
+        else:
+            openf.write('<circle cx="0" cy="0" r="{:g}" fill="none" '
+                        'stroke="{}" stroke-width="0.5"/>\n'.format(rad, edge))
+
+    openf.write('</svg>\n')
+
+
+def render_svg(fname, coord_list, die_xy, center_xy, dia, gridlines=True,
+               outline=True):
+    """
+    Render a die map to an SVG file.
+
+    See ``write_svg`` for a description of the parameters.
+    """
+    with open(fname, 'w') as openf:
+        write_svg(openf, coord_list, die_xy, center_xy, dia,
+                  gridlines, outline)
+
+
+# ---------------------------------------------------------------------------
+### Catalog Rendering
+# ---------------------------------------------------------------------------
+def _render_product(job):
+    """
+    Calculate and render a single product. Runs in a worker process.
+
+    ``job`` is a (product, out_dir, fmt, size) tuple. Returns the
+    product name, the output file name, and the GDW.
+    """
+    product, out_dir, fmt, size = job
+    dia = product['dia']
+    die_map = compare.setup_die_map(product)
+    coord_list = die_map.coord_list()
+    center_xy = die_map.center_xy
+    n_probe = die_map.gdw
+
+    # The grid steps by the pitch, which includes the street.
+    fname = os.path.join(out_dir, "{}.{}".format(product['name'], fmt))
+    if fmt == "png":
+        render_png(fname, coord_list, die_map.pitch_xy, center_xy, dia, size)
+    else:
+        render_svg(fname, coord_list, die_map.pitch_xy, center_xy, dia)
+
+    return product['name'], fname, n_probe
+
+
+def render_catalog(products, out_dir, fmt="png", size=128, max_workers=None):
+    """
+    Render a thumbnail for every product in a catalog using a process pool.
+
+    Parameters:
+    -----------
+    products : iterable of dict
+        Each product needs ``name``, ``die_xy`` and ``dia`` keys and may
+        have ``ee``, ``fe``, ``north_limit``, ``offset``, ``units`` and
+        ``street_xy`` keys, which default to 4.5, 4.5, None, None
+        (optimize the offset), None (float mm; see ``engine.classify``)
+        and (0, 0). These are the same dicts as ``batch.sweep_catalog``
+        takes, and the GDW matches it.
+    out_dir : str
+        The directory to write the images to. Created if needed.
+    fmt : str, optional
+        Either ``"png"`` or ``"svg"``.
+    size : int, optional
+        The PNG width and height in pixels. Ignored for SVG.
+    max_workers : int, optional
+        The number of worker processes. Defaults to the shared
+        ``scheduler``, at batch priority.
+
+    Returns:
+    --------
+    results : list of (name, fname, gdw) tuples
+        One per product, in catalog order.
+    """
+    if fmt not in ("png", "svg"):
+        raise ValueError("fmt must be 'png' or 'svg'")
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+
+    jobs = [(product, out_dir, fmt, size) for product in products]
+    return scheduler.batch_map(_render_product, jobs, 8, max_workers)
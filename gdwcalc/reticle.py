@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              reticle.py
+@author:            Douglas Thor
+@created:           2019-10-18
+@descr:             Multi-die reticle (shot) maps.
+
+                    A reticle exposes an array of die per shot, so litho
+                    cost is driven by the number of shots rather than the
+                    number of die. Shots are classified first: a shot that
+                    is entirely inside the edge exclusion and clear of the
+                    row limits is all probe-able, and a shot that is
+                    entirely outside the edge exclusion has nothing to
+                    probe. Only the remaining boundary shots are broken down
+                    into individual die.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+
+# Third Party
+import numpy as np
+
+# Package / Application
+from gdwcalc import engine
+from gdwcalc import exclusion
+from gdwcalc import geometry
+from gdwcalc import keepout
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+class ShotMap(object):
+    """
+    The result of ``shot_map``.
+
+    Parameters:
+    -----------
+    probe_counts : ``numpy.ndarray`` of int
+        The number of probe-able die in each shot, shape
+        ``(n_rows, n_cols)``. Row 0 is the top of the wafer.
+    x_centers, y_centers : ``numpy.ndarray``
+        The X and Y coordinates (mm) of the shot centers, top row first.
+    reticle_xy : tuple of ints
+        The number of die per shot in X and Y.
+    pitch_xy : tuple of floats
+        The die pitch (die size + street width) in mm.
+    die_offset : tuple of floats
+        The mm location of a die center relative to the wafer center, for
+        use as the ``center_offset`` of ``engine.classify``.
+    """
+    def __init__(self, probe_counts, x_centers, y_centers, reticle_xy,
+                 pitch_xy, die_offset):
+        self.probe_counts = probe_counts
+        self.x_centers = x_centers
+        self.y_centers = y_centers
+        self.reticle_xy = reticle_xy
+        self.pitch_xy = pitch_xy
+        self.die_offset = die_offset
+
+    @property
+    def die_per_shot(self):
+        """ The number of die in a full shot """
+        return self.reticle_xy[0] * self.reticle_xy[1]
+
+    @property
+    def shot_size(self):
+        """ The (x, y) size of a shot in mm """
+        return (self.reticle_xy[0] * self.pitch_xy[0],
+                self.reticle_xy[1] * self.pitch_xy[1])
+
+    @property
+    def gdw(self):
+        """ The number of probe-able die across all shots """
+        return int(self.probe_counts.sum())
+
+    @property
+    def n_shots(self):
+        """ The number of shots with at least one probe-able die """
+        return int(np.count_nonzero(self.probe_counts))
+
+    @property
+    def n_full(self):
+        """ The number of shots where every die is probe-able """
+        return int(np.count_nonzero(self.probe_counts == self.die_per_shot))
+
+    @property
+    def n_partial(self):
+        """ The number of shots with some, but not all, die probe-able """
+        return self.n_shots - self.n_full
+
+    def shot_list(self):
+        """
+        Return the shots that have at least one probe-able die.
+
+        A list of (x_ll, y_ll, probe_count) tuples, where the coordinates
+        are the lower-left corner of the shot in mm.
+        """
+        rows, cols = np.nonzero(self.probe_counts)
+        size_x, size_y = self.shot_size
+        x_ll = self.x_centers[cols] - size_x / 2
+        y_ll = self.y_centers[rows] - size_y / 2
+        return list(zip(x_ll.tolist(),
+                        y_ll.tolist(),
+                        self.probe_counts[rows, cols].tolist()))
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def shot_offset(die_map, reticle_xy, phase=(0, 0)):
+    """
+    Return the mm shot offset that lines a reticle up with a DieMap's grid.
+
+    ``phase`` is the (column, row) of the die that starts a shot, counted
+    from the bottom-left die of the map's grid.
+    """
+    pitch_x, pitch_y = die_map.pitch_xy
+    first_x = die_map.x_centers[phase[0]]
+    first_y = die_map.y_centers[-1 - phase[1]]
+    return (float(first_x + (reticle_xy[0] - 1) / 2 * pitch_x),
+            float(first_y + (reticle_xy[1] - 1) / 2 * pitch_y))
+
+
+def shot_phase(die_map, reticle_xy, offset):
+    """
+    Inverse of ``shot_offset``: return the phase of a mm shot offset on a
+    DieMap's grid.
+    """
+    pitch_x, pitch_y = die_map.pitch_xy
+    first_x = offset[0] - (reticle_xy[0] - 1) / 2 * pitch_x
+    first_y = offset[1] - (reticle_xy[1] - 1) / 2 * pitch_y
+    col = int(round((first_x - die_map.x_centers[0]) / pitch_x))
+    row = int(round((first_y - die_map.y_centers[-1]) / pitch_y))
+    return col % reticle_xy[0], row % reticle_xy[1]
+
+
+def _die_in_shot(n_die, pitch):
+    """ Return the die center offsets from the shot center along one axis """
+    return (np.arange(n_die) - (n_die - 1) / 2) * pitch
+
+
+def shot_map(die_xy, reticle_xy, dia, offset, excl, flat_excl,
+             north_limit=None, street_xy=(0, 0), keepouts=()):
+    """
+    Lay a reticle grid over the wafer and count the probe-able die per shot.
+
+    Parameters:
+    -----------
+    die_xy : tuple of floats
+        The die body size in mm.
+    reticle_xy : tuple of ints
+        The number of die per shot in X and Y, e.g. ``(4, 3)``.
+    dia : int or float
+        The wafer diameter in mm.
+    offset : tuple
+        The X and Y shot grid offsets. Each is "odd" (a shot is centered on
+        the wafer), "even" (a shot corner is on the wafer center) or the
+        location in mm of a shot center relative to the wafer center.
+    excl, flat_excl, north_limit, street_xy, keepouts :
+        See ``engine.classify``.
+
+    Returns:
+    --------
+    shot_map : ``ShotMap``
+    """
+    n_x, n_y = reticle_xy
+    pitch_x = die_xy[0] + street_xy[0]
+    pitch_y = die_xy[1] + street_xy[1]
+    rad = geometry.require_diameter(dia, "shot_map") / 2
+
+    shot_x, _ = engine.grid_axis(rad, n_x * pitch_x,
+                                 engine._offset_fraction(offset[0],
+                                                         n_x * pitch_x))
+    shot_y, _ = engine.grid_axis(rad, n_y * pitch_y,
+                                 engine._offset_fraction(offset[1],
+                                                         n_y * pitch_y))
+    shot_y = shot_y[::-1]
+
+    # The extent of the die bodies in a shot, which leaves off the outer
+    # half street.
+    half_x = (n_x * pitch_x - street_xy[0]) / 2
+    half_y = (n_y * pitch_y - street_xy[1]) / 2
+    # An exclusion profile is only exact per die, so shots inside its widest
+    # width are interior and shots outside its narrowest have no probe die.
+    if exclusion.is_profile(excl):
+        inner_rad = max(rad - excl.max_width, 0)
+        excl_rad = max(rad - excl.min_width, 0)
+    else:
+        inner_rad = excl_rad = max(rad - excl, 0)
+
+    far_sq = ((np.abs(shot_y) + half_y)[:, None]**2
+              + (np.abs(shot_x) + half_x)[None, :]**2)
+    near_sq = (np.maximum(np.abs(shot_y) - half_y, 0)[:, None]**2
+               + np.maximum(np.abs(shot_x) - half_x, 0)[None, :]**2)
+
+    # Rows of shots that are clear of the flat, flat exclusion and top-side
+    # limits.
+    flat_y = engine.flat_location(dia)
+    row_clear = shot_y - half_y >= flat_y + max(flat_excl, 0)
+    if north_limit is not None:
+        row_clear &= shot_y + half_y <= north_limit
+
+    interior = (far_sq <= inner_rad**2) & row_clear[:, None]
+    if keepouts:
+        interior &= ~keepout.grid_mask(shot_x, shot_y, (2 * half_x,
+                                                        2 * half_y),
+                                       keepouts)
+    boundary = ~interior & (near_sq < excl_rad**2)
+
+    probe_counts = np.where(interior, n_x * n_y, 0)
+
+    # Descend into the boundary shots only.
+    rows, cols = np.nonzero(boundary)
+    if len(rows):
+        die_x = shot_x[cols][:, None, None] + _die_in_shot(n_x, pitch_x)
+        die_y = (shot_y[rows][:, None, None]
+                 + _die_in_shot(n_y, pitch_y)[:, None])
+        status = engine.die_status(die_x, die_y, die_xy, dia, excl,
+                                   flat_excl, north_limit, keepouts)
+        probe_counts[rows, cols] = (status == engine.PROBE).sum(axis=(1, 2))
+
+    # A die center in the first column and row of a shot.
+    die_offset = (float(shot_x[0] + _die_in_shot(n_x, pitch_x)[0]),
+                  float(shot_y[0] + _die_in_shot(n_y, pitch_y)[0]))
+    return ShotMap(probe_counts, shot_x, shot_y, tuple(reticle_xy),
+                   (pitch_x, pitch_y), die_offset)
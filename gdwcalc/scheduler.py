@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              scheduler.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             A priority job scheduler shared by the GUI, the batch
+                    sweeps and the local service.
+
+                    Jobs are queued in one of three priority classes:
+                    interactive (setup comparisons in the GUI),
+                    service (``gdwcalc.service`` requests) and batch
+                    (catalog sweeps, Monte Carlo, thumbnails). At most
+                    ``max_workers`` tasks are in the process pool at once,
+                    and a free worker always takes the highest priority
+                    task that is waiting. Batch jobs are split into chunks
+                    that are queued separately, so a comparison only
+                    waits for the chunks that are already running, never
+                    for the rest of a sweep.
+
+                    The Calculate button (including its rotation search)
+                    and mask generation don't use the scheduler. They run
+                    in the GUI process, because the dialogs that trigger
+                    them need the new die map right away.
+
+                    If a worker process dies, the pool is broken: the
+                    tasks that were running fail with ``BrokenProcessPool``
+                    and the next task starts a new pool.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import collections
+import concurrent.futures
+import concurrent.futures.process
+import heapq
+import itertools
+import multiprocessing
+import sys
+import threading
+import time
+
+# Third Party
+import numpy as np
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+# Priority classes, most urgent first.
+INTERACTIVE = 0
+SERVICE = 1
+BATCH = 2
+PRIORITY_NAMES = ("interactive", "service", "batch")
+
+# The number of recent jobs and tasks that the latency metrics cover.
+METRIC_WINDOW = 1000
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+class _Job(object):
+    """ A submitted job: one or more tasks that complete one future """
+    def __init__(self, priority, n_tasks, chunked=False):
+        self.priority = priority
+        self.chunked = chunked
+        self.future = concurrent.futures.Future()
+        self.results = [None] * n_tasks
+        self.remaining = n_tasks
+        self.failed = False
+        self.submitted = time.perf_counter()
+
+
+class Scheduler(object):
+    """
+    A bounded process pool that runs queued tasks in priority order.
+
+    Parameters:
+    -----------
+    max_workers : int, optional
+        The most tasks that run at once, and the number of worker
+        processes. Defaults to the number of CPUs.
+    mp_context : ``multiprocessing`` context, optional
+        How to start the workers. Defaults to the platform default, which
+        is also used before Python 3.7.
+    """
+    def __init__(self, max_workers=None, mp_context=None):
+        if max_workers is None:
+            max_workers = multiprocessing.cpu_count()
+        self.max_workers = max_workers
+        self.mp_context = mp_context
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queue = []
+        self._seq = itertools.count()
+        self._running = [0] * len(PRIORITY_NAMES)
+        self._queued = [0] * len(PRIORITY_NAMES)
+        self._counts = [collections.Counter() for _ in PRIORITY_NAMES]
+        self._waits = [collections.deque(maxlen=METRIC_WINDOW)
+                       for _ in PRIORITY_NAMES]
+        self._latencies = [collections.deque(maxlen=METRIC_WINDOW)
+                           for _ in PRIORITY_NAMES]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    @property
+    def executor(self):
+        """ The ``ProcessPoolExecutor``, started on first use """
+        if self._executor is None:
+            kwargs = {}
+            if self.mp_context is not None and sys.version_info >= (3, 7):
+                kwargs['mp_context'] = self.mp_context
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                self.max_workers, **kwargs)
+        return self._executor
+
+    def warm(self):
+        """ Start the workers now instead of on the first job """
+        futures = [self.executor.submit(_ping)
+                   for _ in range(self.max_workers)]
+        concurrent.futures.wait(futures)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue ``fn(*args, **kwargs)`` as a single task.
+
+        The priority class is the ``priority`` keyword argument, which
+        defaults to ``INTERACTIVE``. ``fn`` and its arguments must be
+        picklable.
+
+        Returns:
+        --------
+        future : ``concurrent.futures.Future``
+        """
+        priority = kwargs.pop('priority', INTERACTIVE)
+        job = _Job(priority, 1)
+        self._enqueue(job, [(0, fn, args, kwargs)])
+        return job.future
+
+    def map(self, fn, items, priority=BATCH, chunksize=1):
+        """
+        Queue ``fn`` over every item, ``chunksize`` items per task.
+
+        Higher priority tasks that are submitted while the job runs are
+        started at the next chunk boundary.
+
+        Returns:
+        --------
+        future : ``concurrent.futures.Future``
+            Its result is the list of ``fn(item)``, in order.
+        """
+        items = list(items)
+        chunks = [items[start:start + chunksize]
+                  for start in range(0, len(items), chunksize)]
+        job = _Job(priority, len(chunks), chunked=True)
+        if not chunks:
+            job.future.set_result([])
+            return job.future
+        self._enqueue(job, [(n, _run_chunk, (fn, chunk), {})
+                            for n, chunk in enumerate(chunks)])
+        return job.future
+
+    def _enqueue(self, job, tasks):
+        with self._lock:
+            now = time.perf_counter()
+            for index, fn, args, kwargs in tasks:
+                heapq.heappush(self._queue, (job.priority, next(self._seq),
+                                             now, job, index, fn, args,
+                                             kwargs))
+            self._queued[job.priority] += len(tasks)
+            self._counts[job.priority]['submitted'] += 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """ Start waiting tasks, most urgent first, while there is room """
+        started = []
+        rejected = []
+        broken = []
+        with self._lock:
+            while self._queue and sum(self._running) < self.max_workers:
+                item = heapq.heappop(self._queue)
+                (priority, _, queued, job, index, fn, args, kwargs) = item
+                self._queued[priority] -= 1
+                if job.failed:
+                    continue
+                executor = self.executor
+                try:
+                    future = executor.submit(fn, *args, **kwargs)
+                except concurrent.futures.process.BrokenProcessPool:
+                    # A worker died since the last task finished. Put the
+                    # task back and start it in a new pool.
+                    heapq.heappush(self._queue, item)
+                    self._queued[priority] += 1
+                    self._executor = None
+                    broken.append(executor)
+                    continue
+                except Exception as err:
+                    job.failed = True
+                    self._counts[priority]['failed'] += 1
+                    rejected.append((job, err))
+                    continue
+                self._running[priority] += 1
+                self._waits[priority].append(time.perf_counter() - queued)
+                started.append((job, index, future, executor))
+        for executor in broken:
+            executor.shutdown(wait=False)
+        for job, err in rejected:
+            if not job.future.done():
+                job.future.set_exception(err)
+        # A callback runs right away if the task is already done, so it
+        # can't be added while holding the lock.
+        for job, index, future, executor in started:
+            future.add_done_callback(
+                lambda future, job=job, index=index, executor=executor:
+                self._task_done(job, index, future, executor))
+
+    def _task_done(self, job, index, future, executor):
+        """ Record one finished task and start the next one """
+        priority = job.priority
+        error = future.exception()
+        finished = False
+        broken = isinstance(error,
+                            concurrent.futures.process.BrokenProcessPool)
+        with self._lock:
+            if broken and self._executor is executor:
+                # Every task in a broken pool fails. Drop it, so that the
+                # next task starts a new one.
+                self._executor = None
+            else:
+                broken = False
+            self._running[priority] -= 1
+            if not job.failed:
+                if error is not None:
+                    # The job's other queued tasks are skipped.
+                    job.failed = True
+                    finished = True
+                    self._counts[priority]['failed'] += 1
+                else:
+                    job.results[index] = future.result()
+                    job.remaining -= 1
+                    finished = job.remaining == 0
+                    if finished:
+                        self._counts[priority]['completed'] += 1
+                if finished:
+                    self._latencies[priority].append(time.perf_counter()
+                                                     - job.submitted)
+        if broken:
+            executor.shutdown(wait=False)
+        self._dispatch()
+
+        # A job cancelled by ``shutdown`` is already done.
+        if not finished or job.future.done():
+            return
+        if error is not None:
+            job.future.set_exception(error)
+        elif job.chunked:
+            job.future.set_result(
+                list(itertools.chain.from_iterable(job.results)))
+        else:
+            job.future.set_result(job.results[0])
+
+    def metrics(self):
+        """
+        Return the queue depth and latency of each priority class.
+
+        Returns:
+        --------
+        metrics : dict
+            ``PRIORITY_NAMES`` mapped to dicts of ``queued`` and
+            ``running`` tasks, ``submitted``, ``completed`` and ``failed``
+            jobs, and the mean, 95th percentile and max seconds that recent
+            tasks waited in the queue (``wait_*``) and that recent jobs
+            took from submission to completion (``latency_*``).
+        """
+        with self._lock:
+            metrics = {}
+            for priority, name in enumerate(PRIORITY_NAMES):
+                counts = self._counts[priority]
+                entry = {'queued': self._queued[priority],
+                         'running': self._running[priority],
+                         'submitted': counts['submitted'],
+                         'completed': counts['completed'],
+                         'failed': counts['failed'],
+                         }
+                entry.update(_summary("wait", self._waits[priority]))
+                entry.update(_summary("latency", self._latencies[priority]))
+                metrics[name] = entry
+        return metrics
+
+    def shutdown(self, wait=True):
+        """
+        Drop every queued task and stop.
+
+        Parameters:
+        -----------
+        wait : bool, optional
+            Wait for the running tasks to finish. If False, return right
+            away and let the workers exit when their tasks are done.
+        """
+        with self._lock:
+            queue, self._queue = self._queue, []
+            for item in queue:
+                self._queued[item[0]] -= 1
+        for item in queue:
+            job = item[3]
+            if not job.failed:
+                job.failed = True
+                job.future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def _ping():
+    """ Do nothing in a worker, to start it """
+    return None
+
+
+def _run_chunk(fn, chunk):
+    """ Run ``fn`` over one chunk of a ``map`` job. Runs in a worker. """
+    return [fn(item) for item in chunk]
+
+
+def _summary(prefix, samples):
+    """ The mean, 95th percentile and max of latency samples """
+    if not samples:
+        return {prefix + "_mean": 0.0, prefix + "_p95": 0.0,
+                prefix + "_max": 0.0}
+    samples = np.fromiter(samples, dtype=float)
+    return {prefix + "_mean": float(samples.mean()),
+            prefix + "_p95": float(np.percentile(samples, 95)),
+            prefix + "_max": float(samples.max())}
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler():
+    """
+    Return the process-wide scheduler, creating it on first use.
+
+    Everything that calculates in a pool submits to this one scheduler, so
+    that a sweep and an interactive calculation share the same bounded set
+    of workers.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Scheduler()
+        return _shared
+
+
+def shutdown_shared(wait=True):
+    """
+    Shut down the process-wide scheduler, if it was started. ``wait`` is
+    passed to ``Scheduler.shutdown``.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is not None:
+            _shared.shutdown(wait)
+            _shared = None
+
+
+def batch_map(fn, items, chunksize=1, max_workers=None, priority=BATCH):
+    """
+    Run ``fn`` over ``items`` at batch priority and return the results.
+
+    Uses the shared scheduler, unless ``max_workers`` is given, in which
+    case a private scheduler of that size is used for this call only.
+    """
+    if max_workers is None:
+        return shared_scheduler().map(fn, items, priority,
+                                      chunksize).result()
+    with Scheduler(max_workers) as scheduler:
+        return scheduler.map(fn, items, priority, chunksize).result()
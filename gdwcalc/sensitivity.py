@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              sensitivity.py
+@author:            Douglas Thor
+@created:           2019-10-16
+@descr:             GDW as a function of a single exclusion parameter.
+
+                    For a fixed die grid, each die has a critical value for
+                    the edge exclusion, flat exclusion and top-side scribe
+                    limit: the point past which it is no longer probe-able.
+                    Sorting those once gives the entire GDW step function,
+                    rather than re-classifying the wafer for every value.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+
+# Third Party
+import numpy as np
+
+# Package / Application
+from gdwcalc import engine
+from gdwcalc import geometry
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+class StepCurve(object):
+    """
+    GDW as a step function of one parameter.
+
+    Parameters:
+    -----------
+    critical : array-like
+        The critical parameter value of every die that could be probed.
+    decreasing : bool
+        If ``True``, a die is probe-able while the parameter is <= its
+        critical value (exclusion widths). If ``False``, while the
+        parameter is >= its critical value (the top-side scribe limit).
+    """
+    def __init__(self, critical, decreasing=True):
+        self.critical = np.sort(np.asarray(critical, dtype=float))
+        self.decreasing = decreasing
+
+    def __call__(self, value):
+        """ Return the GDW at ``value``, which may be an array. """
+        if self.decreasing:
+            n_lost = np.searchsorted(self.critical, value, side='left')
+            return len(self.critical) - n_lost
+        return np.searchsorted(self.critical, value, side='right')
+
+    def steps(self):
+        """
+        Return the breakpoints and the GDW at each one.
+
+        The GDW changes only at these values, so this is the whole curve.
+        """
+        values = np.unique(self.critical)
+        return values, self(values)
+
+    def plot_points(self, low, high):
+        """
+        Return the (x, y) vertices of the step curve between ``low`` and
+        ``high``, suitable for drawing as a single polyline.
+        """
+        values = self.critical[(self.critical > low) & (self.critical < high)]
+        values = np.unique(values)
+        x = np.concatenate(([low], np.repeat(values, 2), [high]))
+
+        # The value just before and just after each breakpoint.
+        edges = np.concatenate(([low], values, [high]))
+        if self.decreasing:
+            levels = self(np.nextafter(edges[1:], -np.inf))
+        else:
+            levels = self(edges[:-1])
+        y = np.repeat(levels, 2)
+        return list(zip(x.tolist(), y.tolist()))
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def _probe_centers(die_map):
+    """ Return the x and y centers of every probe die in a DieMap. """
+    rows, cols = np.nonzero(die_map.status == engine.PROBE)
+    return die_map.x_centers[cols], die_map.y_centers[rows]
+
+
+def edge_exclusion_curve(die_xy, dia, center_offset, flat_excl,
+                         north_limit=None, street_xy=(0, 0)):
+    """
+    GDW versus edge exclusion for a fixed grid.
+
+    A die's critical edge exclusion is the wafer radius minus the distance
+    to its farthest corner.
+
+    See ``engine.classify`` for a description of the parameters.
+
+    Returns:
+    --------
+    curve : ``StepCurve``
+    """
+    geometry.require_diameter(dia, "edge_exclusion_curve")
+    # With no edge exclusion the other limits are the only ones that apply.
+    die_map = engine.classify(die_xy, dia, center_offset, 0, flat_excl,
+                              north_limit, street_xy=street_xy)
+    x, y = _probe_centers(die_map)
+    far = np.hypot(np.abs(x) + die_xy[0] / 2, np.abs(y) + die_xy[1] / 2)
+    return StepCurve(dia / 2 - far, decreasing=True)
+
+
+def flat_exclusion_curve(die_xy, dia, center_offset, excl, north_limit=None,
+                         street_xy=(0, 0)):
+    """
+    GDW versus flat exclusion for a fixed grid.
+
+    A die's critical flat exclusion is the distance from its bottom edge
+    to the wafer flat (or the bottom of the wafer if there is no flat).
+
+    See ``engine.classify`` for a description of the parameters.
+
+    Returns:
+    --------
+    curve : ``StepCurve``
+    """
+    geometry.require_diameter(dia, "flat_exclusion_curve")
+    die_map = engine.classify(die_xy, dia, center_offset, excl, 0,
+                              north_limit, street_xy=street_xy)
+    _, y = _probe_centers(die_map)
+    bottom = y - die_xy[1] / 2
+    return StepCurve(bottom - engine.flat_location(dia), decreasing=True)
+
+
+def north_limit_curve(die_xy, dia, center_offset, excl, flat_excl,
+                      street_xy=(0, 0)):
+    """
+    GDW versus the top-side scribe Y limit for a fixed grid.
+
+    A die's critical limit is the Y coordinate of its top edge. Unlike the
+    exclusions, GDW increases with the limit.
+
+    See ``engine.classify`` for a description of the parameters.
+
+    Returns:
+    --------
+    curve : ``StepCurve``
+    """
+    die_map = engine.classify(die_xy, dia, center_offset, excl, flat_excl,
+                              None, street_xy=street_xy)
+    _, y = _probe_centers(die_map)
+    return StepCurve(y + die_xy[1] / 2, decreasing=False)
@@ -0,0 +1,441 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              service.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             A local JSON over HTTP GDW service.
+
+                    Serves the same calculation as the Calculate button to
+                    tools that don't have a GUI::
+
+                        python -m gdwcalc.service --port 8042
+
+                    ``POST /max_gdw`` picks the best odd/even grid and
+                    ``POST /classify`` uses a fixed ``offset``. Both take a
+                    JSON object with the keys of ``compare.setup_die_map``
+                    and return the GDW and losses. ``GET /stats`` returns
+                    the request counters.
+
+                    The server is a single asyncio event loop. Requests
+                    are normalized to a cache key; a result that is cached
+                    is returned straight from the loop, and identical
+                    requests that arrive while one is being calculated all
+                    wait on the same future. Only the calculations
+                    themselves go to the process pool, as service priority
+                    jobs in a ``scheduler.Scheduler``. Its workers are
+                    started before the first connection and never forked
+                    from the server, so they don't hold client sockets
+                    open. ``GET /metrics`` returns the scheduler's queue
+                    depth and latency.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import argparse
+import asyncio
+import collections
+import json
+import multiprocessing
+import numbers
+
+# Package / Application
+from . import aio
+from . import compare
+from . import engine
+from . import scheduler
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8042
+
+# The number of results kept in the LRU cache.
+CACHE_SIZE = 4096
+
+# The largest request body that is read.
+MAX_BODY = 64 * 1024
+
+# The largest die grid that is calculated, ``(dia / pitch_x) * (dia /
+# pitch_y)``. A 0.3 mm pitch on a 300 mm wafer is at the limit; the
+# calculation needs several arrays of this many elements.
+MAX_GRID_CELLS = 1000000
+
+# The endpoints that calculate, and whether they need an ``offset``.
+ENDPOINTS = {"/max_gdw": False, "/classify": True}
+
+REASONS = {200: "OK",
+           400: "Bad Request",
+           404: "Not Found",
+           405: "Method Not Allowed",
+           413: "Payload Too Large",
+           500: "Internal Server Error",
+           }
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+class RequestError(Exception):
+    """ A request that gets an HTTP error response """
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class GdwService(object):
+    """
+    The GDW HTTP server.
+
+    Parameters:
+    -----------
+    host : str, optional
+        The interface to listen on. Defaults to localhost only.
+    port : int, optional
+        The port to listen on. 0 picks a free port, which is then in
+        ``port`` once the server has started.
+    max_workers : int, optional
+        The number of worker processes. Defaults to the number of CPUs.
+        Ignored if a ``job_scheduler`` is given.
+    cache_size : int, optional
+        The number of results to keep.
+    job_scheduler : ``scheduler.Scheduler``, optional
+        Share an existing scheduler, whose workers must already be
+        running. By default the service starts, and stops, its own.
+
+    Public Attributes:
+    ------------------
+    stats : ``collections.Counter``
+        ``requests``, ``computed``, ``cached`` and ``coalesced`` counts.
+    """
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, max_workers=None,
+                 cache_size=CACHE_SIZE, job_scheduler=None):
+        self.host = host
+        self.port = port
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.stats = collections.Counter()
+        self._cache = collections.OrderedDict()
+        self._pending = {}
+        self._scheduler = job_scheduler
+        self._own_scheduler = job_scheduler is None
+        self._server = None
+
+    async def start(self):
+        """ Start the worker pool and begin listening """
+        if self._scheduler is None:
+            self._scheduler = scheduler.Scheduler(
+                self.max_workers or multiprocessing.cpu_count(),
+                _mp_context())
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._scheduler.warm)
+        self._server = await asyncio.start_server(self._handle_connection,
+                                                  self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """ Start, if needed, and serve until cancelled """
+        if self._server is None:
+            await self.start()
+        try:
+            await aio.wait_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """ Stop listening and shut down the worker pool """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._own_scheduler and self._scheduler is not None:
+            self._scheduler.shutdown()
+            self._scheduler = None
+
+    async def calculate(self, setup):
+        """
+        Return the result of a normalized setup, from the cache, from an
+        identical calculation that is already running, or by calculating
+        it in the process pool.
+        """
+        key = json.dumps(setup, sort_keys=True)
+        if key in self._cache:
+            self.stats['cached'] += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if key in self._pending:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(self._pending[key])
+
+        future = asyncio.wrap_future(self._scheduler.submit(
+            setup_result, setup, priority=scheduler.SERVICE))
+        self._pending[key] = future
+        self.stats['computed'] += 1
+        try:
+            result = await future
+        finally:
+            del self._pending[key]
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    async def _handle_connection(self, reader, writer):
+        """ Serve requests on one connection until it is closed """
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except RequestError as err:
+                    await _write_response(writer, err.status,
+                                          {'error': str(err)}, False)
+                    break
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                status, payload = await self._respond(method, path, body)
+                await _write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, path, body):
+        """ Return the (status, payload) of one request """
+        self.stats['requests'] += 1
+        try:
+            if path == "/stats":
+                if method != "GET":
+                    raise RequestError(405, "Use GET")
+                return 200, dict(self.stats)
+            if path == "/metrics":
+                if method != "GET":
+                    raise RequestError(405, "Use GET")
+                return 200, self._scheduler.metrics()
+            if path not in ENDPOINTS:
+                raise RequestError(404, "Unknown path {}".format(path))
+            if method != "POST":
+                raise RequestError(405, "Use POST")
+            try:
+                params = json.loads(body.decode('utf-8'))
+            except ValueError:
+                raise RequestError(400, "The body is not valid JSON")
+            try:
+                setup = normalize(params, ENDPOINTS[path])
+            except (TypeError, ValueError) as err:
+                raise RequestError(400, str(err))
+            try:
+                return 200, await self.calculate(setup)
+            except ValueError as err:
+                raise RequestError(400, str(err))
+        except RequestError as err:
+            return err.status, {'error': str(err)}
+        except Exception as err:
+            # Keep serving other requests.
+            return 500, {'error': "{}: {}".format(type(err).__name__, err)}
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def _mp_context():
+    """
+    Return a context whose workers don't inherit the server's sockets:
+    forkserver where there is one, otherwise spawn.
+
+    Before Python 3.7 the pool can't be given a context, but it also
+    starts every worker at once, which ``start`` does before listening.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _number(params, name, default=None):
+    """ Return a float parameter, rejecting bools and strings """
+    value = params.get(name, default)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        raise ValueError("{} must be a number".format(name))
+    return float(value)
+
+
+def _pair(params, name, default=None):
+    """ Return an [x, y] parameter as a list of two floats """
+    value = params.get(name, default)
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError("{} must be a list of two numbers".format(name))
+    return [_number({name: item}, name) for item in value]
+
+
+def normalize(params, fixed_offset):
+    """
+    Validate a request and return it as a setup for ``setup_result``.
+
+    Parameters:
+    -----------
+    params : dict
+        The request. ``die_xy`` and ``dia`` are required; ``ee``, ``fe``,
+        ``north_limit``, ``street_xy``, ``units`` and ``rotation`` are
+        optional. ``die`` asks for the die list as well. Setups with more
+        than ``MAX_GRID_CELLS`` grid cells are rejected.
+    fixed_offset : bool
+        If ``True``, ``offset`` is required and each item is "odd", "even"
+        or a die center location in mm. Otherwise it is not allowed.
+
+    Returns:
+    --------
+    setup : dict
+        With every default filled in, so that equal requests are equal
+        dicts.
+    """
+    if not isinstance(params, dict):
+        raise ValueError("The request must be a JSON object")
+    known = {'die_xy', 'dia', 'ee', 'fe', 'north_limit', 'street_xy',
+             'units', 'rotation', 'offset', 'die'}
+    unknown = sorted(set(params) - known)
+    if unknown:
+        raise ValueError("Unknown parameters: {}".format(", ".join(unknown)))
+    if 'die_xy' not in params or 'dia' not in params:
+        raise ValueError("die_xy and dia are required")
+
+    setup = {'die_xy': _pair(params, 'die_xy'),
+             'dia': _number(params, 'dia'),
+             'ee': _number(params, 'ee', 4.5),
+             'fe': _number(params, 'fe', 4.5),
+             'north_limit': _number(params, 'north_limit'),
+             'street_xy': _pair(params, 'street_xy', [0, 0]),
+             'units': params.get('units', None),
+             'rotation': _number(params, 'rotation', 0),
+             'offset': None,
+             'die': bool(params.get('die', False)),
+             }
+    if min(setup['die_xy']) <= 0 or setup['dia'] <= 0:
+        raise ValueError("die_xy and dia must be positive")
+    if min(setup['street_xy']) < 0 or setup['ee'] < 0 or setup['fe'] < 0:
+        raise ValueError("street_xy, ee and fe must not be negative")
+    pitch_x, pitch_y = [size + street for size, street
+                        in zip(setup['die_xy'], setup['street_xy'])]
+    if (setup['dia'] / pitch_x) * (setup['dia'] / pitch_y) > MAX_GRID_CELLS:
+        raise ValueError("The die grid is larger than {} cells".format(
+            MAX_GRID_CELLS))
+    if setup['units'] not in (None,) + tuple(sorted(engine.UNIT_SCALES)):
+        raise ValueError("units must be one of {}".format(
+            sorted(engine.UNIT_SCALES)))
+
+    offset = params.get('offset', None)
+    if fixed_offset:
+        if not isinstance(offset, (list, tuple)) or len(offset) != 2:
+            raise ValueError("offset must be a list of two items")
+        setup['offset'] = [item if item in ("odd", "even")
+                           else _number({'offset': item}, 'offset')
+                           for item in offset]
+    elif offset is not None:
+        raise ValueError("offset is only allowed for /classify")
+    return setup
+
+
+def setup_result(setup):
+    """
+    Calculate a normalized setup and return the JSON result. Runs in a
+    worker process.
+    """
+    die_map = compare.setup_die_map(setup)
+    counts = die_map.counts()
+    center_offset = [item if isinstance(item, str) else float(item)
+                     for item in die_map.center_offset]
+    result = {'gdw': die_map.gdw,
+              'counts': {name: int(count) for name, count
+                         in zip(engine.STATUS_NAMES, counts)},
+              'center_xy': [float(item) for item in die_map.center_xy],
+              'center_offset': center_offset,
+              'pitch_xy': [float(item) for item in die_map.pitch_xy],
+              'rotation': float(die_map.rotation),
+              'fingerprint': die_map.fingerprint(),
+              }
+    if setup['die']:
+        result['die'] = [list(item) for item in die_map.coord_list()]
+    return result
+
+
+async def _read_request(reader):
+    """
+    Read one HTTP/1.1 request.
+
+    Returns (method, path, body, keep_alive), or ``None`` if the
+    connection was closed before a new request.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, version = line.decode('latin-1').split()
+    except ValueError:
+        raise RequestError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise RequestError(400, "Bad Content-Length")
+    if length < 0:
+        raise RequestError(400, "Bad Content-Length")
+    if length > MAX_BODY:
+        raise RequestError(413, "The body is too large")
+    body = await reader.readexactly(length) if length else b""
+
+    connection = headers.get('connection', "").lower()
+    if version == "HTTP/1.0":
+        keep_alive = connection == "keep-alive"
+    else:
+        keep_alive = connection != "close"
+    return method, path.split("?")[0], body, keep_alive
+
+
+async def _write_response(writer, status, payload, keep_alive):
+    """ Write a JSON response """
+    body = json.dumps(payload).encode('utf-8')
+    head = ["HTTP/1.1 {} {}".format(status, REASONS[status]),
+            "Content-Type: application/json",
+            "Content-Length: {}".format(len(body)),
+            "Connection: {}".format("keep-alive" if keep_alive else "close"),
+            ]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+
+
+def main(argv=None):
+    """ Run the service until interrupted """
+    parser = argparse.ArgumentParser(description="Local GDW JSON service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: number of CPUs)")
+    args = parser.parse_args(argv)
+
+    service = GdwService(args.host, args.port, args.workers)
+    print("Serving GDW on http://{}:{}".format(args.host, args.port))
+    try:
+        aio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        # ``aio.run`` has cancelled ``serve_forever``, which closed the
+        # service.
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              stepping.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             Prober stepping path ordering.
+
+                    Prober index time depends on the path taken through the
+                    die to test. This orders die (or touchdowns) by row
+                    serpentine, column serpentine, or nearest neighbor
+                    followed by a windowed 2-opt refinement, and estimates
+                    the index time of a path from the stage speed and
+                    acceleration.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import collections
+import math
+
+# Third Party
+import numpy as np
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+# Strategy name: display name
+STRATEGIES = collections.OrderedDict([
+    ("row", "Row Serpentine"),
+    ("column", "Column Serpentine"),
+    ("nearest", "Nearest Neighbor + 2-opt"),
+])
+
+# 2-opt only tries to reverse segments up to this many steps long.
+TWO_OPT_WINDOW = 32
+
+
+# ---------------------------------------------------------------------------
+### Classes
+# ---------------------------------------------------------------------------
+# A stepping path. ``order`` indexes into the points it was planned for,
+# distance is in mm and index_time in seconds.
+Path = collections.namedtuple("Path",
+                              ["strategy", "order", "distance", "index_time"])
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def _serpentine(major, minor):
+    """ Sort by ``major``, alternating the direction of ``minor`` each band """
+    _, band = np.unique(major, return_inverse=True)
+    direction = np.where(band % 2, -1, 1)
+    return np.lexsort((minor * direction, major))
+
+
+def row_serpentine(xy):
+    """ Step along each row, top row first, alternating direction. """
+    xy = np.asarray(xy, dtype=float)
+    return _serpentine(-xy[:, 1], xy[:, 0])
+
+
+def column_serpentine(xy):
+    """ Step along each column, left column first, alternating direction. """
+    xy = np.asarray(xy, dtype=float)
+    return _serpentine(xy[:, 0], -xy[:, 1])
+
+
+def _ring(center_x, center_y, radius):
+    """ Yield the bucket keys at a Chebyshev distance of ``radius``. """
+    if radius == 0:
+        yield center_x, center_y
+        return
+    for dx in range(-radius, radius + 1):
+        yield center_x + dx, center_y - radius
+        yield center_x + dx, center_y + radius
+    for dy in range(-radius + 1, radius):
+        yield center_x - radius, center_y + dy
+        yield center_x + radius, center_y + dy
+
+
+def nearest_neighbor(xy, start=0):
+    """
+    Always step to the closest point not yet visited, starting at index
+    ``start``. Ties go to the lowest index.
+
+    Points are bucketed on a square grid about one point spacing wide, and
+    the search widens one ring of buckets at a time, so each step only
+    looks at nearby points.
+    """
+    xy = np.asarray(xy, dtype=float)
+    n_points = len(xy)
+    if n_points == 0:
+        return np.empty(0, dtype=int)
+
+    # About one point per bucket, even if the points are all in a line.
+    low = xy.min(axis=0)
+    span = xy.max(axis=0) - low
+    area = max(span[0] * span[1], span.max()**2 / n_points, 1e-12)
+    cell = math.sqrt(area / n_points)
+    keys = np.floor((xy - low) / cell).astype(int)
+    max_radius = int(keys.max()) + 1
+
+    buckets = collections.defaultdict(list)
+    for index, key in enumerate(map(tuple, keys.tolist())):
+        buckets[key].append(index)
+
+    points = xy.tolist()
+    order = [start]
+    current = start
+    buckets[tuple(keys[start])].remove(start)
+    for _ in range(n_points - 1):
+        cur_x, cur_y = points[current]
+        key_x, key_y = keys[current]
+        best = None
+        for radius in range(max_radius + 1):
+            for key in _ring(key_x, key_y, radius):
+                for index in buckets.get(key, ()):
+                    dist_sq = ((points[index][0] - cur_x)**2
+                               + (points[index][1] - cur_y)**2)
+                    if best is None or (dist_sq, index) < best:
+                        best = (dist_sq, index)
+            # Anything in the next ring is at least radius * cell away.
+            if best is not None and best[0] <= (radius * cell)**2:
+                break
+        current = best[1]
+        buckets[tuple(keys[current])].remove(current)
+        order.append(current)
+    return np.array(order, dtype=int)
+
+
+def two_opt(xy, order, window=TWO_OPT_WINDOW, max_passes=50):
+    """
+    Improve a path by reversing segments of up to ``window`` steps.
+
+    Every candidate reversal is scored at once. Each pass then applies the
+    best non-overlapping improving reversals, until a pass finds none.
+    """
+    xy = np.asarray(xy, dtype=float)
+    order = np.array(order, dtype=int)
+    n_points = len(order)
+    if n_points < 4:
+        return order
+
+    for _ in range(max_passes):
+        pts = xy[order]
+        # Reversing order[i + 1:j + 1] swaps edges (i, i+1) and (j, j+1)
+        # for edges (i, j) and (i+1, j+1).
+        i = np.arange(n_points - 3)[:, None]
+        j = i + np.arange(2, window + 2)[None, :]
+        valid = j < n_points - 1
+        j = np.where(valid, j, n_points - 2)
+
+        def dist(a, b):
+            step = pts[a] - pts[b]
+            return np.hypot(step[..., 0], step[..., 1])
+
+        gain = (dist(i, i + 1) + dist(j, j + 1)
+                - dist(i, j) - dist(i + 1, j + 1))
+        gain = np.where(valid, gain, 0)
+
+        best = np.argmax(gain, axis=1)
+        rows = np.arange(len(best))
+        best_gain = gain[rows, best]
+        best_j = j[rows, best]
+
+        improving = np.flatnonzero(best_gain > 1e-9)
+        if len(improving) == 0:
+            break
+
+        # Apply the largest gains first, skipping overlapping segments.
+        used = np.zeros(n_points, dtype=bool)
+        for start in improving[np.argsort(-best_gain[improving])]:
+            stop = best_j[start] + 1
+            if used[start:stop + 1].any():
+                continue
+            used[start:stop + 1] = True
+            order[start + 1:stop] = order[start + 1:stop][::-1]
+    return order
+
+
+def move_time(distance, speed, accel):
+    """
+    Return the time for a single-axis move with a trapezoidal velocity
+    profile. Short moves never reach full speed.
+    """
+    distance = np.abs(distance)
+    ramp = speed**2 / accel
+    return np.where(distance < ramp,
+                    2 * np.sqrt(distance / accel),
+                    distance / speed + speed / accel)
+
+
+def travel_distance(xy, order):
+    """ Return the total straight-line travel distance of a path. """
+    steps = np.diff(np.asarray(xy, dtype=float)[order], axis=0)
+    return float(np.hypot(steps[:, 0], steps[:, 1]).sum())
+
+
+def index_time(xy, order, speed, accel):
+    """
+    Return the total index time of a path in seconds.
+
+    X and Y move at the same time, so each step takes as long as the
+    slower of the two axes.
+    """
+    steps = np.diff(np.asarray(xy, dtype=float)[order], axis=0)
+    times = np.maximum(move_time(steps[:, 0], speed, accel),
+                       move_time(steps[:, 1], speed, accel))
+    return float(times.sum())
+
+
+def plan_path(xy, strategy="row", speed=100.0, accel=1000.0):
+    """
+    Order points with one of the ``STRATEGIES``.
+
+    Parameters:
+    -----------
+    xy : array-like
+        The (x, y) coordinates of the points to visit in mm, shape
+        ``(n, 2)``.
+    strategy : str, optional
+        One of the keys of ``STRATEGIES``.
+    speed : float, optional
+        The stage speed in mm/s.
+    accel : float, optional
+        The stage acceleration in mm/s^2.
+
+    Returns:
+    --------
+    path : ``Path``
+    """
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    if strategy == "row":
+        order = row_serpentine(xy)
+    elif strategy == "column":
+        order = column_serpentine(xy)
+    elif strategy == "nearest":
+        # Start at the same die as the row serpentine.
+        start = row_serpentine(xy)[0] if len(xy) else 0
+        order = two_opt(xy, nearest_neighbor(xy, start))
+    else:
+        raise ValueError("strategy must be one of {}".format(
+            list(STRATEGIES)))
+    return Path(strategy,
+                order,
+                travel_distance(xy, order),
+                index_time(xy, order, speed, accel))
+
+
+def compare_paths(xy, speed=100.0, accel=1000.0):
+    """ Return a ``Path`` for every strategy, in ``STRATEGIES`` order. """
+    return [plan_path(xy, strategy, speed, accel) for strategy in STRATEGIES]
+
+
+def grid_to_mm(grid_xy, pitch_xy, center_xy):
+    """
+    Convert grid (col, row) coordinates to mm relative to the wafer center.
+    """
+    grid_xy = np.asarray(grid_xy, dtype=float).reshape(-1, 2)
+    return np.column_stack(((grid_xy[:, 0] - center_xy[0]) * pitch_xy[0],
+                            (center_xy[1] - grid_xy[:, 1]) * pitch_xy[1]))
+
+
+def order_coord_list(coord_list, pitch_xy, center_xy, strategy="row"):
+    """
+    Return a ``wafer_map`` coord list with the probe die first, in stepping
+    order, followed by all other die in their original order.
+    """
+    probe = [item for item in coord_list if item[2] == "probe"]
+    others = [item for item in coord_list if item[2] != "probe"]
+    if not probe:
+        return others
+    xy = grid_to_mm([item[:2] for item in probe], pitch_xy, center_xy)
+    path = plan_path(xy, strategy)
+    return [probe[i] for i in path.order] + others
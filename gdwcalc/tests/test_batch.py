@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.batch
+"""
+
+import unittest
+
+import numpy as np
+
+from .. import batch
+from .. import engine
+from .. import yield_models
+
+
+PRODUCTS = [
+    {'name': "a", 'die_xy': (5, 5), 'dia': 150},
+    {'name': "b", 'die_xy': (3, 7), 'dia': 150, 'north_limit': 60,
+     'street_xy': (0.1, 0.1)},
+    {'name': "c", 'die_xy': (5, 5), 'dia': 150, 'offset': ("odd", "even")},
+    {'name': "d", 'die_xy': (4, 6), 'dia': 200, 'units': "um"},
+]
+
+
+class TestSweepCatalog(unittest.TestCase):
+    def test_product_gdw(self):
+        self.assertEqual(batch.product_gdw(PRODUCTS[0]),
+                         engine.max_gdw((5, 5), 150, 4.5, 4.5).gdw)
+        self.assertEqual(batch.product_gdw(PRODUCTS[1]),
+                         engine.max_gdw((3, 7), 150, 4.5, 4.5, 60,
+                                        street_xy=(0.1, 0.1)).gdw)
+        self.assertEqual(batch.product_gdw(PRODUCTS[2]),
+                         engine.classify((5, 5), 150, ("odd", "even"),
+                                         4.5, 4.5).gdw)
+        self.assertEqual(batch.product_gdw(PRODUCTS[3]),
+                         engine.max_gdw((4, 6), 200, 4.5, 4.5,
+                                        units="um").gdw)
+
+    def test_sweep(self):
+        d0 = np.linspace(0, 1, 11)
+        sweep = batch.sweep_catalog(PRODUCTS, d0, "murphy", max_workers=2)
+        self.assertEqual(sweep.names, ["a", "b", "c", "d"])
+        self.assertEqual(sweep.net_die.shape, (4, 11))
+        np.testing.assert_array_equal(sweep.net_die[:, 0], sweep.gdw)
+        np.testing.assert_allclose(
+            sweep.net_die[1],
+            yield_models.net_die(sweep.gdw[1], 21, d0, "murphy"))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
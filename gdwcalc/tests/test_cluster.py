@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.cluster
+"""
+
+import asyncio
+import json
+import unittest
+
+import numpy as np
+
+from .. import aio
+from .. import batch
+from .. import cluster
+
+
+async def take_chunk(port):
+    """ Connect as a worker and take one chunk without calculating it """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    await reader.readline()
+    writer.write(b'{"type": "request"}\n')
+    await writer.drain()
+    chunk = json.loads((await reader.readline()).decode('utf-8'))
+    return reader, writer, chunk
+
+
+class TestParameterGrid(unittest.TestCase):
+    def test_products(self):
+        grid = cluster.ParameterGrid([2, 3], [4, 5, 6], [100, 150], [3])
+        self.assertEqual(grid.shape, (2, 3, 2, 1, 1))
+        self.assertEqual(grid.size, 12)
+        products = grid.products(0, grid.size)
+        self.assertEqual(products[0]['die_xy'], (2, 4))
+        self.assertEqual(products[1]['dia'], 150)
+        self.assertEqual(products[-1]['die_xy'], (3, 6))
+        self.assertEqual(grid.products(5, 7), products[5:7])
+
+        same = cluster.ParameterGrid.from_dict(
+            json.loads(json.dumps(grid.to_dict())))
+        self.assertEqual(same.products(0, same.size), products)
+
+    def test_square(self):
+        grid = cluster.ParameterGrid(cluster.axis_range(0.5, 30, 0.01),
+                                     dia=[150, 200], ee=[3, 4.5])
+        self.assertTrue(grid.square)
+        self.assertEqual(grid.shape, (2951, 2, 2, 1))
+        self.assertEqual(grid.products(4, 5)[0]['die_xy'], (0.51, 0.51))
+        self.assertEqual(grid.axes['die_x'][-1], 30)
+
+        with self.assertRaises(ValueError):
+            cluster.ParameterGrid([], dia=[150])
+
+
+class TestCluster(unittest.TestCase):
+    def setUp(self):
+        self.grid = cluster.ParameterGrid([2, 3.5, 5], dia=[100, 150],
+                                          ee=[3, 4.5])
+        products = self.grid.products(0, self.grid.size)
+        self.expected = np.array([batch.product_gdw(product)
+                                  for product in products]
+                                 ).reshape(self.grid.shape)
+
+    def run_cluster(self, scenario, **kwargs):
+        """ Run ``scenario(coordinator, run_workers)`` on localhost """
+        async def run():
+            loop = asyncio.get_event_loop()
+            coordinator = cluster.Coordinator(self.grid, port=0,
+                                              chunk_size=3, **kwargs)
+            await coordinator.start()
+
+            async def run_workers(n_workers):
+                return await asyncio.gather(*[
+                    loop.run_in_executor(None, cluster.run_worker,
+                                         "127.0.0.1", coordinator.port, 1)
+                    for _ in range(n_workers)])
+            try:
+                await scenario(coordinator, run_workers)
+            finally:
+                await coordinator.close()
+        aio.run(run())
+
+    def test_workers(self):
+        async def scenario(coordinator, run_workers):
+            n_chunks = await run_workers(3)
+            gdw = await asyncio.wait_for(coordinator.wait(), 60)
+            np.testing.assert_array_equal(gdw, self.expected)
+            self.assertEqual(sum(n_chunks), 4)
+            self.assertEqual(coordinator.stats['completed'], 4)
+            self.assertEqual(coordinator.stats['reassigned'], 0)
+        self.run_cluster(scenario)
+
+    def test_lost_worker(self):
+        async def scenario(coordinator, run_workers):
+            _, writer, chunk = await take_chunk(coordinator.port)
+            self.assertEqual(chunk['type'], "chunk")
+            writer.close()
+            await asyncio.sleep(0.1)
+            self.assertEqual(coordinator.stats['lost'], 1)
+
+            await run_workers(2)
+            gdw = await asyncio.wait_for(coordinator.wait(), 60)
+            np.testing.assert_array_equal(gdw, self.expected)
+            self.assertEqual(coordinator.stats['completed'], 4)
+        self.run_cluster(scenario)
+
+    def test_bad_result(self):
+        async def scenario(coordinator, run_workers):
+            bad = [{'type': "result", 'chunk': 99, 'gdw': [0, 0, 0]},
+                   {'type': "result", 'chunk': -1, 'gdw': [0, 0, 0]},
+                   {'type': "result", 'chunk': "0", 'gdw': [0, 0, 0]},
+                   {'type': "result", 'chunk': 0, 'gdw': [0]},
+                   {'type': "result", 'chunk': 0},
+                   ["result"],
+                   ]
+            for message in bad:
+                reader, writer, _ = await take_chunk(coordinator.port)
+                writer.write(json.dumps(message).encode() + b"\n")
+                await writer.drain()
+                # The worker is dropped and its chunk released.
+                self.assertEqual(await reader.readline(), b"")
+                writer.close()
+            await asyncio.sleep(0.1)
+            self.assertEqual(coordinator.n_done, 0)
+            self.assertEqual(coordinator.stats['lost'], len(bad))
+            self.assertEqual(len(coordinator._handlers), 0)
+
+            await run_workers(1)
+            gdw = await asyncio.wait_for(coordinator.wait(), 60)
+            np.testing.assert_array_equal(gdw, self.expected)
+        self.run_cluster(scenario)
+
+    def test_expired_lease(self):
+        async def scenario(coordinator, run_workers):
+            reader, writer, chunk = await take_chunk(coordinator.port)
+            await run_workers(2)
+            gdw = await asyncio.wait_for(coordinator.wait(), 60)
+            np.testing.assert_array_equal(gdw, self.expected)
+            self.assertEqual(coordinator.stats['reassigned'], 1)
+
+            # The hung worker's late result is ignored.
+            size = chunk['stop'] - chunk['start']
+            writer.write(json.dumps({'type': "result",
+                                     'chunk': chunk['chunk'],
+                                     'gdw': [0] * size}).encode() + b"\n")
+            await writer.drain()
+            reply = json.loads((await reader.readline()).decode('utf-8'))
+            self.assertEqual(reply['type'], "done")
+            self.assertEqual(coordinator.stats['duplicate'], 1)
+            np.testing.assert_array_equal(coordinator.gdw, self.expected)
+            writer.close()
+        self.run_cluster(scenario, lease_timeout=0.5)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.compare
+"""
+
+import unittest
+
+import numpy as np
+
+from .. import compare
+from .. import engine
+from .. import keepout
+from .. import scheduler
+
+
+SETUPS = [
+    {'name': "base", 'die_xy': (5, 5), 'dia': 150},
+    {'die_xy': (5, 5), 'dia': 150, 'ee': 3, 'north_limit': 60},
+    {'die_xy': (4, 6), 'dia': 150, 'offset': ("odd", "even"),
+     'keepouts': [keepout.CircleZone(0, 0, 5)]},
+    {'die_xy': (5, 5), 'dia': 150, 'rotation': 1.5},
+]
+
+
+class TestCompare(unittest.TestCase):
+    def test_setup_die_map(self):
+        die_map = compare.setup_die_map(SETUPS[1])
+        self.assertEqual(die_map.fingerprint(),
+                         engine.max_gdw((5, 5), 150, 3, 4.5,
+                                        60).fingerprint())
+        die_map = compare.setup_die_map(SETUPS[2])
+        expected = engine.classify((4, 6), 150, ("odd", "even"), 4.5, 4.5,
+                                   keepouts=SETUPS[2]['keepouts'])
+        self.assertEqual(die_map.fingerprint(), expected.fingerprint())
+
+    def test_compare(self):
+        result = compare.compare_setups(SETUPS, max_workers=2)
+        self.assertEqual(result.names,
+                         ["base", "Setup 2", "Setup 3", "Setup 4"])
+        self.assertEqual(result.table.shape, (4, len(compare.COLUMNS)))
+        for die_map, row in zip(result.die_maps, result.table):
+            counts = die_map.counts()
+            self.assertEqual(row[0], die_map.gdw)
+            self.assertEqual(row[-1], counts[engine.KEEPOUT])
+        self.assertGreater(result.table[2, -1], 0)
+        np.testing.assert_array_equal(result.deltas[0], 0)
+        np.testing.assert_array_equal(result.deltas,
+                                      result.table - result.table[0])
+
+    def test_shared_scheduler(self):
+        try:
+            result = compare.compare_setups(SETUPS[:2])
+            metrics = scheduler.shared_scheduler().metrics()
+        finally:
+            scheduler.shutdown_shared()
+        self.assertEqual(metrics['interactive']['completed'], 1)
+        self.assertEqual(result.table[1, 0] - result.table[0, 0],
+                         result.deltas[1, 0])
+        self.assertEqual(result.names, ["base", "Setup 2"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
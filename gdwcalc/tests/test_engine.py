@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.engine
+"""
+
+import itertools
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from .. import engine
+
+
+def scalar_classify(die_map, dia, excl, flat_excl, north_limit):
+    """ Die-at-a-time classification, the same way gdw.gdw does it. """
+    half_x = die_map.die_xy[0] / 2
+    half_y = die_map.die_xy[1] / 2
+    rad = dia / 2
+    flat_y = engine.flat_location(dia)
+    status = np.empty_like(die_map.status)
+    for (i, y), (j, x) in itertools.product(enumerate(die_map.y_centers),
+                                            enumerate(die_map.x_centers)):
+        dist = math.sqrt((abs(x) + half_x)**2 + (abs(y) + half_y)**2)
+        if dist > rad:
+            code = engine.OFF_WAFER
+        elif y - half_y < flat_y:
+            code = engine.FLAT
+        elif dist > rad - excl:
+            code = engine.EXCL
+        elif y - half_y < flat_y + flat_excl:
+            code = engine.FLAT_EXCL
+        elif north_limit is not None and y + half_y > north_limit:
+            code = engine.SCRIBE
+        else:
+            code = engine.PROBE
+        status[i, j] = code
+    return status
+
+
+class TestClassify(unittest.TestCase):
+    def test_matches_scalar(self):
+        for center_type in engine.CENTER_TYPES + ((1.3, 2.2),):
+            die_map = engine.classify((5, 7), 150, center_type, 4.5, 4.5,
+                                      70.2)
+            expected = scalar_classify(die_map, 150, 4.5, 4.5, 70.2)
+            np.testing.assert_array_equal(die_map.status, expected)
+
+    def test_symmetry_is_exact(self):
+        params = itertools.product([(5, 5), (0.7, 3.1), (13.3, 2.9)],
+                                   [100, 150, 200, 300],
+                                   [0, 3, 4.5],
+                                   [0, 4.5, 8],
+                                   [None, 40.1],
+                                   engine.CENTER_TYPES + ((0, 3),))
+        for die_xy, dia, excl, flat_excl, north_limit, offset in params:
+            fast = engine.classify(die_xy, dia, offset, excl, flat_excl,
+                                   north_limit, symmetry=True)
+            full = engine.classify(die_xy, dia, offset, excl, flat_excl,
+                                   north_limit, symmetry=False)
+            np.testing.assert_array_equal(fast.status, full.status)
+
+    def test_center_xy(self):
+        die_map = engine.classify((5, 5), 150, ("odd", "even"), 5, 5)
+        center_x, center_y = die_map.center_xy
+        self.assertEqual(center_x % 1, 0)
+        self.assertEqual(center_y % 1, 0.5)
+        self.assertEqual(die_map.x_centers[int(center_x)], 0)
+
+    def test_probe_list(self):
+        die_map = engine.classify((5, 5), 150, ("odd", "odd"), 5, 5)
+        probe_list = die_map.probe_list()
+        self.assertEqual(len(probe_list), die_map.counts().sum())
+        col, row, x_ll, y_ll, status = probe_list[0]
+        self.assertEqual(status, engine.STATUS_NAMES[die_map.status[row, col]])
+        self.assertEqual(x_ll, die_map.x_centers[col] - 2.5)
+
+
+class TestFixedPoint(unittest.TestCase):
+    def test_matches_float(self):
+        for units in ("um", "nm"):
+            for center_type in engine.CENTER_TYPES + ((1.3, 2.2),):
+                fixed = engine.classify((5, 7), 150, center_type, 4.5, 4.5,
+                                        70.2, units=units)
+                flt = engine.classify((5, 7), 150, center_type, 4.5, 4.5,
+                                      70.2)
+                np.testing.assert_array_equal(fixed.status, flt.status)
+                self.assertEqual(fixed.center_xy, flt.center_xy)
+
+    def test_boundary_is_exact(self):
+        # Center die's far corner is (2.4, 4.5), exactly 5.1 mm from the
+        # wafer center, which is exactly the edge exclusion radius. Float
+        # math rounds it outside.
+        for units in ("um", "nm"):
+            die_map = engine.classify((4.8, 9.0), 150, ("odd", "odd"), 69.9,
+                                      0, units=units)
+            col, row = die_map.center_xy
+            self.assertEqual(die_map.status[int(row), int(col)],
+                             engine.PROBE)
+
+    def test_symmetry_is_exact(self):
+        params = itertools.product([(5, 5), (0.7, 3.1), (13.3, 2.9)],
+                                   [100, 150, 300],
+                                   [0, 4.5],
+                                   [None, 40.1],
+                                   engine.CENTER_TYPES + ((0, 3),))
+        for die_xy, dia, excl, north_limit, offset in params:
+            fast = engine.classify(die_xy, dia, offset, excl, 4.5,
+                                   north_limit, units="nm")
+            full = engine.classify(die_xy, dia, offset, excl, 4.5,
+                                   north_limit, symmetry=False, units="nm")
+            np.testing.assert_array_equal(fast.status, full.status)
+            self.assertEqual(fast.fingerprint(), full.fingerprint())
+
+    def test_bad_units(self):
+        with self.assertRaises(ValueError):
+            engine.classify((5, 5), 150, ("odd", "odd"), 5, 5, units="mil")
+
+
+class TestCountGdw(unittest.TestCase):
+    def test_matches_classify(self):
+        params = itertools.product([(5, 7), (0.9, 2.3), (23, 11)],
+                                   [100, 150, 300],
+                                   [None, 40.1],
+                                   engine.CENTER_TYPES + ((1.3, 2.2),))
+        for die_xy, dia, north_limit, offset in params:
+            die_map = engine.classify(die_xy, dia, offset, 3, 4.5,
+                                      north_limit)
+            count = engine.count_gdw(die_xy, dia, offset, 3, 4.5,
+                                     north_limit)
+            self.assertEqual(count, die_map.gdw)
+
+    def test_broadcast(self):
+        die_x = np.array([3, 5, 7.5])
+        counts = engine.count_gdw((die_x, 4), 150, ("even", 1.1), 4.5, 4.5)
+        self.assertEqual(counts.shape, (3, ))
+        for x, count in zip(die_x, counts):
+            die_map = engine.classify((x, 4), 150, ("even", 1.1), 4.5, 4.5)
+            self.assertEqual(count, die_map.gdw)
+
+    def test_count_max_gdw(self):
+        gdw, shift = engine.count_max_gdw((5, 7), 150, 4.5, 4.5, 60)
+        die_map = engine.max_gdw((5, 7), 150, 4.5, 4.5, 60)
+        self.assertEqual(gdw, die_map.gdw)
+        self.assertEqual(engine.CENTER_TYPES[shift], die_map.center_offset)
+
+
+class TestDieStatus(unittest.TestCase):
+    def test_matches_classify(self):
+        die_map = engine.classify((5, 7), 150, (1.3, 2.2), 3, 4.5, 40.1)
+        status = engine.die_status(die_map.x_centers[None, :],
+                                   die_map.y_centers[:, None], (5, 7), 150,
+                                   3, 4.5, 40.1)
+        np.testing.assert_array_equal(status, die_map.status)
+
+
+class TestStreet(unittest.TestCase):
+    def test_pitch(self):
+        die_map = engine.classify((4.9, 4.8), 150, ("odd", "even"), 4.5, 4.5,
+                                  street_xy=(0.1, 0.2))
+        self.assertEqual(die_map.pitch_xy, (5.0, 5.0))
+        np.testing.assert_allclose(np.diff(die_map.x_centers), 5)
+        np.testing.assert_allclose(np.diff(die_map.y_centers), -5)
+        self.assertAlmostEqual(die_map.y_centers[0] % 5, 2.5)
+
+    def test_body_only_exclusion(self):
+        # Same grid, but the street is not tested against the exclusions.
+        with_street = engine.classify((4, 4), 150, ("odd", "odd"), 4.5,
+                                      4.5, 60, street_xy=(1, 1))
+        without = engine.classify((5, 5), 150, ("odd", "odd"), 4.5, 4.5, 60)
+        self.assertEqual(with_street.status.shape, without.status.shape)
+        self.assertTrue((with_street.status[without.status == engine.PROBE]
+                         == engine.PROBE).all())
+        self.assertGreater(with_street.gdw, without.gdw)
+
+    def test_fixed_point(self):
+        for offset in engine.CENTER_TYPES + ((1.3, -2.2),):
+            float_map = engine.classify((4.9, 2.3), 150, offset, 4.5, 4.5,
+                                        60, street_xy=(0.1, 0.08))
+            fixed_map = engine.classify((4.9, 2.3), 150, offset, 4.5, 4.5,
+                                        60, units="um", street_xy=(0.1, 0.08))
+            self.assertEqual(fixed_map.gdw, float_map.gdw)
+            self.assertEqual(fixed_map.street_xy, (0.1, 0.08))
+
+    def test_count_sweep(self):
+        streets = np.linspace(0, 0.5, 11)
+        counts = engine.count_gdw((4, 6), 150, (0.7, "even"), 4.5, 4.5, 60,
+                                  (streets, 0.1))
+        for street, count in zip(streets, counts):
+            die_map = engine.classify((4, 6), 150, (0.7, "even"), 4.5, 4.5,
+                                      60, street_xy=(street, 0.1))
+            self.assertEqual(count, die_map.gdw)
+
+
+class TestMaxGdw(unittest.TestCase):
+    def test_best_of_four(self):
+        best = engine.max_gdw((5, 5), 150, 4.5, 4.5)
+        for center_type in engine.CENTER_TYPES:
+            die_map = engine.classify((5, 5), 150, center_type, 4.5, 4.5)
+            self.assertGreaterEqual(best.gdw, die_map.gdw)
+
+
+class TestRotation(unittest.TestCase):
+    def scalar_rotated(self, die_map, dia, excl, flat_excl, north_limit):
+        """ Die-at-a-time classification from the rotated corners. """
+        half_x = die_map.die_xy[0] / 2
+        half_y = die_map.die_xy[1] / 2
+        theta = math.radians(die_map.rotation)
+        rad = dia / 2
+        flat_y = engine.flat_location(dia)
+        status = np.empty_like(die_map.status)
+        for (i, y), (j, x) in itertools.product(
+                enumerate(die_map.y_centers), enumerate(die_map.x_centers)):
+            corners = [(x + dx, y + dy) for dx in (-half_x, half_x)
+                       for dy in (-half_y, half_y)]
+            corners = [(u * math.cos(theta) - v * math.sin(theta),
+                        u * math.sin(theta) + v * math.cos(theta))
+                       for u, v in corners]
+            dist = max(math.hypot(u, v) for u, v in corners)
+            bottom = min(v for u, v in corners)
+            top = max(v for u, v in corners)
+            if dist > rad:
+                code = engine.OFF_WAFER
+            elif bottom < flat_y:
+                code = engine.FLAT
+            elif dist > rad - excl:
+                code = engine.EXCL
+            elif bottom < flat_y + flat_excl:
+                code = engine.FLAT_EXCL
+            elif north_limit is not None and top > north_limit:
+                code = engine.SCRIBE
+            else:
+                code = engine.PROBE
+            status[i, j] = code
+        return status
+
+    def test_scalar(self):
+        params = itertools.product([100, 150],
+                                   [(5, 5), (3.3, 7.1)],
+                                   [("odd", "even"), (1.7, -3.2)],
+                                   [2.5, -17],
+                                   [None, 30.3])
+        for dia, die_xy, offset, rotation, north_limit in params:
+            die_map = engine.classify(die_xy, dia, offset, 4.5, 3,
+                                      north_limit, rotation=rotation)
+            self.assertEqual(die_map.rotation, rotation)
+            expected = self.scalar_rotated(die_map, dia, 4.5, 3, north_limit)
+            np.testing.assert_array_equal(die_map.status, expected)
+
+    def test_quarter_turn(self):
+        # A round wafer without a flat looks the same from any angle.
+        plain = engine.classify((3, 5), 200, ("odd", "even"), 4, 0)
+        turned = engine.classify((5, 3), 200, ("even", "odd"), 4, 0,
+                                 rotation=90)
+        self.assertEqual(plain.gdw, turned.gdw)
+
+    def test_wafer_centers(self):
+        die_map = engine.classify((5, 5), 150, (1, 2), 4, 4, rotation=90)
+        x, y = die_map.wafer_centers()
+        np.testing.assert_allclose(x, -die_map.y_centers[:, None]
+                                   * np.ones_like(x), atol=1e-9)
+        np.testing.assert_allclose(y, die_map.x_centers[None, :]
+                                   * np.ones_like(y), atol=1e-9)
+
+    def test_die_status(self):
+        die_map = engine.classify((2, 3), 150, (0.4, 0.1), 4, 4, 60,
+                                  rotation=5)
+        status = engine.die_status(die_map.x_centers[None, :],
+                                   die_map.y_centers[:, None], (2, 3), 150,
+                                   4, 4, 60, rotation=5)
+        np.testing.assert_array_equal(status, die_map.status)
+
+    def test_max_gdw(self):
+        rotations = [-2, -1, 0, 1, 2]
+        best = engine.max_gdw((5, 5), 100, 3, 8, rotation=rotations)
+        self.assertIn(best.rotation, rotations)
+        for rotation in rotations:
+            die_map = engine.max_gdw((5, 5), 100, 3, 8, rotation=rotation)
+            self.assertGreaterEqual(best.gdw, die_map.gdw)
+
+    def test_units(self):
+        with self.assertRaises(ValueError):
+            engine.classify((5, 5), 150, ("odd", "odd"), 4, 4, units="um",
+                            rotation=1)
+
+
+class TestFields(unittest.TestCase):
+    def setUp(self):
+        self.die_map = engine.classify((5, 7), 150, (1.3, -2.2), 4.5, 4.5,
+                                       60, street_xy=(0.2, 0.1),
+                                       fields=True)
+
+    def test_dtype(self):
+        for name in engine.FIELD_NAMES:
+            field = self.die_map.fields[name]
+            self.assertEqual(field.dtype, np.float32)
+            self.assertEqual(field.shape, self.die_map.status.shape)
+
+    def test_matches_status(self):
+        fields = self.die_map.fields
+        status = self.die_map.status
+        probe = status == engine.PROBE
+        self.assertTrue((fields["edge_distance"][probe] >= 4.5 - 1e-4).all())
+        self.assertTrue((fields["excl_area_fraction"][probe] == 1).all())
+        self.assertTrue((fields["edge_distance"][status == engine.EXCL]
+                         < 4.5).all())
+        self.assertTrue((fields["scribe_distance"][status == engine.SCRIBE]
+                         < 0).all())
+        self.assertTrue((fields["flat_distance"][status == engine.FLAT]
+                         < 0).all())
+
+    def test_area_fraction(self):
+        # Sample the die bodies on a fine grid.
+        fields = self.die_map.fields
+        rows, cols = np.nonzero(self.die_map.status == engine.EXCL)
+        steps = (np.arange(200) + 0.5) / 200 - 0.5
+        for row, col in list(zip(rows, cols))[::7]:
+            x = self.die_map.x_centers[col] + steps * 5
+            y = self.die_map.y_centers[row] + steps * 7
+            inside = np.hypot(x[None, :], y[:, None]) <= 75 - 4.5
+            self.assertAlmostEqual(fields["excl_area_fraction"][row, col],
+                                   inside.mean(), delta=0.01)
+
+    def test_max_gdw(self):
+        self.assertIsNone(engine.max_gdw((5, 5), 150, 4.5, 4.5).fields)
+        die_map = engine.max_gdw((5, 5), 150, 4.5, 4.5, units="um",
+                                 fields=True)
+        self.assertTrue(np.isinf(die_map.fields["scribe_distance"]).all())
+        field_list = die_map.field_list("edge_distance")
+        self.assertEqual([item[:2] for item in field_list],
+                         [item[:2] for item in die_map.coord_list()])
+
+    def test_write_csv(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(tmp_dir, "map.csv")
+            self.die_map.write_csv(fname, (1, 2))
+            with open(fname) as openf:
+                lines = openf.read().splitlines()
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertEqual(lines[0].split(","),
+                         ["Col", "Row", "X", "Y", "Status"]
+                         + list(engine.FIELD_NAMES))
+        self.assertEqual(len(lines) - 1, len(self.die_map.coord_list()))
+        col, row = self.die_map.coord_list()[0][:2]
+        self.assertEqual(lines[1].split(",")[:2],
+                         [str(col - 1), str(row - 2)])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.exclusion
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from .. import engine
+from .. import exclusion
+from .. import geometry
+from .. import reticle
+
+
+# Wider at the flat, at three clamp fingers and at the laser ID.
+PROFILE = exclusion.step_profile(3, [(255, 285, 7),
+                                     (25, 35, 5),
+                                     (145, 155, 5),
+                                     (95, 110, 4.5),
+                                     ])
+
+
+def edge_status(die_map, substrate, profile, n_points=401):
+    """
+    Which die have every sampled point of their edges at least the profile
+    width inside
+    """
+    half_x, half_y = die_map.die_xy[0] / 2, die_map.die_xy[1] / 2
+    x = die_map.x_centers[None, :, None]
+    y = die_map.y_centers[:, None, None]
+    along = np.linspace(-1, 1, n_points)
+    inside = True
+    for dx, dy in ((along * half_x, half_y), (along * half_x, -half_y),
+                   (half_x, along * half_y), (-half_x, along * half_y)):
+        edge_x, edge_y = x + dx, y + dy
+        inside = inside & (substrate.outline_distance(edge_x, edge_y)
+                           >= profile.width_xy(edge_x, edge_y)).all(axis=-1)
+    return inside
+
+
+class TestProfile(unittest.TestCase):
+    def test_interpolation(self):
+        profile = exclusion.ExclusionProfile([0, 90, 180, 270], [1, 2, 3, 4])
+        np.testing.assert_allclose(profile.width_at([45, 135, 315, 0, -90,
+                                                     450]),
+                                   [1.5, 2.5, 2.5, 1, 4, 2])
+        self.assertEqual(profile.min_width, 1)
+        self.assertEqual(profile.max_width, 4)
+
+    def test_steps(self):
+        np.testing.assert_allclose(PROFILE.width_at([0, 25, 30, 35, 35.01,
+                                                     270, 285, 300]),
+                                   [3, 5, 5, 3, 3, 7, 3, 3])
+
+    def test_step_wraps(self):
+        profile = exclusion.step_profile(2, [(350, 10, 6)])
+        np.testing.assert_allclose(profile.width_at([355, 0, 5, 10.5, 180]),
+                                   [6, 6, 6, 2, 2])
+
+    def test_width_xy(self):
+        np.testing.assert_allclose(PROFILE.width_xy([0, -1, 1], [-1, 4, 0.6]),
+                                   [7, 4.5, 5])
+
+    def test_dict(self):
+        params = json.loads(json.dumps(PROFILE.to_dict()))
+        profile = exclusion.ExclusionProfile.from_dict(params)
+        angles = np.arange(0, 360, 0.5)
+        np.testing.assert_array_equal(profile.width_at(angles),
+                                      PROFILE.width_at(angles))
+
+    def test_bad(self):
+        with self.assertRaises(ValueError):
+            exclusion.ExclusionProfile([0, 90], [1])
+        with self.assertRaises(ValueError):
+            exclusion.ExclusionProfile([0], [-1])
+
+
+class TestEngine(unittest.TestCase):
+    def test_uniform_matches_scalar(self):
+        profile = exclusion.ExclusionProfile([0], [4.5])
+        for dia in (150, 200, geometry.CircleNotch(300)):
+            for offset in (("odd", "even"), (1.3, -0.7)):
+                expected = engine.classify((3.1, 4.3), dia, offset, 4.5, 3)
+                die_map = engine.classify((3.1, 4.3), dia, offset, profile,
+                                          3)
+                np.testing.assert_array_equal(die_map.status,
+                                              expected.status)
+
+    def test_edges(self):
+        for dia in (150, geometry.CircleNotch(200)):
+            substrate = geometry.as_substrate(dia)
+            die_map = engine.classify((2.5, 3.5), dia, (0.4, -1.1), PROFILE,
+                                      0)
+            inside = edge_status(die_map, substrate, PROFILE)
+            on_wafer = die_map.status != engine.OFF_WAFER
+            excl = die_map.status == engine.EXCL
+            np.testing.assert_array_equal(excl, on_wafer & ~inside
+                                          & (die_map.status != engine.FLAT))
+
+    def test_narrow_sector(self):
+        # The sector is narrower than the die, so no corner is in it.
+        profile = exclusion.step_profile(1.0, [(85, 95, 20.0)])
+        die_map = engine.classify((30, 5), 150, ("odd", "even"), profile, 0)
+        inside = edge_status(die_map, geometry.as_substrate(150), profile)
+        np.testing.assert_array_equal(die_map.status == engine.PROBE,
+                                      inside
+                                      & (die_map.status != engine.OFF_WAFER)
+                                      & (die_map.status != engine.FLAT))
+        for rotation in (0, 0.5):
+            die_map = engine.classify((30, 5), 150, ("odd", "even"), profile,
+                                      0, rotation=rotation)
+            row = np.argmin(np.abs(die_map.y_centers - 67.5))
+            col = np.argmin(np.abs(die_map.x_centers))
+            self.assertEqual(die_map.status[row, col], engine.EXCL)
+
+    def test_between_uniform(self):
+        gdw = engine.max_gdw((2, 2), 200, PROFILE, 3).gdw
+        self.assertLess(gdw, engine.max_gdw((2, 2), 200, 3, 3).gdw)
+        self.assertGreater(gdw, engine.max_gdw((2, 2), 200, 7, 3).gdw)
+
+    def test_die_status(self):
+        die_map = engine.classify((2, 2), 150, ("odd", "odd"), PROFILE, 3,
+                                  50)
+        status = engine.die_status(die_map.x_centers[None, :],
+                                   die_map.y_centers[:, None], (2, 2), 150,
+                                   PROFILE, 3, 50)
+        np.testing.assert_array_equal(status, die_map.status)
+
+    def test_shot_map(self):
+        shot_map = reticle.shot_map((2, 2), (4, 3), 150, ("odd", "odd"),
+                                    PROFILE, 3)
+        die_map = engine.classify((2, 2), 150, shot_map.die_offset, PROFILE,
+                                  3)
+        self.assertEqual(shot_map.gdw, die_map.gdw)
+
+    def test_fields(self):
+        profile = exclusion.ExclusionProfile([0], [4.5])
+        expected = engine.classify((5, 5), 150, ("odd", "odd"), 4.5, 3,
+                                   fields=True)
+        die_map = engine.classify((5, 5), 150, ("odd", "odd"), profile, 3,
+                                  fields=True)
+        np.testing.assert_allclose(die_map.fields["excl_area_fraction"],
+                                   expected.fields["excl_area_fraction"])
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            engine.classify((2, 2), 150, ("odd", "odd"), PROFILE, 3,
+                            units="um")
+        with self.assertRaises(ValueError):
+            engine.count_gdw((2, 2), 150, ("odd", "odd"), PROFILE, 3)
+
+
+class TestReadProfile(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read(self):
+        fname = os.path.join(self.tmp_dir, "profile.csv")
+        with open(fname, 'w') as openf:
+            openf.write("# angle, width\n"
+                        "0, 3\n"
+                        "260, 3\n"
+                        "260, 6\n"
+                        "280, 6\n"
+                        "280, 3\n")
+        profile = exclusion.read_profile(fname)
+        np.testing.assert_allclose(profile.width_at([90, 270, 300]),
+                                   [3, 6, 3])
+
+    def test_bad_line(self):
+        fname = os.path.join(self.tmp_dir, "profile.csv")
+        with open(fname, 'w') as openf:
+            openf.write("0, 3, 4\n")
+        with self.assertRaises(ValueError):
+            exclusion.read_profile(fname)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.geometry
+"""
+
+import itertools
+import unittest
+
+import numpy as np
+
+from .. import engine
+from .. import geometry
+from .. import landscape
+from .. import optimize
+from .. import reticle
+from .. import sensitivity
+
+
+def brute_probe(die_map, substrate, excl, flat_excl, n=11):
+    """ Whether each probe die body is at least ``excl`` from the edge. """
+    half_x, half_y = die_map.die_xy[0] / 2, die_map.die_xy[1] / 2
+    steps = np.linspace(-1, 1, n)
+    rows, cols = np.nonzero(die_map.status == engine.PROBE)
+    x = die_map.x_centers[cols][:, None, None] + steps[None, None, :] * half_x
+    y = die_map.y_centers[rows][:, None, None] + steps[None, :, None] * half_y
+    return ((substrate.outline_distance(x, y) >= excl - 1e-9)
+            & (substrate.flat_distance(x, y) >= flat_excl - 1e-9)).all()
+
+
+class TestSubstrates(unittest.TestCase):
+    def setUp(self):
+        self.substrates = [geometry.Circle(200),
+                           geometry.CircleFlat(150),
+                           geometry.SecondaryFlat(150, 90),
+                           geometry.SecondaryFlat(100, 45),
+                           geometry.CircleNotch(300),
+                           geometry.Panel(510, 515),
+                           ]
+
+    def test_matches_diameter(self):
+        params = itertools.product([100, 150, 200],
+                                   [(5, 5), (2.3, 7.1)],
+                                   [("odd", "even"), (1.7, -3.2)],
+                                   [None, 30.3])
+        for dia, die_xy, offset, north_limit in params:
+            expected = engine.classify(die_xy, dia, offset, 3, 4.5,
+                                       north_limit, street_xy=(0.1, 0.2))
+            substrate = geometry.CircleFlat(dia)
+            die_map = engine.classify(die_xy, substrate, offset, 3, 4.5,
+                                      north_limit, street_xy=(0.1, 0.2))
+            np.testing.assert_array_equal(die_map.status, expected.status)
+            self.assertEqual(engine.count_gdw(die_xy, substrate, offset, 3,
+                                              4.5, north_limit, (0.1, 0.2)),
+                             expected.gdw)
+
+    def test_count_matches_classify(self):
+        for substrate in self.substrates:
+            for die_xy, offset in itertools.product(
+                    [(5, 5), (12.1, 3.3)], [("odd", "odd"), (2.1, -4.4)]):
+                die_map = engine.classify(die_xy, substrate, offset, 3, 5, 40)
+                self.assertEqual(engine.count_gdw(die_xy, substrate, offset,
+                                                  3, 5, 40),
+                                 die_map.gdw)
+                self.assertTrue(brute_probe(die_map, substrate, 3, 5))
+
+    def test_die_status(self):
+        substrate = geometry.CircleNotch(200)
+        die_map = engine.classify((3, 3), substrate, ("odd", "odd"), 2, 2)
+        status = engine.die_status(die_map.x_centers[None, :],
+                                   die_map.y_centers[:, None], (3, 3),
+                                   substrate, 2, 2)
+        np.testing.assert_array_equal(status, die_map.status)
+
+    def test_notch(self):
+        # A notch only removes die near the bottom center.
+        circle = engine.classify((2, 2), geometry.Circle(300), ("odd", "odd"),
+                                 0.5, 0)
+        notch = engine.classify((2, 2), geometry.CircleNotch(300),
+                                ("odd", "odd"), 0.5, 0)
+        changed = np.nonzero(notch.status != circle.status)
+        self.assertGreater(len(changed[0]), 0)
+        self.assertTrue((np.abs(notch.x_centers[changed[1]]) < 5).all())
+        self.assertTrue((notch.y_centers[changed[0]] < -140).all())
+        self.assertLess(notch.gdw, circle.gdw)
+
+    def test_secondary_flat(self):
+        # The 90 degree secondary flat is on the left.
+        substrate = geometry.SecondaryFlat(150, 90)
+        die_map = engine.classify((1, 1), substrate, ("even", "even"), 3, 3)
+        rows, cols = np.nonzero(die_map.status == engine.FLAT)
+        self.assertTrue((die_map.y_centers[rows] > -60).any())
+        self.assertTrue((die_map.x_centers[cols] < -60).any())
+        self.assertFalse((die_map.x_centers[cols] > 60).any())
+
+    def test_panel(self):
+        panel = geometry.Panel(100, 50)
+        # 10 columns by 5 rows exactly fill the panel.
+        self.assertEqual(engine.count_gdw((10, 10), panel, ("even", "odd"),
+                                          0, 0), 50)
+        self.assertEqual(engine.count_gdw((10, 10), panel, ("even", "odd"),
+                                          0.1, 0), 24)
+        die_map = engine.classify((10, 10), panel, ("even", "odd"), 0, 0,
+                                  fields=True)
+        self.assertEqual(die_map.gdw, 50)
+        np.testing.assert_array_equal(
+            die_map.fields["excl_area_fraction"][die_map.status == 0], 1)
+
+    def test_point_functions(self):
+        notch = geometry.CircleNotch(300)
+        self.assertFalse(notch.inside(0, -149.5))
+        self.assertTrue(notch.inside(2, -149.5))
+        self.assertAlmostEqual(float(notch.distance(0, -148)), 1)
+        self.assertAlmostEqual(float(notch.distance(1, -149)),
+                               1 / np.sqrt(2))
+        panel = geometry.Panel(100, 50)
+        self.assertEqual(float(panel.distance(0, 0)), 25)
+        self.assertEqual(float(panel.distance(53, 29)), -5)
+        flat = geometry.CircleFlat(150)
+        self.assertAlmostEqual(float(flat.distance(0, 0)),
+                               -engine.flat_location(150))
+
+    def test_chord_cache(self):
+        substrate = geometry.CircleNotch(200)
+        y = np.arange(-100, 100, 5.0)
+        first = substrate.chord_table(y, y + 5, 3)
+        self.assertIs(substrate.chord_table(y, y + 5, 3), first)
+        self.assertIsNot(substrate.chord_table(y, y + 5, 2), first)
+
+    def test_diameter_only(self):
+        notch = geometry.CircleNotch(300)
+        calls = [
+            lambda: engine.probe_half_widths(np.zeros(3), (5, 5), notch, 3,
+                                             3),
+            lambda: sensitivity.edge_exclusion_curve((5, 5), notch,
+                                                     ("odd", "odd"), 3),
+            lambda: landscape.gdw_landscape((5, 5), notch, 3, 3),
+            lambda: reticle.shot_map((5, 5), (2, 2), notch,
+                                     ("odd", "odd"), 3, 3),
+            lambda: optimize.best_offsets([5], [5], notch, 3, 3),
+            lambda: optimize.max_die_size(100, notch, 3, 3),
+            ]
+        for call in calls:
+            with self.assertRaisesRegex(TypeError, "not a CircleNotch"):
+                call()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
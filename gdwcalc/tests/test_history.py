@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.history
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from .. import engine
+from .. import history
+
+
+def die_maps():
+    """ A few different die maps, one with fields """
+    return [engine.classify((5, 5), 150, ("odd", "even"), 4.5, 4.5),
+            engine.classify((3, 4), 150, (0.25, -1.5), 3, 4, 60,
+                            fields=True),
+            engine.max_gdw((6, 6), 200, 5, 5, rotation=1.5),
+            ]
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def assert_same(self, die_map, expected):
+        self.assertEqual(die_map.fingerprint(), expected.fingerprint())
+        np.testing.assert_array_equal(die_map.x_centers, expected.x_centers)
+        np.testing.assert_array_equal(die_map.y_centers, expected.y_centers)
+        self.assertEqual(die_map.center_xy, expected.center_xy)
+        self.assertEqual(die_map.center_offset, expected.center_offset)
+        self.assertEqual(die_map.rotation, expected.rotation)
+        self.assertEqual(die_map.coord_list(), expected.coord_list())
+        if expected.fields is None:
+            self.assertIsNone(die_map.fields)
+        else:
+            for name in engine.FIELD_NAMES:
+                np.testing.assert_array_equal(die_map.fields[name],
+                                              expected.fields[name])
+
+    def test_save_load(self):
+        fname = os.path.join(self.tempdir, "entry.npz")
+        for n, die_map in enumerate(die_maps()):
+            entry = history.HistoryEntry({'n': n, 'dia': "150"}, die_map)
+            entry.save(fname)
+            loaded = history.HistoryEntry.load(fname)
+            self.assertEqual(loaded.params, {'n': n, 'dia': "150"})
+            self.assert_same(loaded.die_map, die_map)
+            np.testing.assert_array_equal(loaded.counts, die_map.counts())
+
+    def test_back_forward(self):
+        maps = die_maps()
+        with history.History(spill_dir=self.tempdir) as hist:
+            self.assertIsNone(hist.current)
+            self.assertIsNone(hist.back())
+            for n, die_map in enumerate(maps):
+                hist.push({'n': n}, die_map)
+            self.assertEqual(len(hist), 3)
+            self.assertFalse(hist.can_forward)
+            self.assertEqual(hist.back().params, {'n': 1})
+            self.assertEqual(hist.back().params, {'n': 0})
+            self.assertIsNone(hist.back())
+            self.assertEqual(hist.forward().params, {'n': 1})
+
+            # A new calculation replaces everything ahead of it.
+            hist.push({'n': 3}, maps[0])
+            self.assertEqual(len(hist), 3)
+            self.assertFalse(hist.can_forward)
+            self.assertEqual(hist.back().params, {'n': 1})
+
+            # Repeating the current calculation doesn't add an entry.
+            hist.forward()
+            hist.push({'n': 3}, maps[0])
+            self.assertEqual(len(hist), 3)
+
+    def test_spill(self):
+        maps = die_maps()
+        budget = max(history.HistoryEntry({}, die_map).nbytes
+                     for die_map in maps)
+        with history.History(max_bytes=budget,
+                             spill_dir=self.tempdir) as hist:
+            for n, die_map in enumerate(maps):
+                hist.push({'n': n}, die_map)
+                self.assertLessEqual(hist.nbytes, budget)
+            self.assertTrue(os.listdir(self.tempdir))
+
+            # Spilled entries come back unchanged.
+            while hist.can_back:
+                hist.back()
+            for n, die_map in enumerate(maps):
+                self.assertEqual(hist.current.params, {'n': n})
+                self.assert_same(hist.current.die_map, die_map)
+                self.assertLessEqual(hist.nbytes, budget)
+                hist.forward()
+        self.assertEqual(os.listdir(self.tempdir), [])
+
+    def test_temporary_dir(self):
+        hist = history.History(max_bytes=0)
+        for n, die_map in enumerate(die_maps()):
+            hist.push({'n': n}, die_map)
+        spill_dir = hist.spill_dir
+        self.assertTrue(os.listdir(spill_dir))
+        hist.close()
+        self.assertFalse(os.path.exists(spill_dir))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
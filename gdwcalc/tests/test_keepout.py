@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.keepout
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from .. import engine
+from .. import keepout
+from .. import reticle
+
+
+def sampled_hits(zone, x, y, half_x, half_y, n=21):
+    """ Whether any sampled point of each die is inside the zone. """
+    steps = np.linspace(-1, 1, n)
+    px, py = np.broadcast_arrays(x[:, None, None] + steps * half_x,
+                                 y[:, None, None] + steps[:, None] * half_y)
+    px, py = px.ravel(), py.ravel()
+    if isinstance(zone, keepout.CircleZone):
+        inside = np.hypot(px - zone.x, py - zone.y) <= zone.radius
+    else:
+        inside = zone.contains(px, py)
+    return inside.reshape(len(x), -1).any(axis=1)
+
+
+ZONES = [keepout.CircleZone(10.3, -20.1, 3.2),
+         keepout.PolygonZone([(-30, 30), (-10, 32), (-20, 45)]),
+         # Concave "L" shape.
+         keepout.PolygonZone([(30, 0), (45, 0), (45, 4), (34, 4), (34, 15),
+                              (30, 15)]),
+         ]
+
+
+class TestZones(unittest.TestCase):
+    def test_hits(self):
+        x, y = np.meshgrid(np.arange(-60, 60, 1.3), np.arange(-60, 60, 1.7))
+        x, y = x.ravel(), y.ravel()
+        for zone in ZONES:
+            hits = zone.hits(x, y, 0.6, 0.8)
+            sampled = sampled_hits(zone, x, y, 0.6, 0.8)
+            # Sampling can only miss a corner clip, never find extra hits.
+            self.assertTrue((hits | ~sampled).all())
+            self.assertLessEqual(np.count_nonzero(hits & ~sampled),
+                                 0.05 * np.count_nonzero(hits))
+
+    def test_dict(self):
+        for zone in ZONES:
+            params = json.loads(json.dumps(zone.to_dict()))
+            self.assertEqual(repr(keepout.zone_from_dict(params)),
+                             repr(zone))
+        with self.assertRaises(ValueError):
+            keepout.zone_from_dict({'kind': "square"})
+
+    def test_die_inside_polygon(self):
+        zone = keepout.PolygonZone([(-10, -10), (10, -10), (10, 10),
+                                    (-10, 10)])
+        self.assertTrue(zone.hits(np.array([0.0]), np.array([0.0]), 1, 1)[0])
+        # Polygon entirely inside the die.
+        self.assertTrue(zone.hits(np.array([0.0]), np.array([0.0]), 50,
+                                  50)[0])
+        self.assertFalse(zone.hits(np.array([12.0]), np.array([0.0]), 1.5,
+                                   1)[0])
+
+    def test_grid_mask(self):
+        die_map = engine.classify((1.1, 0.9), 150, (0.3, 0.2), 3, 3)
+        mask = keepout.grid_mask(die_map.x_centers, die_map.y_centers,
+                                 die_map.die_xy, ZONES)
+        expected = keepout.die_mask(die_map.x_centers[None, :],
+                                    die_map.y_centers[:, None],
+                                    die_map.die_xy, ZONES)
+        np.testing.assert_array_equal(mask, expected)
+        self.assertTrue(mask.any())
+
+
+class TestEngine(unittest.TestCase):
+    def test_status(self):
+        plain = engine.classify((2, 2), 150, ("odd", "odd"), 3, 3)
+        die_map = engine.classify((2, 2), 150, ("odd", "odd"), 3, 3,
+                                  keepouts=ZONES)
+        lost = die_map.status == engine.KEEPOUT
+        self.assertTrue(lost.any())
+        self.assertTrue((plain.status[lost] == engine.PROBE).all())
+        self.assertEqual(die_map.counts()[engine.KEEPOUT],
+                         plain.gdw - die_map.gdw)
+
+    def test_die_status(self):
+        die_map = engine.classify((2, 2), 150, (0.5, 0.7), 3, 3, 50,
+                                  keepouts=ZONES)
+        status = engine.die_status(die_map.x_centers[None, :],
+                                   die_map.y_centers[:, None], (2, 2), 150,
+                                   3, 3, 50, ZONES)
+        np.testing.assert_array_equal(status, die_map.status)
+
+    def test_shot_map(self):
+        shot_map = reticle.shot_map((2, 2), (4, 3), 150, ("odd", "odd"), 3,
+                                    3, keepouts=ZONES)
+        die_map = engine.classify((2, 2), 150, shot_map.die_offset, 3, 3,
+                                  keepouts=ZONES)
+        self.assertEqual(shot_map.gdw, die_map.gdw)
+
+
+class TestReadZones(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read(self):
+        fname = os.path.join(self.tmp_dir, "zones.csv")
+        with open(fname, 'w') as openf:
+            openf.write("# alignment marks\n"
+                        "circle, -40, 0, 2\n"
+                        "\n"
+                        "polygon, 0,0, 5,0, 5,5\n")
+        zones = keepout.read_zones(fname)
+        self.assertEqual(len(zones), 2)
+        self.assertEqual(zones[0].radius, 2)
+        self.assertEqual(zones[1].vertices.shape, (3, 2))
+
+    def test_bad_line(self):
+        fname = os.path.join(self.tmp_dir, "zones.csv")
+        with open(fname, 'w') as openf:
+            openf.write("circle, 1, 2\n")
+        with self.assertRaises(ValueError):
+            keepout.read_zones(fname)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.landscape
+"""
+
+import unittest
+
+import numpy as np
+
+from .. import engine
+from .. import landscape
+
+
+class TestGdwLandscape(unittest.TestCase):
+    def test_matches_classify(self):
+        params = [((5, 7), 150, 4.5, 4.5, 60.1),
+                  ((3.3, 2.1), 200, 3, 5, None),
+                  ((11, 4), 100, 2, 6, 30),
+                  ]
+        for die_xy, dia, excl, flat_excl, north_limit in params:
+            x_offsets, y_offsets, gdw = landscape.gdw_landscape(
+                die_xy, dia, excl, flat_excl, north_limit, shape=(7, 9))
+            self.assertEqual(gdw.shape, (7, 9))
+            for iy, y_offset in enumerate(y_offsets):
+                for ix, x_offset in enumerate(x_offsets):
+                    die_map = engine.classify(die_xy, dia,
+                                              (x_offset, y_offset),
+                                              excl, flat_excl, north_limit)
+                    self.assertEqual(gdw[iy, ix], die_map.gdw)
+
+    def test_includes_odd_odd(self):
+        _, _, gdw = landscape.gdw_landscape((5, 5), 150, 4.5, 4.5)
+        die_map = engine.classify((5, 5), 150, ("odd", "odd"), 4.5, 4.5)
+        self.assertEqual(gdw[0, 0], die_map.gdw)
+
+
+class TestCliffDepth(unittest.TestCase):
+    def test_wraps(self):
+        gdw = np.full((4, 4), 10)
+        gdw[0, 0] = 7
+        cliff = landscape.cliff_depth(gdw)
+        self.assertEqual(cliff[3, 3], 3)
+        self.assertEqual(cliff[0, 0], 0)
+        self.assertEqual(cliff[2, 2], 0)
+
+
+class TestToRgb(unittest.TestCase):
+    def test_colors(self):
+        gdw = np.array([[0, 1], [2, 4]])
+        rgb = landscape.to_rgb(gdw)
+        self.assertEqual(rgb.shape, (2, 2, 3))
+        # Row 0 of the landscape is at the bottom of the image.
+        self.assertEqual(tuple(rgb[1, 0]), landscape.LOW_COLOR)
+        self.assertEqual(tuple(rgb[0, 1]), landscape.HIGH_COLOR)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.montecarlo
+"""
+
+import unittest
+
+import numpy as np
+
+from .. import engine
+from .. import montecarlo
+from .. import scheduler
+from .. import yield_models
+
+
+class TestRadialProfile(unittest.TestCase):
+    def test_sample(self):
+        profile = montecarlo.edge_profile(150, 0.1, 5, 2.0)
+        rng = np.random.RandomState(0)
+        wafer, x, y = profile.sample(rng, 2000)
+        radius = np.hypot(x, y)
+        self.assertTrue((radius <= 75).all())
+        self.assertTrue((np.diff(wafer) >= 0).all())
+        # Defects per wafer in each ring match the profile.
+        in_edge = np.count_nonzero(radius > 70) / 2000
+        self.assertAlmostEqual(in_edge / profile.expected_defects[1], 1,
+                               delta=0.05)
+
+    def test_bad_profile(self):
+        with self.assertRaises(ValueError):
+            montecarlo.RadialProfile([0, 75], [0.1, 0.2])
+
+
+class TestSimulate(unittest.TestCase):
+    def setUp(self):
+        self.die_map = engine.max_gdw((5, 5), 150, 4.5, 4.5)
+
+    def test_uniform_matches_poisson(self):
+        profile = montecarlo.RadialProfile([0, 75], [0.5])
+        result = montecarlo.simulate(self.die_map, profile, 5000, seed=1,
+                                     max_workers=2)
+        expected = yield_models.net_die(self.die_map.gdw, 25, 0.5)
+        self.assertEqual(len(result.good_die), 5000)
+        self.assertEqual(result.gdw, self.die_map.gdw)
+        self.assertLess(abs(result.mean - expected), 1)
+        self.assertLess(result.mean_ci[0], result.mean)
+        self.assertGreater(result.mean_ci[1], result.mean)
+        valid = ~np.isnan(result.ring_yield)
+        np.testing.assert_allclose(result.ring_yield[valid], np.exp(-0.125),
+                                   atol=0.01)
+
+    def test_repeatable(self):
+        profile = montecarlo.RadialProfile([0, 75], [0.5])
+        first = montecarlo.simulate(self.die_map, profile, 2500, seed=3,
+                                    batch_size=1000, max_workers=1)
+        second = montecarlo.simulate(self.die_map, profile, 2500, seed=3,
+                                     batch_size=1000, max_workers=3)
+        np.testing.assert_array_equal(first.good_die, second.good_die)
+
+    def test_edge_heavy(self):
+        profile = montecarlo.edge_profile(150, 0.05, 10, 5.0)
+        result = montecarlo.simulate(self.die_map, profile, 2000, seed=2,
+                                     max_workers=2)
+        # Rings with die touching the edge band yield worse.
+        self.assertLess(result.ring_yield[13], result.ring_yield[0] - 0.1)
+
+    def test_jobs(self):
+        profile = montecarlo.edge_profile(150, 0.1, 5, 2.0)
+        jobs = montecarlo.simulation_jobs(self.die_map, profile, 2500,
+                                          seed=4, batch_size=1000)
+        self.assertEqual([job[2] for job in jobs], [1000, 1000, 500])
+        try:
+            batches = scheduler.shared_scheduler().map(
+                montecarlo.simulate_batch, jobs).result()
+        finally:
+            scheduler.shutdown_shared()
+        result = montecarlo.simulation_result(self.die_map, batches)
+        expected = montecarlo.simulate(self.die_map, profile, 2500, seed=4,
+                                       batch_size=1000, max_workers=1)
+        np.testing.assert_array_equal(result.good_die, expected.good_die)
+        np.testing.assert_array_equal(result.ring_yield, expected.ring_yield)
+
+    def test_defect_free(self):
+        profile = montecarlo.RadialProfile([0, 75], [0])
+        result = montecarlo.simulate(self.die_map, profile, 10,
+                                     max_workers=1)
+        self.assertTrue((result.good_die == self.die_map.gdw).all())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.mpw
+"""
+
+import unittest
+
+import numpy as np
+
+from .. import engine
+from .. import geometry
+from .. import mpw
+
+
+PRODUCTS = mpw.parse_products(["# name, x, y, qty",
+                               "A, 5, 5, 150",
+                               "B, 10, 8, 40",
+                               "",
+                               "C, 2, 3, 600",
+                               "D, 12, 12, 15",
+                               ])
+
+
+def assert_valid(test, layout, dia, excl, flat_excl, north_limit=None):
+    """ Every die is probe-able on its own and no two die overlap. """
+    for x, y, product in zip(layout.x_centers, layout.y_centers,
+                             layout.product):
+        status = engine.die_status(np.array([x]), np.array([y]),
+                                   tuple(layout.die_xy[product]), dia, excl,
+                                   flat_excl, north_limit)
+        test.assertEqual(status[0], engine.PROBE)
+
+    rects = np.array(layout.rect_list())
+    x_ll, y_ll, width, height = rects[:, :4].T
+    overlap = ((x_ll[:, None] < x_ll + width - 1e-9)
+               & (x_ll < x_ll[:, None] + width[:, None] - 1e-9)
+               & (y_ll[:, None] < y_ll + height - 1e-9)
+               & (y_ll < y_ll[:, None] + height[:, None] - 1e-9))
+    np.fill_diagonal(overlap, False)
+    test.assertFalse(overlap.any())
+
+
+class TestParse(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(len(PRODUCTS), 4)
+        self.assertEqual(PRODUCTS[1], {'name': "B",
+                                       'die_xy': (10.0, 8.0),
+                                       'quantity': 40})
+
+    def test_bad_line(self):
+        for line in ["A, 5, 5", "A, 5, x, 10", "A, 0, 5, 10"]:
+            with self.assertRaises(ValueError):
+                mpw.parse_products([line])
+
+
+class TestPack(unittest.TestCase):
+    def test_strategies(self):
+        for strategy in mpw.STRATEGIES:
+            layout = mpw.pack(PRODUCTS, 150, 3, 3, street_xy=(0.1, 0.1),
+                              strategy=strategy, n_candidates=500, seed=0)
+            self.assertTrue(layout.complete)
+            self.assertFalse(layout.shortfall.any())
+            assert_valid(self, layout, 150, 3, 3)
+
+    def test_repeatable(self):
+        layout_a = mpw.pack(PRODUCTS, 150, 3, 3, n_candidates=200, seed=5)
+        layout_b = mpw.pack(PRODUCTS, 150, 3, 3, n_candidates=200, seed=5)
+        np.testing.assert_array_equal(layout_a.x_centers, layout_b.x_centers)
+        np.testing.assert_array_equal(layout_a.shelves, layout_b.shelves)
+
+    def test_limits(self):
+        notch = geometry.CircleNotch(200)
+        layout = mpw.pack(PRODUCTS, notch, 4, 2, north_limit=80,
+                          n_candidates=200, seed=1)
+        assert_valid(self, layout, notch, 4, 2, 80)
+        layout = mpw.pack(PRODUCTS, 100, 3, 10, n_candidates=200, seed=1)
+        assert_valid(self, layout, 100, 3, 10)
+        self.assertFalse(layout.complete)
+
+    def test_score_matches_layout(self):
+        rng = np.random.RandomState(2)
+        shelves, start = mpw.candidate_packings(PRODUCTS, 150, 3, 3,
+                                                street_xy=(0.2, 0.1),
+                                                n_candidates=20, rng=rng)
+        counts = mpw.score_packings(PRODUCTS, shelves, start, 150, 3, 3,
+                                    street_xy=(0.2, 0.1))
+        self.assertEqual(counts.shape, (20, 4))
+        for n in range(20):
+            layout = mpw.layout(PRODUCTS, shelves[n], start[n], 150, 3, 3,
+                                street_xy=(0.2, 0.1))
+            np.testing.assert_array_equal(layout.counts, counts[n])
+
+    def test_bad_strategy(self):
+        with self.assertRaises(ValueError):
+            mpw.candidate_packings(PRODUCTS, 150, 3, 3, strategy="spiral")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.optimize
+"""
+
+import unittest
+
+from .. import engine
+from .. import optimize
+from .. import reticle
+
+
+class TestBestOffsets(unittest.TestCase):
+    def test_at_least_max_gdw(self):
+        gdw, x_offset, y_offset = optimize.best_offsets([5, 3], [5, 8], 150,
+                                                        4.5, 4.5,
+                                                        n_offsets=4)
+        for n, die_xy in enumerate([(5, 5), (3, 8)]):
+            die_map = engine.max_gdw(die_xy, 150, 4.5, 4.5)
+            self.assertGreaterEqual(gdw[n], die_map.gdw)
+            die_map = engine.classify(die_xy, 150,
+                                      (x_offset[n], y_offset[n]), 4.5, 4.5)
+            self.assertEqual(gdw[n], die_map.gdw)
+
+    def test_street_sweep(self):
+        streets = [0, 0.1, 0.25]
+        gdw, x_offset, y_offset = optimize.best_offsets([5] * 3, [5] * 3, 150,
+                                                        4.5, 4.5,
+                                                        street_xy=(streets,
+                                                                   0.1))
+        for n, street in enumerate(streets):
+            die_map = engine.classify((5, 5), 150,
+                                      (x_offset[n], y_offset[n]), 4.5, 4.5,
+                                      street_xy=(street, 0.1))
+            self.assertEqual(gdw[n], die_map.gdw)
+        self.assertGreaterEqual(gdw[0], gdw[2])
+
+
+class TestOptimizeAspectRatio(unittest.TestCase):
+    def test_candidates(self):
+        cands = optimize.optimize_aspect_ratio(25, 150, 4.5, 4.5, 60,
+                                               n_aspect=200, top_n=5)
+        self.assertEqual(len(cands), 5)
+        gdws = [c.gdw for c in cands]
+        self.assertEqual(gdws, sorted(gdws, reverse=True))
+        for cand in cands:
+            self.assertAlmostEqual(cand.die_x * cand.die_y, 25)
+            die_map = engine.classify((cand.die_x, cand.die_y), 150,
+                                      (cand.x_offset, cand.y_offset),
+                                      4.5, 4.5, 60)
+            self.assertEqual(cand.gdw, die_map.gdw)
+
+    def test_beats_square(self):
+        cands = optimize.optimize_aspect_ratio(25, 150, 4.5, 4.5, top_n=1)
+        self.assertGreaterEqual(cands[0].gdw,
+                                engine.max_gdw((5, 5), 150, 4.5, 4.5).gdw)
+
+
+class TestMaxDieSize(unittest.TestCase):
+    def test_square(self):
+        cand = optimize.max_die_size(500, 150, 4.5, 4.5)
+        self.assertGreaterEqual(cand.gdw, 500)
+        self.assertAlmostEqual(cand.die_x, cand.die_y)
+        die_map = engine.classify((cand.die_x, cand.die_y), 150,
+                                  (cand.x_offset, cand.y_offset), 4.5, 4.5)
+        self.assertEqual(cand.gdw, die_map.gdw)
+
+        # A slightly larger die misses the target at every offset.
+        bigger = cand.die_x + 0.01
+        gdw, _, _ = optimize.best_offsets([bigger], [bigger], 150, 4.5, 4.5)
+        self.assertLess(gdw[0], 500)
+
+    def test_fixed_die_x(self):
+        cand = optimize.max_die_size(300, 150, 4.5, 4.5, die_x=4)
+        self.assertEqual(cand.die_x, 4)
+        self.assertGreaterEqual(cand.gdw, 300)
+        self.assertGreater(cand.die_y, 4)
+
+    def test_impossible(self):
+        self.assertIsNone(optimize.max_die_size(2, 150, 4.5, 4.5,
+                                                   die_x=200))
+
+
+class TestOptimizeShots(unittest.TestCase):
+    def test_keeps_max_gdw(self):
+        cand = optimize.optimize_shots((5, 5), (4, 3), 150, 4.5, 4.5, 60)
+        gdw, _, _ = optimize.best_offsets([5], [5], 150, 4.5, 4.5, 60,
+                                          n_offsets=8)
+        self.assertEqual(cand.gdw, gdw[0])
+
+        shot_map = reticle.shot_map((5, 5), (4, 3), 150,
+                                    (cand.x_offset, cand.y_offset), 4.5, 4.5,
+                                    60)
+        self.assertEqual(shot_map.gdw, cand.gdw)
+        self.assertEqual(shot_map.n_shots, cand.n_shots)
+        self.assertEqual(shot_map.n_partial, cand.n_partial)
+
+        # No better than the plain odd/odd shot grid.
+        odd = reticle.shot_map((5, 5), (4, 3), 150, ("odd", "odd"), 4.5,
+                               4.5, 60)
+        if odd.gdw == cand.gdw:
+            self.assertLessEqual(cand.n_shots, odd.n_shots)
+
+    def test_drop_partial(self):
+        cand = optimize.optimize_shots((5, 5), (4, 3), 150, 4.5, 4.5,
+                                       drop_partial=True)
+        self.assertEqual(cand.n_partial, 0)
+        self.assertEqual(cand.gdw, 12 * cand.n_shots)
+        self.assertGreater(cand.gdw, 0)
+
+        shot_map = reticle.shot_map((5, 5), (4, 3), 150,
+                                    (cand.x_offset, cand.y_offset), 4.5, 4.5)
+        self.assertEqual(shot_map.n_full, cand.n_shots)
+
+        # No placement has more die in full shots.
+        for phase in ("odd", "even"):
+            other = reticle.shot_map((5, 5), (4, 3), 150, (phase, phase),
+                                     4.5, 4.5)
+            self.assertLessEqual(12 * other.n_full, cand.gdw)
+
+        loose = optimize.optimize_shots((5, 5), (4, 3), 150, 4.5, 4.5,
+                                        tolerance=50, drop_partial=True)
+        self.assertLessEqual(loose.n_shots, cand.n_shots)
+        self.assertGreaterEqual(loose.gdw, cand.gdw - 50)
+
+    def test_tolerance(self):
+        strict = optimize.optimize_shots((5, 5), (4, 3), 150, 4.5, 4.5)
+        loose = optimize.optimize_shots((5, 5), (4, 3), 150, 4.5, 4.5,
+                                        tolerance=50)
+        self.assertLessEqual(loose.n_shots, strict.n_shots)
+        self.assertGreaterEqual(loose.gdw, strict.gdw - 50)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
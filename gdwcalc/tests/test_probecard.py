@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.probecard
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from .. import engine
+from .. import probecard
+
+
+def probe_xy(die_xy, dia):
+    die_map = engine.max_gdw(die_xy, dia, 4.5, 4.5)
+    rows, cols = np.nonzero(die_map.status == engine.PROBE)
+    return np.column_stack((cols, rows))
+
+
+class TestPlanTouchdowns(unittest.TestCase):
+    def check_covers(self, plan, xy):
+        tested = set()
+        for step in range(plan.n_touchdowns):
+            tested.update(map(tuple, plan.site_coords(step).tolist()))
+        self.assertTrue(set(map(tuple, xy.tolist())) <= tested)
+        self.assertEqual(plan.n_die.sum(), len(xy))
+
+    def test_rectangular(self):
+        xy = probe_xy((5, 5), 150)
+        for sites in [(2, 2), (1, 8), (4, 4)]:
+            plan = probecard.plan_touchdowns(xy, sites)
+            self.check_covers(plan, xy)
+            lower_bound = np.ceil(len(xy) / plan.n_sites)
+            self.assertGreaterEqual(plan.n_touchdowns, lower_bound)
+            self.assertGreater(plan.utilization, 0.75)
+
+    def test_pattern(self):
+        xy = probe_xy((5, 5), 150)
+        sites = np.array([[1, 0, 1],
+                          [0, 1, 0]], dtype=bool)
+        plan = probecard.plan_touchdowns(xy, sites)
+        self.assertEqual(plan.n_sites, 3)
+        self.check_covers(plan, xy)
+
+    def test_single_site(self):
+        xy = probe_xy((5, 5), 150)
+        plan = probecard.plan_touchdowns(xy, (1, 1))
+        self.assertEqual(plan.n_touchdowns, len(xy))
+        self.assertEqual(plan.utilization, 1)
+
+    def test_serpentine(self):
+        plan = probecard.plan_touchdowns(probe_xy((5, 5), 150), (2, 2))
+        rows = plan.touchdowns[:, 1]
+        self.assertTrue((np.diff(rows) >= 0).all())
+
+    def test_empty(self):
+        plan = probecard.plan_touchdowns([], (2, 2))
+        self.assertEqual(plan.n_touchdowns, 0)
+        self.assertEqual(plan.utilization, 0)
+
+
+class TestWritePlan(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_write(self):
+        plan = probecard.plan_touchdowns([(0, 0), (1, 0), (5, 5)], (2, 2))
+        fname = os.path.join(self.tmp_dir, "plan.csv")
+        probecard.write_plan(fname, plan)
+        with open(fname) as openf:
+            lines = openf.read().splitlines()
+        self.assertTrue(lines[0].startswith("# 2x2 sites, 2 touchdowns"))
+        self.assertEqual(lines[1], "Step,Col,Row,Die")
+        self.assertEqual(len(lines), 4)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
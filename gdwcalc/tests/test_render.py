@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.render
+"""
+
+import io
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+import numpy as np
+
+from .. import batch
+from .. import engine
+from .. import render
+
+
+# A tiny 3x3 map centered on the middle die.
+COORD_LIST = [(x, y, "probe") for x in range(1, 4) for y in range(1, 4)]
+COORD_LIST[0] = (1, 1, "excl")
+DIE_XY = (10, 10)
+CENTER_XY = (2, 2)
+DIA = 100
+
+
+class TestRasterize(unittest.TestCase):
+    def test_shape(self):
+        img = render.rasterize(COORD_LIST, DIE_XY, CENTER_XY, DIA, size=64)
+        self.assertEqual(img.shape, (64, 64, 3))
+        self.assertEqual(img.dtype, np.uint8)
+
+    def test_colors(self):
+        img = render.rasterize(COORD_LIST, DIE_XY, CENTER_XY, DIA, size=105,
+                               gridlines=False, outline=False)
+        probe = render.LEGEND_COLORS[render.LEGEND_VALUES.index("probe")]
+        excl = render.LEGEND_COLORS[render.LEGEND_VALUES.index("excl")]
+        # Wafer center is in the middle of the center die.
+        self.assertEqual(tuple(img[52, 52]), probe)
+        # Die (1, 1) is the top-left die.
+        self.assertEqual(tuple(img[40, 40]), excl)
+        # Corners are off the map.
+        self.assertEqual(tuple(img[0, 0]), render.BACKGROUND_COLOR)
+
+    def test_empty(self):
+        img = render.rasterize([], DIE_XY, CENTER_XY, DIA, size=8,
+                               outline=False)
+        self.assertFalse(img.any())
+
+
+class TestWritePng(unittest.TestCase):
+    def test_round_trip(self):
+        img = np.random.randint(0, 256, (5, 7, 3)).astype(np.uint8)
+        buf = io.BytesIO()
+        render.write_png(buf, img)
+        data = buf.getvalue()
+
+        self.assertEqual(data[:8], b"\x89PNG\r\n\x1a\n")
+        width, height = struct.unpack(">II", data[16:24])
+        self.assertEqual((width, height), (7, 5))
+
+        idat_len = struct.unpack(">I", data[33:37])[0]
+        raw = zlib.decompress(data[41:41 + idat_len])
+        raw = np.frombuffer(raw, dtype=np.uint8).reshape(5, 7 * 3 + 1)
+        np.testing.assert_array_equal(raw[:, 1:].reshape(5, 7, 3), img)
+
+
+class TestWriteSvg(unittest.TestCase):
+    def test_one_rect_per_die(self):
+        buf = io.StringIO()
+        render.write_svg(buf, COORD_LIST, DIE_XY, CENTER_XY, 150)
+        svg = buf.getvalue()
+        self.assertTrue(svg.rstrip().endswith("</svg>"))
+        self.assertEqual(svg.count('class="probe"'), 8)
+        self.assertEqual(svg.count('class="excl"'), 1)
+        self.assertIn('x="-15.0000" y="-15.0000"', svg)
+
+
+class TestRenderCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_render(self):
+        products = [{'name': "small", 'die_xy': (5, 5), 'dia': 100},
+                    {'name': "tall", 'die_xy': (4, 9), 'dia': 150,
+                     'ee': 3},
+                    {'name': "fixed", 'die_xy': (6, 6), 'dia': 150,
+                     'offset': ("odd", "even")},
+                    {'name': "street", 'die_xy': (4, 4), 'dia': 100,
+                     'street_xy': (1, 0.5)},
+                    ]
+        for fmt in ("png", "svg"):
+            out_dir = os.path.join(self.tmp_dir, fmt)
+            results = render.render_catalog(products, out_dir, fmt,
+                                            size=32, max_workers=2)
+            self.assertEqual([name for name, _, _ in results],
+                             ["small", "tall", "fixed", "street"])
+            for (name, fname, gdw), product in zip(results, products):
+                self.assertEqual(fname,
+                                 os.path.join(out_dir, name + "." + fmt))
+                with open(fname, 'rb') as openf:
+                    data = openf.read()
+                if fmt == "png":
+                    self.assertEqual(data[:8], b"\x89PNG\r\n\x1a\n")
+                    self.assertEqual(struct.unpack(">II", data[16:24]),
+                                     (32, 32))
+                else:
+                    self.assertTrue(data.rstrip().endswith(b"</svg>"))
+                    self.assertEqual(data.count(b'class="probe"'), gdw)
+
+            self.assertEqual(results[0][2],
+                             engine.max_gdw((5, 5), 100, 4.5, 4.5).gdw)
+            self.assertEqual(results[2][2],
+                             engine.classify((6, 6), 150, ("odd", "even"),
+                                             4.5, 4.5).gdw)
+            sweep = batch.sweep_catalog(products, max_workers=1)
+            self.assertEqual([gdw for _, _, gdw in results],
+                             list(sweep.gdw))
+
+        with self.assertRaises(ValueError):
+            render.render_catalog(products, self.tmp_dir, "jpg")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.reticle
+"""
+
+import itertools
+import unittest
+
+import numpy as np
+
+from .. import engine
+from .. import reticle
+
+
+class TestShotMap(unittest.TestCase):
+    def test_matches_die_map(self):
+        params = itertools.product([(5, 7), (2.3, 1.9)],
+                                   [(4, 3), (1, 1), (2, 5)],
+                                   [None, 40.1],
+                                   [("odd", "odd"), ("even", "odd"),
+                                    (3.3, -7.1)])
+        for die_xy, reticle_xy, north_limit, offset in params:
+            shot_map = reticle.shot_map(die_xy, reticle_xy, 150, offset, 3,
+                                        4.5, north_limit, (0.1, 0.2))
+            die_map = engine.classify(die_xy, 150, shot_map.die_offset, 3,
+                                      4.5, north_limit,
+                                      street_xy=(0.1, 0.2))
+            self.assertEqual(shot_map.gdw, die_map.gdw)
+
+    def test_per_shot_counts(self):
+        die_xy = (5, 7)
+        shot_map = reticle.shot_map(die_xy, (4, 3), 150, ("even", "odd"),
+                                    4.5, 4.5, 60)
+        pitch_x, pitch_y = shot_map.pitch_xy
+        for x_ll, y_ll, count in shot_map.shot_list():
+            x = x_ll + pitch_x / 2 + np.arange(4) * pitch_x
+            y = y_ll + pitch_y / 2 + np.arange(3) * pitch_y
+            status = engine.die_status(x[None, :], y[:, None], die_xy, 150,
+                                       4.5, 4.5, 60)
+            self.assertEqual(count, np.count_nonzero(status == engine.PROBE))
+
+    def test_shot_counts(self):
+        shot_map = reticle.shot_map((5, 5), (4, 3), 150, ("odd", "odd"),
+                                    4.5, 4.5)
+        self.assertEqual(shot_map.die_per_shot, 12)
+        self.assertEqual(shot_map.n_shots,
+                         shot_map.n_full + shot_map.n_partial)
+        self.assertGreater(shot_map.n_partial, 0)
+        self.assertLessEqual(shot_map.n_full * 12, shot_map.gdw)
+        self.assertLess(shot_map.gdw, shot_map.n_shots * 12)
+
+    def test_shot_offset(self):
+        die_map = engine.max_gdw((5, 7), 150, 4.5, 4.5)
+        offset = reticle.shot_offset(die_map, (4, 3))
+        shot_map = reticle.shot_map((5, 7), (4, 3), 150, offset, 4.5, 4.5)
+        self.assertEqual(shot_map.gdw, die_map.gdw)
+
+    def test_shot_phase(self):
+        die_map = engine.max_gdw((5, 7), 150, 4.5, 4.5)
+        for phase in [(0, 0), (3, 1), (2, 2)]:
+            offset = reticle.shot_offset(die_map, (4, 3), phase)
+            self.assertEqual(reticle.shot_phase(die_map, (4, 3), offset),
+                             phase)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
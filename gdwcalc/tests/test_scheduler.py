@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.scheduler
+"""
+
+import concurrent.futures
+import concurrent.futures.process
+import os
+import time
+import unittest
+
+from .. import scheduler
+
+
+def slow_square(value, delay=0.05):
+    time.sleep(delay)
+    return value * value
+
+
+def fail(value):
+    raise ValueError("bad value {}".format(value))
+
+
+class TestScheduler(unittest.TestCase):
+    def test_submit_and_map(self):
+        with scheduler.Scheduler(2) as sched:
+            future = sched.submit(slow_square, 3, delay=0)
+            self.assertEqual(future.result(), 9)
+            future = sched.map(slow_square, range(7), chunksize=3)
+            self.assertEqual(future.result(), [n * n for n in range(7)])
+            self.assertEqual(sched.map(slow_square, []).result(), [])
+
+            metrics = sched.metrics()
+            self.assertEqual(metrics['interactive']['completed'], 1)
+            self.assertEqual(metrics['batch']['submitted'], 1)
+            self.assertEqual(metrics['batch']['completed'], 1)
+            self.assertEqual(metrics['batch']['queued'], 0)
+            self.assertEqual(metrics['batch']['running'], 0)
+            self.assertGreater(metrics['batch']['latency_max'], 0)
+
+    def test_error(self):
+        with scheduler.Scheduler(1) as sched:
+            future = sched.map(fail, range(5))
+            with self.assertRaises(ValueError):
+                future.result()
+            self.assertEqual(sched.metrics()['batch']['failed'], 1)
+            # The rest of the failed job is skipped.
+            self.assertEqual(sched.submit(slow_square, 2).result(), 4)
+            self.assertEqual(sched.metrics()['batch']['queued'], 0)
+
+    def test_priority(self):
+        done = []
+        with scheduler.Scheduler(1) as sched:
+            sched.warm()
+            batch = sched.map(slow_square, range(10))
+            batch.add_done_callback(lambda f: done.append("batch"))
+            service = sched.submit(slow_square, 2,
+                                   priority=scheduler.SERVICE)
+            service.add_done_callback(lambda f: done.append("service"))
+            interactive = sched.submit(slow_square, 1)
+            interactive.add_done_callback(
+                lambda f: done.append("interactive"))
+
+            metrics = sched.metrics()
+            self.assertEqual(metrics['batch']['running'], 1)
+            self.assertEqual(metrics['batch']['queued'], 9)
+            self.assertEqual(metrics['interactive']['queued'], 1)
+
+            concurrent.futures.wait([batch, service, interactive])
+            # Both jump ahead of the rest of the batch job.
+            self.assertEqual(done, ["interactive", "service", "batch"])
+            self.assertEqual(batch.result(), [n * n for n in range(10)])
+
+    def test_dead_worker(self):
+        with scheduler.Scheduler(2) as sched:
+            future = sched.submit(os._exit, 1)
+            with self.assertRaises(
+                    concurrent.futures.process.BrokenProcessPool):
+                future.result()
+            # A new pool is started for the next tasks.
+            self.assertEqual(sched.submit(slow_square, 3).result(), 9)
+            self.assertEqual(sched.map(slow_square, range(4)).result(),
+                             [0, 1, 4, 9])
+            metrics = sched.metrics()['interactive']
+            self.assertEqual(metrics['running'], 0)
+            self.assertEqual(metrics['failed'], 1)
+            self.assertEqual(metrics['completed'], 1)
+
+    def test_shutdown(self):
+        sched = scheduler.Scheduler(1)
+        future = sched.map(slow_square, range(20))
+        sched.shutdown()
+        self.assertTrue(future.cancelled())
+        self.assertEqual(sched.metrics()['batch']['queued'], 0)
+
+    def test_shutdown_no_wait(self):
+        sched = scheduler.Scheduler(1)
+        sched.warm()
+        future = sched.submit(slow_square, 3, 1.0)
+        start = time.perf_counter()
+        sched.shutdown(wait=False)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(future.result(), 9)
+
+    def test_batch_map(self):
+        self.assertEqual(scheduler.batch_map(slow_square, range(4), 2,
+                                             max_workers=2),
+                         [0, 1, 4, 9])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
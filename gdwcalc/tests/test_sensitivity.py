@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.sensitivity
+"""
+
+import unittest
+
+import numpy as np
+
+from .. import engine
+from .. import sensitivity
+
+
+DIE_XY = (5, 7)
+DIA = 150
+OFFSET = ("even", "odd")
+
+
+class TestStepCurve(unittest.TestCase):
+    def test_decreasing(self):
+        curve = sensitivity.StepCurve([1, 2, 2, 3], decreasing=True)
+        np.testing.assert_array_equal(curve([0, 1, 1.5, 2, 2.5, 3, 4]),
+                                      [4, 4, 3, 3, 1, 1, 0])
+
+    def test_increasing(self):
+        curve = sensitivity.StepCurve([1, 2, 2, 3], decreasing=False)
+        np.testing.assert_array_equal(curve([0, 1, 1.5, 2, 2.5, 3, 4]),
+                                      [0, 1, 1, 3, 3, 4, 4])
+
+    def test_plot_points(self):
+        curve = sensitivity.StepCurve([1, 2], decreasing=True)
+        expected = [(0, 2), (1, 2), (1, 1), (2, 1), (2, 0), (3, 0)]
+        self.assertEqual(curve.plot_points(0, 3), expected)
+
+
+class TestCurves(unittest.TestCase):
+    def test_edge_exclusion(self):
+        curve = sensitivity.edge_exclusion_curve(DIE_XY, DIA, OFFSET, 4.5,
+                                                 60.1)
+        for ee in np.arange(0.05, 12, 0.5):
+            die_map = engine.classify(DIE_XY, DIA, OFFSET, ee, 4.5, 60.1)
+            self.assertEqual(curve(ee), die_map.gdw)
+
+    def test_flat_exclusion(self):
+        curve = sensitivity.flat_exclusion_curve(DIE_XY, DIA, OFFSET, 3,
+                                                 60.1)
+        for fe in np.arange(0.05, 12, 0.5):
+            die_map = engine.classify(DIE_XY, DIA, OFFSET, 3, fe, 60.1)
+            self.assertEqual(curve(fe), die_map.gdw)
+
+    def test_north_limit(self):
+        curve = sensitivity.north_limit_curve(DIE_XY, DIA, OFFSET, 3, 4.5)
+        for north_limit in np.arange(0.05, 80, 2.5):
+            die_map = engine.classify(DIE_XY, DIA, OFFSET, 3, 4.5,
+                                      north_limit)
+            self.assertEqual(curve(north_limit), die_map.gdw)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.service
+"""
+
+import asyncio
+import json
+import unittest
+
+from .. import aio
+from .. import engine
+from .. import service
+
+
+async def post(port, path, payload, method="POST"):
+    """ Send one request on a new connection and return (status, json) """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b""
+    head = ("{} {} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+            "Content-Length: {}\r\n\r\n").format(method, path, len(body))
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, json.loads(body.decode('utf-8'))
+
+
+class TestNormalize(unittest.TestCase):
+    def test_defaults(self):
+        setup = service.normalize({'die_xy': [5, 5], 'dia': 150}, False)
+        self.assertEqual(setup['ee'], 4.5)
+        self.assertIsNone(setup['offset'])
+        self.assertEqual(setup, service.normalize(
+            {'die_xy': [5.0, 5], 'dia': 150.0, 'fe': 4.5}, False))
+
+    def test_errors(self):
+        bad = [({'die_xy': [5, 5]}, False),
+               ({'die_xy': [5], 'dia': 150}, False),
+               ({'die_xy': [5, "5"], 'dia': 150}, False),
+               ({'die_xy': [5, 5], 'dia': 150, 'ee': True}, False),
+               ({'die_xy': [5, 5], 'dia': 150, 'bogus': 1}, False),
+               ({'die_xy': [5, 5], 'dia': 150, 'offset': [0, 0]}, False),
+               ({'die_xy': [5, 5], 'dia': 150}, True),
+               ({'die_xy': [5, 5], 'dia': 150, 'offset': ["odd", "x"]}, True),
+               ({'die_xy': [5, 5], 'dia': 150, 'units': "mm"}, False),
+               ({'die_xy': [0, 5], 'dia': 150}, False),
+               ({'die_xy': [1e-6, 1e-6], 'dia': 300}, False),
+               ({'die_xy': [0.2, 0.2], 'dia': 300}, False),
+               ]
+        for params, fixed_offset in bad:
+            with self.assertRaises(ValueError):
+                service.normalize(params, fixed_offset)
+
+    def test_result(self):
+        setup = service.normalize({'die_xy': [3, 4], 'dia': 150,
+                                   'north_limit': 60,
+                                   'offset': ["odd", 0.5], 'die': True},
+                                  True)
+        result = service.setup_result(setup)
+        die_map = engine.classify((3, 4), 150, ("odd", 0.5), 4.5, 4.5, 60)
+        self.assertEqual(result['gdw'], die_map.gdw)
+        self.assertEqual(result['counts']['scribe'],
+                         die_map.counts()[engine.SCRIBE])
+        self.assertEqual(result['fingerprint'], die_map.fingerprint())
+        self.assertEqual(len(result['die']), len(die_map.coord_list()))
+        json.dumps(result)
+
+
+class TestService(unittest.TestCase):
+    def run_service(self, scenario):
+        """ Run ``scenario(service)`` against a running service """
+        async def run():
+            gdw_service = service.GdwService(port=0, max_workers=2)
+            await gdw_service.start()
+            try:
+                await scenario(gdw_service)
+            finally:
+                await gdw_service.close()
+        aio.run(run())
+
+    def test_endpoints(self):
+        async def scenario(gdw_service):
+            port = gdw_service.port
+            status, result = await post(port, "/max_gdw",
+                                        {'die_xy': [5, 5], 'dia': 150})
+            self.assertEqual(status, 200)
+            self.assertEqual(result['gdw'],
+                             engine.max_gdw((5, 5), 150, 4.5, 4.5).gdw)
+
+            status, result = await post(port, "/classify",
+                                        {'die_xy': [5, 5], 'dia': 150,
+                                         'offset': ["even", "odd"]})
+            self.assertEqual(status, 200)
+            self.assertEqual(result['center_offset'], ["even", "odd"])
+
+            status, result = await post(port, "/classify",
+                                        {'die_xy': [5, 5], 'dia': 150})
+            self.assertEqual(status, 400)
+            self.assertIn('error', result)
+            status, result = await post(port, "/max_gdw",
+                                        {'die_xy': [1e-6, 1e-6], 'dia': 300})
+            self.assertEqual(status, 400)
+            self.assertIn('grid', result['error'])
+            status, _ = await post(port, "/nope", {})
+            self.assertEqual(status, 404)
+            status, _ = await post(port, "/max_gdw", None, "GET")
+            self.assertEqual(status, 405)
+            status, stats = await post(port, "/stats", None, "GET")
+            self.assertEqual(status, 200)
+            self.assertEqual(stats['computed'], 2)
+            status, metrics = await post(port, "/metrics", None, "GET")
+            self.assertEqual(status, 200)
+            self.assertEqual(metrics['service']['completed'], 2)
+            self.assertEqual(metrics['batch']['submitted'], 0)
+        self.run_service(scenario)
+
+    def test_coalesce_and_cache(self):
+        request = {'die_xy': [0.5, 0.5], 'dia': 300, 'rotation': 0.5}
+
+        async def scenario(gdw_service):
+            port = gdw_service.port
+            results = await asyncio.gather(*[post(port, "/max_gdw", request)
+                                             for _ in range(20)])
+            self.assertEqual(len({json.dumps(r) for r in results}), 1)
+            self.assertEqual(gdw_service.stats['computed'], 1)
+            self.assertEqual(gdw_service.stats['coalesced']
+                             + gdw_service.stats['cached'], 19)
+
+            cached = gdw_service.stats['cached']
+            status, _ = await post(port, "/max_gdw", request)
+            self.assertEqual(status, 200)
+            self.assertEqual(gdw_service.stats['cached'], cached + 1)
+            self.assertEqual(gdw_service.stats['computed'], 1)
+        self.run_service(scenario)
+
+    def test_keep_alive(self):
+        async def scenario(gdw_service):
+            reader, writer = await asyncio.open_connection(
+                "127.0.0.1", gdw_service.port)
+            body = json.dumps({'die_xy': [5, 5], 'dia': 100}).encode()
+            head = ("POST /max_gdw HTTP/1.1\r\nContent-Length: {}\r\n\r\n"
+                    .format(len(body))).encode()
+            for _ in range(3):
+                writer.write(head + body)
+                await writer.drain()
+                status_line = await reader.readline()
+                self.assertIn(b"200", status_line)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line == b"\r\n":
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.lower()] = value.strip()
+                await reader.readexactly(int(headers['content-length']))
+            writer.close()
+            self.assertEqual(gdw_service.stats['computed'], 1)
+        self.run_service(scenario)
+
+    def test_bad_length(self):
+        async def scenario(gdw_service):
+            for length in ("-5", "x"):
+                reader, writer = await asyncio.open_connection(
+                    "127.0.0.1", gdw_service.port)
+                writer.write("POST /max_gdw HTTP/1.1\r\nContent-Length: {}"
+                             "\r\n\r\n".format(length).encode())
+                await writer.drain()
+                response = await reader.read()
+                writer.close()
+                self.assertTrue(response.startswith(b"HTTP/1.1 400"))
+                self.assertIn(b"Bad Content-Length", response)
+        self.run_service(scenario)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
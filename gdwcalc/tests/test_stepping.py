@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.stepping
+"""
+
+import unittest
+
+import numpy as np
+
+from .. import engine
+from .. import stepping
+
+
+def probe_xy():
+    die_map = engine.max_gdw((5, 5), 150, 4.5, 4.5)
+    rows, cols = np.nonzero(die_map.status == engine.PROBE)
+    return np.column_stack((die_map.x_centers[cols],
+                            die_map.y_centers[rows]))
+
+
+def brute_nearest_neighbor(xy, start):
+    visited = np.zeros(len(xy), dtype=bool)
+    order = [start]
+    visited[start] = True
+    for _ in range(len(xy) - 1):
+        dist_sq = ((xy - xy[order[-1]])**2).sum(axis=1)
+        dist_sq[visited] = np.inf
+        order.append(int(np.argmin(dist_sq)))
+        visited[order[-1]] = True
+    return np.array(order)
+
+
+class TestStrategies(unittest.TestCase):
+    def test_row_serpentine(self):
+        xy = np.array([[0, 1], [1, 1], [0, 0], [1, 0]], dtype=float)
+        np.testing.assert_array_equal(stepping.row_serpentine(xy),
+                                      [0, 1, 3, 2])
+
+    def test_column_serpentine(self):
+        xy = np.array([[0, 1], [1, 1], [0, 0], [1, 0]], dtype=float)
+        np.testing.assert_array_equal(stepping.column_serpentine(xy),
+                                      [0, 2, 3, 1])
+
+    def test_nearest_neighbor(self):
+        rng = np.random.RandomState(0)
+        for xy in [rng.uniform(0, 100, (300, 2)),
+                   rng.randint(0, 20, (200, 2)) * 2.5]:
+            np.testing.assert_array_equal(stepping.nearest_neighbor(xy, 7),
+                                          brute_nearest_neighbor(xy, 7))
+
+    def test_two_opt(self):
+        rng = np.random.RandomState(1)
+        xy = rng.uniform(0, 100, (300, 2))
+        order = stepping.nearest_neighbor(xy)
+        improved = stepping.two_opt(xy, order)
+        self.assertEqual(sorted(improved), list(range(300)))
+        self.assertEqual(improved[0], order[0])
+        self.assertLess(stepping.travel_distance(xy, improved),
+                        stepping.travel_distance(xy, order))
+
+    def test_compare_paths(self):
+        xy = probe_xy()
+        paths = stepping.compare_paths(xy)
+        self.assertEqual([p.strategy for p in paths],
+                         list(stepping.STRATEGIES))
+        for path in paths:
+            self.assertEqual(sorted(path.order), list(range(len(xy))))
+            # At least one pitch per step.
+            self.assertGreaterEqual(path.distance, 5 * (len(xy) - 1) - 1e-6)
+            self.assertGreater(path.index_time, 0)
+
+    def test_bad_strategy(self):
+        with self.assertRaises(ValueError):
+            stepping.plan_path(probe_xy(), "spiral")
+
+
+class TestTiming(unittest.TestCase):
+    def test_move_time(self):
+        # Reaches full speed: 100 mm at 100 mm/s plus the ramps.
+        self.assertAlmostEqual(float(stepping.move_time(100, 100, 1000)),
+                               1.1)
+        # Never reaches full speed.
+        self.assertAlmostEqual(float(stepping.move_time(2.5, 100, 1000)),
+                               0.1)
+        self.assertEqual(float(stepping.move_time(0, 100, 1000)), 0)
+
+    def test_index_time(self):
+        xy = np.array([[0, 0], [2.5, 0], [2.5, 10]])
+        time = stepping.index_time(xy, [0, 1, 2], 100, 1000)
+        self.assertAlmostEqual(time, 0.1 + 0.2)
+
+
+class TestOrderCoordList(unittest.TestCase):
+    def test_probe_first(self):
+        die_map = engine.max_gdw((5, 5), 150, 4.5, 4.5)
+        coord_list = die_map.coord_list()
+        ordered = stepping.order_coord_list(coord_list, die_map.pitch_xy,
+                                            die_map.center_xy, "nearest")
+        self.assertEqual(sorted(ordered), sorted(coord_list))
+        n_probe = die_map.gdw
+        self.assertTrue(all(c[2] == "probe" for c in ordered[:n_probe]))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for gdwcalc.yield_models
+"""
+
+import unittest
+
+import numpy as np
+
+from .. import yield_models
+
+
+class TestModels(unittest.TestCase):
+    def test_zero_defects(self):
+        for model in yield_models.MODELS:
+            self.assertEqual(float(yield_models.die_yield(25, 0, model)), 1)
+
+    def test_known_values(self):
+        # 100 mm^2 at 1 defect/cm^2 is AD = 1.
+        die_yield = yield_models.die_yield
+        self.assertAlmostEqual(float(die_yield(100, 1, "poisson")),
+                               np.exp(-1))
+        self.assertAlmostEqual(float(die_yield(100, 1, "murphy")),
+                               (1 - np.exp(-1))**2)
+        self.assertAlmostEqual(float(die_yield(100, 1, "seeds")), 0.5)
+        self.assertAlmostEqual(float(die_yield(100, 1, "negative_binomial",
+                                               alpha=1)), 0.5)
+
+    def test_ordering(self):
+        # Poisson is the most pessimistic, Seeds the least.
+        d0 = np.linspace(0.01, 5, 1000)
+        poisson = yield_models.die_yield(50, d0, "poisson")
+        murphy = yield_models.die_yield(50, d0, "murphy")
+        seeds = yield_models.die_yield(50, d0, "seeds")
+        self.assertTrue((poisson < murphy).all())
+        self.assertTrue((murphy < seeds).all())
+        self.assertTrue((np.diff(poisson) < 0).all())
+
+    def test_negative_binomial_limit(self):
+        d0 = np.linspace(0, 2, 50)
+        np.testing.assert_allclose(
+            yield_models.die_yield(50, d0, "negative_binomial", alpha=1e7),
+            yield_models.die_yield(50, d0, "poisson"), rtol=1e-5)
+
+    def test_broadcast(self):
+        gdw = np.array([[600], [150]])
+        area = np.array([[25], [100]])
+        d0 = np.linspace(0, 1, 2000)
+        net = yield_models.net_die(gdw, area, d0)
+        self.assertEqual(net.shape, (2, 2000))
+        np.testing.assert_array_equal(net[:, 0], [600, 150])
+        curves = yield_models.net_die_curves(gdw, area, d0)
+        self.assertEqual(curves.shape, (len(yield_models.MODELS), 2, 2000))
+
+    def test_bad_model(self):
+        with self.assertRaises(ValueError):
+            yield_models.die_yield(25, 0.1, "bose")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+@name:              yield_models.py
+@author:            Douglas Thor
+@created:           2019-10-19
+@descr:             Defect-density yield models.
+
+                    Converts gross die per wafer into net (yielding) die
+                    with the standard Poisson, Murphy, Seeds and negative
+                    binomial models. Every function broadcasts, so a whole
+                    curve over D0, or a catalog of die areas against a D0
+                    curve, is a single NumPy expression.
+
+"""
+# ---------------------------------------------------------------------------
+### Imports
+# ---------------------------------------------------------------------------
+# Standard Library
+from __future__ import print_function, division
+import collections
+
+# Third Party
+import numpy as np
+
+
+# ---------------------------------------------------------------------------
+### Constants
+# ---------------------------------------------------------------------------
+# Die areas are in mm^2 but D0 is conventionally in defects/cm^2.
+MM2_PER_CM2 = 100.0
+
+# The negative binomial cluster parameter if none is given.
+DEFAULT_ALPHA = 2.0
+
+
+# ---------------------------------------------------------------------------
+### Functions
+# ---------------------------------------------------------------------------
+def poisson(ad):
+    """ Poisson yield, exp(-AD). Defects are randomly distributed. """
+    return np.exp(-np.asarray(ad, dtype=float))
+
+
+def murphy(ad):
+    """ Murphy's yield, ((1 - exp(-AD)) / AD)^2. Equal to 1 at AD = 0. """
+    ad = np.asarray(ad, dtype=float)
+    safe = np.where(ad == 0, 1, ad)
+    return np.where(ad == 0, 1, (-np.expm1(-safe) / safe)**2)
+
+
+def seeds(ad):
+    """ Seeds' yield, 1 / (1 + AD). """
+    return 1 / (1 + np.asarray(ad, dtype=float))
+
+
+def negative_binomial(ad, alpha=DEFAULT_ALPHA):
+    """
+    Negative binomial yield, (1 + AD / alpha)^-alpha.
+
+    Small ``alpha`` means strongly clustered defects. As ``alpha`` goes to
+    infinity this becomes the Poisson model.
+    """
+    ad = np.asarray(ad, dtype=float)
+    return (1 + ad / alpha)**-np.asarray(alpha, dtype=float)
+
+
+# Model name: (display name, function of AD)
+MODELS = collections.OrderedDict([
+    ("poisson", ("Poisson", poisson)),
+    ("murphy", ("Murphy", murphy)),
+    ("seeds", ("Seeds", seeds)),
+    ("negative_binomial", ("Negative Binomial", negative_binomial)),
+])
+
+
+def die_yield(die_area, d0, model="poisson", alpha=DEFAULT_ALPHA):
+    """
+    Return the fraction of die that yield.
+
+    Parameters:
+    -----------
+    die_area : float or array-like
+        The die area in mm^2.
+    d0 : float or array-like
+        The defect density in defects/cm^2. Broadcast against
+        ``die_area``.
+    model : str, optional
+        One of the keys of ``MODELS``.
+    alpha : float or array-like, optional
+        The cluster parameter. Only used by the negative binomial model.
+
+    Returns:
+    --------
+    yield : float or ``numpy.ndarray`` of float
+    """
+    if model not in MODELS:
+        raise ValueError("model must be one of {}".format(list(MODELS)))
+    ad = (np.asarray(die_area, dtype=float) / MM2_PER_CM2
+          * np.asarray(d0, dtype=float))
+    if model == "negative_binomial":
+        return MODELS[model][1](ad, alpha)
+    return MODELS[model][1](ad)
+
+
+def net_die(gdw, die_area, d0, model="poisson", alpha=DEFAULT_ALPHA):
+    """
+    Return the expected number of yielding die per wafer.
+
+    ``gdw`` is broadcast against ``die_area`` and ``d0``, so passing
+    column vectors of GDW and area with a row vector of D0 gives a
+    (product, D0) table. See ``die_yield`` for the other parameters.
+    """
+    return np.asarray(gdw, dtype=float) * die_yield(die_area, d0, model,
+                                                    alpha)
+
+
+def net_die_curves(gdw, die_area, d0, alpha=DEFAULT_ALPHA):
+    """
+    Return the net die for every model, in ``MODELS`` order.
+
+    Returns:
+    --------
+    curves : ``numpy.ndarray`` of float
+        Shape ``(len(MODELS),) + broadcast shape of the inputs``.
+    """
+    return np.stack([net_die(gdw, die_area, d0, model, alpha)
+                     for model in MODELS])